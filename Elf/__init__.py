@@ -24,10 +24,14 @@ import logging
 from stat import *
 from Elf.elf_lookup import *
 import vstruct
+import vstruct.codec as vs_codec
 import vstruct.defs.elf as vs_elf
 
 logger = logging.getLogger(__name__)
 
+# dynamic symbols are unpacked this many at a time (there is no DT_SYMTABSZ)
+DYNSYM_CHUNK = 4096
+
 
 class ElfReloc:
     """
@@ -54,39 +58,47 @@ class ElfReloc:
 
 
 class Elf32Reloc(ElfReloc, vs_elf.Elf32Reloc):
+    symshift = 8
+
     def __init__(self, bigend=False):
         vs_elf.Elf32Reloc.__init__(self, bigend=bigend)
         ElfReloc.__init__(self)
 
     def getSymTabIndex(self):
-        return self.r_info >> 8
+        return self.r_info >> self.symshift
 
 
 class Elf32Reloca(ElfReloc, vs_elf.Elf32Reloca):
+    symshift = 8
+
     def __init__(self, bigend=False):
         vs_elf.Elf32Reloca.__init__(self, bigend=bigend)
         ElfReloc.__init__(self)
 
     def getSymTabIndex(self):
-        return self.r_info >> 8
+        return self.r_info >> self.symshift
 
 
 class Elf64Reloc(ElfReloc, vs_elf.Elf64Reloc):
+    symshift = 32
+
     def __init__(self, bigend=False):
         vs_elf.Elf64Reloc.__init__(self, bigend=bigend)
         ElfReloc.__init__(self)
 
     def getSymTabIndex(self):
-        return self.r_info >> 32
+        return self.r_info >> self.symshift
 
 
 class Elf64Reloca(ElfReloc, vs_elf.Elf64Reloca):
+    symshift = 32
+
     def __init__(self, bigend=False):
         vs_elf.Elf64Reloca.__init__(self, bigend=bigend)
         ElfReloc.__init__(self)
 
     def getSymTabIndex(self):
-        return self.r_info >> 32
+        return self.r_info >> self.symshift
 
 
 class ElfDynamic:
@@ -158,6 +170,173 @@ class Elf64Symbol(ElfSymbol, vs_elf.Elf64Symbol):
         vs_elf.Elf64Symbol.__init__(self, bigend=bigend)
         ElfSymbol.__init__(self)
 
+class ElfTable:
+    '''
+    A column oriented table of fixed size Elf structures (symbols, relocs,
+    dynamics).  Whole tables are unpacked at once into a list per field and
+    the Elf structure objects are only built (and then cached) when an entry
+    is indexed or iterated.  Rows may come from more than one structure class
+    (ie. REL and RELA relocs); fields a row's class does not have are None.
+
+    NOTE: the columns hold the parsed values, changes made to the objects
+          handed out are not reflected back into them.
+
+    Example:
+        syms = elf.getDynSymTable()
+        for name, value in zip(syms.names, syms.getColumn('st_value')):
+            print('0x%.8x %s' % (value, name))
+    '''
+    def __init__(self, bigend=False):
+        self.bigend = bigend
+        self.names = []
+        self.classes = []
+        self.columns = {}
+        self._objs = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        for idx in range(len(self.names)):
+            yield self.getObject(idx)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self.getObject(i) for i in range(*idx.indices(len(self.names)))]
+
+        if idx < 0:
+            idx += len(self.names)
+        if idx < 0 or idx >= len(self.names):
+            raise IndexError('ElfTable index out of range')
+        return self.getObject(idx)
+
+    def getCodec(self, cls):
+        return vs_codec.getCodec(cls, bigend=self.bigend)
+
+    def getColumn(self, fname):
+        '''
+        Return the list of values for the named field (one per row).
+        '''
+        col = self.columns.get(fname)
+        if col is None:
+            return [None] * len(self.names)
+        return col
+
+    def getRow(self, idx):
+        '''
+        Return the tuple of field values for the given row (in the
+        field order of the row's structure class).
+        '''
+        codec = self.getCodec(self.classes[idx])
+        return tuple(self.columns[fname][idx] for fname in codec.fields)
+
+    def unpackRows(self, cls, bytez, offset=0, count=None, stride=None):
+        '''
+        Unpack consecutive cls structures from bytez into row tuples
+        without adding them (see addRows()).  If the table entries are
+        not sizeof(cls) apart (ie. DT_SYMENT says otherwise) pass stride.
+        '''
+        codec = self.getCodec(cls)
+        if stride is None or stride == codec.size:
+            return codec.unpackArray(bytez, offset, count)
+
+        if stride < codec.size:
+            raise Exception('ElfTable: stride %d < %s size %d' % (stride, codec.name, codec.size))
+
+        maxcount = (len(bytez) - offset - codec.size) // stride + 1
+        if count is None:
+            count = max(maxcount, 0)
+        elif count > maxcount:
+            raise Exception('%s: not enough data for %d records' % (codec.name, count))
+
+        unpack = codec.struct.unpack_from
+        return [unpack(bytez, off) for off in range(offset, offset + (count * stride), stride)]
+
+    def addRows(self, cls, rows, names=None):
+        '''
+        Add rows (as returned by unpackRows()) of the given structure
+        class, returning the number of rows added.
+        '''
+        count = len(rows)
+        if not count:
+            return 0
+
+        if names is None:
+            names = [''] * count
+        elif len(names) != count:
+            raise Exception('ElfTable: %d names for %d rows' % (len(names), count))
+
+        base = len(self.names)
+        codec = self.getCodec(cls)
+        for fname, col in zip(codec.fields, zip(*rows)):
+            column = self.columns.get(fname)
+            if column is None:
+                column = self.columns[fname] = [None] * base
+            column.extend(col)
+
+        for column in self.columns.values():
+            if len(column) < base + count:
+                column.extend([None] * count)
+
+        self.classes.extend([cls] * count)
+        self.names.extend(names)
+        return count
+
+    def addBytes(self, cls, bytez, offset=0, count=None):
+        '''
+        Unpack and add consecutive cls structures from bytez (as many
+        as fit if count is None), returning the number of rows added.
+        '''
+        return self.addRows(cls, self.unpackRows(cls, bytez, offset, count))
+
+    def append(self, obj):
+        '''
+        Add an already parsed Elf structure object as a row.
+        '''
+        cls = type(obj)
+        row = self.getCodec(cls).struct.unpack(obj.vsEmit())
+        self.addRows(cls, [row], [obj.getName()])
+        self._objs[len(self.names) - 1] = obj
+
+    def extend(self, objs):
+        for obj in objs:
+            self.append(obj)
+
+    def getObject(self, idx):
+        '''
+        Return the (cached) Elf structure object for the given row.
+        '''
+        obj = self._objs.get(idx)
+        if obj is None:
+            cls = self.classes[idx]
+            obj = cls(bigend=self.bigend)
+            obj.vsParse(self.getCodec(cls).struct.pack(*self.getRow(idx)))
+            obj.setName(self.names[idx])
+            self._objs[idx] = obj
+        return obj
+
+    def setName(self, idx, name):
+        self.names[idx] = name
+        obj = self._objs.get(idx)
+        if obj is not None:
+            obj.setName(name)
+
+    def hasField(self, idx, fname):
+        '''
+        Does the structure class of the given row have the named field?
+        '''
+        return fname in self.getCodec(self.classes[idx]).prims
+
+class ElfRelocTable(ElfTable):
+    '''
+    An ElfTable of relocations (REL and RELA rows).
+    '''
+    def getSymTabIndex(self, idx):
+        '''
+        Return the symbol table index for the given reloc row.
+        '''
+        return self.columns['r_info'][idx] >> self.classes[idx].symshift
+
 class ElfPheader:
     def __init__(self):
         pass
@@ -222,6 +401,9 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
         '''
         Parse data from 'fd' and create an Elf object.
 
+        If fd is a vstruct.BufferFile (ie. from vstruct.mapFile()) reads
+        are served as slices of its buffer rather than seek()/read().
+
         This process attempts to get as much information from DYNAMICS as
         possible, then adds in data from SECTIONS.
         '''
@@ -246,6 +428,7 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
             self._cls_reloca = Elf32Reloca
             self._cls_symbol = Elf32Symbol
             self._cls_section = Elf32Section
+            self._cls_dynamic = Elf32Dynamic
         #Parse 64bit header
         elif e.e_class == ELFCLASS64:
             vs_elf.Elf64.__init__(self, bigend=bigend)
@@ -256,10 +439,14 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
             self._cls_reloca = Elf64Reloca
             self._cls_symbol = Elf64Symbol
             self._cls_section = Elf64Section
+            self._cls_dynamic = Elf64Dynamic
         else:
             raise Exception('Unrecognized e_class: %d' % e.e_class)
 
         self.fd = fd
+        self.fmap = None
+        if isinstance(fd, vstruct.BufferFile):
+            self.fmap = fd
         self.inmem = inmem
         self.bigend = bigend
 
@@ -276,15 +463,21 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
         self.pheaders = []
         self.sections = []
         self.secnames = {}
-        self.symbols  = []
-        self.relocs   = []
+        # symbols, relocs and dynamics are ElfTables (parsed into columns
+        # with the entry objects built on demand)
+        self.symbols  = ElfTable(bigend=bigend)
+        self.relocs   = ElfRelocTable(bigend=bigend)
         self.relocvas = []
+        self._relocvaset = set()
+        # name/addr -> index into self.symbols
         self.symbols_by_name = {}
         self.symbols_by_addr = {}
-        self.dynamics = []      # deprecated - 2019-10-21
-        self.dynamic_symbols = []
+        self.dynamics = ElfTable(bigend=bigend)      # deprecated - 2019-10-21
+        self.dynamic_symbols = ElfTable(bigend=bigend)
         self.dynstrtabmeta = (None, None)
         self.dynstrtab = []
+        self.dynstrbytes = None
+        self._strtabs = {}
         self.dynsymtabct = None     # populated by _parseDynStrs()
         logger.info('self._parsePheaders')
         self._parsePheaders()
@@ -325,6 +518,9 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
 
         But keeping in mind not to smash over the old location of the fd
         '''
+        if self.fmap is not None:
+            return self.fmap.readAt(0, len(self.fmap))
+
         self.fd.flush()
         old = self.fd.tell()
         self.fd.seek(0)
@@ -421,54 +617,75 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
 
         # only parse the symbols that are not already accounted for.
         # symbols are ordered, so existence of index Y is always the same
-        sym = self._cls_symbol(bigend=self.bigend)
-        count = len(symtab) // len(sym)
-        diff = count - len(self.dynamic_symbols)
-        if diff == 0:
+        cls = self._cls_symbol
+        table = self.dynamic_symbols
+        codec = table.getCodec(cls)
+        count = len(symtab) // codec.size
+        diff = count - len(table)
+        if diff <= 0:
             return
 
-        offset = len(self.dynamic_symbols) * len(sym)
-
-        syms = sym * diff
-        vstruct.VArray(elems=syms).vsParse(symtab[offset:], fast=True)
+        offset = len(table) * codec.size
+        rows = table.unpackRows(cls, symtab, offset, diff)
 
         logger.warning("_parseDynSymsFromSections:  current_count: %d\tdiff: %d\toffset: %d\t", count, diff, offset)
-        for sym in syms:
-            if not sym.st_name:
+        iname = codec.getFieldIndex('st_name')
+        seen = set(table.getRow(idx) for idx in range(len(table)))
+        newrows = []
+        names = []
+        for row in rows:
+            if not row[iname]:
                 continue
-            name = self.getStrtabString(sym.st_name, ".dynstr")
-            sym.setName(name)
 
-            if sym in self.dynamic_symbols:
+            name = self.getStrtabString(row[iname], ".dynstr")
+            if row in seen:
                 continue
-            self.dynamic_symbols.append(sym)
+
+            seen.add(row)
+            newrows.append(row)
+            names.append(name)
+
+        table.addRows(cls, newrows, names)
+
+    def _getDynamicRows(self, dynbytes):
+        '''
+        Unpack the dynamic entries in dynbytes (up to and including DT_NULL)
+        into (d_tag, d_value) rows.
+        '''
+        rows = self.dynamics.unpackRows(self._cls_dynamic, dynbytes)
+        for idx, (d_tag, d_value) in enumerate(rows):
+            if d_tag == DT_NULL:  # Represents the end
+                return rows[:idx + 1]
+        return rows
 
     def _parseDynamicsFromSections(self):
         '''
         if by some strange chance, the DYNAMCS PHDR doesn't exist but we have this section...
         '''
         dynbytes = self.getSectionBytes('.dynamic')
-        while dynbytes:
-            if self.bits == 32:
-                dyn = Elf32Dynamic(bigend=self.bigend)
-            elif self.bits == 64:
-                dyn = Elf64Dynamic(bigend=self.bigend)
-            else:
-                raise Exception('Platform not supported: %d' % (self.bits))
-            dyn.vsParse(dynbytes)
+        if not dynbytes:
+            return
 
-            if dyn.d_tag in Elf32Dynamic.has_string:
-                name = self.getStrtabString(dyn.d_value, ".dynstr")
-                dyn.setName(name)
+        table = self.dynamics
+        seen = set(table.getRow(idx) for idx in range(len(table)))
+        rows = []
+        names = []
+        for row in self._getDynamicRows(dynbytes):
+            d_tag, d_value = row
+            name = ''
+            if d_tag in ElfDynamic.has_string:
+                name = self.getStrtabString(d_value, ".dynstr")
 
             # don't add a second entry
-            if dyn not in self.dynamics:
-                logger.debug("dynamic: %r: 0x%x", dt_names.get(dyn.d_tag), dyn.d_value)
-                self.dynamics.append(dyn)
+            if row in seen:
+                continue
 
-            if dyn.d_tag == DT_NULL:  # Represents the end
-                break
-            dynbytes = dynbytes[len(dyn):]
+            logger.debug("dynamic: %r: 0x%x", dt_names.get(d_tag), d_value)
+            seen.add(row)
+            rows.append(row)
+            names.append(name)
+
+        table.addRows(self._cls_dynamic, rows, names)
 
     def _parseDynLinkInfo(self):
         '''
@@ -481,30 +698,19 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
         if dynbytes is None:
             return
 
-        while dynbytes:
-            if self.bits == 32:
-                dyn = Elf32Dynamic(bigend=self.bigend)
-            elif self.bits == 64:
-                dyn = Elf64Dynamic(bigend=self.bigend)
-            else:
-                raise Exception('Platform not supported: %d' % (self.bits))
-
-            dyn.vsParse(dynbytes)
-
+        rows = self._getDynamicRows(dynbytes)
+        for d_tag, d_value in rows:
             # dump the tag/value pairs into the "dyns" dictionary.  if multiples, create a tuple
-            curdyn = self.dyns.get(dyn.d_tag)
+            curdyn = self.dyns.get(d_tag)
             if curdyn is not None:
-                self.dyns[dyn.d_tag] = (curdyn, dyn.d_value)
+                self.dyns[d_tag] = (curdyn, d_value)
             else:
-                self.dyns[dyn.d_tag] = dyn.d_value
-            logger.debug('dynamic: %r: 0x%x', dt_names.get(dyn.d_tag), dyn.d_value)
+                self.dyns[d_tag] = d_value
+            logger.debug('dynamic: %r: 0x%x', dt_names.get(d_tag), d_value)
 
-            # DEPRECATED: storing info in both dyns{} and dynamics[].  
-            # 2019-10-21:  dynamics will go away sometime in the future
-            self.dynamics.append(dyn)
-            if dyn.d_tag == DT_NULL: # Represents the end
-                break
-            dynbytes = dynbytes[len(dyn):]
+        # DEPRECATED: storing info in both dyns{} and dynamics[].
+        # 2019-10-21:  dynamics will go away sometime in the future
+        self.dynamics.addRows(self._cls_dynamic, rows)
 
     def _parseDynStrs(self):
         # setup STRTAB for string recovery:
@@ -521,6 +727,7 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
         strtabbytes = self.readAtRva(dynstrtab, strsz)
 
         self.dynstrtabmeta = (dynstrtab, strsz)
+        self.dynstrbytes = strtabbytes
         self.dynstrtab = strtabbytes.split(b'\0')
 
         # since our string table should certainly end in '\0', we'll have an empty string
@@ -537,10 +744,11 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
             self.dynsymtabct = len(dynsymstrs) - 1
 
         # setup names for the dynamics table entries
-        for dyn in self.dynamics:
-            if dyn.d_tag in Elf32Dynamic.has_string:
-                name = self.getDynStrtabString(dyn.d_value)
-                dyn.setName(name)
+        table = self.dynamics
+        for idx, (d_tag, d_value) in enumerate(zip(table.getColumn('d_tag'), table.getColumn('d_value'))):
+            if d_tag in ElfDynamic.has_string:
+                name = self.getDynStrtabString(d_value)
+                table.setName(idx, name)
 
     def _parseDynSyms(self):
         '''
@@ -553,6 +761,9 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
         getDynSymTabInfo() cannot be fully trusted.  Therefore, we run a few
         sanity heuristics.
 
+        The table is unpacked DYNSYM_CHUNK entries at a time and stops at
+        the first entry which fails the heuristics.
+
         This is only a prep run to identify symbols.  If getDynSymbol() is
         called with an index not currently in dynamic_symbols, dynamic_symbols
         is expanded to fill the need (albeit, without these sanity checks, so
@@ -570,48 +781,58 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
         if symtabrva is None:
             return
 
+        cls = self._cls_symbol
+        table = self.dynamic_symbols
+        codec = table.getCodec(cls)
+        iname = codec.getFieldIndex('st_name')
+        iinfo = codec.getFieldIndex('st_info')
+
         dsoff = 0
         while True:
-            syment = self.readAtRva(symtabrva + dsoff, symsz)
-            sym = self._cls_symbol(bigend=self.bigend)
-            sym.vsParse(syment)
-            if sym.st_info & 0xf not in st_info_type:
-                break
+            symbytes = self.viewAtOffset(self.rvaToOffset(symtabrva + dsoff), symsz * DYNSYM_CHUNK)
+            rows = table.unpackRows(cls, symbytes, stride=symsz)
 
-            if sym.st_info >> 4 not in st_info_bind:
-                break
+            names = []
+            for row in rows:
+                info = row[iinfo]
+                if info & 0xf not in st_info_type:
+                    break
 
-            name = self.getDynStrtabString(sym.st_name)
-            if name is None:
-                break
+                if info >> 4 not in st_info_bind:
+                    break
 
-            sym.setName(name)
-            self.dynamic_symbols.append(sym)
+                name = self.getDynStrtabString(row[iname])
+                if name is None:
+                    break
 
-            dsoff += symsz
+                names.append(name)
+
+            table.addRows(cls, rows[:len(names)], names)
+            if len(names) < DYNSYM_CHUNK:
+                break
+
+            dsoff += symsz * DYNSYM_CHUNK
 
     # FIXME: wrap in VERDEF and SYMINFO into the analysis.
     def _parseSectionSymbols(self):
         """
         Parse out the symbols that this elf binary has for us.
         """
+        cls = self._cls_symbol
+        iname = self.symbols.getCodec(cls).getFieldIndex('st_name')
         for sec in self.sections:
             if sec.sh_type == SHT_SYMTAB:
-                sym = self._cls_symbol(bigend=self.bigend)
-                symtab = self.readAtOffset(sec.sh_offset, sec.sh_size)
-
-                count, remain = divmod(sec.sh_size, len(sym))
-                syms = sym * count
-
-                vstruct.VArray(elems=syms).vsParse(symtab, fast=True)
+                symtab = self.viewAtOffset(sec.sh_offset, sec.sh_size)
+                rows = self.symbols.unpackRows(cls, symtab)
 
-                for sym in syms:
-                    if sym.st_name:
-                        name = self.getStrtabString(sym.st_name, ".strtab")
-                        sym.setName(name)
-                    # logger.info('SHT_SYMTAB: %r', sym)
+                names = []
+                for row in rows:
+                    name = ''
+                    if row[iname]:
+                        name = self.getStrtabString(row[iname], ".strtab")
+                    names.append(name)
 
-                    self.addSymbol(sym)
+                self._addSymbolRows(rows, names)
 
     def _parseDynRelocs(self):
         """
@@ -636,25 +857,27 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
             self._doDynRelocs(jmprel, pltrelsz, cls)
 
     def _doDynRelocs(self, rva, relsz, cls=None):
-        syms = self.getDynSyms()
-
         if cls is None:
             cls = self._cls_reloc
 
-        reloc = cls(bigend=self.bigend)
-        relbytes = self.readAtRva(rva, relsz)
-        count, remain = divmod(relsz, len(reloc))
+        relbytes = self.viewAtOffset(self.rvaToOffset(rva), relsz)
+        rows = self.relocs.unpackRows(cls, relbytes)
+        if not rows:
+            return
+
+        codec = self.relocs.getCodec(cls)
+        ioff = codec.getFieldIndex('r_offset')
+        iinfo = codec.getFieldIndex('r_info')
 
-        relocs = reloc * count
-        vstruct.VArray(elems=relocs).vsParse(relbytes,fast=True)
+        symidxs = [row[iinfo] >> cls.symshift for row in rows]
+        # grow dynamic_symbols (once) to cover every referenced symbol
+        self.getDynSymbol(max(symidxs))
+        symnames = self.dynamic_symbols.names
 
-        for reloc in relocs:
-            index = reloc.getSymTabIndex()
-            sym = self.getDynSymbol(index)
-            if sym is not None:
-                reloc.setName( sym.getName() )
-            self.relocs.append(reloc)
-            self.relocvas.append(reloc.r_offset)
+        self.relocs.addRows(cls, rows, [symnames[idx] for idx in symidxs])
+        offsets = [row[ioff] for row in rows]
+        self.relocvas.extend(offsets)
+        self._relocvaset.update(offsets)
 
     def _parseSectionRelocs(self):
         """
@@ -680,27 +903,35 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
             if sec.sh_type == SHT_RELA:
                 reloccls = self._cls_reloca
 
-            secbytes = self.readAtOffset(sec.sh_offset, sec.sh_size)
-            reloc = reloccls(bigend=self.bigend)
-            count, remain = divmod(len(secbytes), len(reloc))
+            secbytes = self.viewAtOffset(sec.sh_offset, sec.sh_size)
+            rows = self.relocs.unpackRows(reloccls, secbytes)
 
-            relocs = reloc * count
-            vstruct.VArray(elems=relocs).vsParse(secbytes, fast=True)
+            codec = self.relocs.getCodec(reloccls)
+            ioff = codec.getFieldIndex('r_offset')
+            iinfo = codec.getFieldIndex('r_info')
+            symnames = self.dynamic_symbols.names
 
-            for reloc in relocs:
-                index = reloc.getSymTabIndex()
-                if index < len(self.dynamic_symbols):
-                    sym = self.dynamic_symbols[index]
-                    reloc.setName( sym.getName() )
+            newrows = []
+            names = []
+            for row in rows:
+                name = ''
+                index = row[iinfo] >> reloccls.symshift
+                if index < len(symnames):
+                    name = symnames[index]
 
-                if reloc.r_offset in self.relocvas:
+                rva = row[ioff]
+                if rva in self._relocvaset:
                     # FIXME: This line is hit sever tens of thousands of times during parsing
-                    logger.debug('duplicate relocation (section): %s', reloc)
+                    logger.debug('duplicate relocation (section): 0x%x', rva)
                     continue
 
-                logger.info('section reloc: %s', reloc)
-                self.relocs.append(reloc)
-                self.relocvas.append(reloc.r_offset)
+                logger.info('section reloc: @0x%x %d %s', rva, row[iinfo] & 0xff, name)
+                newrows.append(row)
+                names.append(name)
+                self.relocvas.append(rva)
+                self._relocvaset.add(rva)
+
+            self.relocs.addRows(reloccls, newrows, names)
 
     def getBaseAddress(self):
         """
@@ -772,9 +1003,21 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
         '''
         Read from the given file offset.
         '''
+        if self.fmap is not None:
+            return self.fmap.readAt(off, size)
+
         self.fd.seek(off)
         return self.fd.read(size)
 
+    def viewAtOffset(self, off, size):
+        '''
+        Like readAtOffset() but returns a memoryview (no copy) when the
+        file is mapped.  Used to bulk unpack tables.
+        '''
+        if self.fmap is not None:
+            return self.fmap.getView(off, size)
+        return self.readAtOffset(off, size)
+
     def getEndian(self):
         '''
         Is architecture BigEndian?
@@ -830,9 +1073,19 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
             return None
         return self.readAtOffset(sec.sh_offset, sec.sh_size)
 
+    def getStrtabBytes(self, section=".strtab"):
+        '''
+        Return the (cached) bytes of the named string table section.
+        '''
+        strtab = self._strtabs.get(section)
+        if strtab is None:
+            sec = self.getSection(section)
+            strtab = self.readAtOffset(sec.sh_offset, sec.sh_size)
+            self._strtabs[section] = strtab
+        return strtab
+
     def getStrtabString(self, offset, section=".strtab"):
-        sec = self.getSection(section)
-        bytes = self.readAtOffset(sec.sh_offset, sec.sh_size)
+        bytes = self.getStrtabBytes(section)
         index = bytes.find(b"\x00", offset)
         return bytes[offset:index].decode('utf-8')
 
@@ -890,9 +1143,28 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
         '''
         return list(self.dynamics)
 
+    def getDynamicTable(self):
+        '''
+        Return the ElfTable of dynamics (see getDynamics()).
+        '''
+        return self.dynamics
+
     def getDynSyms(self):
         '''
         Return a list of dynamic symbol objects.
+
+        NOTE: this is the ElfTable itself, which builds the objects on demand.
+        '''
+        return self.dynamic_symbols
+
+    def getDynSymTable(self):
+        '''
+        Return the ElfTable of dynamic symbols.
+
+        Example:
+            syms = elf.getDynSymTable()
+            for name, info in zip(syms.names, syms.getColumn('st_info')):
+                print(name, info & 0xf)
         '''
         return self.dynamic_symbols
 
@@ -902,14 +1174,21 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
         '''
         return list(self.relocs)
 
+    def getRelocTable(self):
+        '''
+        Return the ElfTable of relocations (REL and RELA rows, the
+        r_addend column is None for REL entries).
+        '''
+        return self.relocs
+
     def isPreLinked(self):
         '''
         Returns True if the Elf binary is prelinked.
         '''
-        for dyn in self.dynamics:
-            if dyn.d_tag == DT_GNU_PRELINKED:
+        for d_tag in self.dynamics.getColumn('d_tag'):
+            if d_tag == DT_GNU_PRELINKED:
                 return True
-            if dyn.d_tag == DT_GNU_CONFLICTSZ:
+            if d_tag == DT_GNU_CONFLICTSZ:
                 return True
         return False
 
@@ -987,14 +1266,20 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
         a long representing the address for the given symbol. Or None if
         it's not found.
         """
-        return self.symbols_by_name.get(name, None)
+        idx = self.symbols_by_name.get(name)
+        if idx is None:
+            return None
+        return self.symbols[idx]
 
     def lookupSymbolAddr(self, address):
         """
         lookup symbols from this elf binary by address.
         This returns the name for the given symbol or None for not found
         """
-        return self.symbols_by_addr.get(address, None)
+        idx = self.symbols_by_addr.get(address)
+        if idx is None:
+            return None
+        return self.symbols[idx]
 
     def getPheaders(self):
         """
@@ -1008,8 +1293,21 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
         These symbols are from ELF Sections of type SHT_SYMTAB
         '''
         self.symbols.append(symbol)
-        self.symbols_by_name[symbol.getName()] = symbol
-        self.symbols_by_addr[symbol.st_value] = symbol
+        idx = len(self.symbols) - 1
+        self.symbols_by_name[symbol.getName()] = idx
+        self.symbols_by_addr[symbol.st_value] = idx
+
+    def _addSymbolRows(self, rows, names):
+        '''
+        Add unpacked symbol rows to the Symbols table (see addSymbol()).
+        '''
+        base = len(self.symbols)
+        self.symbols.addRows(self._cls_symbol, rows, names)
+
+        ivalue = self.symbols.getCodec(self._cls_symbol).getFieldIndex('st_value')
+        for idx, (row, name) in enumerate(zip(rows, names), base):
+            self.symbols_by_name[name] = idx
+            self.symbols_by_addr[row[ivalue]] = idx
 
     def getSymbols(self):
         '''
@@ -1017,6 +1315,12 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
         '''
         return self.symbols
 
+    def getSymbolTable(self):
+        '''
+        Return the ElfTable of Symbols (from ELF Sections).
+        '''
+        return self.symbols
+
     def getDynSymbol(self, symidx):
         '''
         Returns the DT_SYMTAB entry at index "symidx".
@@ -1028,8 +1332,7 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
         if symidx >= symlen:
             # dynamic_symbols is too small, grow
             logger.info('getDynSymbol(%d): expanding dynamic_symbols from %d', symidx, symlen)
-            newspace = [self._getDynSymbol(x) for x in range(symlen, symidx + 1)]
-            self.dynamic_symbols.extend(newspace)
+            self._addDynSymbols(symlen, symidx + 1 - symlen)
 
         sym = self.dynamic_symbols[symidx]
         return sym
@@ -1051,6 +1354,21 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
         sym.setName(name)
         return sym
 
+    def _addDynSymbols(self, symidx, count):
+        '''
+        Unpack count DT_SYMTAB entries starting at index symidx into
+        self.dynamic_symbols (without any sanity checks).
+        '''
+        symtabrva, symsz, symtabsz = self.getDynSymTabInfo()
+
+        cls = self._cls_symbol
+        table = self.dynamic_symbols
+        symbytes = self.readAtRva(symtabrva + (symidx * symsz), count * symsz)
+        rows = table.unpackRows(cls, symbytes, count=count, stride=symsz)
+
+        iname = table.getCodec(cls).getFieldIndex('st_name')
+        table.addRows(cls, rows, [self.getDynStrtabString(row[iname]) for row in rows])
+
     def getDynStrTabInfo(self):
         return self.dynstrtabmeta
 
@@ -1087,8 +1405,7 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
             logger.info("no dyn strtabs!")
             return ''
 
-        dynstrtabva, strsz = self.dynstrtabmeta
-        strings = self.readAtRva(dynstrtabva, strsz)
+        strings = self.dynstrbytes
         strend = strings.find(b'\0', stroff)
         if stroff > len(strings):
             return None
@@ -1096,12 +1413,19 @@ class Elf(vs_elf.Elf32, vs_elf.Elf64):
         return strings[stroff:strend].decode('utf-8')
 
 
-def elfFromFileName(fname):
-    return Elf(open(fname, 'rb'))
+def elfFromFileName(fname, mapped=True):
+    '''
+    Parse the named file (regular files are mmap'd read-only unless
+    mapped=False).
+    '''
+    fd = open(fname, 'rb')
+    if mapped:
+        fd = vstruct.mapFile(fd)
+    return Elf(fd)
 
 
 def elfFromBytes(fbytes):
-    fd = io.BytesIO(fbytes)
+    fd = vstruct.BufferFile(fbytes)
     return Elf(fd)
 
 
@@ -0,0 +1,102 @@
+import unittest
+
+import Elf
+
+
+def mkSymbol(cls, name, value, size, info, bigend=False):
+    sym = cls(bigend=bigend)
+    sym.st_name = name
+    sym.st_value = value
+    sym.st_size = size
+    sym.st_info = info
+    sym.st_shndx = 1
+    return sym
+
+
+def mkReloc(cls, offset, info, addend=None, bigend=False):
+    rel = cls(bigend=bigend)
+    rel.r_offset = offset
+    rel.r_info = info
+    if addend is not None:
+        rel.r_addend = addend
+    return rel
+
+
+class ElfTableTest(unittest.TestCase):
+
+    def test_elf_table_columns(self):
+        syms = [mkSymbol(Elf.Elf64Symbol, i * 8, 0x1000 + i, i, Elf.STT_FUNC | (Elf.STB_GLOBAL << 4)) for i in range(5)]
+        bytez = b''.join(sym.vsEmit() for sym in syms)
+
+        table = Elf.ElfTable()
+        self.assertEqual(table.addBytes(Elf.Elf64Symbol, bytez), 5)
+        self.assertEqual(len(table), 5)
+        self.assertEqual(table.getColumn('st_value'), [0x1000 + i for i in range(5)])
+        self.assertEqual(table.getColumn('st_name'), [i * 8 for i in range(5)])
+        self.assertEqual(table.getColumn('nope'), [None] * 5)
+
+        # no objects until they are asked for
+        table.setName(3, 'foo')
+        self.assertEqual(table._objs, {})
+
+        sym = table[3]
+        self.assertIsInstance(sym, Elf.Elf64Symbol)
+        self.assertEqual(sym.st_value, 0x1003)
+        self.assertEqual(sym.st_size, 3)
+        self.assertEqual(sym.getName(), 'foo')
+        self.assertEqual(sym.getInfoType(), Elf.STT_FUNC)
+        self.assertIs(table[-2], sym)
+        self.assertEqual(list(table._objs.keys()), [3])
+
+        table.setName(3, 'bar')
+        self.assertEqual(sym.getName(), 'bar')
+        self.assertEqual([s.st_value for s in table], table.getColumn('st_value'))
+        self.assertEqual(table.getRow(1), table.getCodec(Elf.Elf64Symbol).struct.unpack(syms[1].vsEmit()))
+
+        with self.assertRaises(IndexError):
+            table[5]
+
+    def test_elf_table_relocs(self):
+        # REL and RELA rows in one (big endian 32 bit) table
+        rels = [mkReloc(Elf.Elf32Reloc, 0x2000 + (i * 4), (i << 8) | 1, bigend=True) for i in range(3)]
+        relas = [mkReloc(Elf.Elf32Reloca, 0x3000 + (i * 4), (i << 8) | 7, addend=0x10 + i, bigend=True) for i in range(2)]
+
+        table = Elf.ElfRelocTable(bigend=True)
+        table.addBytes(Elf.Elf32Reloc, b''.join(r.vsEmit() for r in rels))
+        rows = table.unpackRows(Elf.Elf32Reloca, b''.join(r.vsEmit() for r in relas))
+        table.addRows(Elf.Elf32Reloca, rows, ['a', 'b'])
+
+        self.assertEqual(table.getColumn('r_offset'), [0x2000, 0x2004, 0x2008, 0x3000, 0x3004])
+        self.assertEqual(table.getColumn('r_addend'), [None, None, None, 0x10, 0x11])
+        self.assertEqual(table.names, ['', '', '', 'a', 'b'])
+        self.assertEqual([table.getSymTabIndex(i) for i in range(5)], [0, 1, 2, 0, 1])
+        self.assertFalse(table.hasField(0, 'r_addend'))
+        self.assertTrue(table.hasField(4, 'r_addend'))
+
+        rela = table[4]
+        self.assertIsInstance(rela, Elf.Elf32Reloca)
+        self.assertEqual(rela.vsEmit(), relas[1].vsEmit())
+        self.assertEqual(rela.getName(), 'b')
+        self.assertEqual(rela.getSymTabIndex(), 1)
+
+        # already parsed objects may be appended too
+        table.append(mkReloc(Elf.Elf32Reloca, 0x4000, 0x207, addend=5, bigend=True))
+        self.assertEqual(table.getColumn('r_addend')[-1], 5)
+        self.assertEqual(table.getSymTabIndex(5), 2)
+
+    def test_elf_table_stride(self):
+        # DT_SYMENT may be larger than the structure
+        syms = [mkSymbol(Elf.Elf32Symbol, i, 0x8000 + i, 4, Elf.STT_OBJECT) for i in range(4)]
+        bytez = b''.join(sym.vsEmit() + b'\xff' * 8 for sym in syms)
+
+        table = Elf.ElfTable()
+        rows = table.unpackRows(Elf.Elf32Symbol, bytez, stride=len(syms[0]) + 8)
+        self.assertEqual(len(rows), 4)
+        table.addRows(Elf.Elf32Symbol, rows)
+        self.assertEqual(table.getColumn('st_value'), [0x8000, 0x8001, 0x8002, 0x8003])
+
+        rows = table.unpackRows(Elf.Elf32Symbol, bytez, offset=len(syms[0]) + 8, count=2, stride=len(syms[0]) + 8)
+        self.assertEqual([row[1] for row in rows], [0x8001, 0x8002])
+
+        with self.assertRaises(Exception):
+            table.unpackRows(Elf.Elf32Symbol, bytez, count=5, stride=len(syms[0]) + 8)
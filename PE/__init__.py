@@ -388,9 +388,15 @@ class PE(object):
         """
         Construct a PE object.  use inmem=True if you are
         using a MemObjFile or other "memory like" image.
+
+        If fd is a vstruct.BufferFile (ie. from vstruct.mapFile()) reads
+        are served as slices of its buffer rather than seek()/read().
         """
         object.__init__(self)
         self.inmem = inmem
+        self.fmap = None
+        if isinstance(fd, vstruct.BufferFile):
+            self.fmap = fd
         self.filesize = None
         self.min_rva = None
         self.max_rva = None
@@ -434,6 +440,9 @@ class PE(object):
 
         But keeping in mind not to smash over the old location of the fd
         '''
+        if self.fmap is not None:
+            return self.fmap.readAt(0, len(self.fmap))
+
         self.fd.flush()
         old = self.fd.tell()
         self.fd.seek(0)
@@ -755,6 +764,12 @@ class PE(object):
         return self.readAtOffset(offset, size, shortok)
 
     def readAtOffset(self, offset, size, shortok=False):
+        if self.fmap is not None and offset >= 0 and size >= 0:
+            ret = self.fmap.readAt(offset, size)
+            if len(ret) != size and not shortok:
+                return None
+            return ret
+
         ret = b""
         self.fd.seek(offset)
         while len(ret) != size:
@@ -1147,8 +1162,26 @@ class PE(object):
         """
         return self.relocations
 
+    def getRelocationColumns(self):
+        """
+        Return the base-relocations in this PE as a tuple of two
+        lists: (rvas, rtypes).  This avoids building a tuple per
+        relocation for large tables.
+
+        Example:
+            rvas, rtypes = pe.getRelocationColumns()
+            for rva, rtype in zip(rvas, rtypes):
+                print('0x%.8x %d' % (rva, rtype))
+        """
+        return self.reloc_columns
+
     def parseRelocations(self):
-        self.relocations = []
+        rvas = []
+        rtypes = []
+        self.reloc_columns = (rvas, rtypes)
+        # the (rva, rtype) list is built on demand from the columns
+        self.__dict__.pop('relocations', None)
+
         edir = self.getDataDirectory(IMAGE_DIRECTORY_ENTRY_BASERELOC)
         rva = edir.VirtualAddress
         rsize = edir.Size
@@ -1159,13 +1192,15 @@ class PE(object):
 
         reloff = self.rvaToOffset(rva)
         relbytes = self.readAtOffset(reloff, rsize)
+        relsize = len(relbytes)
 
-        while relbytes:
+        offset = 0
+        while offset < relsize:
             # bounce if we have less than 8 bytes to unpack
-            if len(relbytes) < 8:
+            if relsize - offset < 8:
                 return
 
-            pageva, chunksize = struct.unpack("<II", relbytes[:8])
+            pageva, chunksize = struct.unpack_from("<II", relbytes, offset)
             relcnt = (chunksize - 8) // 2
 
             # if chunksize == 0 bail
@@ -1174,7 +1209,7 @@ class PE(object):
                 return
 
             # RP BUG FIX - sometimes the chunksize is invalid we do a quick check to make sure we dont overrun the buffer
-            if chunksize > len(relbytes):
+            if chunksize > relsize - offset:
                 logger.warning("PE: corrupt relocation table: chunk size > table size")
                 return
 
@@ -1182,13 +1217,13 @@ class PE(object):
                 logger.warning("PE: corrupt relocation table: negative relocation count")
                 return
 
-            for roffset in range(8, min(chunksize, len(relbytes)), 2):
-                r = struct.unpack_from("<H", relbytes, roffset)[0]
-                rtype = r >> 12
-                roff  = r & 0xfff
-                self.relocations.append((pageva+roff, rtype))
+            # unpack the whole block at once (an odd chunksize still
+            # includes the entry straddling the end of the block)
+            entries = struct.unpack_from("<%dH" % len(range(8, chunksize, 2)), relbytes, offset + 8)
+            rvas.extend([pageva + (r & 0xfff) for r in entries])
+            rtypes.extend([r >> 12 for r in entries])
 
-            relbytes = relbytes[chunksize:]
+            offset += chunksize
 
     def getExportName(self):
         '''
@@ -1451,9 +1486,14 @@ class PE(object):
             return self.ResourceRoot
 
         elif name == "relocations":
-            self.parseRelocations()
+            rvas, rtypes = self.getRelocationColumns()
+            self.relocations = list(zip(rvas, rtypes))
             return self.relocations
 
+        elif name == "reloc_columns":
+            self.parseRelocations()
+            return self.reloc_columns
+
         elif name == "IMAGE_LOAD_CONFIG":
             self.parseLoadConfig()
             return self.IMAGE_LOAD_CONFIG
@@ -1465,15 +1505,20 @@ def peFromMemoryObject(memobj, baseaddr):
     fd = vstruct.MemObjFile(memobj, baseaddr)
     return PE(fd, inmem=True)
 
-def peFromFileName(fname):
+def peFromFileName(fname, mapped=True):
     """
     Utility helper that assures that the file is opened in
     binary mode which is required for proper functioning.
+
+    Regular files are mmap'd (read-only) unless mapped=False.
     """
     # TODO api change to make context handler
-    return PE(open(fname, 'rb'))
+    fd = open(fname, 'rb')
+    if mapped:
+        fd = vstruct.mapFile(fd)
+    return PE(fd)
 
 def peFromBytes(fbytes):
-    fd = io.BytesIO(fbytes)
+    fd = vstruct.BufferFile(fbytes)
     return PE(fd)
 
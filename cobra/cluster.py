@@ -4,14 +4,17 @@ Cobra's built in clustering framework
 """
 
 import gc
+import os
 import sys
 import time
 import struct
+import signal
 import socket
 import logging
 import traceback
 import threading
 import subprocess
+import collections
 import multiprocessing
 import urllib.request as url_req
 
@@ -25,16 +28,31 @@ queen_port = 32124
 cluster_port = 32123
 cluster_ip = "224.69.69.69"
 
+# Persistent workers heartbeat this often (seconds) and the server
+# expires their leases after this long without one.
+worker_heartbeat = 5
+worker_timeout = 30
+
 sub_cmd = """
 import cobra.cluster
 cobra.cluster.getAndDoWork("%s", docode=%s)
 """
 
+worker_cmd = """
+import cobra.cluster
+cobra.cluster.runClusterWorker("%s", docode=%s, batch=%d, idle=%s)
+"""
+
 class InvalidInProgWorkId(Exception):
     def __init__(self, workid):
         Exception.__init__(self, "Work ID %d is not valid" % workid)
         self.workid = workid
 
+class InvalidWorkerId(Exception):
+    def __init__(self, workerid):
+        Exception.__init__(self, "Worker ID %s is not valid" % workerid)
+        self.workerid = workerid
+
 class ClusterWork(object):
     """
     Extend this object to create your own work units.  Do it in
@@ -174,8 +192,6 @@ class VerboseCallback(ClusterCallback):
     def workCanceled(self, server, work):
         logger.debug("WORK CANCELED %d", work.id)
 
-import collections
-
 class ClusterServer:
 
     def __init__(self, name, maxsize=None, docode=False, bindsrc="", cobrad=None):
@@ -190,6 +206,7 @@ class ClusterServer:
         """
         self.go = True
         self.name = name
+        self.draining = False
         self.queens = []
         self.nextwid = 0
         self.inprog = {}
@@ -199,6 +216,13 @@ class ClusterServer:
         self.qcond = threading.Condition()
         self.widiter = iter(range(999999999))
 
+        # Persistent workers (see ClusterWorker) and the work ids
+        # they currently hold a lease on.
+        self.workers = {}
+        self.leases = {}
+        self.workeriter = iter(range(999999999))
+        self.workertimeout = worker_timeout
+
         # Initialize a cobra daemon if needed
         if cobrad is None:
             cobrad = cobra.CobraDaemon(host="", port=0)
@@ -283,25 +307,155 @@ class ClusterServer:
 
     def __cleanWork(self, workid):
         # Used by done/timeout/etc to clea up an in
-        # progress work unit
-        return self.inprog.pop(workid, None)
+        # progress work unit (and any worker lease on it)
+        with self.qcond:
+            work = self.inprog.pop(workid, None)
+            worker = self.workers.get(self.leases.pop(workid, None))
+            if worker is not None:
+                worker['leased'].pop(workid, None)
+                worker['running'].discard(workid)
+        return work
+
+    def __requeueWork(self, worker, workids):
+        # Put leased (but not yet started) work back at the
+        # front of the queue in the order it was handed out.
+        works = []
+        for workid in workids:
+            if self.leases.get(workid) != worker['id']:
+                continue
+            if workid in worker['running']:
+                continue
+            self.leases.pop(workid)
+            worker['leased'].pop(workid, None)
+            work = self.inprog.pop(workid, None)
+            if work is not None:
+                works.append(work)
+
+        self.queue.extendleft(reversed(works))
+        if works:
+            self.qcond.notify_all()
+        return works
 
     def timerThread(self):
-        # Internal function to monitor work unit time
+        # Internal function to monitor worker heartbeats and work unit time
         while self.go:
             try:
-                for id,work in self.inprog.items():
-                    if work.isTimedOut():
-                        self.timeoutWork(work)
+                self.checkTimeouts()
 
             except Exception as e:
                 logger.info("ClusterTimer: %s", e)
 
             time.sleep(2)
 
+    def checkTimeouts(self):
+        """
+        Expire the leases of workers which have missed their heartbeats
+        (work they had not started is queued again, work they were running
+        is timed out) and time out work units which stopped making progress.
+        """
+        now = time.time()
+        timedout = []
+        with self.qcond:
+            for workerid, worker in list(self.workers.items()):
+                if worker['seen'] + self.workertimeout >= now:
+                    continue
+
+                logger.warning("Worker %s (%r) missed its heartbeats", workerid, worker['info'])
+                self.workers.pop(workerid)
+                self.__requeueWork(worker, list(worker['leased']))
+                for workid in worker['running']:
+                    self.leases.pop(workid, None)
+                    work = self.inprog.get(workid)
+                    if work is not None:
+                        timedout.append(work)
+
+            # Only work units with a timeout which are actually running
+            # (not sitting in a worker's prefetch queue) need a look.
+            for workid, work in list(self.inprog.items()):
+                if work.timeout is None or work in timedout:
+                    continue
+
+                worker = self.workers.get(self.leases.get(workid))
+                if worker is not None and workid not in worker['running']:
+                    continue
+
+                if work.isTimedOut():
+                    timedout.append(work)
+
+        for work in timedout:
+            self.timeoutWork(work)
+
     def shutdownServer(self):
         self.go = False
 
+    def drainWorkers(self):
+        """
+        Stop handing out work.  Persistent workers finish the work unit
+        they are running, hand back the ones they prefetched and exit.
+        """
+        self.draining = True
+
+    def registerWorker(self, info=None):
+        """
+        Used by persistent workers (see ClusterWorker) to get the worker
+        id they lease work and heartbeat with.
+        """
+        with self.qcond:
+            workerid = 'worker%d' % next(self.workeriter)
+            self.workers[workerid] = {
+                'id': workerid,
+                'info': info,
+                'seen': time.time(),
+                'leased': {},
+                'running': set(),
+            }
+        return workerid
+
+    def unregisterWorker(self, workerid):
+        """
+        Used by persistent workers on their way out.  Any work they still
+        hold a lease on (and had not started) is queued again.
+        """
+        with self.qcond:
+            worker = self.workers.pop(workerid, None)
+            if worker is not None:
+                self.__requeueWork(worker, list(worker['leased']))
+
+    def heartbeat(self, workerid, running=()):
+        """
+        Used by persistent workers to tell the server they are alive
+        and which of their leased work units they have started.
+
+        Returns False if the worker should drain and exit (the server
+        is draining or the worker's leases already expired).
+        """
+        with self.qcond:
+            worker = self.workers.get(workerid)
+            if worker is None:
+                return False
+
+            worker['seen'] = time.time()
+            for workid in running:
+                if workid not in worker['leased'] or workid in worker['running']:
+                    continue
+                worker['running'].add(workid)
+                work = self.inprog.get(workid)
+                if work is not None:
+                    work.touch()
+
+            return not self.draining
+
+    def releaseWork(self, workerid, workids):
+        """
+        Used by persistent workers to hand back leased work units which
+        they have not started (they are queued again).
+        """
+        with self.qcond:
+            worker = self.workers.get(workerid)
+            if worker is None:
+                return
+            self.__requeueWork(worker, workids)
+
     def announceWork(self):
         """
         Announce to our multicast cluster peers that we have work
@@ -368,23 +522,52 @@ class ClusterServer:
             self.callback.workAdded(self, work)
 
     def getWork(self):
-
-        self.qcond.acquire()
-
-        try:
-            ret = self.queue.popleft()
-        except IndexError:
-            self.qcond.release()
+        """
+        Get the next work unit (or None if there is none).
+        """
+        ret = self.getWorkBatch(1)
+        if not ret:
             return None
+        return ret[0]
 
-        self.qcond.notifyAll()
-        self.qcond.release()
+    def getWorkBatch(self, count, workerid=None):
+        """
+        Get a list of up to count work units in one round trip.  Persistent
+        workers pass their workerid to lease the work, leased work units do
+        not time out until the worker reports them as running.
 
-        self.inprog[ret.id] = ret
-        self.__touchWork(ret.id)
+        Example:
+            for work in server.getWorkBatch(8, workerid):
+                ...
+        """
+        ret = []
+        with self.qcond:
+            if self.draining:
+                return ret
+
+            worker = None
+            if workerid is not None:
+                worker = self.workers.get(workerid)
+                if worker is None:
+                    raise InvalidWorkerId(workerid)
+                worker['seen'] = time.time()
+
+            while self.queue and len(ret) < count:
+                ret.append(self.queue.popleft())
+
+            if ret:
+                self.qcond.notify_all()
+
+            for work in ret:
+                self.inprog[work.id] = work
+                work.touch()
+                if worker is not None:
+                    worker['leased'][work.id] = True
+                    self.leases[work.id] = workerid
 
         if self.callback:
-            self.callback.workGotten(self, ret)
+            for work in ret:
+                self.callback.workGotten(self, work)
 
         return ret
 
@@ -430,6 +613,10 @@ class ClusterServer:
         if inprog:
             p = self.inprog
             self.inprog = {}
+            self.leases.clear()
+            for worker in self.workers.values():
+                worker['leased'].clear()
+                worker['running'].clear()
             qlist.extend(p.values())
 
         self.qcond.notifyAll()
@@ -490,14 +677,20 @@ class ClusterClient:
 
     maxwidth is the number of work units to do in parallel
     docode will enable code sharing with the server
+    persistent runs long lived ClusterWorker processes (which lease batch
+    work units at a time and exit after idle seconds without work) rather
+    than one process per work unit
     """
 
-    def __init__(self, name, maxwidth=multiprocessing.cpu_count(), docode=False):
+    def __init__(self, name, maxwidth=multiprocessing.cpu_count(), docode=False, persistent=True, batch=8, idle=10):
         self.go = True
         self.name = name
         self.width = 0
         self.maxwidth = maxwidth
         self.docode = docode
+        self.persistent = persistent
+        self.batch = batch
+        self.idle = idle
 
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -549,13 +742,179 @@ class ClusterClient:
 
     def threadForker(self, uri):
         self.width += 1
-        cmd = sub_cmd % (uri, self.docode)
+        if self.persistent:
+            cmd = worker_cmd % (uri, self.docode, self.batch, self.idle)
+        else:
+            cmd = sub_cmd % (uri, self.docode)
         try:
             sub = subprocess.Popen([sys.executable, '-c', cmd], stdin=subprocess.PIPE)
             sub.wait()
         finally:
             self.width -= 1
 
+class ClusterWorker:
+    """
+    A long lived worker which leases batches of work units from a
+    ClusterServer (prefetching the next batch while it works), heartbeats
+    to keep its leases and drains gracefully (finishing the running work
+    unit and handing back the prefetched ones) when asked to stop.
+
+    batch      - how many work units to lease per round trip
+    prefetch   - lease more once this few are left (default: batch // 2)
+    idle       - drain after this many seconds without work (None waits
+                 until the server drains or goes away)
+
+    Example:
+        worker = ClusterWorker('cobra://host:port/name', batch=16)
+        worker.runWorker()
+    """
+
+    def __init__(self, uri, batch=8, prefetch=None, heartbeat=worker_heartbeat, idle=None, docode=False):
+        if batch < 1:
+            raise Exception('ClusterWorker batch must be at least 1!')
+
+        self.go = True
+        self.uri = uri
+        self.batch = batch
+        if prefetch is None:
+            prefetch = batch // 2
+        self.prefetch = min(prefetch, batch - 1)
+        self.heartbeat = heartbeat
+        self.idle = idle
+        self.pollwait = 0.5
+        self.workerid = None
+        self.donecount = 0
+
+        self.pending = collections.deque()
+        self.running = set()
+        self.cond = threading.Condition()
+        self.finished = threading.Event()
+
+        if docode:
+            host, port = getHostPortFromUri(uri)
+            cobra.dcode.addDcodeServer(host, port=port)
+
+        # Use a cobra proxy with timeout/maxretry so we
+        # don't hang forever if the server goes away
+        self.server = cobra.CobraProxy(uri, timeout=60, retrymax=3)
+
+    def drain(self):
+        """
+        Stop leasing work.  The running work unit is finished and the
+        prefetched ones are handed back to the server.  (Safe to call
+        from a signal handler.)
+        """
+        with self.cond:
+            self.go = False
+            self.cond.notify_all()
+
+    def runWorker(self):
+        """
+        Do work units until drained, idle or the server goes away.
+        Returns the number of work units done.
+        """
+        info = (socket.gethostname(), os.getpid())
+        self.workerid = self.server.registerWorker(info)
+
+        for target in (self._fetchThread, self._heartbeatThread):
+            thr = threading.Thread(target=target, daemon=True)
+            thr.start()
+
+        try:
+            while True:
+                with self.cond:
+                    while self.go and not self.pending:
+                        self.cond.wait()
+
+                    if not self.go:
+                        break
+
+                    work = self.pending.popleft()
+                    self.running.add(work.id)
+                    self.cond.notify_all()
+
+                finished = runAndWaitWork(self.server, work)
+
+                with self.cond:
+                    self.running.discard(work.id)
+
+                self.donecount += 1
+                if not finished:
+                    # a hung work unit leaves its thread behind, so
+                    # get out and let a fresh process take over.
+                    logger.warning("Work %r did not finish, draining", work.id)
+                    self.drain()
+
+        finally:
+            self.finished.set()
+            with self.cond:
+                self.go = False
+                workids = [work.id for work in self.pending]
+                self.pending.clear()
+
+            try:
+                if workids:
+                    self.server.releaseWork(self.workerid, workids)
+                self.server.unregisterWorker(self.workerid)
+            except Exception as e:
+                logger.warning("Worker %s failed to unregister: %s", self.workerid, e)
+
+        return self.donecount
+
+    def _fetchThread(self):
+        lastwork = time.time()
+        while True:
+            with self.cond:
+                while self.go and len(self.pending) > self.prefetch:
+                    self.cond.wait()
+
+                if not self.go:
+                    return
+
+                count = self.batch - len(self.pending)
+
+            try:
+                works = self.server.getWorkBatch(count, self.workerid)
+            except Exception as e:
+                logger.warning("Worker %s failed to get work: %s", self.workerid, e)
+                self.drain()
+                return
+
+            with self.cond:
+                self.pending.extend(works)
+                self.cond.notify_all()
+                busy = bool(self.pending or self.running)
+
+            if works:
+                lastwork = time.time()
+                continue
+
+            if busy:
+                lastwork = time.time()
+
+            elif self.idle is not None and time.time() - lastwork > self.idle:
+                self.drain()
+                return
+
+            # The server has nothing for us, back off a bit
+            time.sleep(self.pollwait)
+
+    def _heartbeatThread(self):
+        # keep beating until the worker loop is done so the
+        # work unit being finished while draining keeps its lease.
+        while not self.finished.wait(self.heartbeat):
+            with self.cond:
+                running = list(self.running)
+
+            try:
+                ok = self.server.heartbeat(self.workerid, running)
+            except Exception as e:
+                logger.warning("Worker %s heartbeat failed: %s", self.workerid, e)
+                ok = False
+
+            if not ok:
+                self.drain()
+
 class ClusterQueen:
 
     def __init__(self, ifip, recast=True):
@@ -612,7 +971,10 @@ def workThread(server, work):
         server.failWork(work)
 
 def runAndWaitWork(server, work):
-
+    """
+    Run the work unit and wait for it to finish (or time out).  Returns
+    True if the work unit finished.
+    """
     work.touch()
     thr = threading.Thread(target=workThread, args=(server, work))
     thr.setDaemon(True)
@@ -620,19 +982,18 @@ def runAndWaitWork(server, work):
 
     # Wait around for done or timeout
     while True:
-        if work.isTimedOut():
-            break
-
         # If the thread is done, lets get out.
-        if not thr.isAlive():
-            break
+        thr.join(2)
+        if not thr.is_alive():
+            return True
+
+        if work.isTimedOut():
+            return False
 
         # If our parent, or some thread closes stdin,
         # time to pack up and go.
-        if sys.stdin.closed:
-            break
-
-        time.sleep(2)
+        if sys.stdin is not None and sys.stdin.closed:
+            return False
 
 def getAndDoWork(uri, docode=False):
 
@@ -660,3 +1021,20 @@ def getAndDoWork(uri, docode=False):
     gc.collect() # Try to call destructors
     sys.exit(0)  # GTFO
 
+def runClusterWorker(uri, docode=False, batch=8, idle=None):
+    """
+    Run a persistent ClusterWorker for the server at uri (SIGTERM
+    drains it) and exit once it is done.
+    """
+    logger.debug("runClusterWorker: uri=%s", uri)
+    try:
+        worker = ClusterWorker(uri, batch=batch, idle=idle, docode=docode)
+        signal.signal(signal.SIGTERM, lambda signum, frame: worker.drain())
+        worker.runWorker()
+
+    except Exception:
+        logger.error(traceback.format_exc())
+
+    gc.collect() # Try to call destructors
+    sys.exit(0)  # GTFO
+
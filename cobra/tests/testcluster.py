@@ -0,0 +1,147 @@
+import time
+import threading
+import unittest
+
+import cobra
+import cobra.cluster as c_cluster
+import cobra.tools.clusterbench as c_t_clusterbench
+
+
+class TestWork(c_cluster.ClusterWork):
+
+    def __init__(self, timeout=None):
+        c_cluster.ClusterWork.__init__(self, timeout=timeout)
+        self.ran = False
+
+    def work(self):
+        self.ran = True
+
+
+class TestCallback(c_cluster.ClusterCallback):
+
+    def __init__(self):
+        self.done = []
+        self.timedout = []
+
+    def workDone(self, server, work):
+        self.done.append(work.id)
+
+    def workTimeout(self, server, work):
+        self.timedout.append(work.id)
+
+
+class CobraClusterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.daemon = cobra.CobraDaemon(host='127.0.0.1', port=0)
+        self.server = c_cluster.ClusterServer('test', cobrad=self.daemon)
+        self.callback = TestCallback()
+        self.server.callback = self.callback
+
+    def tearDown(self):
+        self.server.shutdownServer()
+        if self.daemon.thr is not None:
+            self.daemon.stopServer()
+        else:
+            self.daemon.server_close()
+
+    def addWork(self, count, timeout=None):
+        works = [TestWork(timeout=timeout) for i in range(count)]
+        [self.server.addWork(work) for work in works]
+        return [work.id for work in works]
+
+    def test_cluster_getworkbatch(self):
+        wids = self.addWork(5)
+        self.assertEqual([w.id for w in self.server.getWorkBatch(3)], wids[:3])
+        self.assertEqual(self.server.getWork().id, wids[3])
+        self.assertEqual(self.server.inQueueCount(), 1)
+        self.assertEqual(self.server.inProgressCount(), 4)
+
+        self.assertRaises(c_cluster.InvalidWorkerId, self.server.getWorkBatch, 1, 'nope')
+
+        self.server.drainWorkers()
+        self.assertEqual(self.server.getWorkBatch(3), [])
+        self.assertIsNone(self.server.getWork())
+
+    def test_cluster_leases(self):
+        wids = self.addWork(6)
+        workerid = self.server.registerWorker()
+        works = self.server.getWorkBatch(4, workerid)
+        self.assertTrue(self.server.heartbeat(workerid, [wids[0]]))
+
+        # handing back unstarted work puts it at the front of the queue
+        self.server.releaseWork(workerid, wids[2:4])
+        self.assertEqual([w.id for w in self.server.queue], wids[2:])
+
+        self.server.doneWork(works[0])
+        self.assertEqual(self.callback.done, [wids[0]])
+
+        # a worker which stops heartbeating loses its leases
+        self.server.getWorkBatch(1, workerid)
+        self.server.heartbeat(workerid, [wids[1]])
+        self.server.workertimeout = 0
+        time.sleep(0.01)
+        self.server.checkTimeouts()
+        self.assertEqual(self.callback.timedout, [wids[1]])
+        self.assertEqual([w.id for w in self.server.queue], wids[2:])
+        self.assertEqual(self.server.inProgressCount(), 0)
+        self.assertFalse(self.server.heartbeat(workerid))
+
+    def test_cluster_lease_timeouts(self):
+        wids = self.addWork(2, timeout=0)
+        workerid = self.server.registerWorker()
+        self.server.getWorkBatch(2, workerid)
+        time.sleep(0.01)
+
+        # prefetched (not yet running) work does not time out
+        self.server.checkTimeouts()
+        self.assertEqual(self.callback.timedout, [])
+
+        self.server.heartbeat(workerid, [wids[0]])
+        time.sleep(0.01)
+        self.server.checkTimeouts()
+        self.assertEqual(self.callback.timedout, [wids[0]])
+        self.assertEqual(self.server.inProgressCount(), 1)
+
+    def test_cluster_worker(self):
+        wids = self.addWork(20)
+        self.daemon.fireThread()
+        uri = 'cobra://127.0.0.1:%d/%s' % (self.daemon.port, self.server.cobraname)
+
+        worker = c_cluster.ClusterWorker(uri, batch=4, idle=0)
+        self.assertEqual(worker.runWorker(), 20)
+        self.assertEqual(self.callback.done, wids)
+        self.assertEqual(self.server.workers, {})
+
+    def test_cluster_worker_drain(self):
+        wids = self.addWork(20)
+        self.daemon.fireThread()
+        uri = 'cobra://127.0.0.1:%d/%s' % (self.daemon.port, self.server.cobraname)
+
+        worker = c_cluster.ClusterWorker(uri, batch=8)
+        origwork = TestWork.work
+
+        def slowWork(work):
+            origwork(work)
+            if work.id == wids[2]:
+                worker.drain()
+
+        TestWork.work = slowWork
+        try:
+            thr = threading.Thread(target=worker.runWorker, daemon=True)
+            thr.start()
+            thr.join(30)
+        finally:
+            TestWork.work = origwork
+
+        # the running work unit finishes and the prefetched ones go back
+        self.assertFalse(thr.is_alive())
+        self.assertEqual(self.callback.done, wids[:3])
+        self.assertEqual([w.id for w in self.server.queue], wids[3:])
+        self.assertEqual(self.server.inProgressCount(), 0)
+        self.assertEqual(self.server.workers, {})
+
+    def test_cluster_bench(self):
+        ret = c_t_clusterbench.runBench(20, workers=2, batch=4, timeout=120)
+        self.assertEqual(ret['count'], 20)
+        self.assertEqual(ret['failed'], 0)
@@ -0,0 +1,174 @@
+'''
+Measure cobra.cluster work unit throughput on loopback.
+
+A ClusterServer is loaded with tiny work units and worker processes are
+run against it directly (no multicast announcements).  By default the
+workers are persistent ClusterWorkers leasing batches of work, --oneshot
+measures the old process per work unit model for comparison.
+
+Example:
+    python -m cobra.tools.clusterbench --count 1000 --workers 4 --batch 16
+    python -m cobra.tools.clusterbench --count 50 --workers 4 --oneshot
+'''
+import os
+import sys
+import time
+import argparse
+import threading
+import subprocess
+
+import cobra
+import cobra.cluster as c_cluster
+
+
+class BenchWork(c_cluster.ClusterWork):
+    '''
+    A work unit which does nothing (but optionally sleep).
+    '''
+    def __init__(self, delay=0.0):
+        c_cluster.ClusterWork.__init__(self)
+        self.delay = delay
+
+    def work(self):
+        if self.delay:
+            time.sleep(self.delay)
+
+
+class BenchCallback(c_cluster.ClusterCallback):
+    '''
+    Count work units as they finish and set an event once they all have.
+    '''
+    def __init__(self, count):
+        self.left = count
+        self.failed = 0
+        self.lock = threading.Lock()
+        self.alldone = threading.Event()
+
+    def _finish(self, failed=False):
+        with self.lock:
+            self.left -= 1
+            if failed:
+                self.failed += 1
+            if self.left <= 0:
+                self.alldone.set()
+
+    def workDone(self, server, work):
+        self._finish()
+
+    def workFailed(self, server, work):
+        self._finish(failed=True)
+
+    def workTimeout(self, server, work):
+        self._finish(failed=True)
+
+
+def getChildEnv():
+    '''
+    Return an environment for the worker pythons which imports this tree.
+    '''
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    path = env.get('PYTHONPATH')
+    env['PYTHONPATH'] = root if not path else os.pathsep.join((root, path))
+    return env
+
+
+def runOneShot(server, uri, workers):
+    # What ClusterClient used to do: a fresh python per work unit
+    # (up to workers at once) for as long as there is work queued.
+    env = getChildEnv()
+
+    def forker():
+        while server.inQueueCount():
+            cmd = c_cluster.sub_cmd % (uri, False)
+            subprocess.call([sys.executable, '-c', cmd], env=env, stdin=subprocess.DEVNULL)
+
+    thrs = [threading.Thread(target=forker, daemon=True) for i in range(workers)]
+    [thr.start() for thr in thrs]
+    return thrs
+
+
+def runPersistent(server, uri, workers, batch):
+    env = getChildEnv()
+    cmd = c_cluster.worker_cmd % (uri, False, batch, 1)
+    return [subprocess.Popen([sys.executable, '-c', cmd], env=env, stdin=subprocess.DEVNULL)
+            for i in range(workers)]
+
+
+def runBench(count, workers=4, batch=8, delay=0.0, oneshot=False, timeout=600):
+    '''
+    Run count work units through workers worker processes and return a
+    dict with the elapsed seconds and work units per second.
+    '''
+    # Use the work unit class by module name so the workers can
+    # unpickle it even when we are running as __main__.
+    import cobra.tools.clusterbench as c_t_clusterbench
+
+    daemon = cobra.CobraDaemon(host='127.0.0.1', port=0)
+    server = c_cluster.ClusterServer('clusterbench', cobrad=daemon)
+    callback = BenchCallback(count)
+    server.callback = callback
+
+    for i in range(count):
+        server.addWork(c_t_clusterbench.BenchWork(delay=delay))
+
+    daemon.fireThread()
+    uri = 'cobra://127.0.0.1:%d/%s' % (daemon.port, server.cobraname)
+
+    procs = []
+    start = time.time()
+    try:
+        if oneshot:
+            runOneShot(server, uri, workers)
+        else:
+            procs = runPersistent(server, uri, workers, batch)
+
+        if not callback.alldone.wait(timeout):
+            raise Exception('clusterbench: only %d of %d work units done' % (count - callback.left, count))
+
+        elapsed = time.time() - start
+
+    finally:
+        server.drainWorkers()
+        server.cancelAllWork()
+        for proc in procs:
+            try:
+                proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+
+        server.shutdownServer()
+        daemon.stopServer()
+
+    return {
+        'count': count,
+        'failed': callback.failed,
+        'seconds': elapsed,
+        'rate': count / elapsed,
+    }
+
+
+def setup():
+    ap = argparse.ArgumentParser('Measure cobra.cluster throughput on loopback')
+    ap.add_argument('--count', type=int, default=500, help='Number of work units to run')
+    ap.add_argument('--workers', type=int, default=4, help='Number of worker processes')
+    ap.add_argument('--batch', type=int, default=8, help='Work units leased per round trip')
+    ap.add_argument('--delay', type=float, default=0.0, help='Seconds each work unit sleeps')
+    ap.add_argument('--oneshot', action='store_true', help='Run a process per work unit instead')
+    return ap
+
+
+def main(argv):
+    opts = setup().parse_args(argv)
+    ret = runBench(opts.count, workers=opts.workers, batch=opts.batch,
+                   delay=opts.delay, oneshot=opts.oneshot)
+
+    mode = 'oneshot' if opts.oneshot else 'persistent (batch %d)' % opts.batch
+    print('%s: %d work units (%d failed) on %d workers in %.2fs (%.1f/s)' %
+          (mode, ret['count'], ret['failed'], opts.workers, ret['seconds'], ret['rate']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -7,12 +7,16 @@ import cobra.cluster as c_cluster
 def setup():
     ap = argparse.ArgumentParser('Cluster worker tool')
     ap.add_argument('cluster', help='Name of the cluster to attach to')
+    ap.add_argument('--batch', type=int, default=8, help='Work units to lease per round trip')
+    ap.add_argument('--idle', type=int, default=10, help='Seconds without work before a worker exits')
+    ap.add_argument('--oneshot', action='store_true', help='Run a process per work unit (no persistent workers)')
     return ap
 
 
 def main(argv):
     opts = setup().parse_args(argv)
-    worker = c_cluster.ClusterClient(opts.cluster, docode=True)
+    worker = c_cluster.ClusterClient(opts.cluster, docode=True, persistent=not opts.oneshot,
+                                     batch=opts.batch, idle=opts.idle)
     worker.processWork()
 
 
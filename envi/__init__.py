@@ -5,9 +5,11 @@ ArchitectureModule, Opcode, Operand, and Emulator objects.
 
 import types
 import struct
+import importlib
 import logging
 import platform
 import contextlib
+import collections
 
 from envi.exc import *
 
@@ -75,6 +77,54 @@ import envi.memory as e_mem
 import envi.registers as e_reg
 import envi.memcanvas as e_canvas
 
+# A lightweight decoded instruction (see archParseOpcodes(records=True))
+OpRecord = collections.namedtuple('OpRecord', ('va', 'size', 'iflags', 'branches'))
+
+def parseOpcodeRun(parse, bytez, offset=0, va=0, maxcount=None, maxva=None, records=False):
+    '''
+    Linearly decode instructions using the given parse(bytez, offset, va)
+    callable (usually an arch's disassembler), returning a list of Opcodes
+    (or OpRecords if records=True).
+
+    Decoding stops at the end of the bytes, after maxcount instructions,
+    once an instruction would start at or beyond maxva, or at the first
+    bytes which do not decode (InvalidInstruction, SegmentationViolation
+    or an instruction truncated by the end of the bytes is *not* raised;
+    the last returned instruction shows where the run ended).  Any other
+    error from the parser is raised.
+    '''
+    ret = []
+    append = ret.append
+    endoff = len(bytez)
+    if maxva is not None:
+        endoff = min(endoff, offset + (maxva - va))
+
+    if maxcount is None:
+        maxcount = -1
+
+    delta = va - offset
+    while offset < endoff and maxcount != 0:
+        try:
+            op = parse(bytez, offset, offset + delta)
+        except (InvalidInstruction, SegmentationViolation):
+            break
+        except (IndexError, struct.error):
+            # the disassemblers run off the end of the bytes this way
+            break
+
+        if records:
+            append(OpRecord(op.va, op.size, op.iflags, tuple(op.getBranches())))
+        else:
+            append(op)
+
+        if op.size <= 0:
+            break
+
+        offset += op.size
+        maxcount -= 1
+
+    return ret
+
 class ArchitectureModule:
     """
     An architecture module implementes methods to deal
@@ -153,6 +203,22 @@ class ArchitectureModule:
         '''
         raise ArchNotImplemented('archParseOpcode')
 
+    def archParseOpcodes(self, bytez, offset=0, va=0, maxcount=None, maxva=None, records=False):
+        '''
+        Linearly decode a run of instructions from the given bytes in one
+        call.  Decoding stops at the end of the bytes, after maxcount
+        instructions, once an instruction would start at or beyond maxva,
+        or at the first bytes which do not decode (without raising).
+
+        If records=True, lightweight OpRecord(va, size, iflags, branches)
+        tuples are returned rather than the Opcode objects.
+
+        Example:
+            for op in a.archParseOpcodes(bytez, va=0x41414141, maxcount=10):
+                print(repr(op))
+        '''
+        return parseOpcodeRun(self.archParseOpcode, bytez, offset, va, maxcount=maxcount, maxva=maxva, records=records)
+
     def archGetRegisterGroups(self):
         '''
         Returns a tuple of tuples of registers for different register groups.
@@ -255,6 +321,24 @@ def stealArchMethods(obj, archname):
         if type(o) == types.MethodType:
             setattr(obj, name, o)
 
+def getObjVars(obj):
+    '''
+    Return a dict of the attributes set on an object, like vars() but
+    including __slots__ attributes (Opcode and Operand objects use slots
+    to keep the per-instruction memory cost down).
+
+    Example:
+        for name, valu in getObjVars(op.opers[0]).items():
+            print('%s: %r' % (name, valu))
+    '''
+    ret = {}
+    for cls in reversed(type(obj).__mro__):
+        for name in cls.__dict__.get('__slots__', ()):
+            if hasattr(obj, name):
+                ret[name] = getattr(obj, name)
+    ret.update(getattr(obj, '__dict__', {}))
+    return ret
+
 class Operand:
 
     """
@@ -262,6 +346,7 @@ class Operand:
     attached to an envi Opcode.  This does *not* have a constructor of it's
     pwn on purpose to cut down on memory use and constructor CPU cost.
     """
+    __slots__ = ()
 
     def getOperValue(self, op, emu=None):
         """
@@ -338,11 +423,13 @@ class Operand:
         return True
 
 class DerefOper(Operand):
+    __slots__ = ()
 
     def isDeref(self):
         return True
 
 class ImmedOper(Operand):
+    __slots__ = ()
 
     def isImmed(self):
         return True
@@ -351,6 +438,7 @@ class ImmedOper(Operand):
         return True
 
 class RegisterOper(Operand):
+    __slots__ = ()
 
     def isReg(self):
         return True
@@ -359,6 +447,8 @@ class Opcode:
     """
     A universal representation for an opcode
     """
+    __slots__ = ('opcode', 'mnem', 'prefixes', 'size', 'opers', 'repr', 'iflags', 'va')
+
     prefix_names = [] # flag->humon tuples
 
     def __init__(self, va, opcode, mnem, prefixes, size, operands, iflags=0):
@@ -565,8 +655,7 @@ class Emulator(e_reg.RegisterContext, e_mem.MemoryObject):
         '''
         Sets Endianness for the Emulator.
         '''
-        for arch in self.imem_archs:
-            arch.setEndian(endian)
+        self.imem_archs.setEndian(endian)
 
     def getEndian(self):
         '''
@@ -1308,30 +1397,82 @@ def getArchModule(name=None):
     else:
         raise ArchNotImplemented(name)
 
+# (module, class) for each arch module, these must be in ARCH_FOO order
+arch_module_ctors = (
+    ('envi.archs.i386', 'i386Module'),
+    ('envi.archs.amd64', 'Amd64Module'),
+    ('envi.archs.arm', 'ArmModule'),
+    ('envi.archs.thumb16', 'Thumb16Module'),
+    ('envi.archs.thumb16', 'ThumbModule'),
+    ('envi.archs.msp430', 'Msp430Module'),
+    ('envi.archs.h8', 'H8Module'),
+)
+
+class ArchModuleList(list):
+    '''
+    The list of arch modules returned by getArchModules().
+
+    Each arch module is imported and constructed the first time its
+    index is used, so a memory object (or workspace) only pays for the
+    architectures it actually decodes.  Iterating builds them all.
+    '''
+    def __init__(self, default=ARCH_DEFAULT):
+        list.__init__(self, [None] * (len(arch_module_ctors) + 1))
+        self._arch_default = default >> 16
+        self._arch_endian = None
+
+    def _buildArch(self, idx):
+        if idx == ARCH_DEFAULT:
+            if self._arch_default == ARCH_DEFAULT:
+                return None
+            archmod = self[self._arch_default]
+            list.__setitem__(self, idx, archmod)
+            return archmod
+
+        modname, clsname = arch_module_ctors[idx - 1]
+        archmod = getattr(importlib.import_module(modname), clsname)()
+        if self._arch_endian is not None:
+            archmod.setEndian(self._arch_endian)
+
+        list.__setitem__(self, idx, archmod)
+        return archmod
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+
+        archmod = list.__getitem__(self, idx)
+        if archmod is None:
+            if idx < 0:
+                idx += len(self)
+            archmod = self._buildArch(idx)
+        return archmod
+
+    def __setitem__(self, idx, archmod):
+        if idx == ARCH_DEFAULT:
+            # an explicitly set default replaces the lazy one
+            self._arch_default = ARCH_DEFAULT
+        list.__setitem__(self, idx, archmod)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def setEndian(self, endian):
+        '''
+        Set the endianness of the arch modules built so far (and of any
+        built later).
+        '''
+        self._arch_endian = endian
+        for archmod in list.__iter__(self):
+            if archmod is not None:
+                archmod.setEndian(endian)
+
 def getArchModules(default=ARCH_DEFAULT):
     '''
     Retrieve a default array of arch modules ( where index 0 is
     also the "named" or "default" arch module.
+
+    The arch modules are imported on first use (see ArchModuleList).
     '''
-    import envi.archs.h8 as e_h8
-    import envi.archs.arm as e_arm
-    import envi.archs.i386 as e_i386
-    import envi.archs.amd64 as e_amd64
-    import envi.archs.thumb16 as e_thumb16
-    import envi.archs.msp430 as e_msp430
-
-    archs = [None]
-
-    # These must be in ARCH_FOO order
-    archs.append(e_i386.i386Module())
-    archs.append(e_amd64.Amd64Module())
-    archs.append(e_arm.ArmModule())
-    archs.append(e_thumb16.Thumb16Module())
-    archs.append(e_thumb16.ThumbModule())
-    archs.append(e_msp430.Msp430Module())
-    archs.append(e_h8.H8Module())
-
-    # Set the default module ( or None )
-    archs[ARCH_DEFAULT] = archs[default >> 16]
-
-    return archs
+    return ArchModuleList(default=default)
@@ -70,6 +70,8 @@ META_SIZES[2] = RMETA_LOW16
 META_SIZES[4] = RMETA_LOW32
 
 class Amd64Opcode(i386Opcode):
+    __slots__ = ()
+
     def __init__(self, va, opcode, mnem, prefixes, size, operands, iflags=0):
         '''
         Overriding this from envi/__init__.py in order to set the mnem for VEX instructions
@@ -113,6 +115,8 @@ class Amd64Opcode(i386Opcode):
                 mcanv.addText(",")
 
 class Amd64RipRelOper(envi.DerefOper):
+    __slots__ = ('imm', 'tsize', '_is_deref', '_dis_regctx')
+
     def __init__(self, imm, tsize):
         self.imm = imm
         self.tsize = tsize
@@ -185,6 +189,11 @@ class Amd64Disasm(e_i386.i386Disasm):
         self._dis_amethods[opcode86.ADDRMETH_L >> 16] = self.ameth_l
         self._dis_amethods[opcode86.ADDRMETH_VEXH >> 16] = self.ameth_vexh
 
+        self._dis_alens[opcode86.ADDRMETH_B >> 16] = 0
+        self._dis_alens[opcode86.ADDRMETH_H >> 16] = 0
+        self._dis_alens[opcode86.ADDRMETH_L >> 16] = 1
+        self._dis_alens[opcode86.ADDRMETH_VEXH >> 16] = 0
+
         # Over-ride these which are in use by the i386 version of the ASM
         self.ROFFSETSIMD  = e_i386.getRegOffset(amd64regs, "ymm0")
         self.ROFFSETDEBUG = e_i386.getRegOffset(amd64regs, "debug0")
@@ -227,8 +236,124 @@ class Amd64Disasm(e_i386.i386Disasm):
 
     def disasm(self, bytez, offset, va):
         '''
-        The main amd64 decoder function. The inital steps it takes are determining what
-        potential prefixes are attached to the instruction. By "potential", we mean that at
+        The main amd64 decoder function.  See _dis_lookup() for the prefix
+        and opcode table handling, after which the operands are parsed
+        based on their addressing methods.
+        '''
+        startoff = offset  # Use startoff as a size knob if needed
+        tabdesc, opdesc, offset, prefixes, isvex = self._dis_lookup(bytez, offset, va)
+        optype = opdesc[1]
+        tbl_opercnt = tabdesc[1]
+        mnem = opdesc[3 + tbl_opercnt]
+
+        # Stuff we'll be putting in the opcode object
+        operands = []
+
+        operoffset = 0
+        # Begin parsing operands based off address method
+        for i in range(operands_index, operands_index + tbl_opercnt):
+
+            oper = None  # Set this if we end up with an operand
+            osize = 0
+
+            # Pull out the operand description from the table
+            operflags = opdesc[i]
+            opertype = operflags & opcode86.OPTYPE_MASK
+            addrmeth = operflags & opcode86.ADDRMETH_MASK
+
+            # If there are no more operands, break out of the loop!
+            if operflags == 0:
+                break
+
+            # handles tsize calculations including new REX prefixes
+            tsize = self._dis_calc_tsize(opertype, prefixes, operflags)
+            # If addrmeth is zero, we have operands embedded in the opcode
+            if addrmeth == 0:
+                osize = 0
+                oper = self.ameth_0(operflags, opdesc[2+tbl_opercnt+i], tsize, prefixes)
+
+            else:
+                # So the 0x7f is here to help us deal with an issue between VEX and non-VEX
+                # A super common patter in vex is to add an operand somewhere in the middle of the
+                # existing operands. So if we have like cmpps xmm2, 17 in non-VEX, the vex version
+                # will look like vsprlw xmm3, xmm4, 17.
+                # The fun bit of this is that the vex only portions aren't exclusive to the VEX-only
+                # addressing methods, so we can have ADDRMETH_V be skipped outside of VEX mode too, and not
+                # just things like ADDRMETH_H. Hence, we need a new flag that I stash in the upper bits of
+                # instruction operand definition so we can know when to skip operands
+                ameth = self._dis_amethods[(addrmeth >> 16) & 0x7F]
+                vex_skip = addrmeth & opcode86.ADDRMETH_VEXSKIP
+                if not isvex and vex_skip:
+                    continue
+
+                if ameth is None:
+                    raise Exception("Implement Addressing Method 0x%.8x" % addrmeth)
+
+                # NOTE: Depending on your addrmethod you may get beginning of operands, or offset
+                try:
+                    if addrmeth in IMM_REQOFFS:
+                        osize, oper = ameth(bytez, offset+operoffset, tsize, prefixes, operflags)
+
+                        # If we are a sign extended immediate and not the same as the other operand,
+                        # do the sign extension during disassembly so nothing else has to worry about it..
+                        if operflags & opcode86.OP_SIGNED:
+                            if len(operands) and tsize != operands[-1].tsize:
+                                otsize = operands[-1].tsize
+                                oper.imm = e_bits.sign_extend(oper.imm, oper.tsize, otsize)
+                                oper.tsize = otsize
+                            elif not len(operands):
+                                oper.imm = e_bits.sign_extend(oper.imm, oper.tsize, self._dis_default_size)
+                                oper.tsize = self._dis_default_size
+
+                    else:
+                        # see same code section in i386 for this rationale
+                        osize, oper = ameth(bytez, offset, tsize, prefixes, operflags)
+                        if oper and oper.isDeref():
+                            memsz = OP_EXTRA_MEMSIZES[(operflags & OP_MEMMASK) >> 4]
+                            if memsz is not None:
+                                oper.tsize = memsz
+                            if prefixes & PREFIX_ADDR_SIZE:
+                                if getattr(oper, 'reg', None) is not None:
+                                    oper.reg |= RMETA_LOW32
+                                elif getattr(oper, 'index', None) is not None:
+                                    oper.index |= RMETA_LOW32
+
+                except struct.error:
+                    # Catch struct unpack errors due to insufficient data length
+                    raise envi.InvalidInstruction(bytez=bytez[startoff:startoff+16])
+
+            if oper is not None:
+                if oper.__class__ is e_i386.i386RegOper:
+                    oper = self._getSharedRegOper(oper)
+                # This is a filty hack for now...
+                oper._dis_regctx = self._dis_regctx
+                operands.append(oper)
+
+            operoffset += osize
+
+        iflags = self._dis_get_iflags(optype, mnem, prefixes)
+
+        # Lea will have a reg-mem/sib operand with _is_deref True, but should be false
+        if optype & 0xFFFF == opcode86.INS_LEA and operands[1].isDeref():
+            operands[1]._is_deref = False
+
+        ret = Amd64Opcode(va, optype, mnem, prefixes, (offset-startoff)+operoffset, operands, iflags)
+        return ret
+
+    def _dis_flow_lookup(self, bytez, offset, va):
+        tabdesc, opdesc, offset, prefixes, isvex = self._dis_lookup(bytez, offset, va)
+        tbl_opercnt = tabdesc[1]
+        operflags = opdesc[operands_index:operands_index + tbl_opercnt]
+        return offset, prefixes, opdesc[1], opdesc[3 + tbl_opercnt], operflags, isvex
+
+    def _dis_lookup(self, bytez, offset, va):
+        '''
+        Consume the prefixes (including REX and VEX) and walk the opcode
+        tables for the instruction at offset.  Returns a tuple of
+        (tabdesc, opdesc, offset, prefixes, isvex) where the offset points
+        just past the opcode bytes.
+
+        The inital steps it takes are determining what potential prefixes are attached to the instruction. By "potential", we mean that at
         this stage we don't know if thigs like 66, F2, F3 are being used as normal prefixes
         (representing things like a rep prefix) or if they're being used as mandatory prefixes
         that completely change with instruction we're decoding. All potential prefixes are stored
@@ -268,10 +393,8 @@ class Amd64Disasm(e_i386.i386Disasm):
         last_pref = 0
         ppref = [(None, None)]
 
-        # Stuff we'll be putting in the opcode object
         optype = None  # This gets set if we successfully decode below
         mnem = None
-        operands = []
 
         prefixes = 0
         pho_prefixes = 0  # faux prefixes...don't immediately apply them, they may not be the prefixes we're looking for
@@ -418,108 +541,11 @@ class Amd64Disasm(e_i386.i386Disasm):
 
         tabdesc, opdesc, offset, prefixes = decodings.pop()
         optype = opdesc[1]
-        tbl_opercnt = tabdesc[1]
-        mnem = opdesc[3 + tbl_opercnt]
 
         if optype == 0:
             raise envi.InvalidInstruction(bytez=bytez[startoff:startoff+16], va=va)
 
-        operoffset = 0
-        # Begin parsing operands based off address method
-        for i in range(operands_index, operands_index + tbl_opercnt):
-
-            oper = None  # Set this if we end up with an operand
-            osize = 0
-
-            # Pull out the operand description from the table
-            operflags = opdesc[i]
-            opertype = operflags & opcode86.OPTYPE_MASK
-            addrmeth = operflags & opcode86.ADDRMETH_MASK
-
-            # If there are no more operands, break out of the loop!
-            if operflags == 0:
-                break
-
-            # handles tsize calculations including new REX prefixes
-            tsize = self._dis_calc_tsize(opertype, prefixes, operflags)
-            # If addrmeth is zero, we have operands embedded in the opcode
-            if addrmeth == 0:
-                osize = 0
-                oper = self.ameth_0(operflags, opdesc[2+tbl_opercnt+i], tsize, prefixes)
-
-            else:
-                # So the 0x7f is here to help us deal with an issue between VEX and non-VEX
-                # A super common patter in vex is to add an operand somewhere in the middle of the
-                # existing operands. So if we have like cmpps xmm2, 17 in non-VEX, the vex version
-                # will look like vsprlw xmm3, xmm4, 17.
-                # The fun bit of this is that the vex only portions aren't exclusive to the VEX-only
-                # addressing methods, so we can have ADDRMETH_V be skipped outside of VEX mode too, and not
-                # just things like ADDRMETH_H. Hence, we need a new flag that I stash in the upper bits of
-                # instruction operand definition so we can know when to skip operands
-                ameth = self._dis_amethods[(addrmeth >> 16) & 0x7F]
-                vex_skip = addrmeth & opcode86.ADDRMETH_VEXSKIP
-                if not isvex and vex_skip:
-                    continue
-
-                if ameth is None:
-                    raise Exception("Implement Addressing Method 0x%.8x" % addrmeth)
-
-                # NOTE: Depending on your addrmethod you may get beginning of operands, or offset
-                try:
-                    if addrmeth in IMM_REQOFFS:
-                        osize, oper = ameth(bytez, offset+operoffset, tsize, prefixes, operflags)
-
-                        # If we are a sign extended immediate and not the same as the other operand,
-                        # do the sign extension during disassembly so nothing else has to worry about it..
-                        if operflags & opcode86.OP_SIGNED:
-                            if len(operands) and tsize != operands[-1].tsize:
-                                otsize = operands[-1].tsize
-                                oper.imm = e_bits.sign_extend(oper.imm, oper.tsize, otsize)
-                                oper.tsize = otsize
-                            elif not len(operands):
-                                oper.imm = e_bits.sign_extend(oper.imm, oper.tsize, self._dis_default_size)
-                                oper.tsize = self._dis_default_size
-
-                    else:
-                        # see same code section in i386 for this rationale
-                        osize, oper = ameth(bytez, offset, tsize, prefixes, operflags)
-                        if oper and oper.isDeref():
-                            memsz = OP_EXTRA_MEMSIZES[(operflags & OP_MEMMASK) >> 4]
-                            if memsz is not None:
-                                oper.tsize = memsz
-                            if prefixes & PREFIX_ADDR_SIZE:
-                                if getattr(oper, 'reg', None) is not None:
-                                    oper.reg |= RMETA_LOW32
-                                elif getattr(oper, 'index', None) is not None:
-                                    oper.index |= RMETA_LOW32
-
-                except struct.error:
-                    # Catch struct unpack errors due to insufficient data length
-                    raise envi.InvalidInstruction(bytez=bytez[startoff:startoff+16])
-
-            if oper is not None:
-                # This is a filty hack for now...
-                oper._dis_regctx = self._dis_regctx
-                operands.append(oper)
-
-            operoffset += osize
-
-        typemask = optype & 0xFFFF
-        # Pull in the envi generic instruction flags
-        iflags = iflag_lookup.get(typemask, 0) | self._dis_oparch
-
-        if prefixes & PREFIX_REP_MASK:
-            iflags |= envi.IF_REPEAT
-
-        if priv_lookup.get(mnem, False):
-            iflags |= envi.IF_PRIV
-
-        # Lea will have a reg-mem/sib operand with _is_deref True, but should be false
-        if typemask == opcode86.INS_LEA:
-            operands[1]._is_deref = False
-
-        ret = Amd64Opcode(va, optype, mnem, prefixes, (offset-startoff)+operoffset, operands, iflags)
-        return ret
+        return tabdesc, opdesc, offset, prefixes, isvex
 
     def parse_modrm(self, byte, prefixes=0):
         # Pass in a string with an offset for speed rather than a new string
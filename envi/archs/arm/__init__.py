@@ -54,6 +54,15 @@ class ArmModule(envi.ArchitectureModule):
 
         return self._arch_dis.disasm(bytes, offset, va)
 
+    def archParseOpcodes(self, bytez, offset=0, va=0, maxcount=None, maxva=None, records=False):
+        parse = self._arch_dis.disasm
+        if va & 3:
+            offset &= -2
+            va &= -2
+            parse = self._arch_thumb_dis.disasm
+
+        return envi.parseOpcodeRun(parse, bytez, offset, va, maxcount=maxcount, maxva=maxva, records=records)
+
     def getEmulator(self):
         return ArmEmulator()
 
@@ -130,6 +139,10 @@ class ThumbModule(envi.ArchitectureModule):
         va &= -2
         return self._arch_dis.disasm(bytes, offset, va)
 
+    def archParseOpcodes(self, bytez, offset=0, va=0, maxcount=None, maxva=None, records=False):
+        va &= -2
+        return envi.parseOpcodeRun(self._arch_dis.disasm, bytez, offset, va, maxcount=maxcount, maxva=maxva, records=records)
+
     def getEmulator(self):
         emu = ArmEmulator()
         emu.setThumbMode()
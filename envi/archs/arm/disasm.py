@@ -3873,6 +3873,8 @@ inittable = [
 endian_names = ("le","be")
 
 class ArmOpcode(envi.Opcode):
+    __slots__ = ('simdflags',)
+
     _def_arch = envi.ARCH_ARMV7
 
     def __init__(self, va, opcode, mnem, prefixes, size, operands, iflags=0, simdflags=0):
@@ -4078,6 +4080,8 @@ class ArmOpcode(envi.Opcode):
         return mnem + " " + ", ".join(x)
 
 class ArmOperand(envi.Operand):
+    __slots__ = ()
+
     tsize = 4
     def involvesPC(self):
         return False
@@ -4087,6 +4091,7 @@ class ArmOperand(envi.Operand):
 
 class ArmRegOper(ArmOperand):
     ''' register operand.  see "addressing mode 1 - data processing operands - register" '''
+    __slots__ = ('reg', 'oflags', 'va')
 
     def __init__(self, reg, va=0, oflags=0):
         if reg is None:
@@ -4206,6 +4211,8 @@ class ArmRegOper(ArmOperand):
         return rname
 
 class ArmRegScalarOper(ArmRegOper):
+    __slots__ = ('index',)
+
     def __init__(self, reg, index, va=0, oflags=0):
         self.index = index
         ArmRegOper.__init__(self, reg, va, oflags)
@@ -4253,6 +4260,7 @@ class ArmRegScalarOper(ArmRegOper):
 
 class ArmRegShiftRegOper(ArmOperand):
     ''' register shift operand.  see "addressing mode 1 - data processing operands - * shift * by register" '''
+    __slots__ = ('reg', 'shtype', 'shreg')
 
     def __init__(self, reg, shtype, shreg):
         self.reg = reg
@@ -4296,6 +4304,7 @@ class ArmRegShiftRegOper(ArmOperand):
 
 class ArmRegShiftImmOper(ArmOperand):
     ''' register shift immediate operand.  see "addressing mode 1 - data processing operands - * shift * by immediate" '''
+    __slots__ = ('reg', 'shtype', 'shimm', 'va')
 
     def __init__(self, reg, shtype, shimm, va):
         if shimm == 0:
@@ -4357,6 +4366,7 @@ class ArmRegShiftImmOper(ArmOperand):
 
 class ArmImmOper(ArmOperand):
     ''' register operand.  see "addressing mode 1 - data processing operands - immediate" '''
+    __slots__ = ('val', 'shval', 'shtype', 'size')
 
 
     def __init__(self, val, shval=0, shtype=S_ROR, va=0, size=4):
@@ -4404,6 +4414,8 @@ class ArmFloatOper(ArmImmOper):
     internal storage as N-bit bitfield (like the architecture would)
     repr/render provides the appropriate floating point value
     '''
+    __slots__ = ('endian', 'floatfmt', 'intfmt')
+
     def __init__(self, val, size=4, endian=envi.ENDIAN_LSB):
         self.size = size
         self.endian = endian
@@ -4444,6 +4456,8 @@ class ArmFloatOper(ArmImmOper):
 
 class ArmScaledOffsetOper(ArmOperand):
     ''' scaled offset operand.  see "addressing mode 2 - load and store word or unsigned byte - scaled register *" '''
+    __slots__ = ('base_reg', 'offset_reg', 'shtype', 'shval', 'pubwl', 'psize', 'tsize', 'va')
+
     def __init__(self, base_reg, offset_reg, shtype, shval, va, pubwl=PUxWL_DFLT, psize=4, tsize=None):
         if shval == 0:
             if shtype == S_ROR:
@@ -4590,6 +4604,8 @@ class ArmScaledOffsetOper(ArmOperand):
 class ArmRegOffsetOper(ArmOperand):
     ''' register offset operand.  see "addressing mode 2 - load and store word or unsigned byte - register *" 
     dereference address mode using the combination of two register values '''
+    __slots__ = ('base_reg', 'offset_reg', 'pubwl', 'psize', 'tsize')
+
     def __init__(self, base_reg, offset_reg, va, pubwl=PUxWL_DFLT, psize=4, tsize=None):
         self.base_reg = base_reg
         self.offset_reg = offset_reg
@@ -4693,6 +4709,8 @@ class ArmImmOffsetOper(ArmOperand):
     possibly with indexing, pre/post for faster rolling through arrays and such
     if the base_reg is PC, we'll dig in and hopefully grab the data being referenced.
     '''
+    __slots__ = ('base_reg', 'offset', 'pubwl', 'psize', 'tsize', 'va')
+
     def __init__(self, base_reg, offset, va, pubwl=PUxWL_DFLT, psize=4, tsize=None):
         '''
         psize is pointer-size, since we want to increment base_reg that size when indexing
@@ -4850,6 +4868,8 @@ class ArmPcOffsetOper(ArmOperand):
 
     ArmImmOper but for Branches, not a dereference.  perhaps we can have ArmImmOper do all the things... but for now we have this.
     '''
+    __slots__ = ('val', 'va')
+
     def __init__(self, val, va):
         self.val = val # depending on mode, this is reg/imm
         self.va = va
@@ -4897,6 +4917,8 @@ psrs = ("CPSR", "SPSR", 'APSR', 'inval', 'inval', 'inval', 'inval', 'inval',)
 fields = (None, 'c', 'x', 'cx', 's', 'cs', 'xs', 'cxs',  'f', 'fc', 'fx', 'fcx', 'fs', 'fcs', 'fxs', 'fcxs')
 
 class ArmPgmStatRegOper(ArmOperand):
+    __slots__ = ('psr', 'val', 'mask')
+
     def __init__(self, r, val=0, mask=0xffffffff):
         self.mask = mask
         self.val = val
@@ -4963,6 +4985,8 @@ class ArmPgmStatRegOper(ArmOperand):
 
     
 class ArmEndianOper(ArmImmOper):
+    __slots__ = ()
+
     def repr(self, op):
         return endian_names[self.val]
 
@@ -4976,6 +5000,8 @@ class ArmEndianOper(ArmImmOper):
         return self.val
 
 class ArmRegListOper(ArmOperand):
+    __slots__ = ('val', 'oflags')
+
     def __init__(self, val, oflags=0):
         self.val = val
         self.oflags = oflags
@@ -5028,6 +5054,8 @@ class ArmExtRegListOper(ArmOperand):
     '''
     extended register list: Vector/FP registers
     '''
+    __slots__ = ('firstreg', 'count', 'size', 'inc')
+
     def __init__(self, firstreg, count, size, inc=1):
         self.firstreg = firstreg
         self.count = count
@@ -5107,6 +5135,8 @@ class ArmExtRegListOper(ArmOperand):
     
 aif_flags = (None, 'f','i','if','a','af','ai','aif')
 class ArmPSRFlagsOper(ArmOperand):
+    __slots__ = ('flags',)
+
     def __init__(self, flags):
         self.flags = flags
 
@@ -5136,6 +5166,8 @@ class ArmPSRFlagsOper(ArmOperand):
         mcanv.addNameText(aif_flags[self.flags], typename='flags')
 
 class ArmCoprocOpcodeOper(ArmOperand):
+    __slots__ = ('val',)
+
     def __init__(self, val):
         self.val = val
         
@@ -5162,6 +5194,8 @@ class ArmCoprocOpcodeOper(ArmOperand):
         mcanv.addNameText('%d' % self.val, typename='coprocreg')
 
 class ArmCoprocOper(ArmOperand):
+    __slots__ = ('val',)
+
     def __init__(self, val):
         self.val = val
         
@@ -5188,6 +5222,8 @@ class ArmCoprocOper(ArmOperand):
         mcanv.addNameText('p%d' % self.val, typename='coproc')
 
 class ArmCoprocRegOper(ArmOperand):
+    __slots__ = ('val', 'shval', 'shtype')
+
     def __init__(self, val, shtype=None, shval=None):
         self.val = val # depending on mode, this is reg/imm
         self.shval = shval
@@ -5223,6 +5259,8 @@ class ArmCoprocRegOper(ArmOperand):
         mcanv.addNameText('cr%d' % self.val, typename='coprocreg')
 
 class ArmCoprocOption(ArmImmOffsetOper):
+    __slots__ = ()
+
     def __init__(self, base_reg, offset, va, pubwl=8):
         ArmImmOffsetOper.__init__(self, base_reg, offset, va, pubwl)
         self.base_reg = base_reg
@@ -5242,6 +5280,8 @@ class ArmCoprocOption(ArmImmOffsetOper):
         return '[%s], {%s}' % (arm_regs[self.base_reg],self.offset)
 
 class ArmModeOper(ArmOperand):
+    __slots__ = ('mode', 'update')
+
     def __init__(self, mode, update=False):
         self.mode = mode
         self.update = update
@@ -5271,6 +5311,8 @@ class ArmModeOper(ArmOperand):
         mcanv.addNameText(proc_modes[0x10 | self.mode][PM_SNAME], typename='mode')
 
 class ArmDbgHintOption(ArmOperand):
+    __slots__ = ('val',)
+
     def __init__(self, option):
         self.val = option
 
@@ -5300,6 +5342,8 @@ class ArmDbgHintOption(ArmOperand):
 
 
 class ArmBarrierOption(ArmOperand):
+    __slots__ = ('option',)
+
     options = ("","","oshst","osh","","","nshst","nsh","","","ishst","ish","","","st","sy")
     def __init__(self, option):
         self.option = option
@@ -5317,6 +5361,8 @@ class ArmBarrierOption(ArmOperand):
         return None
         
 class ArmCPSFlagsOper(ArmOperand):
+    __slots__ = ('flags',)
+
     def __init__(self, flags):
         self.flags = flags
 
@@ -90,6 +90,8 @@ def addrToName(mcanv, va):
 
 
 class H8Opcode(envi.Opcode):
+    __slots__ = ()
+
     _def_arch = envi.ARCH_H8
 
     def __hash__(self):
@@ -177,6 +179,8 @@ class H8Opcode(envi.Opcode):
 
 
 class H8Operand(envi.Operand):
+    __slots__ = ('_dis_regctx',)
+
     tsize = 2
 
     def involvesPC(self):
@@ -187,6 +191,7 @@ class H8RegDirOper(envi.RegisterOper, H8Operand):
     '''
     Register direct [Rn]
     '''
+    __slots__ = ('reg', 'tsize', 'oflags', 'va')
 
     def __init__(self, reg, tsize=4, va=0, oflags=0):
         self.va = va
@@ -241,6 +246,7 @@ class H8RegIndirOper(envi.DerefOper, H8Operand):
     Register indirect with displacement [@(d:16,ERn) or @(d:24,ERn)]
     Register indirect with post-increment or pre-decrement [@ERn+ or @-ERn]
     '''
+    __slots__ = ('reg', 'tsize', 'disp', 'dispsz', 'oflags', 'va')
 
     def __init__(self, reg, tsize, va, disp=0, dispsz=0, oflags=0):
         self.va = va
@@ -347,6 +353,8 @@ class H8RegMultiOper(H8Operand):
     rn = upper register
     count = number of registers (2, 3, or 4)
     '''
+    __slots__ = ('basereg', 'count')
+
     def __init__(self, basereg, count):
         self.count = count
         self.basereg = basereg
@@ -397,6 +405,8 @@ class H8AbsAddrOper(H8Operand):
     '''
     Absolute address [@aa:8, @aa:16, or @aa:24]
     '''
+    __slots__ = ('aa', 'tsize', 'aasize')
+
     def __init__(self, aa, tsize=1, aasize=2):
 
         if aasize == 1:
@@ -446,6 +456,8 @@ class H8ImmOper(envi.ImmedOper, H8Operand):
     '''
     Immediate [#xx:8, #xx:16, or #xx:32]
     '''
+    __slots__ = ('val', 'tsize', 'oflags')
+
     def __init__(self, val, tsize, oflags=0):
         self.val = val
         self.oflags = oflags
@@ -482,6 +494,8 @@ class H8MemIndirOper(envi.DerefOper, H8Operand):
     '''
     Memory indirect [@@aa:8]
     '''
+    __slots__ = ('aa', 'tsize')
+
     def __init__(self, aa, tsize=1):
         self.aa = aa
         self.tsize = tsize
@@ -533,6 +547,8 @@ class H8PcOffsetOper(H8Operand):
     H8ImmOper but for Branches, not a dereference.  perhaps we can have H8ImmOper do all the things... but for now we have this.
     Program-counter relative [@(d:8,PC) or @(d:16,PC)]
     '''
+    __slots__ = ('val', 'va', 'aasize')
+
     def __init__(self, val, va, aasize):
         self.va = va
         self.val = val
@@ -35,6 +35,12 @@ class i386Module(envi.ArchitectureModule):
     def archParseOpcode(self, bytes, offset=0, va=0):
         return self._arch_dis.disasm(bytes, offset, va)
 
+    def archParseOpcodes(self, bytez, offset=0, va=0, maxcount=None, maxva=None, records=False):
+        if records:
+            # the flow decoder builds the OpRecords directly
+            return envi.parseOpcodeRun(self._arch_dis.disasmFlow, bytez, offset, va, maxcount=maxcount, maxva=maxva)
+        return envi.parseOpcodeRun(self._arch_dis.disasm, bytez, offset, va, maxcount=maxcount, maxva=maxva)
+
     def getEmulator(self):
         return IntelEmulator()
 
@@ -151,6 +151,47 @@ MODESIZE = [
     8,
 ]
 
+# Operand length kinds for the flow decoder (non-negative values are fixed sizes)
+ALEN_MODRM = -1     # modrm (+ sib + displacement)
+ALEN_REGMODRM = -2  # a single modrm byte for registers, otherwise ALEN_MODRM
+ALEN_TSIZE = -3     # an immediate of the operand size
+ALEN_PTR = -4       # a pointer sized displacement
+
+# Flow plan for instructions disasmFlow() leaves to the full decoder
+FLOW_FULL = ()
+# Flow plans to cache before starting over
+FLOW_TRIE_MAX = 0x10000
+
+# modrm byte -> bytes for modrm + displacement (+ sib, excluding any sib imm32)
+modrm_lens = []
+for _b in range(256):
+    _mod, _rm = _b >> 6, _b & 7
+    if _mod == 3:
+        modrm_lens.append(1)
+    elif _mod == 0:
+        modrm_lens.append((1, 1, 1, 1, 2, 5, 1, 1)[_rm])
+    else:
+        modrm_lens.append((1 + (1, 4)[_mod - 1]) + (_rm == 4))
+
+class TrackedBytes:
+    '''
+    Wrap a bytes object and track the highest offset indexed (used to key
+    the flow plans by exactly the bytes the opcode table walk depends on).
+    '''
+    __slots__ = ('bytez', 'maxidx')
+
+    def __init__(self, bytez):
+        self.bytez = bytez
+        self.maxidx = -1
+
+    def __len__(self):
+        return len(self.bytez)
+
+    def __getitem__(self, idx):
+        if idx.__class__ is int and idx > self.maxidx:
+            self.maxidx = idx
+        return self.bytez[idx]
+
 addr16_modes = [
     (REG_BX, REG_SI),
     (REG_BX, REG_DI),
@@ -177,6 +218,7 @@ def addrToName(mcanv, va):
 # Operand objects for the i386 architecture
 #
 class i386RegOper(envi.RegisterOper):
+    __slots__ = ('reg', 'tsize', '_dis_regctx')
 
     def __init__(self, reg, tsize):
         self.reg = reg
@@ -219,6 +261,8 @@ class i386ImmOper(envi.ImmedOper):
     """
     An operand representing an immediate.
     """
+    __slots__ = ('imm', 'tsize', '_dis_regctx')
+
     def __init__(self, imm, tsize):
         self.imm = imm
         self.tsize = tsize
@@ -268,6 +312,8 @@ class i386PcRelOper(envi.Operand):
     This is the operand used for EIP relative offsets
     for operands on instructions like jmp/call
     """
+    __slots__ = ('imm', 'tsize', '_dis_regctx')
+
     def __init__(self, imm, tsize):
         self.imm = imm
         self.tsize = tsize
@@ -310,6 +356,8 @@ class i386RegMemOper(envi.DerefOper):
     An operand which represents the result of reading/writing memory from the
     dereference (with possible displacement) from a given register.
     """
+    __slots__ = ('reg', 'tsize', 'disp', '_is_deref', '_dis_regctx')
+
     def __init__(self, reg, tsize, disp=0):
         self.reg = reg
         self.tsize = tsize
@@ -384,6 +432,8 @@ class i386ImmMemOper(envi.DerefOper):
     An operand which represents the dereference (memory read/write) of
     a memory location associated with an immediate.
     """
+    __slots__ = ('imm', 'tsize', '_is_deref', '_dis_regctx')
+
     def __init__(self, imm, tsize):
         self.imm = imm
         self.tsize = tsize
@@ -441,6 +491,8 @@ class i386SibOper(envi.DerefOper):
     An operand which represents the result of reading/writting memory from the
     dereference (with possible displacement) from a given register.
     """
+    __slots__ = ('reg', 'imm', 'index', 'scale', 'tsize', 'disp', '_is_deref', '_dis_regctx')
+
     def __init__(self, tsize, reg=None, imm=None, index=None, scale=1, disp=0):
         self.reg = reg
         self.imm = imm
@@ -571,6 +623,7 @@ class i386SibOper(envi.DerefOper):
         mcanv.addText("]")
 
 class i386Opcode(envi.Opcode):
+    __slots__ = ()
 
     # Printable prefix names
     prefix_names = [
@@ -684,6 +737,10 @@ class i386Disasm:
         self._dis_mode = mode
         self._dis_prefixes = i386_prefixes
         self._dis_regctx = i386RegisterContext()
+        self._dis_regopers = {}
+        self._dis_iflags = {}
+        self._dis_flow_trie = {}
+        self._dis_flow_count = 0
         self._dis_oparch = envi.ARCH_I386
         self._dis_default_size = MODESIZE[mode]
         self.ptrsize = 4
@@ -710,6 +767,28 @@ class i386Disasm:
         self._dis_amethods[opconst.ADDRMETH_X>>16] = self.ameth_x
         self._dis_amethods[opconst.ADDRMETH_Y>>16] = self.ameth_y
 
+        # Operand lengths for the address methods (see disasmFlow)
+        self._dis_alens = [ None for x in range(1 + (opconst.ADDRMETH_LAST>>16)) ]
+        self._dis_alens[opconst.ADDRMETH_A>>16] = ALEN_TSIZE
+        self._dis_alens[opconst.ADDRMETH_C>>16] = 0
+        self._dis_alens[opconst.ADDRMETH_D>>16] = 0
+        self._dis_alens[opconst.ADDRMETH_E>>16] = ALEN_MODRM
+        self._dis_alens[opconst.ADDRMETH_M>>16] = ALEN_MODRM
+        self._dis_alens[opconst.ADDRMETH_N>>16] = 1
+        self._dis_alens[opconst.ADDRMETH_Q>>16] = ALEN_REGMODRM
+        self._dis_alens[opconst.ADDRMETH_R>>16] = ALEN_MODRM
+        self._dis_alens[opconst.ADDRMETH_W>>16] = ALEN_REGMODRM
+        self._dis_alens[opconst.ADDRMETH_I>>16] = ALEN_TSIZE
+        self._dis_alens[opconst.ADDRMETH_J>>16] = ALEN_TSIZE
+        self._dis_alens[opconst.ADDRMETH_O>>16] = ALEN_PTR
+        self._dis_alens[opconst.ADDRMETH_G>>16] = 0
+        self._dis_alens[opconst.ADDRMETH_P>>16] = 0
+        self._dis_alens[opconst.ADDRMETH_S>>16] = 0
+        self._dis_alens[opconst.ADDRMETH_U>>16] = 1
+        self._dis_alens[opconst.ADDRMETH_V>>16] = 0
+        self._dis_alens[opconst.ADDRMETH_X>>16] = 0
+        self._dis_alens[opconst.ADDRMETH_Y>>16] = 0
+
         # Offsets used to add in addressing method parsers
         # MMX is just a meta reg of st
         self.ROFFSETSIMD  = getRegOffset(i386regs, "xmm0")
@@ -914,15 +993,18 @@ class i386Disasm:
 
         return sizelist[mode]
 
-    def disasm(self, bytez, offset, va):
+    def _dis_lookup(self, bytez, offset, va):
+        '''
+        Consume the prefixes and walk the opcode tables for the instruction
+        at offset.  Returns a tuple of (opdesc, offset, prefixes) where the
+        offset points just past the opcode bytes (at any modrm/immediates).
+        '''
         # Stuff for opcode parsing
         tabdesc = all_tables[0] # A tuple (optable, shiftbits, mask byte, sub, max)
         startoff = offset # Use startoff as a size knob if needed
 
-        # Stuff we'll be putting in the opcode object
         optype = None # This gets set if we successfully decode below
         mnem = None
-        operands = []
 
         all_prefixes = 0
         prefix_len = 0
@@ -1008,6 +1090,17 @@ class i386Disasm:
         if optype == 0:
             raise envi.InvalidInstruction(bytez=bytez[startoff:startoff+16], va=va)
 
+        return opdesc, offset, all_prefixes
+
+    def disasm(self, bytez, offset, va):
+        startoff = offset # Use startoff as a size knob if needed
+        opdesc, offset, all_prefixes = self._dis_lookup(bytez, offset, va)
+        optype = opdesc[1]
+        mnem = opdesc[6]
+
+        # Stuff we'll be putting in the opcode object
+        operands = []
+
         operoffset = 0
         # Begin parsing operands based off address method
         for i in operand_range:
@@ -1068,27 +1161,247 @@ class i386Disasm:
                     raise envi.InvalidInstruction(bytez=bytez[startoff:startoff+16])
 
             if oper is not None:
+                if oper.__class__ is i386RegOper:
+                    oper = self._getSharedRegOper(oper)
                 # This is a filty hack for now...
                 oper._dis_regctx = self._dis_regctx
                 operands.append(oper)
 
             operoffset += osize
 
+        iflags = self._dis_get_iflags(optype, mnem, all_prefixes)
+
+        # Lea will have a reg-mem/sib operand with _is_deref True, but should be false
+        if optype == opcode86.INS_LEA and operands[1].isDeref():
+            operands[1]._is_deref = False
+
+        ret = i386Opcode(va, optype, mnem, all_prefixes, (offset-startoff)+operoffset, operands, iflags)
+
+        return ret
+
+    def _dis_get_iflags(self, optype, mnem, prefixes):
+        '''
+        Return the envi IF_* flags for the decoded instruction.
+        '''
         # Pull in the envi generic instruction flags
         iflags = iflag_lookup.get(optype & 0xFFFF, 0) | self._dis_oparch
 
-        if all_prefixes & PREFIX_REP_MASK:
+        if prefixes & PREFIX_REP_MASK:
             iflags |= envi.IF_REPEAT
 
         if priv_lookup.get(mnem, False):
             iflags |= envi.IF_PRIV
 
-        # Lea will have a reg-mem/sib operand with _is_deref True, but should be false
-        if optype == opcode86.INS_LEA:
-            operands[1]._is_deref = False
+        # share the (few distinct) iflags values between opcodes
+        return self._dis_iflags.setdefault(iflags, iflags)
 
-        ret = i386Opcode(va, optype, mnem, all_prefixes, (offset-startoff)+operoffset, operands, iflags)
+    def disasmFlow(self, bytez, offset, va):
+        '''
+        Decode only the length and control flow of the instruction at
+        offset.  Returns an envi.OpRecord(va, size, iflags, branches) which
+        matches what disasm() would produce, but without building operand
+        (or Opcode) objects.
+
+        The opcode tables are only walked the first time a given sequence
+        of prefix/opcode bytes is seen.  The result is compiled into a
+        "flow plan" (fixed length, modrm length kinds, branch flags) which
+        is stored in a trie keyed by exactly the bytes the table walk read.
+
+        Example:
+            rec = dis.disasmFlow(bytez, 0, 0x41414141)
+            nextva = rec.va + rec.size
+        '''
+        node = self._dis_flow_trie
+        i = offset
+        try:
+            while node.__class__ is dict:
+                node = node[bytez[i]]
+                i += 1
+        except KeyError:
+            node = self._dis_flow_learn(bytez, offset, va)
+
+        if node is None:
+            raise envi.InvalidInstruction(bytez=bytez[offset:offset+16], va=va)
+
+        if node is FLOW_FULL:
+            return self._dis_flow_full(bytez, offset, va)
+
+        oplen, size, kinds, jsize, iflags, fall, tflags = node
+        if kinds:
+            modrm = bytez[offset + oplen]
+            for kind in kinds:
+                if kind == ALEN_REGMODRM and modrm >= 0xc0:
+                    size += 1
+                    continue
+                size += modrm_lens[modrm]
+                # [ imm32 + index * scale ] SIB form
+                if modrm & 0xc7 == 0x04 and bytez[offset + oplen + 1] & 7 == 5:
+                    size += 4
+
+        if offset + size > len(bytez):
+            raise envi.InvalidInstruction(bytez=bytez[offset:offset+16], va=va)
+
+        nextva = va + size
+        if tflags is None:
+            if fall is None:
+                return envi.OpRecord(va, size, iflags, ())
+            return envi.OpRecord(va, size, iflags, ((nextva, fall),))
+
+        tova = nextva + e_bits.parsebytes(bytez, offset + oplen, jsize, sign=True)
+        if fall is None:
+            return envi.OpRecord(va, size, iflags, ((tova, tflags),))
+        return envi.OpRecord(va, size, iflags, ((nextva, fall), (tova, tflags)))
+
+    def _dis_flow_full(self, bytez, offset, va):
+        # Fall back to a full decode for the cases disasmFlow() skips
+        op = self.disasm(bytez, offset, va)
+        return envi.OpRecord(op.va, op.size, op.iflags, tuple(op.getBranches()))
+
+    def _dis_flow_learn(self, bytez, offset, va):
+        '''
+        Walk the opcode tables for the instruction at offset and add the
+        resulting flow plan (None for invalid bytes) to the trie.
+        '''
+        if self._dis_flow_count >= FLOW_TRIE_MAX:
+            self._dis_flow_trie.clear()
+            self._dis_flow_count = 0
+
+        tracker = TrackedBytes(bytez)
+        try:
+            plan = self._dis_flow_compile(tracker, offset, va)
+        except envi.InvalidInstruction:
+            plan = None
+
+        # the plan is valid for any bytes which match all the bytes read
+        node = self._dis_flow_trie
+        last = tracker.maxidx
+        for i in range(offset, last):
+            node = node.setdefault(bytez[i], {})
+        node[bytez[last]] = plan
+        self._dis_flow_count += 1
+        return plan
+
+    def _dis_flow_lookup(self, bytez, offset, va):
+        '''
+        Return (offset, prefixes, optype, mnem, operflags, isvex) for the
+        instruction at offset (the arch specific part of a flow plan).
+        '''
+        opdesc, offset, prefixes = self._dis_lookup(bytez, offset, va)
+        # 16 bit addressing is rare enough to leave to the full decoder
+        if prefixes & PREFIX_ADDR_SIZE:
+            return None
+        return offset, prefixes, opdesc[1], opdesc[6], opdesc[2:5], False
+
+    def _dis_flow_compile(self, bytez, offset, va):
+        '''
+        Build the flow plan tuple for the instruction at offset:
+
+            (oplen, size, kinds, jsize, iflags, fall, tflags)
+
+        oplen is the prefix/opcode length (the offset of any modrm/imm),
+        size is the fixed part of the instruction length and kinds are the
+        ALEN_* modrm lengths to add.  jsize is the size of a relative branch
+        immediate, fall/tflags are the fallthrough and target branch flags
+        (mirroring i386Opcode.getBranches() without an emulator).
 
+        Returns FLOW_FULL for instructions which need the full decoder.
+        '''
+        info = self._dis_flow_lookup(bytez, offset, va)
+        if info is None:
+            return FLOW_FULL
+
+        opoff, prefixes, optype, mnem, operflags, isvex = info
+        oplen = opoff - offset
+
+        size = oplen
+        kinds = []
+        jsize = None
+        nopers = 0
+        hasvexh = False
+        for flags in operflags:
+            if flags == 0:
+                break
+
+            addrmeth = flags & opcode86.ADDRMETH_MASK
+            if addrmeth == 0:
+                if not flags & (opcode86.OP_REG | opcode86.OP_IMM):
+                    return FLOW_FULL
+                nopers += 1
+                continue
+
+            if not isvex and addrmeth & opconst.ADDRMETH_VEXSKIP:
+                continue
+
+            alen = self._dis_alens[(addrmeth >> 16) & 0x7F]
+            if alen is None:
+                return FLOW_FULL
+
+            if alen == ALEN_TSIZE:
+                alen = self._dis_calc_tsize(flags & opcode86.OPTYPE_MASK, prefixes, flags)
+            elif alen == ALEN_PTR:
+                alen = self.ptrsize
+
+            if alen >= 0:
+                size += alen
+            else:
+                kinds.append(alen)
+
+            # memory forms of ameth_vexh produce no operand
+            if addrmeth == opconst.ADDRMETH_VEXH:
+                hasvexh = True
+                continue
+
+            if nopers == 0 and addrmeth == opcode86.ADDRMETH_J:
+                if flags & opcode86.OP_SIGNED:
+                    return FLOW_FULL
+                jsize = alen
+
+            nopers += 1
+
+        iflags = self._dis_get_iflags(optype, mnem, prefixes)
+        if optype == opconst.INS_HALT:
+            return (oplen, size, tuple(kinds), jsize, iflags, None, None)
+
+        flags = iflags & envi.ARCH_MASK
+        addb = False
+        if optype == opconst.INS_BRANCHCC:
+            flags |= envi.BR_COND
+            addb = True
+
+        fall = None
+        if not iflags & envi.IF_NOFALL:
+            fall = flags | envi.BR_FALL
+
+        tflags = None
+        if nopers:
+            if optype == opconst.INS_CALL:
+                flags |= envi.BR_PROC
+                addb = True
+            elif optype == opconst.INS_CALLCC:
+                flags |= (envi.BR_PROC | envi.BR_COND)
+                addb = True
+            elif optype == opconst.INS_BRANCH:
+                addb = True
+
+            if addb:
+                # only relative (immediate) targets are resolved here
+                if jsize is None or hasvexh:
+                    return FLOW_FULL
+                tflags = flags
+
+        return (oplen, size, tuple(kinds), jsize, iflags, fall, tflags)
+
+    def _getSharedRegOper(self, oper):
+        '''
+        Return the shared i386RegOper instance for the (fully decoded)
+        register operand.  Register operands are never modified once the
+        opcode is built, so every instruction using the same register and
+        size can reference one instance rather than carrying its own.
+        '''
+        key = (oper.reg, oper.tsize)
+        ret = self._dis_regopers.get(key)
+        if ret is None:
+            ret = self._dis_regopers[key] = oper
         return ret
 
     # Declare all the address method parsers here!
@@ -329,6 +329,7 @@ decode_function = (
 )
 
 class Msp430Opcode(envi.Opcode):
+    __slots__ = ()
 
     def __init__(self, va, opcode, mnem, opers, iflags=0, size=0):
         self.va = va
@@ -444,6 +445,7 @@ def renderPossibleLocation(mcanv, op, idx, value):
         mcanv.addNameText('0x%x' % value)
 
 class Msp430Operand(envi.Operand):
+    __slots__ = ('val', 'tsize', 'va', '_dis_regctx')
 
     def __init__(self, val, inData, tsize=2, va=0):
         self.val = val
@@ -463,6 +465,8 @@ class Msp430Operand(envi.Operand):
             mcanv.addNameText(name, name=rname, typename="registers")
 
 class Msp430RegDirectOper(Msp430Operand):
+    __slots__ = ()
+
     def __repr__(self):
         # Register direct
         if self.val == REG_CG:
@@ -499,6 +503,8 @@ class Msp430RegDirectOper(Msp430Operand):
         return emu.setRegister(self.val, val)
 
 class Msp430RegIndexOper(Msp430Operand):
+    __slots__ = ('new_val',)
+
     def __init__(self, val, inData, tsize=0, va=0):
         Msp430Operand.__init__(self, val, inData, tsize, va)
         if val != REG_CG:
@@ -584,6 +590,8 @@ class Msp430RegIndexOper(Msp430Operand):
         return True
 
 class Msp430RegIndirOper(Msp430Operand):
+    __slots__ = ()
+
     def __repr__(self):
         # Register indirect
         if self.val == REG_SR:
@@ -645,6 +653,8 @@ class Msp430RegIndirOper(Msp430Operand):
         return True
 
 class Msp430RegIndirAutoincOper(Msp430Operand):
+    __slots__ = ('new_val',)
+
     def __init__(self, val, inData, tsize, va=0):
         Msp430Operand.__init__(self, val, inData, tsize, va)
         if val == REG_PC:
@@ -725,6 +735,8 @@ class Msp430RegIndirAutoincOper(Msp430Operand):
         return True
 
 class Msp430JmpOper(Msp430Operand):
+    __slots__ = ()
+
     def __init__(self, val, inData, tsize, va=0):
         if (val > 0xff):
             jmp_val = va + (2 * ((val & 511) - 512)) + 2
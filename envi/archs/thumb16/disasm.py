@@ -598,6 +598,8 @@ it_strs = (it_strs_0, it_strs_1, it_strs_2, it_strs_3)
 
 
 class ThumbITOper(ArmOperand):
+    __slots__ = ('firstcond', 'mask')
+
     def __init__(self, mask, firstcond):
         self.mask = mask
         self.firstcond = firstcond
@@ -2434,11 +2436,15 @@ def is_thumb32(val):
 
 
 class Thumb16Opcode(ArmOpcode):
+    __slots__ = ()
+
     _def_arch = envi.ARCH_THUMB16
     pass
 
 
 class ThumbOpcode(ArmOpcode):
+    __slots__ = ()
+
     _def_arch = envi.ARCH_THUMB
     pass
 
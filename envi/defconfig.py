@@ -0,0 +1,40 @@
+'''
+Default config shared by the envi based debugger and cli tools.
+
+This lives outside of vdb so vivisect may use the same defaults without
+importing the debugger (and vtrace) at startup.
+'''
+import envi.config as e_config
+
+defconfig = {
+
+    'vdb':{
+        'BreakOnEntry':False,
+        'BreakOnMain':False,
+
+        'SymbolCacheActive':True,
+        'SymbolCachePath':e_config.gethomedir('.envi','symcache'),
+
+        'KillOnQuit': False,
+    },
+
+    'cli':{
+        'verbose':False,
+        'aliases': {
+            '<f1>':'stepi',
+            '<f2>':'go -I 1',
+            '<f5>':'go',
+        }
+    },
+
+}
+
+docconfig = {
+    'vdb':{
+        'BreakOnMain':'Should the debugger break on main() if known?',
+        'BreakOnEntry':'Should the debugger break on the entry to the main module? (only works if you exec (and not attach to) the process)',
+
+        'SymbolCacheActive':'Should we cache symbols for subsequent loads?',
+        'SymbolCachePaths':'Path elements ( ; seperated) to search/cache symbols (filepath,cobra)',
+    }
+}
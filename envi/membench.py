@@ -0,0 +1,103 @@
+'''
+Measure the memory used by decoded instructions for an envi architecture.
+
+The input bytes are linearly disassembled (skipping undecodable bytes) and
+every Opcode is kept alive while tracemalloc reports the retained bytes.
+
+Example:
+    python -m envi.membench amd64 /bin/ls
+    python -m envi.membench thumb firmware.bin --offset 0x100 --size 0x10000
+'''
+import sys
+import time
+import argparse
+import tracemalloc
+
+import envi
+
+
+def decodeBytes(arch, bytez, va=0, step=1, maxcount=None):
+    '''
+    Linearly decode the given bytes, returning the list of Opcodes.
+    Bytes which do not decode are skipped "step" at a time.
+    '''
+    ops = []
+    offset = 0
+    size = len(bytez)
+    while offset < size:
+        left = None
+        if maxcount is not None:
+            left = maxcount - len(ops)
+            if left <= 0:
+                break
+
+        # decode runs in one call, stepping past whatever ended the run
+        run = arch.archParseOpcodes(bytez, offset, va + offset, maxcount=left)
+        if run:
+            ops.extend(run)
+            last = run[-1]
+            offset = (last.va - va) + max(last.size, 0)
+            if last.size > 0 and (offset >= size or len(run) == left):
+                continue
+
+        offset += step
+
+    return ops
+
+
+def measureBytes(arch, bytez, va=0, step=1, maxcount=None):
+    '''
+    Decode the given bytes and return a dict describing the memory
+    retained by the decoded instructions (and their operands).
+    '''
+    tracemalloc.start()
+    try:
+        start = time.time()
+        base = tracemalloc.get_traced_memory()[0]
+        ops = decodeBytes(arch, bytez, va=va, step=step, maxcount=maxcount)
+        delta = time.time() - start
+        used = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+
+    count = len(ops)
+    opers = sum(len(op.opers) for op in ops)
+    return {
+        'count': count,
+        'opers': opers,
+        'bytes': used,
+        'perop': used / float(max(count, 1)),
+        'secs': delta,
+    }
+
+
+def setup():
+    ap = argparse.ArgumentParser('Measure bytes per decoded instruction')
+    ap.add_argument('arch', help='envi architecture name (i386, amd64, arm, thumb, ...)')
+    ap.add_argument('files', nargs='+', help='Files to linearly disassemble')
+    ap.add_argument('--offset', type=lambda x: int(x, 0), default=0, help='File offset to start at')
+    ap.add_argument('--size', type=lambda x: int(x, 0), default=None, help='Number of bytes to decode')
+    ap.add_argument('--step', type=int, default=1, help='Bytes to skip past an invalid instruction')
+    ap.add_argument('--maxcount', type=int, default=None, help='Stop after this many instructions')
+    return ap
+
+
+def main(argv):
+    opts = setup().parse_args(argv)
+    arch = envi.getArchModule(opts.arch)
+
+    for fname in opts.files:
+        with open(fname, 'rb') as f:
+            f.seek(opts.offset)
+            if opts.size is None:
+                bytez = f.read()
+            else:
+                bytez = f.read(opts.size)
+
+        info = measureBytes(arch, bytez, va=opts.offset, step=opts.step, maxcount=opts.maxcount)
+        print('%s: %d instructions (%d operands) %d bytes, %.1f bytes/instruction, %.2fs' %
+              (fname, info['count'], info['opers'], info['bytes'], info['perop'], info['secs']))
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -4,14 +4,22 @@ MemoryCanvas objects.
 '''
 
 import sys
+import bisect
 import logging
 import functools
 import traceback
+import collections
 
+import envi.exc as e_exc
 import envi.symstore.resolver as e_resolv
 
 logger = logging.getLogger(__name__)
 
+# rendered units kept by a canvas with a render cache
+rend_cache_max = 0x2000
+# lines rendered above and below the visible lines of a window
+rend_margin = 16
+
 class MemoryRenderer(object):
     """
     A top level object for all memory renderers
@@ -46,6 +54,77 @@ class MemoryRenderer(object):
         """
         raise Exception("Implement render!")
 
+    def getUnitVa(self, mcanv, va):
+        '''
+        Return the va of the unit which contains va (renderers with an
+        index of their units, like a location database, should say so).
+        '''
+        return va
+
+    def getPrevUnitVa(self, mcanv, va):
+        '''
+        Return the va of the unit which ends at va (or None if the renderer
+        can not tell without rendering).
+        '''
+        return None
+
+
+class RenderCache(object):
+    '''
+    The rendered (text, tag) segments of units by va, for a canvas to
+    replay instead of rendering them again.  The least recently used units
+    are dropped once there are more than maxunits of them.
+    '''
+    def __init__(self, maxunits=rend_cache_max):
+        self.maxunits = maxunits
+        self.units = collections.OrderedDict()
+        self.unitvas = []
+        self.maxsize = 1
+
+    def __len__(self):
+        return len(self.units)
+
+    def getUnit(self, va):
+        '''
+        Return the cached (size, segs, lines) for the unit at va or None.
+        '''
+        unit = self.units.get(va)
+        if unit is not None:
+            self.units.move_to_end(va)
+        return unit
+
+    def addUnit(self, va, unit):
+        if va not in self.units:
+            bisect.insort(self.unitvas, va)
+        self.units[va] = unit
+        self.maxsize = max(self.maxsize, unit[0])
+
+        while len(self.units) > self.maxunits:
+            oldva, oldunit = self.units.popitem(last=False)
+            del self.unitvas[bisect.bisect_left(self.unitvas, oldva)]
+
+    def delUnits(self, va, size):
+        '''
+        Drop the cached units which overlap va to va+size.
+        '''
+        maxva = va + max(size, 1)
+        begin = bisect.bisect_left(self.unitvas, va - self.maxsize + 1)
+        end = bisect.bisect_left(self.unitvas, maxva)
+
+        keep = []
+        for uva in self.unitvas[begin:end]:
+            if uva + max(self.units[uva][0], 1) > va:
+                self.units.pop(uva)
+            else:
+                keep.append(uva)
+
+        self.unitvas[begin:end] = keep
+
+    def clear(self):
+        self.units.clear()
+        self.unitvas = []
+        self.maxsize = 1
+
 
 class MemoryCanvas(object):
     """
@@ -70,6 +149,11 @@ class MemoryCanvas(object):
         self._canv_endva = None
         self._canv_rendvas = []
 
+        # Rendered units (when enabled) and the last rendered window
+        self._canv_rendcache = None
+        self._canv_cacherend = None
+        self._canv_window = None
+
     def setScrolledCanvas(self, scroll):
         self._canv_scrolled = scroll
 
@@ -92,6 +176,31 @@ class MemoryCanvas(object):
     def getRenderer(self, name):
         return self.renderers.get(name)
 
+    def setRenderCache(self, enable=True, maxunits=rend_cache_max):
+        '''
+        Keep the rendered units to replay them when they are rendered
+        again.  Only enable this for memory which does not change behind
+        the canvas' back (the owner must call renderMemoryUpdate() or
+        clearRenderCache() for any change which changes how it renders).
+        '''
+        self._canv_rendcache = None
+        if enable:
+            self._canv_rendcache = RenderCache(maxunits=maxunits)
+
+    def clearRenderCache(self, va=None, size=None):
+        '''
+        Drop the cached renders of the units overlapping va to va+size (or
+        all of them).
+        '''
+        if self._canv_rendcache is None:
+            return
+
+        if va is None:
+            self._canv_rendcache.clear()
+            return
+
+        self._canv_rendcache.delUnits(va, size)
+
     def getRendererNames(self):
         ret = list(self.renderers.keys())
         ret.sort()
@@ -210,12 +319,59 @@ class MemoryCanvas(object):
         '''
         return (va, 0)
 
+    def _recordUnit(self, rend, va):
+        '''
+        Render the unit at va (or get it from the render cache) and return
+        its (size, segs, lines).
+        '''
+        rcache = self._canv_rendcache
+        if rcache is not None:
+            if self._canv_cacherend is not rend:
+                rcache.clear()
+                self._canv_cacherend = rend
+
+            unit = rcache.getUnit(va)
+            if unit is not None:
+                return unit
+
+        rcanv = RecordCanvas(self)
+        size = rend.render(rcanv, va)
+        unit = (size, rcanv.segs, rcanv.lines)
+
+        if rcache is not None:
+            rcache.addUnit(va, unit)
+
+        return unit
+
+    def _renderUnit(self, rend, va):
+        '''
+        Render the unit at va (replaying it if it is cached) and return
+        its size.
+        '''
+        if self._canv_rendcache is None:
+            return rend.render(self, va)
+
+        size, segs, lines = self._recordUnit(rend, va)
+        self._replayUnit(segs)
+        return size
+
+    def _replayUnit(self, segs):
+        for text, tag in segs:
+            self.addText(text, tag=tag)
+
     def renderMemoryUpdate(self, va, size, init=None, fini=None):
 
         maxva = va + size
+        self.clearRenderCache(va, size)
         if not self._isRendered(va, maxva):
             return
 
+        # a window is small enough to just render again
+        if self._canv_window is not None:
+            wva, rows, margin = self._canv_window
+            self.renderMemoryWindow(wva, rows, margin=margin, cb=fini)
+            return
+
         # Find the index of the first and last change
         iend = None
         ibegin = None
@@ -248,7 +404,7 @@ class MemoryCanvas(object):
 
             while startva < endva:
                 self._beginRenderVa(startva)
-                rsize = self.currend.render(self, startva)
+                rsize = self._renderUnit(self.currend, startva)
                 newrendvas.append((startva, rsize))
                 self._endRenderVa(startva)
                 startva += rsize
@@ -279,7 +435,7 @@ class MemoryCanvas(object):
 
             while va < firstva:
                 self._beginRenderVa(va)
-                rsize = rend.render(self, va)
+                rsize = self._renderUnit(rend, va)
                 self._canv_rendvas.append((va, rsize))
                 self._endRenderVa(va)
                 va += rsize
@@ -304,7 +460,7 @@ class MemoryCanvas(object):
             maxva = va + size
             while va < maxva:
                 self._beginRenderVa(va)
-                rsize = rend.render(self, va)
+                rsize = self._renderUnit(rend, va)
                 self._canv_rendvas.append((va, rsize))
                 self._endRenderVa(va)
                 va += rsize
@@ -330,7 +486,7 @@ class MemoryCanvas(object):
 
                 self._beginRenderVa(va)
                 try:
-                    rsize = rend.render(self, va)
+                    rsize = self._renderUnit(rend, va)
                     self._canv_rendvas.append((va, rsize))
                     self._endRenderVa(va)
                     va += rsize
@@ -351,6 +507,7 @@ class MemoryCanvas(object):
         self._canv_beginva = va
         self._canv_endva = va + size
         self._canv_rendvas = []
+        self._canv_window = None
         if rend is None:
             rend = self.currend
         self.currend = rend
@@ -362,6 +519,160 @@ class MemoryCanvas(object):
         else:
             clearcb(None)
 
+    def _getWindowBounds(self, va):
+        mmap = self.mem.getMemoryMap(va)
+        if mmap is None:
+            raise e_exc.InvalidAddress(va)
+        mva, msize, mperm, mfname = mmap
+        return mva, mva + msize
+
+    def _walkUnits(self, rend, va, lines, backward=False):
+        '''
+        Return a list of (va, size, segs, lines) for the units before (or
+        from) va until they add up to lines (or the memory map ends).
+        '''
+        minva, maxva = self._getWindowBounds(va)
+
+        ret = []
+        count = 0
+        while count < lines:
+            if backward:
+                uva = rend.getPrevUnitVa(self, va)
+                if uva is None or uva < minva or uva >= va:
+                    break
+            else:
+                uva = va
+                if uva >= maxva:
+                    break
+
+            size, segs, ulines = self._recordUnit(rend, uva)
+            if not size:
+                break
+
+            ret.append((uva, size, segs, ulines))
+            count += max(ulines, 1)
+            va = uva if backward else uva + size
+
+        if backward:
+            ret.reverse()
+        return ret
+
+    def renderMemoryWindow(self, va, rows, margin=rend_margin, rend=None, cb=None):
+        '''
+        Render only the units needed to fill a view of rows lines which
+        begins with the unit containing va (and margin lines above and
+        below it) and return the va of that unit.  With a render cache
+        (see setRenderCache()) units rendered before are just replayed.
+
+        Example:
+            canvas.setRenderCache()
+            canvas.renderMemoryWindow(va, 40)
+            ...
+            canvas.scrollMemoryWindow(3)
+        '''
+        if rend is None:
+            rend = self.currend
+        self.currend = rend
+
+        va = rend.getUnitVa(self, va)
+        units = self._walkUnits(rend, va, margin, backward=True)
+        units.extend(self._walkUnits(rend, va, rows + margin))
+
+        self._canv_window = (va, rows, margin)
+        self._canv_rendvas = [(uva, size) for uva, size, segs, lines in units]
+        self._canv_beginva = va
+        self._canv_endva = va
+        if units:
+            lastva, lastsize, segs, lines = units[-1]
+            self._canv_beginva = units[0][0]
+            self._canv_endva = lastva + lastsize
+
+        # a window replaces whatever the canvas showed before
+        self.clearCanvas(functools.partial(self._windowCleared, units, cb))
+        return va
+
+    def _windowCleared(self, units, cb, data):
+        va = self._canv_beginva
+        size = self._canv_endva - va
+        self._beginRenderMemory(va, size, self.currend)
+        for uva, usize, segs, lines in units:
+            self._beginRenderVa(uva)
+            self._replayUnit(segs)
+            self._endRenderVa(uva)
+        self._endRenderMemory(va, size, self.currend, cb)
+
+    def scrollMemoryWindow(self, lines, cb=None):
+        '''
+        Move the window from the last renderMemoryWindow() by lines (up
+        for a negative count) and return the va of its new first unit.
+        '''
+        if self._canv_window is None:
+            raise Exception('scrollMemoryWindow() without renderMemoryWindow()')
+
+        va, rows, margin = self._canv_window
+        rend = self.currend
+        units = self._walkUnits(rend, va, abs(lines), backward=lines < 0)
+        if units:
+            if lines < 0:
+                va = units[0][0]
+            else:
+                # stop at a full window of the end of memory
+                uva, size, segs, ulines = units[-1]
+                minva, maxva = self._getWindowBounds(va)
+                if uva + size < maxva:
+                    va = uva + size
+                elif len(units) > 1:
+                    va = uva
+
+        return self.renderMemoryWindow(va, rows, margin=margin, rend=rend, cb=cb)
+
+    def getScrollPos(self, va):
+        '''
+        Return the position (0.0 to 1.0) of va in its memory map, for a
+        scroll bar which does not depend on how much text is rendered.
+        '''
+        minva, maxva = self._getWindowBounds(va)
+        if maxva - minva <= 1:
+            return 0.0
+        return float(va - minva) / (maxva - minva - 1)
+
+    def getScrollVa(self, pos, va):
+        '''
+        Return the va of the unit at the scroll position pos in the memory
+        map which contains va (see getScrollPos()).
+        '''
+        minva, maxva = self._getWindowBounds(va)
+        pos = min(max(pos, 0.0), 1.0)
+        sva = minva + int(pos * (maxva - minva - 1))
+        return self.currend.getUnitVa(self, sva)
+
+
+class RecordCanvas(MemoryCanvas):
+    '''
+    A canvas which records the (text, tag) segments rendered to it, with
+    the tags of the canvas it records for, so they may be replayed there.
+    '''
+    def __init__(self, canvas):
+        # NOTE: only the rendering APIs are used, skip the canvas setup
+        self.mem = canvas.mem
+        self.syms = canvas.syms
+        self.canvas = canvas
+        self.segs = []
+        self.lines = 0
+
+    def getTag(self, typename):
+        return self.canvas.getTag(typename)
+
+    def getNameTag(self, name, typename='name'):
+        return self.canvas.getNameTag(name, typename=typename)
+
+    def getVaTag(self, va):
+        return self.canvas.getVaTag(va)
+
+    def addText(self, text, tag=None):
+        self.segs.append((text, tag))
+        self.lines += text.count('\n')
+
 
 class StringMemoryCanvas(MemoryCanvas):
 
@@ -375,6 +686,8 @@ class StringMemoryCanvas(MemoryCanvas):
 
     def clearCanvas(self, cb=None):
         self.strval = ''
+        if cb is not None:
+            cb(None)
 
     def addText(self, text, tag=None):
         self.strval += text
@@ -52,6 +52,10 @@ class ByteRend(e_canvas.MemoryRenderer):
 
         return len(bytez)
 
+    def getPrevUnitVa(self, mcanv, va):
+        # every line (but the last in a map) is 16 bytes
+        return va - 16
+
 class ShortRend(ByteRend):
 
     __fmt_char__ = 'H'
@@ -80,8 +80,7 @@ class IMemory:
         Set endianness for memory and architecture modules
         '''
         self.bigend = endian
-        for arch in self.imem_archs:
-            arch.setEndian(self.bigend)
+        self.imem_archs.setEndian(self.bigend)
 
         if self.arch is not None:
             self.arch.setEndian(self.bigend)
@@ -646,6 +645,18 @@ class MemoryObject(IMemory):
         off, b = self.getByteDef(va)
         return self.imem_archs[(arch & envi.ARCH_MASK) >> 16].archParseOpcode(b, off, va)
 
+    def parseOpcodes(self, va, arch=envi.ARCH_DEFAULT, maxcount=None, maxva=None, records=False):
+        '''
+        Linearly parse a run of opcodes starting at the specified virtual
+        address (within one memory map) in a single call.  See the arch
+        module archParseOpcodes() for the stop conditions and records.
+
+        Example: ops = m.parseOpcodes(0x7c773803, maxva=0x7c773900)
+        '''
+        off, b = self.getByteDef(va)
+        archmod = self.imem_archs[(arch & envi.ARCH_MASK) >> 16]
+        return archmod.archParseOpcodes(b, off, va, maxcount=maxcount, maxva=maxva, records=records)
+
     def readMemString(self, va, maxlen=0xfffffff):
         '''
         Returns a C-style string from memory.  Stops at Memory Map boundaries, or the first NULL (\x00) byte.
@@ -1,3 +1,8 @@
+import sys
+import array
+import bisect
+import operator
+import itertools
 import collections
 
 # Symbol Type Constants ( for serialization )
@@ -171,11 +176,18 @@ class SymbolResolver:
         self.casesens = casesens
         self.baseaddr = baseaddr    # Set if this is an RVA sym resolver
 
-        # Lets use 4096 byte buckes for now
-        self.bucketsize = 4096
-        self.bucketmask = self.widthmask ^ (self.bucketsize-1)
+        # Non-exact lookups more than this far past the nearest
+        # symbol (which does not contain the address) are bunk
+        self.nearmax = 0x2000
 
-        self.buckets = collections.defaultdict(list)
+        # (symtups, vas, maxends) segments of symbol tuples sorted by
+        # address with parallel arrays of their addresses and the running
+        # max of their end addresses (for the bisect in non-exact lookups).
+        # New tuples are added to symnew and become a segment on the next
+        # non-exact lookup, segments are merged as they grow so there are
+        # only ever log(n) of them.
+        self.symsegs = []
+        self.symnew = []
 
         # holds tuples by name/addr, instantiated on demand and subsequently
         # stored in symobjsbyaddr and symobjsbyname
@@ -192,9 +204,8 @@ class SymbolResolver:
         """
         symval = int(sym)
         self.symaddrs.pop(symval, None)
-
-        # bbase = symval & self.bucketmask
-        # self.objbuckets[bbase].remove(sym)
+        self.symobjsbyaddr.pop(symval, None)
+        self._delSymTupAddrs(symval)
 
         subres = None
         if sym.fname is not None:
@@ -210,6 +221,8 @@ class SymbolResolver:
             if not self.casesens:
                 symname = symname.lower()
             self.symnames.pop(symname, None)
+            if self.symobjsbyname.get(symname) is sym:
+                self.symobjsbyname.pop(symname)
 
     def addSymbol(self, sym):
         """
@@ -228,10 +241,52 @@ class SymbolResolver:
         else:
             self._nomSymTupNames(symtups)
 
-        self._nomSymTupAddrs(symtups)
-
         return self._addSymObject(sym)
 
+    def addSymbols(self, syms):
+        """
+        Add a list of symbols to the resolver in one go.  Plain Symbol,
+        FunctionSymbol and SectionSymbol objects are only kept as tuples
+        (with interned names) and instantiated again on demand.  Like
+        addSymbol(), symbols whose fname has a FileSymbol are named (and
+        indexed by address) in it, and only in it unless it is empty (size
+        0, as the ones vtrace makes for libraries).
+
+        Example:
+            syms = [ FunctionSymbol('main', 0x401000, size=0x40, fname='foo'), ]
+            symres.addSymbols(syms)
+        """
+        byfname = collections.defaultdict(list)
+        for sym in syms:
+            if type(sym) not in tupclasses:
+                self.addSymbol(sym)
+                continue
+
+            symtup = (sym.value, sym.size, sys.intern(sym.name), sym.symtype, sym.fname)
+            byfname[sym.fname].append(symtup)
+
+        for symfname, symtups in byfname.items():
+            self._nomSymTupAddrs(symtups)
+
+            subres = None
+            if symfname:
+                subres = self.symobjsbyname.get(symfname)
+
+            # the last symbol added at an address wins (like addSymbol)
+            symobjs = self.symobjsbyaddr
+            [symobjs.pop(n[0], None) for n in symtups]
+
+            if isinstance(subres, SymbolResolver):
+                symobjs = subres.symobjsbyaddr
+                [symobjs.pop(n[0], None) for n in symtups]
+                subres._nomSymTupAddrs(symtups)
+                subres._nomSymTupNames(symtups)
+
+            # (the same test as addSymbol, a FileSymbol of size 0 is false
+            # so its symbols are named in this resolver as well)
+            if not subres or not isinstance(subres, SymbolResolver):
+                self._nomSymTupNames(symtups)
+
     def getSymByName(self, name):
         '''
         Retrieve a Symbol object by name.
@@ -273,10 +328,6 @@ class SymbolResolver:
         # Add a symbol object to our datastructures.
         self.symobjsbyaddr[sym.value] = sym
 
-        symmax = sym.value + sym.size
-
-        bbase = sym.value & self.bucketmask
-
         if sym.fname:
             subres = self.symobjsbyname.get(sym.fname)
             if subres is not None:
@@ -303,23 +354,47 @@ class SymbolResolver:
         if symtup:
             return self._symFromTup(symtup)
 
-        # In the "not exact" case, go by the tuples...
-        # ...and try 2 buckets... ( more than 8k away is bunk )
+        # In the "not exact" case, bisect for the nearest previous symbol
         if not exact:
-            bucketva = va & self.bucketmask
-            b1 = [ b for b in self.buckets[bucketva] if b[0] <= va ]
-            if not b1:
-                b1 = self.buckets[bucketva - self.bucketsize]
-
-            if b1:
-                b1.sort()
-                symtup = b1[-1]
+            symtup = self._getNearSymTup(va)
+            if symtup is not None:
                 sym = self.symobjsbyaddr.get(symtup[0])
                 if sym is not None:
                     return sym
 
                 return self._symFromTup(symtup)
 
+    def _getNearSymTup(self, va):
+        self._fixSymTupAddrs()
+
+        best = None
+        bestva = -1
+        for symtups, vas, maxends in self.symsegs:
+            idx = bisect.bisect_right(vas, va) - 1
+            if idx < 0 or vas[idx] <= bestva:
+                continue
+
+            if va - vas[idx] >= self.nearmax:
+                # too far past the nearest symbol, unless some symbol
+                # before it is big enough to contain the address.
+                if maxends[idx] <= va:
+                    continue
+
+                while vas[idx] + symtups[idx][1] <= va:
+                    idx -= 1
+
+                if vas[idx] <= bestva:
+                    continue
+
+            best = symtups[idx]
+            bestva = vas[idx]
+
+        if best is None:
+            return None
+
+        # (the last symbol added at an address wins like exact lookups)
+        return self.symaddrs.get(best[0], best)
+
     def getSymList(self):
         """
         Return a list of the symbols which are contained in this resolver.
@@ -345,12 +420,65 @@ class SymbolResolver:
 
         # Ugly list comprehensions for speed...
         [self.symaddrs.__setitem__(n[0], n) for n in symtups]
-
-        for symtup in symtups:
-            # do the size range...
-            self.buckets[symtup[0] & self.bucketmask].append(symtup)
-            if symtup[1]:
-                [self.buckets[b].append(symtup) for b in range(symtup[0], symtup[0] + symtup[1], self.bucketsize)]
+        self.symnew.extend(symtups)
+
+    def _getSymSeg(self, symtups):
+        # Sort symbol tuples and build their address arrays
+        mask = self.widthmask
+        try:
+            symtups.sort(key=operator.itemgetter(0))
+            vas = array.array('Q', map(operator.itemgetter(0), symtups))
+            if vas and vas[-1] > mask:
+                raise OverflowError()
+
+            ends = map(operator.add, vas, map(operator.itemgetter(1), symtups))
+            maxends = array.array('Q', itertools.accumulate(ends, max))
+
+        except OverflowError:
+            # (slow path) addresses which need masking to fit the width
+            symtups.sort(key=lambda symtup: symtup[0] & mask)
+            vas = array.array('Q', [symtup[0] & mask for symtup in symtups])
+            ends = [min(va + symtup[1], mask) for va, symtup in zip(vas, symtups)]
+            maxends = array.array('Q', itertools.accumulate(ends, max))
+
+        return symtups, vas, maxends
+
+    def _fixSymTupAddrs(self):
+        # Make the new symbol tuples a segment, merging it with the
+        # previous ones while they are no bigger ( timsort only has to
+        # merge the sorted runs ).  Later segments win address ties.
+        if not self.symnew:
+            return
+
+        seg = self._getSymSeg(self.symnew)
+        self.symnew = []
+        while self.symsegs and len(self.symsegs[-1][0]) <= len(seg[0]):
+            seg = self._mergeSymSegs(self.symsegs.pop(), seg)
+
+        self.symsegs.append(seg)
+
+    def _mergeSymSegs(self, seg1, seg2):
+        symtups1, vas1, maxends1 = seg1
+        symtups2, vas2, maxends2 = seg2
+        if not symtups1 or not symtups2:
+            return seg2 if symtups2 else seg1
+
+        # (usually) a new module's symbols all come after the old ones
+        # and none of the old ones reach into it, so just concatenate.
+        if vas1[-1] <= vas2[0] and maxends1[-1] <= maxends2[0]:
+            return symtups1 + symtups2, vas1 + vas2, maxends1 + maxends2
+
+        return self._getSymSeg(symtups1 + symtups2)
+
+    def _delSymTupAddrs(self, va):
+        self._fixSymTupAddrs()
+        va &= self.widthmask
+        for i, (symtups, vas, maxends) in enumerate(self.symsegs):
+            lo = bisect.bisect_left(vas, va)
+            hi = bisect.bisect_right(vas, va, lo)
+            if lo != hi:
+                del symtups[lo:hi]
+                self.symsegs[i] = self._getSymSeg(symtups)
 
     def _nomSymTupNames(self, symtups):
         if not self.casesens:
@@ -364,7 +492,13 @@ class SymbolResolver:
         given base address ( and for the given sub-file )
         '''
         # Recieve a "cache" list and make it into our kind of tuples.
-        symtups = [(symaddr + baseaddr, symsize, symname, symtype, symfname) for (symaddr, symsize, symname, symtype) in symcache]
+        # ( binary symbol cache files build them in bulk )
+        getsymtups = getattr(symcache, 'getSymTups', None)
+        if getsymtups is not None:
+            symtups = getsymtups(baseaddr=baseaddr, fname=symfname)
+        else:
+            intern = sys.intern
+            symtups = [(symaddr + baseaddr, symsize, intern(symname), symtype, symfname) for (symaddr, symsize, symname, symtype) in symcache]
 
         # Either way, index the addresses
         self._nomSymTupAddrs(symtups)
@@ -451,3 +585,5 @@ class FileSymbol(Symbol, SymbolResolver):
         return True
 
 symclasses = (Symbol, FunctionSymbol, SectionSymbol, FileSymbol)
+# symbol classes which addSymbols() may store as tuples only
+tupclasses = (Symbol, FunctionSymbol, SectionSymbol)
@@ -0,0 +1,156 @@
+'''
+Measure attach time symbol loading from the symbol cache.
+
+The symbols of the given ELF files (or synthetic modules) are written to
+a symbol cache in both the old JSON format and the binary format.  Then
+an "attach" is timed: for every module a fresh SymbolResolver gets a
+FileSymbol, the module's cached symbols and one nearest symbol lookup
+(which is what a tracer does as it loads each library).
+
+Example:
+    python -m envi.symstore.symbench /usr/lib/x86_64-linux-gnu/libc.so.6 --copies 100
+    python -m envi.symstore.symbench --synth 200 --symbols 5000
+'''
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+import Elf
+import envi.symstore.symcache as e_symcache
+import envi.symstore.resolver as e_resolv
+
+
+def getElfSymCache(filename):
+    '''
+    Return a list of symbol cache tuples for the symbols in an ELF file.
+    '''
+    elf = Elf.elfFromFileName(filename)
+    ret = {}
+    for sym in list(elf.symbols) + list(elf.dynamic_symbols):
+        if not sym.name or not sym.st_value:
+            continue
+
+        symtype = e_resolv.SYMSTOR_SYM_SYMBOL
+        if (sym.st_info & 0xf) == Elf.STT_FUNC:
+            symtype = e_resolv.SYMSTOR_SYM_FUNCTION
+        ret[sym.name] = (sym.st_value, sym.st_size, sym.name, symtype)
+    return list(ret.values())
+
+
+def getSynthSymCache(count, seed=0):
+    '''
+    Return a list of count random symbol cache tuples.
+    '''
+    rand = random.Random(seed)
+    rvas = sorted(rand.sample(range(0x1000, 0x1000 + (count * 64)), count))
+    return [(rva, rand.choice((0, 16, 64, 256)), 'sym_%d_%x' % (seed, rva), rand.randint(0, 1)) for rva in rvas]
+
+
+def buildCaches(dirname, modules):
+    '''
+    Write each ( vhash, symcache ) module to a JSON and a binary symbol
+    cache and return ( jsondir, bindir ).
+    '''
+    jsondir = os.path.join(dirname, 'json')
+    bindir = os.path.join(dirname, 'bin')
+    os.makedirs(jsondir)
+
+    bincache = e_symcache.SymbolCache(dirname=bindir)
+    for vhash, symcache in modules:
+        with open(os.path.join(jsondir, vhash), 'w', encoding='utf-8') as fd:
+            json.dump(symcache, fd)
+        bincache.setCacheSyms(vhash, symcache)
+
+    return jsondir, bindir
+
+
+def loadJsonSyms(jsondir, vhash):
+    # what SymbolCache.getCacheSyms() used to do
+    with open(os.path.join(jsondir, vhash), 'r', encoding='utf-8') as fd:
+        return json.load(fd)
+
+
+def timeAttach(getsyms, vhashes):
+    '''
+    Load the cached symbols for each module into a fresh resolver and
+    return ( seconds, symbol count ).
+    '''
+    start = time.time()
+
+    symres = e_resolv.SymbolResolver(width=8)
+    baseaddr = 0x10000000
+    for vhash in vhashes:
+        symres.addSymbol(e_resolv.FileSymbol(vhash, baseaddr, 0, width=8))
+        symcache = getsyms(vhash)
+        symres.impSymCache(symcache, symfname=vhash, baseaddr=baseaddr)
+        symres.getSymByAddr(baseaddr + 0x1000, exact=False)
+        baseaddr += 0x10000000
+
+    return time.time() - start, len(symres.symaddrs)
+
+
+def runBench(modules, runs=3):
+    '''
+    Time an attach using the JSON and the binary caches for a list of
+    ( vhash, symcache ) modules and return a dict of the best times.
+    '''
+    vhashes = [vhash for vhash, symcache in modules]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        jsondir, bindir = buildCaches(tmpdir, modules)
+        bincache = e_symcache.SymbolCache(dirname=bindir)
+
+        ret = {'modules': len(modules)}
+        for name, getsyms in (('json', lambda vhash: loadJsonSyms(jsondir, vhash)),
+                              ('binary', bincache.getCacheSyms)):
+            best = None
+            for i in range(runs):
+                secs, count = timeAttach(getsyms, vhashes)
+                best = secs if best is None else min(best, secs)
+            ret[name] = best
+            ret['symbols'] = count
+
+        ret['jsonsize'] = sum(os.path.getsize(os.path.join(jsondir, vhash)) for vhash in vhashes)
+        ret['binsize'] = sum(os.path.getsize(os.path.join(bindir, vhash + e_symcache.symcache_ext)) for vhash in vhashes)
+
+    return ret
+
+
+def setup():
+    ap = argparse.ArgumentParser('Measure attach time symbol cache loading')
+    ap.add_argument('files', nargs='*', help='ELF files to take the symbols from')
+    ap.add_argument('--copies', type=int, default=1, help='Load each file as this many modules')
+    ap.add_argument('--synth', type=int, default=0, help='Add this many synthetic modules')
+    ap.add_argument('--symbols', type=int, default=2000, help='Symbols per synthetic module')
+    ap.add_argument('--runs', type=int, default=3, help='Report the best of this many runs')
+    return ap
+
+
+def main(argv):
+    opts = setup().parse_args(argv)
+
+    modules = []
+    for filename in opts.files:
+        symcache = getElfSymCache(filename)
+        for i in range(opts.copies):
+            modules.append(('%s.%d' % (os.path.basename(filename), i), symcache))
+
+    for i in range(opts.synth):
+        modules.append(('synth.%d' % i, getSynthSymCache(opts.symbols, seed=i)))
+
+    if not modules:
+        setup().print_help()
+        return 1
+
+    ret = runBench(modules, runs=opts.runs)
+    print('%d modules, %d symbols' % (ret['modules'], ret['symbols']))
+    print('json:   %.3fs (%d bytes)' % (ret['json'], ret['jsonsize']))
+    print('binary: %.3fs (%d bytes)' % (ret['binary'], ret['binsize']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
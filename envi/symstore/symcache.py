@@ -1,6 +1,11 @@
 import os
+import sys
 import json
+import mmap
+import array
+import struct
 import logging
+import itertools
 
 import envi.exc as e_exc
 import envi.config as e_config
@@ -16,6 +21,163 @@ def symCacheHashFromPe(pe):
 def symCacheHashFromElf(elf):
     pass #FIXME
 
+# Binary symbol cache files ( <vhash>.esc ) are a header followed by the
+# (little endian) arrays rvas[count], sizes[count], nameoffs[count+1] and
+# symtypes[count] sorted by rva and then a table of NUL terminated names.
+symcache_ext = '.esc'
+symcache_magic = b'ENVISYM1'
+symcache_hdr = struct.Struct('<8sII')
+
+# Names are utf-8, but any str the JSON cache held must be storable (names
+# decoded with surrogateescape may hold lone surrogates).
+symcache_errors = 'surrogatepass'
+
+def _getArray(buf, offset, typecode, count):
+    # A view of count items at offset (copied/swapped on big endian hosts)
+    size = array.array(typecode).itemsize * count
+    if sys.byteorder == 'little':
+        return buf[offset:offset + size].cast(typecode)
+
+    arr = array.array(typecode)
+    arr.frombytes(buf[offset:offset + size])
+    arr.byteswap()
+    return arr
+
+def packSymCache(symcache):
+    '''
+    Return the bytes of a binary symbol cache file for a list of
+    ( rva, size, name, symtype ) tuples.
+
+    Example:
+        buf = packSymCache([ (0x1000, 0x20, 'wootfunc', SYMSTOR_SYM_FUNCTION), ])
+    '''
+    symtups = sorted(symcache, key=lambda symtup: symtup[0])
+    names = [symtup[2].encode('utf-8', symcache_errors) for symtup in symtups]
+
+    arrays = [
+        array.array('q', [symtup[0] for symtup in symtups]),
+        array.array('Q', [symtup[1] for symtup in symtups]),
+        array.array('I', itertools.accumulate([0] + [len(name) + 1 for name in names])),
+        array.array('B', [symtup[3] for symtup in symtups]),
+    ]
+
+    strtab = b''.join([name + b'\x00' for name in names])
+
+    bufs = [symcache_hdr.pack(symcache_magic, len(symtups), len(strtab))]
+    for arr in arrays:
+        if sys.byteorder != 'little':
+            arr.byteswap()
+        bufs.append(arr.tobytes())
+    bufs.append(strtab)
+
+    return b''.join(bufs)
+
+class SymCacheFile:
+    '''
+    A (lazily decoded) binary symbol cache which acts like the list of
+    ( rva, size, name, symtype ) tuples it was made from.  It pickles
+    as a plain list ( for symbol servers shared over cobra ).
+
+    Example:
+        syms = loadSymCacheFile('/path/to/pe.12345678.00000000.00001000.esc')
+        rva, size, name, symtype = syms[0]
+    '''
+    def __init__(self, buf, mapped=None):
+        self.mapped = mapped
+
+        magic, count, strsize = symcache_hdr.unpack_from(buf, 0)
+        if magic != symcache_magic:
+            raise Exception('Invalid symbol cache file (magic: %r)' % (magic,))
+
+        buf = memoryview(buf)
+        offset = symcache_hdr.size
+
+        self.count = count
+        self.rvas = _getArray(buf, offset, 'q', count)
+        offset += 8 * count
+        self.sizes = _getArray(buf, offset, 'Q', count)
+        offset += 8 * count
+        self.nameoffs = _getArray(buf, offset, 'I', count + 1)
+        offset += 4 * (count + 1)
+        self.symtypes = _getArray(buf, offset, 'B', count)
+        offset += count
+        self.strtab = buf[offset:offset + strsize]
+
+        if len(self.strtab) != strsize:
+            raise Exception('Truncated symbol cache file')
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self.count))]
+
+        if idx < 0:
+            idx += self.count
+
+        name = self.getName(idx)
+        return (self.rvas[idx], self.sizes[idx], name, self.symtypes[idx])
+
+    def __iter__(self):
+        return zip(self.rvas.tolist(), self.sizes.tolist(), self.getNames(), self.symtypes.tolist())
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+    def getName(self, idx):
+        '''
+        Decode the name of the symbol at the given index.
+        '''
+        name = self.strtab[self.nameoffs[idx]:self.nameoffs[idx + 1] - 1]
+        return bytes(name).decode('utf-8', symcache_errors)
+
+    def getNames(self):
+        '''
+        Decode the names of all the symbols (in one go).
+        '''
+        names = bytes(self.strtab).decode('utf-8', symcache_errors).split('\x00')[:-1]
+        if len(names) != self.count:
+            # a name with a NUL in it...
+            names = [self.getName(i) for i in range(self.count)]
+        return names
+
+    def getSymTups(self, baseaddr=0, fname=None):
+        '''
+        Bulk build SymbolResolver tuples ( va, size, name, symtype, fname )
+        for the symbols loaded at baseaddr ( see SymbolResolver.impSymCache ).
+        '''
+        vas = self.rvas.tolist()
+        if baseaddr:
+            vas = [rva + baseaddr for rva in vas]
+
+        names = map(sys.intern, self.getNames())
+        return list(zip(vas, self.sizes.tolist(), names, self.symtypes.tolist(), itertools.repeat(fname)))
+
+    def close(self):
+        if self.mapped is None:
+            return
+
+        for view in (self.rvas, self.sizes, self.nameoffs, self.symtypes, self.strtab):
+            if isinstance(view, memoryview):
+                view.release()
+
+        self.mapped.close()
+        self.mapped = None
+
+def loadSymCacheFile(filename):
+    '''
+    Memory map a binary symbol cache file and return a SymCacheFile.
+    '''
+    with open(filename, 'rb') as fd:
+        mapped = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        return SymCacheFile(mapped, mapped=mapped)
+    except Exception:
+        mapped.close()
+        raise
+
 class SymbolCache:
     '''
     A SymbolCache is a location where pre-parsed symbols for
@@ -36,6 +198,15 @@ class SymbolCache:
 
         self._sym_cachedir = os.path.abspath(dirname)
 
+    def _getCacheFile(self, vhash, ext=''):
+        cachefile = os.path.join(self._sym_cachedir, vhash + ext)
+
+        abspath = os.path.abspath(cachefile)
+        if not abspath.startswith(self._sym_cachedir):
+            raise e_exc.InvalidSymbolCache(vhash)
+
+        return cachefile
+
     def setCacheSyms(self, vhash, symcache):
         '''
         Save a set of symbol cache tuples to the symbol cache.
@@ -45,15 +216,14 @@ class SymbolCache:
             cache = SymbolCache()
             cache.setCacheSyms( vhash, tups )
         '''
-        cachefile = os.path.join(self._sym_cachedir, vhash)
+        cachefile = self._getCacheFile(vhash, symcache_ext)
+        buf = packSymCache(symcache)
 
-        abspath = os.path.abspath(cachefile)
-        if not abspath.startswith(self._sym_cachedir):
-            raise e_exc.InvalidSymbolCache(vhash)
-
-        # FIXME check input path
-        with open(cachefile, 'w', encoding='utf-8') as fd:
-            json.dump(symcache, fd)
+        # write/rename so a mapped old version is never modified
+        tmpfile = '%s.%d.tmp' % (cachefile, os.getpid())
+        with open(tmpfile, 'wb') as fd:
+            fd.write(buf)
+        os.replace(tmpfile, cachefile)
 
     def getCacheSyms(self, vhash):
         '''
@@ -64,23 +234,41 @@ class SymbolCache:
             cache = SymbolCache()
             for rva, size, name, stype in cache.getCacheSyms():
                 dostuff()
+
+        NOTE: The symbols are returned as a (memory mapped) SymCacheFile
+              and old JSON cache files are converted on first use.
         '''
-        cachefile = os.path.join(self._sym_cachedir, vhash)
+        cachefile = self._getCacheFile(vhash, symcache_ext)
+        if not os.path.isfile(cachefile):
+            return self._migrateCacheSyms(vhash)
 
-        abspath = os.path.abspath(cachefile)
-        if not abspath.startswith(self._sym_cachedir):
-            raise e_exc.InvalidSymbolCache(vhash)
+        try:
+            return loadSymCacheFile(cachefile)
+        except Exception as e:
+            logger.warning('Failed to load cachefile: %s', e)
+            return None
 
-        if not os.path.isfile(cachefile):
+    def _migrateCacheSyms(self, vhash):
+        # Load an old style JSON cache file and replace it with a binary one
+        jsonfile = self._getCacheFile(vhash)
+        if not os.path.isfile(jsonfile):
             return None
 
         try:
-            with open(cachefile, 'r', encoding='utf-8') as fd:
-                return json.load(fd)
+            with open(jsonfile, 'r', encoding='utf-8') as fd:
+                symcache = json.load(fd)
         except Exception as e:
             logger.warning('Failed to load cachefile: %s', e)
             return None
 
+        try:
+            self.setCacheSyms(vhash, symcache)
+            os.unlink(jsonfile)
+        except Exception as e:
+            logger.warning('Failed to migrate cachefile %s: %s', jsonfile, e)
+
+        return symcache
+
 
 class SymbolCachePath:
 
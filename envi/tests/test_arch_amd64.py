@@ -1196,18 +1196,45 @@ class Amd64InstructionSet(unittest.TestCase):
     def test_envi_amd64_disasm_Specific_MultiByte_Instrs(self):
         self.check_opreprs(amd64MultiByteOpcodes)
 
+    def test_envi_amd64_disasm_flow(self):
+        # the length-and-flow decoder must agree with the full decoder
+        # (including on truncated bytes, and again once the plans are cached)
+        dis = e_amd64.Amd64Disasm()
+        for i in range(2):
+            for name, bytez, reprOp, renderOp in amd64SingleByteOpcodes + amd64MultiByteOpcodes + amd64VexOpcodes:
+                bytez = binascii.unhexlify(bytez)
+                for size in range(1, len(bytez) + 1):
+                    try:
+                        op = dis.disasm(bytez[:size], 0, 0x400)
+                        expected = (op.va, op.size, op.iflags, tuple(op.getBranches()))
+                    except Exception:
+                        expected = None
+
+                    try:
+                        got = tuple(dis.disasmFlow(bytez[:size], 0, 0x400))
+                    except Exception:
+                        got = None
+                    self.assertEqual(got, expected, msg='%s (%d bytes)' % (name, size))
+
+        recs = self._arch.archParseOpcodes(binascii.unhexlify('4883ec08e8f5ffffff75f24883c408c3'), va=0x400, records=True)
+        self.assertEqual([(r.va, r.size) for r in recs], [(0x400, 4), (0x404, 5), (0x409, 2), (0x40b, 4), (0x40f, 1)])
+        self.assertEqual(recs[1].branches, ((0x409, envi.ARCH_AMD64 | envi.BR_FALL), (0x3fe, envi.ARCH_AMD64 | envi.BR_PROC)))
+        self.assertEqual(recs[2].branches, ((0x40b, envi.ARCH_AMD64 | envi.BR_COND | envi.BR_FALL), (0x3fd, envi.ARCH_AMD64 | envi.BR_COND)))
+        self.assertEqual(recs[4].branches, ())
+        self.assertTrue(recs[4].iflags & envi.IF_RET)
+
     def checkOpcode(self, hexbytez, va, oprepr, opcheck, opercheck, renderOp):
 
         op = self._arch.archParseOpcode(binascii.unhexlify(hexbytez), 0, va)
 
         self.assertEqual( repr(op), oprepr )
-        opvars = vars(op)
+        opvars = envi.getObjVars(op)
         for opk,opv in opcheck.items():
             self.assertEqual((repr(op), opk, opvars.get(opk)), (oprepr, opk, opv))
 
         for oidx in range(len(op.opers)):
             oper = op.opers[oidx]
-            opervars = vars(oper)
+            opervars = envi.getObjVars(oper)
             for opk,opv in opercheck[oidx].items():
                 self.assertEqual((repr(op), opk, opervars.get(opk)), (oprepr, opk, opv))
 
@@ -1451,13 +1478,13 @@ def generateTestInfo(ophexbytez='6e'):
     opbytez = ophexbytez
     op = a64.archParseOpcode(binascii.unhexlify(opbytez), 0, 0x4000)
     print("opbytez = '%s'\noprepr = '%s'" % (opbytez, repr(op)))
-    opvars = vars(op)
+    opvars = envi.getObjVars(op)
     opers = opvars.pop('opers')
     print("opcheck = %s" % repr(opvars))
 
     opersvars = []
     for x in range(len(opers)):
-        opervars = vars(opers[x])
+        opervars = envi.getObjVars(opers[x])
         opervars.pop('_dis_regctx')
         opersvars.append(opervars)
 
@@ -743,13 +743,13 @@ def generateTestInfo(ophexbytez='6e'):
     opbytez = ophexbytez
     op = h8.archParseOpcode(binascii.unhexlify(opbytez), 0, 0x4000)
     print("opbytez = '%s'\noprepr = '%s'" % (opbytez, repr(op)))
-    opvars = vars(op)
+    opvars = envi.getObjVars(op)
     opers = opvars.pop('opers')
     print("opcheck = ", repr(opvars))
 
     opersvars = []
     for x in range(len(opers)):
-        opervars = vars(opers[x])
+        opervars = envi.getObjVars(opers[x])
         opervars.pop('_dis_regctx')
         opersvars.append(opervars)
 
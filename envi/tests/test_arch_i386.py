@@ -2,6 +2,8 @@ import binascii
 import unittest
 
 import envi
+import envi.membench as e_membench
+import envi.archs.i386 as e_i386
 import envi.memcanvas as e_memcanvas
 
 import vivisect
@@ -358,13 +360,13 @@ class i386InstructionSet(unittest.TestCase):
 
         op = self._arch.archParseOpcode(binascii.unhexlify(hexbytez), 0, va)
         self.assertEqual(repr(op), oprepr)
-        opvars = vars(op)
+        opvars = envi.getObjVars(op)
         for opk, opv in opcheck.items():
             self.assertEqual((opk, opvars.get(opk)), (opk, opv))
 
         for oidx in range(len(op.opers)):
             oper = op.opers[oidx]
-            opervars = vars(oper)
+            opervars = envi.getObjVars(oper)
             for opk, opv in opercheck[oidx].items():
                 self.assertEqual((opk, opervars.get(opk)), (opk, opv))
 
@@ -489,3 +491,91 @@ class i386InstructionSet(unittest.TestCase):
         opcheck = {'iflags': 65536, 'va': 16384, 'repr': None, 'prefixes': 0, 'mnem': 'cvttps2pi', 'opcode': 61440}
         opercheck = [{'tsize': 8, 'reg': 4194355}, {'disp': -287454021, 'tsize': 8, '_is_deref': True, 'reg': 2}]
         self.checkOpcode(opbytez, 0x4000, oprepr, opcheck, opercheck, oprepr)
+
+    def test_envi_i386_slots(self):
+        # push ebp; mov ebp,esp; mov eax,dword [ebp + 8]; lea ecx,dword [eax + 4]; pop ebp; ret
+        bytez = binascii.unhexlify('5589e58b45088d48045dc3')
+        ops = e_membench.decodeBytes(self._arch, bytez, va=0x1000)
+        self.assertEqual([op.mnem for op in ops], ['push', 'mov', 'mov', 'lea', 'pop', 'ret'])
+
+        for op in ops:
+            self.assertFalse(hasattr(op, '__dict__'))
+            for oper in op.opers:
+                self.assertFalse(hasattr(oper, '__dict__'))
+
+        # register operands are shared between instructions
+        self.assertIs(ops[0].opers[0], ops[1].opers[0])
+        self.assertIs(ops[0].opers[0], ops[4].opers[0])
+        self.assertIsNot(ops[2].opers[1], ops[3].opers[1])
+        self.assertFalse(ops[3].opers[1].isDeref())
+        self.assertTrue(ops[2].opers[1].isDeref())
+
+        self.assertEqual(envi.getObjVars(ops[2].opers[1]),
+                         {'reg': 5, 'tsize': 4, 'disp': 8, '_is_deref': True,
+                          '_dis_regctx': ops[2].opers[1]._dis_regctx})
+
+        info = e_membench.measureBytes(self._arch, bytez * 10)
+        self.assertEqual(info['count'], 60)
+        self.assertGreater(info['perop'], 0)
+
+    def test_envi_i386_disasm_flow(self):
+        dis = e_i386.i386Disasm()
+        for i in range(2):
+            for name, bytez, va, reprOp, renderOp in i386SingleByteOpcodes + i386MultiByteOpcodes:
+                bytez = binascii.unhexlify(bytez)
+                for size in range(1, len(bytez) + 1):
+                    try:
+                        op = dis.disasm(bytez[:size], 0, va)
+                        expected = (op.va, op.size, op.iflags, tuple(op.getBranches()))
+                    except Exception:
+                        expected = None
+
+                    try:
+                        got = tuple(dis.disasmFlow(bytez[:size], 0, va))
+                    except Exception:
+                        got = None
+                    self.assertEqual(got, expected, msg='%s (%d bytes)' % (name, size))
+
+    def test_envi_i386_parseopcodes(self):
+        # push ebp; mov ebp,esp; jz +2; call +0; leave; ret; <invalid>; nop
+        bytez = binascii.unhexlify('5589e57402e800000000c9c3ffff90')
+        va = 0x1000
+        ops = self._arch.archParseOpcodes(bytez, va=va)
+        self.assertEqual([op.mnem for op in ops], ['push', 'mov', 'jz', 'call', 'leave', 'ret'])
+
+        off = 0
+        for op in ops:
+            self.assertEqual(repr(op), repr(self._arch.archParseOpcode(bytez, off, va + off)))
+            off += op.size
+
+        recs = self._arch.archParseOpcodes(bytez, va=va, records=True)
+        self.assertEqual([(r.va, r.size, r.iflags) for r in recs],
+                         [(op.va, op.size, op.iflags) for op in ops])
+        self.assertEqual(recs[2].branches, tuple(ops[2].getBranches()))
+        self.assertEqual(len(recs[2].branches), 2)
+
+        self.assertEqual(len(self._arch.archParseOpcodes(bytez, va=va, maxcount=2)), 2)
+        self.assertEqual(len(self._arch.archParseOpcodes(bytez, va=va, maxva=va + 3)), 2)
+        self.assertEqual(len(self._arch.archParseOpcodes(bytez, 3, va + 3, maxva=va + 4)), 1)
+        self.assertEqual(self._arch.archParseOpcodes(bytez, 12, va + 12), [])
+
+        # the benchmark decoder skips the invalid bytes
+        mnems = [op.mnem for op in e_membench.decodeBytes(self._arch, bytez, va=va)]
+        self.assertEqual(mnems[:6], [op.mnem for op in ops])
+        self.assertEqual(mnems[-1], 'nop')
+
+        vw = vivisect.VivWorkspace()
+        vw.setMeta('Architecture', 'i386')
+        vw.addMemoryMap(va, 7, 'test', bytez)
+        vops = vw.parseOpcodes(va, maxcount=4)
+        self.assertEqual([op.mnem for op in vops], ['push', 'mov', 'jz', 'call'])
+        self.assertEqual(len(vw.parseOpcodes(va + 3, maxva=va + 0x100)), 4)
+
+        # the run shares the workspace opcode cache
+        self.assertIs(vw.parseOpcode(va + 3), vw.parseOpcodes(va + 3, maxcount=1)[0])
+        self.assertIs(vw.parseOpcodes(va, maxcount=4)[1], vw.parseOpcode(va + 1))
+
+        # only decode failures end a run quietly
+        def broken(bytez, offset, va):
+            raise AttributeError('broken parser')
+        self.assertRaises(AttributeError, envi.parseOpcodeRun, broken, bytez)
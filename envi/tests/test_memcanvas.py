@@ -0,0 +1,126 @@
+import unittest
+
+import envi.exc as e_exc
+import envi.memory as e_mem
+import envi.memcanvas as e_mcanvas
+import envi.memcanvas.renderers as e_render
+
+
+class CountingRend(e_render.ByteRend):
+
+    def __init__(self):
+        e_render.ByteRend.__init__(self)
+        self.renders = 0
+
+    def render(self, mcanv, va, numbytes=16):
+        self.renders += 1
+        return e_render.ByteRend.render(self, mcanv, va, numbytes=numbytes)
+
+
+class EnviMemCanvasTest(unittest.TestCase):
+
+    def setUp(self):
+        self.mem = e_mem.MemoryObject()
+        self.mem.addMemoryMap(0x41410000, 7, 'testmem', bytes(range(256)) * 64)
+        self.rend = CountingRend()
+        self.canv = e_mcanvas.StringMemoryCanvas(self.mem)
+        self.canv.addRenderer('bytes', self.rend)
+
+    def getLines(self):
+        return str(self.canv).splitlines()
+
+    def test_render_window(self):
+        # only the visible lines and the margins are rendered
+        va = self.canv.renderMemoryWindow(0x41411000, 10, margin=4)
+        self.assertEqual(va, 0x41411000)
+        lines = self.getLines()
+        self.assertEqual(len(lines), 18)
+        self.assertEqual(self.rend.renders, 18)
+        self.assertTrue(lines[0].startswith('0x41410fc0'))
+        self.assertTrue(lines[4].startswith('0x41411000'))
+        self.assertTrue(lines[-1].startswith('0x414110d0'))
+        self.assertEqual(self.canv._canv_rendvas[4], (0x41411000, 16))
+
+        # same text as the old style render of the range
+        scanv = e_mcanvas.StringMemoryCanvas(self.mem)
+        scanv.addRenderer('bytes', e_render.ByteRend())
+        scanv.renderMemory(0x41410fc0, 18 * 16)
+        self.assertEqual(str(scanv), str(self.canv))
+
+        # the window stops at the edges of the memory map
+        self.canv.renderMemoryWindow(0x41410010, 10, margin=4)
+        lines = self.getLines()
+        self.assertEqual(len(lines), 15)
+        self.assertTrue(lines[0].startswith('0x41410000'))
+
+        self.canv.renderMemoryWindow(0x41413fe0, 10, margin=4)
+        lines = self.getLines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[-1].startswith('0x41413ff0'))
+
+        self.assertRaises(e_exc.InvalidAddress, self.canv.renderMemoryWindow, 0x51410000, 10)
+
+    def test_scroll_window(self):
+        self.canv.renderMemoryWindow(0x41411000, 10, margin=2)
+        self.assertEqual(self.canv.scrollMemoryWindow(3), 0x41411030)
+        self.assertTrue(self.getLines()[2].startswith('0x41411030'))
+        self.assertEqual(self.canv.scrollMemoryWindow(-5), 0x41410fe0)
+        self.assertTrue(self.getLines()[2].startswith('0x41410fe0'))
+
+        # scrolling stops at the ends of the map
+        self.assertEqual(self.canv.scrollMemoryWindow(-0x1000), 0x41410000)
+        self.canv.renderMemoryWindow(0x41413fe0, 10, margin=2)
+        self.assertEqual(self.canv.scrollMemoryWindow(5), 0x41413ff0)
+
+    def test_render_cache(self):
+        self.canv.setRenderCache(maxunits=64)
+        self.canv.renderMemoryWindow(0x41411000, 10, margin=4)
+        text = str(self.canv)
+        self.assertEqual(self.rend.renders, 18)
+
+        # scrolling back and forth replays the cached units
+        self.canv.scrollMemoryWindow(2)
+        self.assertEqual(self.rend.renders, 20)
+        self.canv.scrollMemoryWindow(-2)
+        self.assertEqual(self.rend.renders, 20)
+        self.assertEqual(str(self.canv), text)
+
+        # updates drop (only) the changed units and render the window again
+        self.mem.writeMemory(0x41411008, b'\xff\xff')
+        self.canv.renderMemoryUpdate(0x41411008, 2)
+        self.assertEqual(self.rend.renders, 21)
+        self.assertIn('ff ff', self.getLines()[4])
+        self.assertNotEqual(str(self.canv), text)
+
+        # the least recently used units are dropped
+        self.canv.renderMemoryWindow(0x41412000, 60, margin=4)
+        self.assertEqual(len(self.canv._canv_rendcache), 64)
+
+        # a new renderer starts over
+        rend = CountingRend()
+        self.canv.addRenderer('bytes2', rend)
+        self.canv.renderMemoryWindow(0x41412000, 10, margin=0)
+        self.assertEqual(rend.renders, 10)
+
+    def test_render_cache_units(self):
+        rcache = e_mcanvas.RenderCache(maxunits=4)
+        for va in (0x10, 0x20, 0x30):
+            rcache.addUnit(va, (0x10, [], 1))
+        rcache.addUnit(0x40, (0x20, [], 2))
+
+        rcache.delUnits(0x2f, 2)
+        self.assertEqual(rcache.unitvas, [0x10, 0x40])
+        rcache.delUnits(0x5f, 1)
+        self.assertEqual(rcache.unitvas, [0x10])
+
+        for va in (0x20, 0x30, 0x40, 0x50):
+            rcache.addUnit(va, (0x10, [], 1))
+        self.assertIsNone(rcache.getUnit(0x10))
+        self.assertEqual(rcache.unitvas, [0x20, 0x30, 0x40, 0x50])
+
+    def test_scroll_pos(self):
+        self.canv.setRenderer('bytes')
+        self.assertEqual(self.canv.getScrollPos(0x41410000), 0.0)
+        self.assertEqual(self.canv.getScrollPos(0x41413fff), 1.0)
+        self.assertEqual(self.canv.getScrollVa(0.5, 0x41410000), 0x41411fff)
+        self.assertEqual(self.canv.getScrollVa(2.0, 0x41410000), 0x41413fff)
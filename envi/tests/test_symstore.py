@@ -1,7 +1,13 @@
-import envi.symstore.resolver as e_sym_resolv
-
+import os
+import json
+import pickle
+import tempfile
 import unittest
 
+import envi.exc as e_exc
+import envi.symstore.symcache as e_symcache
+import envi.symstore.resolver as e_sym_resolv
+
 class SymResolverTests(unittest.TestCase):
     def setUp(self):
         self.symres = e_sym_resolv.SymbolResolver()
@@ -67,4 +73,174 @@ class SymResolverTests(unittest.TestCase):
         sym = self.symres.getSymByAddr(0x16010, exact=False)
         assert(sym is not None)
 
+    def test_getSymByAddr_nearest(self):
+        symcache = [
+            (0x1000, 0, 'alpha', e_sym_resolv.SYMSTOR_SYM_FUNCTION),
+            (0x1100, 0x40, 'beta', e_sym_resolv.SYMSTOR_SYM_FUNCTION),
+            (0x20000, 0x10000, 'bigdata', e_sym_resolv.SYMSTOR_SYM_SECTION),
+            (0x20100, 0, 'gamma', e_sym_resolv.SYMSTOR_SYM_SYMBOL),
+        ]
+        self.symres.impSymCache(symcache, baseaddr=0x400000)
+
+        self.assertIsNone(self.symres.getSymByAddr(0x401010))
+        self.assertEqual(self.symres.getSymByAddr(0x401010, exact=False).name, 'alpha')
+        self.assertEqual(self.symres.getSymByAddr(0x401150, exact=False).name, 'beta')
+        self.assertIsInstance(self.symres.getSymByAddr(0x401100, exact=False), e_sym_resolv.FunctionSymbol)
+        self.assertIsNone(self.symres.getSymByAddr(0x3fffff, exact=False))
+
+        # too far from the nearest symbol unless one contains the address
+        self.assertIsNone(self.symres.getSymByAddr(0x410000, exact=False))
+        self.assertEqual(self.symres.getSymByAddr(0x420108, exact=False).name, 'gamma')
+        self.assertEqual(self.symres.getSymByAddr(0x42f000, exact=False).name, 'bigdata')
+        self.assertIsNone(self.symres.getSymByAddr(0x432000, exact=False))
+
+        # symbols added after a lookup and deleted symbols are seen
+        self.symres.addSymbol(e_sym_resolv.Symbol('delta', 0x42e000, 0))
+        self.assertEqual(self.symres.getSymByAddr(0x42f000, exact=False).name, 'delta')
+        self.symres.delSymbol(self.symres.getSymByName('delta'))
+        self.assertIsNone(self.symres.getSymByAddr(0x42e000))
+        self.assertEqual(self.symres.getSymByAddr(0x42f000, exact=False).name, 'bigdata')
+
+    def test_addSymbols(self):
+        fres = e_sym_resolv.FileSymbol('foo', 0x10000, 0x1000, 4)
+        self.symres.addSymbol(fres)
+
+        syms = [e_sym_resolv.FunctionSymbol('func%d' % i, 0x10000 + (i * 0x10), 0x10, 'foo') for i in range(100)]
+        syms.append(e_sym_resolv.SectionSymbol('.text', 0x10000, 0x1000, 'foo'))
+        syms.append(e_sym_resolv.Symbol('global', 0x20000, 0))
+        self.symres.addSymbols(syms)
+
+        sym = self.symres.getSymByName('foo').getSymByName('func7')
+        self.assertIsInstance(sym, e_sym_resolv.FunctionSymbol)
+        self.assertEqual((sym.value, sym.size, str(sym)), (0x10070, 0x10, 'foo.func7'))
+        self.assertEqual(self.symres.getSymByName('foo').func99.value, 0x10630)
+        self.assertEqual(self.symres.getSymByName('global').value, 0x20000)
+        self.assertEqual(str(self.symres.getSymByAddr(0x10074, exact=False)), 'foo.func7')
+        self.assertEqual(str(self.symres.getSymByAddr(0x10800, exact=False)), 'foo.func99')
+
+    def test_addSymbols_like_addSymbol(self):
+        def getSyms():
+            syms = [e_sym_resolv.FileSymbol('foo', 0x10000, 0x1000, 4)]
+            syms.extend(e_sym_resolv.FunctionSymbol('func%d' % i, 0x10000 + (i * 0x10), 0x10, 'foo') for i in range(10))
+            syms.append(e_sym_resolv.Symbol('bar', 0x10200, 4, 'foo'))
+            syms.append(e_sym_resolv.Symbol('global', 0x20000, 0))
+            syms.append(e_sym_resolv.Symbol('other', 0x30000, 0, 'nofile'))
+            return syms
+
+        single = e_sym_resolv.SymbolResolver()
+        for sym in getSyms():
+            single.addSymbol(sym)
+
+        bulk = e_sym_resolv.SymbolResolver()
+        syms = getSyms()
+        bulk.addSymbol(syms[0])
+        bulk.addSymbols(syms[1:])
+
+        for symres in (single, bulk):
+            # the names of a FileSymbol's symbols stay in its namespace
+            self.assertIsNone(symres.getSymByName('bar'))
+            self.assertIsNone(symres.getSymByName('func3'))
+            self.assertEqual(symres.getSymByName('global').value, 0x20000)
+            self.assertEqual(symres.getSymByName('other').value, 0x30000)
+
+        for name in ('func3', 'bar'):
+            self.assertEqual(str(bulk.getSymByName('foo').getSymByName(name)),
+                             str(single.getSymByName('foo').getSymByName(name)))
+
+        for va in (0x10000, 0x10034, 0x10200, 0x10204, 0x20000):
+            for exact in (True, False):
+                self.assertEqual(str(bulk.getSymByAddr(va, exact=exact)), str(single.getSymByAddr(va, exact=exact)))
+
+                fsym = single.getSymByName('foo').getSymByAddr(va, exact=exact)
+                self.assertEqual(str(bulk.getSymByName('foo').getSymByAddr(va, exact=exact)), str(fsym))
+
+        self.assertEqual(str(bulk.getSymByName('foo').getSymByAddr(0x10034, exact=False)), 'foo.func3')
+
+        # an empty FileSymbol (as vtrace makes them) leaves the names here
+        single = e_sym_resolv.SymbolResolver()
+        bulk = e_sym_resolv.SymbolResolver()
+        for symres in (single, bulk):
+            symres.addSymbol(e_sym_resolv.FileSymbol('foo', 0x10000, 0, 4))
+
+        syms = getSyms()[1:]
+        for sym in syms:
+            single.addSymbol(sym)
+        bulk.addSymbols(getSyms()[1:])
+
+        self.assertEqual(sorted(single.symnames), sorted(bulk.symnames))
+        self.assertEqual(bulk.getSymByName('bar').value, 0x10200)
+        self.assertEqual(bulk.getSymByName('foo').bar.value, single.getSymByName('foo').bar.value)
+        self.assertEqual(str(bulk.getSymByAddr(0x10034, exact=False)), str(single.getSymByAddr(0x10034, exact=False)))
+
     #def test_import
+
+
+class SymCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = e_symcache.SymbolCache(dirname=self.tmpdir.name)
+        self.symtups = [
+            (0x2000, 0x40, 'beta', e_sym_resolv.SYMSTOR_SYM_FUNCTION),
+            (0x1000, 0, 'alpha', e_sym_resolv.SYMSTOR_SYM_SYMBOL),
+            (0x3000, 0x1000, '.data\u00e9', e_sym_resolv.SYMSTOR_SYM_SECTION),
+        ]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_symcache_file(self):
+        self.cache.setCacheSyms('pe.1234', self.symtups)
+        self.assertTrue(os.path.isfile(os.path.join(self.tmpdir.name, 'pe.1234' + e_symcache.symcache_ext)))
+        self.assertIsNone(self.cache.getCacheSyms('pe.5678'))
+        self.assertRaises(e_exc.InvalidSymbolCache, self.cache.getCacheSyms, '../pe.1234')
+
+        syms = self.cache.getCacheSyms('pe.1234')
+        self.assertIsInstance(syms, e_symcache.SymCacheFile)
+        self.assertEqual(len(syms), 3)
+        self.assertEqual(list(syms), sorted(self.symtups))
+        self.assertEqual(syms[-1], (0x3000, 0x1000, '.data\u00e9', e_sym_resolv.SYMSTOR_SYM_SECTION))
+        self.assertEqual(syms[:1], [(0x1000, 0, 'alpha', e_sym_resolv.SYMSTOR_SYM_SYMBOL)])
+
+        # symbol servers hand them out over cobra as plain lists
+        self.assertEqual(pickle.loads(pickle.dumps(syms)), sorted(self.symtups))
+
+        symres = e_sym_resolv.SymbolResolver()
+        symres.addSymbol(e_sym_resolv.FileSymbol('foo', 0x400000, 0, 4))
+        symres.impSymCache(syms, symfname='foo', baseaddr=0x400000)
+        self.assertEqual(repr(symres.getSymByName('foo').beta), 'foo.beta()')
+        self.assertEqual(str(symres.getSymByAddr(0x402010, exact=False)), 'foo.beta')
+
+        syms.close()
+        self.assertEqual(e_symcache.SymCacheFile(e_symcache.packSymCache([]))[:], [])
+
+    def test_symcache_migrate(self):
+        jsonfile = os.path.join(self.tmpdir.name, 'pe.1234')
+        with open(jsonfile, 'w', encoding='utf-8') as fd:
+            json.dump(self.symtups, fd)
+
+        syms = self.cache.getCacheSyms('pe.1234')
+        self.assertEqual([tuple(symtup) for symtup in syms], self.symtups)
+        self.assertFalse(os.path.exists(jsonfile))
+
+        syms = self.cache.getCacheSyms('pe.1234')
+        self.assertIsInstance(syms, e_symcache.SymCacheFile)
+        self.assertEqual(list(syms), sorted(self.symtups))
+
+    def test_symcache_surrogates(self):
+        # names decoded with surrogateescape are not valid utf-8
+        name = b'bad\xffname'.decode('utf-8', 'surrogateescape')
+        self.symtups.append((0x4000, 8, name, e_sym_resolv.SYMSTOR_SYM_SYMBOL))
+
+        jsonfile = os.path.join(self.tmpdir.name, 'pe.1234')
+        with open(jsonfile, 'w', encoding='utf-8') as fd:
+            json.dump(self.symtups, fd)
+
+        self.cache.getCacheSyms('pe.1234')
+        self.assertFalse(os.path.exists(jsonfile))
+
+        syms = self.cache.getCacheSyms('pe.1234')
+        self.assertIsInstance(syms, e_symcache.SymCacheFile)
+        self.assertEqual(list(syms), sorted(self.symtups))
+        self.assertEqual(syms[-1][2], name)
+        syms.close()
@@ -26,6 +26,7 @@ setup(
         'console_scripts': [
             'vivbin=vivisect.vivbin:main',
             'vdbbin=vdb.vdbbin:main',
+            'vivbatch=vivisect.batch:main',
         ]
     },
     install_requires=[
@@ -29,6 +29,7 @@ import envi.cli as e_cli
 import envi.bits as e_bits
 import envi.common as e_common
 import envi.config as e_config
+from envi.defconfig import defconfig, docconfig
 import envi.memory as e_memory
 import envi.symstore.resolver as e_resolv
 
@@ -112,39 +113,6 @@ class VdbTrace(object):
     def __getattr__(self, name):
         return getattr(self.db.getTrace(), name)
 
-defconfig = {
-
-    'vdb':{
-        'BreakOnEntry':False,
-        'BreakOnMain':False,
-
-        'SymbolCacheActive':True,
-        'SymbolCachePath':e_config.gethomedir('.envi','symcache'),
-
-        'KillOnQuit': False,
-    },
-
-    'cli':{
-        'verbose':False,
-        'aliases': {
-            '<f1>':'stepi',
-            '<f2>':'go -I 1',
-            '<f5>':'go',
-        }
-    },
-
-}
-
-docconfig = {
-    'vdb':{
-        'BreakOnMain':'Should the debugger break on main() if known?',
-        'BreakOnEntry':'Should the debugger break on the entry to the main module? (only works if you exec (and not attach to) the process)',
-
-        'SymbolCacheActive':'Should we cache symbols for subsequent loads?',
-        'SymbolCachePaths':'Path elements ( ; seperated) to search/cache symbols (filepath,cobra)',
-    }
-}
-
 class WrapExcThread(threading.Thread):
     '''
     Places the return value or exception information into a queue that can
@@ -1,9 +1,15 @@
 '''
-Visgraph supports backing the graph objects with a postgres db.
+Visgraph supports backing the graph objects with a postgres db (or an
+embedded sqlite db for those without a postgres server).
 '''
-
-import psycopg2
+import sqlite3
 import collections
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
 import visgraph.graphcore as vg_graphcore
 
 init_db = '''
@@ -52,6 +58,48 @@ init_db = '''
     CREATE INDEX vg_node_pname_strval ON vg_node_props (pname, strval);
 '''
 
+init_sqlite_db = '''
+    CREATE TABLE IF NOT EXISTS vg_edges (
+        eid     INTEGER PRIMARY KEY,
+        n1      INTEGER,
+        n2      INTEGER,
+        created TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS vg_edges_idx_n1 ON vg_edges (n1);
+    CREATE INDEX IF NOT EXISTS vg_edges_idx_n2 ON vg_edges (n2);
+
+    CREATE TABLE IF NOT EXISTS vg_edge_props (
+        eid     INTEGER NOT NULL,
+        pname   VARCHAR(256) NOT NULL,
+        intval  INTEGER,
+        strval  VARCHAR(1024),
+        created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (eid, pname)
+    );
+    CREATE INDEX IF NOT EXISTS vg_edge_pname_intval ON vg_edge_props (pname, intval);
+    CREATE INDEX IF NOT EXISTS vg_edge_pname_strval ON vg_edge_props (pname, strval);
+
+    CREATE TABLE IF NOT EXISTS vg_nodes (
+        nid     INTEGER PRIMARY KEY,
+        created TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS vg_node_props (
+        nid     INTEGER NOT NULL,
+        pname   VARCHAR(255) NOT NULL,
+        intval  INTEGER,
+        strval  VARCHAR(1024),
+        created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY  (nid,pname)
+    );
+    CREATE INDEX IF NOT EXISTS vg_node_pname_intval ON vg_node_props (pname, intval);
+    CREATE INDEX IF NOT EXISTS vg_node_pname_strval ON vg_node_props (pname, strval);
+'''
+
+# Maximum number of bound variables per sqlite query (older sqlite
+# builds are limited to 999)
+sqlite_maxvars = 900
+
 # Exanmple database creds...
 default_dbinfo = {
 'user':'visgraph',
@@ -61,6 +109,9 @@ default_dbinfo = {
 }
 
 def initGraphDb(dbinfo):
+    if psycopg2 is None:
+        raise Exception('initGraphDb requires psycopg2 (see SqliteGraphStore)')
+
     db = psycopg2.connect(**dbinfo)
     c = db.cursor()
     c.execute(init_db)
@@ -68,6 +119,18 @@ def initGraphDb(dbinfo):
     db.commit()
     db.close()
 
+def _isDbPropVal(val):
+    # only ints (and bools) and strings may be stored as props
+    return isinstance(val, (int, str))
+
+def _dbPropVals(val):
+    '''
+    Return the (intval, strval) columns for a property value.
+    '''
+    if isinstance(val, int):
+        return int(val), None
+    return None, val
+
 # Rollback transactions on exception
 def rollsafe(f):
     def doroll(*args, **kwargs):
@@ -102,6 +165,9 @@ class DbGraphStore:
         if dbinfo is None:
             dbinfo = default_dbinfo
 
+        if psycopg2 is None:
+            raise Exception('DbGraphStore requires psycopg2 (see SqliteGraphStore)')
+
         self.dbinfo = dbinfo
         self.db = psycopg2.connect(**dbinfo)
         self.autocommit = True
@@ -174,11 +240,18 @@ class DbGraphStore:
     def _doCommit(self):
         self.db.commit()
 
+    def _newNodeId(self):
+        q = 'INSERT INTO vg_nodes DEFAULT VALUES RETURNING nid'
+        return self._doInsertRetId(q)
+
+    def _newEdgeId(self, fromid, toid):
+        q = 'INSERT INTO vg_edges (n1, n2) VALUES (%s, %s) RETURNING eid'
+        return self._doInsertRetId(q, fromid, toid)
+
     def addNode(self, nodeid=None, ninfo=None, **kwargs):
         if nodeid is not None:
             raise Exception('DbGraphStore Manages nodeid!')
-        q = 'INSERT INTO vg_nodes DEFAULT VALUES RETURNING nid'
-        nid = self._doInsertRetId(q)
+        nid = self._newNodeId()
 
         if ninfo is not None:
             kwargs.update(ninfo)
@@ -336,13 +409,60 @@ class DbGraphStore:
             raise Exception('Invalid from id (None)!')
         if toid is None:
             raise Exception('Invalid to id (None)!')
-        q = 'INSERT INTO vg_edges (n1, n2) VALUES (%s, %s) RETURNING eid'
-        eid = self._doInsertRetId(q, fromid, toid)
+        eid = self._newEdgeId(fromid, toid)
         if einfo is not None:
             for key,val in einfo.items():
                 self.setEdgeProp(eid, key, val)
         return eid
 
+    def addNodes(self, ninfos):
+        '''
+        Add a list of nodes (specified by their node property dicts) to
+        the graph database.  Returns the list of new node ids.
+
+        Example:
+            nids = g.addNodes([ {'name':'foo'}, {'name':'bar'} ])
+        '''
+        return [ self.addNode(ninfo=ninfo) for ninfo in ninfos ]
+
+    def addEdges(self, edges):
+        '''
+        Add a list of (fromid, toid, einfo) edges to the graph database.
+        Returns the list of new edge ids.
+        '''
+        return [ self.addEdge(n1, n2, einfo=einfo) for (n1, n2, einfo) in edges ]
+
+    def importGraph(self, graph, nidprop=None):
+        '''
+        Bulk insert the nodes and edges of an in-memory visgraph Graph
+        (such as the call graph from a vivisect workspace) and return a
+        dict of { graphnid: dbnid }.
+
+        If nidprop is specified, the node id from the source graph will
+        also be stored in that node property.
+
+        Example:
+            nidmap = g.importGraph(vw.getCallGraph(), nidprop='va')
+        '''
+        nodes = graph.getNodes()
+
+        ninfos = []
+        for nid, nprops in nodes:
+            ninfo = { k:v for (k,v) in nprops.items() if _isDbPropVal(v) }
+            if nidprop is not None:
+                ninfo[nidprop] = nid
+            ninfos.append(ninfo)
+
+        nidmap = dict(zip([ n[0] for n in nodes ], self.addNodes(ninfos)))
+
+        edges = []
+        for eid, n1, n2, eprops in graph.getEdges():
+            einfo = { k:v for (k,v) in eprops.items() if _isDbPropVal(v) }
+            edges.append((nidmap[n1], nidmap[n2], einfo))
+
+        self.addEdges(edges)
+        return nidmap
+
     def getRefsFrom(self, nodeid):
         '''
         Return a list of edges which originate with us.
@@ -533,22 +653,30 @@ class DbGraphStore:
 
     def searchNodes(self, propname, propval=None):
         '''
-        Return (but do not cache forward) the nid's of nodes which
+        Return (but do not cache forward) the (nid,) rows of nodes which
         have a property with the following name (and optionally, value).
 
         Example:
-            for nid in g.searchNodes('woot', 10)
+            for nid, in g.searchNodes('woot', 10)
                 print(g.getNodeProp(nid, 'name'))
 
         NOTE: This is specific to the DbGraphStore...
         '''
         if propval is None:
             q = 'SELECT nid FROM vg_node_props WHERE pname=%s'
-            c = self.db.cursor()
-            c.execute(q, (propname,))
-            for row in c:
-                yield row
-            c.close()
+            args = (propname,)
+        elif isinstance(propval, int):
+            q = 'SELECT nid FROM vg_node_props WHERE pname=%s AND intval=%s'
+            args = (propname, int(propval))
+        else:
+            q = 'SELECT nid FROM vg_node_props WHERE pname=%s AND strval=%s'
+            args = (propname, propval)
+
+        c = self.db.cursor()
+        c.execute(q, args)
+        for row in c:
+            yield row
+        c.close()
 
     def buildSubGraph(self):
         '''
@@ -575,14 +703,21 @@ class DbSubGraph(DbGraphStore, vg_graphcore.Graph):
     def addNode(self, nodeid=None, ninfo=None, **kwargs):
         # Do *both*
         nid = DbGraphStore.addNode(self, nodeid=nodeid, ninfo=ninfo, **kwargs)
-        vg_graphcore.Graph.addNode(self, nodeid=nid, ninfo=None, **kwargs)
+        vg_graphcore.Graph.addNode(self, nid=nid, nprops=ninfo, **kwargs)
         return nid
 
-    def addEdge(self, fromid, toid, einfo):
+    def addEdge(self, fromid, toid, einfo=None):
         eid = DbGraphStore.addEdge(self, fromid, toid, einfo=einfo)
-        vg_graphcore.Graph.addEdge(self, fromid, toid, eid=eid, einfo=None)
+        eprops = dict(einfo) if einfo else None
+        self._addGraphEdge(fromid, toid, eid, eprops=eprops)
         return eid
 
+    def _addGraphEdge(self, n1, n2, eid, eprops=None):
+        # add an edge to *only* the in-memory graph
+        node1 = vg_graphcore.Graph.getNode(self, n1)
+        node2 = vg_graphcore.Graph.getNode(self, n2)
+        return vg_graphcore.Graph.addEdge(self, node1, node2, eid=eid, eprops=eprops)
+
     def useEdges(self, **kwargs):
         '''
         Pull some edges from the DbStore backing this subgraph into the actual
@@ -601,10 +736,11 @@ class DbSubGraph(DbGraphStore, vg_graphcore.Graph):
         # FIXME add the nodes for these edges
         for eid, n1, n2 in done.values():
             if vg_graphcore.Graph.getNode(self, n1) is None:
-                vg_graphcore.Graph.addNode(self, nodeid=n1)
+                vg_graphcore.Graph.addNode(self, nid=n1)
             if vg_graphcore.Graph.getNode(self, n2) is None:
-                vg_graphcore.Graph.addNode(self, nodeid=n2)
-            vg_graphcore.Graph.addEdge(self, n1, n2, eid=eid)
+                vg_graphcore.Graph.addNode(self, nid=n2)
+            if vg_graphcore.Graph.getEdge(self, eid) is None:
+                self._addGraphEdge(n1, n2, eid)
 
     def expandNode(self, nid, maxdepth=1):
         '''
@@ -613,7 +749,7 @@ class DbSubGraph(DbGraphStore, vg_graphcore.Graph):
         '''
         todo = [(nid, 0),]
         if vg_graphcore.Graph.getNode(self, nid) is None:
-            vg_graphcore.Graph.addNode(self, nodeid=nid)
+            vg_graphcore.Graph.addNode(self, nid=nid)
 
         while len(todo):
             nid,depth = todo.pop()
@@ -625,9 +761,9 @@ class DbSubGraph(DbGraphStore, vg_graphcore.Graph):
             q = 'SELECT eid,n2 FROM vg_edges WHERE n1=%s'
             for eid, n2 in self._doSelect(q, nid):
                 if vg_graphcore.Graph.getNode(self, n2) is None:
-                    vg_graphcore.Graph.addNode(self, nodeid=n2)
+                    vg_graphcore.Graph.addNode(self, nid=n2)
                 if vg_graphcore.Graph.getEdge(self, eid) is None:
-                    vg_graphcore.Graph.addEdge(self, nid, n2, eid=eid)
+                    self._addGraphEdge(nid, n2, eid)
                 ndepth = depth+1
                 if ndepth < maxdepth:
                     todo.append((n2, ndepth))
@@ -635,3 +771,249 @@ class DbSubGraph(DbGraphStore, vg_graphcore.Graph):
     # pullNode?
     # expandNode?
 
+class SqliteGraphStore(DbGraphStore):
+    '''
+    A DbGraphStore backed by an embedded sqlite database (in WAL mode) which
+    requires neither psycopg2 nor a running postgres server.  The database
+    file is created (and initialized) if it does not exist.
+
+    Example:
+        g = SqliteGraphStore('/tmp/callgraphs.db')
+        nidmap = g.importGraph(vw.getCallGraph(), nidprop='va')
+    '''
+    def __init__(self, dbpath=':memory:', db=None):
+        self.dbinfo = dbpath
+        self.autocommit = True
+
+        if db is not None:
+            # share an existing connection ( see buildSubGraph )
+            self.db = db
+            return
+
+        # we manage our own transactions ( see autocommit )
+        self.db = sqlite3.connect(dbpath, isolation_level=None, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(init_sqlite_db)
+
+    def _execute(self, query, args):
+        if not self.autocommit and not self.db.in_transaction:
+            self.db.execute('BEGIN')
+        query = query.replace('%s', '?').replace('NOW()', 'CURRENT_TIMESTAMP')
+        return self.db.execute(query, args)
+
+    @rollsafe
+    def _doSelect(self, query, *args):
+        return self._execute(query, args).fetchall()
+
+    @rollsafe
+    def _doInsert(self, query, *args):
+        self._execute(query, args)
+
+    @rollsafe
+    def _doUpdate(self, query, *args):
+        return self._execute(query, args).fetchall()
+
+    @rollsafe
+    def _doInsertRetId(self, query, *args):
+        return self._execute(query, args).lastrowid
+
+    def _doCommit(self):
+        if self.db.in_transaction:
+            self.db.commit()
+
+    def _newNodeId(self):
+        return self._doInsertRetId('INSERT INTO vg_nodes DEFAULT VALUES')
+
+    def _newEdgeId(self, fromid, toid):
+        return self._doInsertRetId('INSERT INTO vg_edges (n1, n2) VALUES (%s, %s)', fromid, toid)
+
+    def _setProp(self, table, idname, pid, pname, value):
+        intval, strval = _dbPropVals(value)
+        q = 'INSERT OR REPLACE INTO %s (%s, pname, intval, strval) VALUES (?,?,?,?)' % (table, idname)
+        self._doInsert(q, pid, pname, intval, strval)
+
+    def setNodeProp(self, nid, pname, value):
+        self._setProp('vg_node_props', 'nid', nid, pname, value)
+
+    def setEdgeProp(self, eid, pname, value):
+        self._setProp('vg_edge_props', 'eid', eid, pname, value)
+
+    def _allocIds(self, table, idname, count):
+        # NOTE: must be called with a write transaction held
+        q = 'SELECT COALESCE(MAX(%s), 0) FROM %s' % (idname, table)
+        base = self.db.execute(q).fetchone()[0] + 1
+        return list(range(base, base + count))
+
+    def _bulkProps(self, table, idname, ids, infos):
+        rows = []
+        for pid, info in zip(ids, infos):
+            if not info:
+                continue
+            for pname, value in info.items():
+                intval, strval = _dbPropVals(value)
+                rows.append((pid, pname, intval, strval))
+
+        q = 'INSERT OR REPLACE INTO %s (%s, pname, intval, strval) VALUES (?,?,?,?)' % (table, idname)
+        self.db.executemany(q, rows)
+
+    @rollsafe
+    def addNodes(self, ninfos):
+        ninfos = list(ninfos)
+        outer = self.db.in_transaction
+        if not outer:
+            self.db.execute('BEGIN IMMEDIATE')
+
+        nids = self._allocIds('vg_nodes', 'nid', len(ninfos))
+        self.db.executemany('INSERT INTO vg_nodes (nid) VALUES (?)', [ (nid,) for nid in nids ])
+        self._bulkProps('vg_node_props', 'nid', nids, ninfos)
+
+        if not outer:
+            self.db.commit()
+        return nids
+
+    @rollsafe
+    def addEdges(self, edges):
+        edges = list(edges)
+        outer = self.db.in_transaction
+        if not outer:
+            self.db.execute('BEGIN IMMEDIATE')
+
+        eids = self._allocIds('vg_edges', 'eid', len(edges))
+        rows = [ (eid, n1, n2) for eid, (n1, n2, einfo) in zip(eids, edges) ]
+        self.db.executemany('INSERT INTO vg_edges (eid, n1, n2) VALUES (?,?,?)', rows)
+        self._bulkProps('vg_edge_props', 'eid', eids, [ e[2] for e in edges ])
+
+        if not outer:
+            self.db.commit()
+        return eids
+
+    def delNode(self, nid):
+        '''
+        Delete the given node (and his edges) from the graph dbase.
+
+        NOTE: this will delete any edges which go to or from nid!
+        '''
+        q = '''
+        DELETE FROM
+            vg_edge_props
+        WHERE
+            eid IN (SELECT eid FROM vg_edges WHERE n1 = %s OR n2 = %s)
+        '''
+        self._doInsert(q, nid, nid)
+        self._doInsert('DELETE FROM vg_edges WHERE n1 = %s OR n2 = %s', nid, nid)
+        self._doInsert('DELETE FROM vg_node_props WHERE nid = %s', nid)
+        self._doInsert('DELETE FROM vg_nodes WHERE nid = %s', nid)
+
+    def _chunkSelect(self, query, ids):
+        '''
+        Run the query ( which must contain a single "IN (%s)" ) in chunks
+        of ids and return all the resulting rows.
+        '''
+        ids = list(ids)
+        ret = []
+        for i in range(0, len(ids), sqlite_maxvars):
+            chunk = ids[i:i + sqlite_maxvars]
+            q = query % ','.join(['?'] * len(chunk))
+            ret.extend(self._doSelect(q, *chunk))
+        return ret
+
+    def getNodesProps(self, nids):
+        ret = collections.defaultdict(dict)
+        q = 'SELECT nid,pname,intval,strval FROM vg_node_props WHERE nid IN (%s)'
+        for nid,pname,intval,strval in self._chunkSelect(q, nids):
+            if intval is not None:
+                ret[nid][pname] = intval
+            else:
+                ret[nid][pname] = strval
+        return ret.items()
+
+    def _getRefs(self, col, nids):
+        q = '''
+        SELECT
+            vg_edges.eid, vg_edges.n1, vg_edges.n2,
+            vg_edge_props.pname, vg_edge_props.intval, vg_edge_props.strval
+        FROM
+            vg_edges
+        LEFT JOIN
+            vg_edge_props
+        ON
+            vg_edges.eid = vg_edge_props.eid
+        WHERE
+            vg_edges.%s IN (%%s)
+        ''' % col
+
+        refs = {}
+        for eid, n1, n2, pname, intval, strval in self._chunkSelect(q, nids):
+            r = refs.get(eid)
+            if r is None:
+                r = (eid, n1, n2, {})
+                refs[eid] = r
+
+            if pname is None:
+                continue
+
+            if intval is not None:
+                r[3][pname] = intval
+            else:
+                r[3][pname] = strval
+
+        return list(refs.values())
+
+    def getRefsFrom(self, nodeid):
+        '''
+        Return a list of edges which originate with us.
+
+        Example: for eid, fromid, toid, einfo in g.getRefsFrom(id)
+        '''
+        return self._getRefs('n1', (nodeid,))
+
+    def getRefsTo(self, nodeid):
+        '''
+        Return a list of edges which we reference.
+
+        Example: for eid, fromid, toid, einfo in g.getRefsTo(id)
+        '''
+        return self._getRefs('n2', (nodeid,))
+
+    def getRefsFromBulk(self, nids):
+        '''
+        Return a list of edges which originate with any of the given nids.
+
+        Example: for eid, fromid, toid, einfo in g.getRefsFromBulk(nids)
+        '''
+        return self._getRefs('n1', nids)
+
+    def getRefsToBulk(self, nids):
+        '''
+        Return a list of edges which terminate at any of the given nids.
+
+        Example: for eid, fromid, toid, einfo in g.getRefsToBulk(nids)
+        '''
+        return self._getRefs('n2', nids)
+
+    def searchNodes(self, propname, propval=None):
+        if propval is None:
+            rows = self._doSelect('SELECT nid FROM vg_node_props WHERE pname=%s', propname)
+        elif isinstance(propval, int):
+            rows = self._doSelect('SELECT nid FROM vg_node_props WHERE pname=%s AND intval=%s', propname, int(propval))
+        else:
+            rows = self._doSelect('SELECT nid FROM vg_node_props WHERE pname=%s AND strval=%s', propname, propval)
+
+        for row in rows:
+            yield row
+
+    def buildSubGraph(self):
+        '''
+        Return a subgraph which may be used to populate from the DB and
+        do path searching.
+        '''
+        return SqliteSubGraph(self.dbinfo, db=self.db)
+
+class SqliteSubGraph(SqliteGraphStore, DbSubGraph):
+    '''
+    A DbSubGraph backed by a SqliteGraphStore.
+    '''
+    def __init__(self, dbpath=':memory:', db=None):
+        vg_graphcore.Graph.__init__(self)
+        SqliteGraphStore.__init__(self, dbpath, db=db)
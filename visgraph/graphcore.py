@@ -28,6 +28,120 @@ def pdict():
     return collections.defaultdict(ldict)
 
 
+# A placeholder node id used to join multiple entry (or exit) nodes
+# when calculating dominators.
+_virtnid = object()
+
+
+def _getDominators(roots, succs, preds):
+    '''
+    Calculate the immediate dominators for the nodes reachable from
+    the list of root nids using the Lengauer-Tarjan algorithm ( with
+    path compression ).  succs and preds are callables which return
+    the successor/predecessor nids for a given nid.
+
+    Returns a dict of { nid: idomnid } (root nodes have idom None).
+    '''
+    if len(roots) != 1:
+        rootset = set(roots)
+        _succs = succs
+        _preds = preds
+
+        def succs(nid):
+            if nid is _virtnid:
+                return roots
+            return _succs(nid)
+
+        def preds(nid):
+            ret = _preds(nid)
+            if nid in rootset:
+                ret = list(ret)
+                ret.append(_virtnid)
+            return ret
+
+        root = _virtnid
+    else:
+        root = roots[0]
+
+    # Number the nodes in depth first order and build the spanning tree
+    dfnum = {}
+    vertex = []
+    parent = {}
+    todo = [(root, None)]
+    while todo:
+        nid, pnid = todo.pop()
+        if nid in dfnum:
+            continue
+
+        dfnum[nid] = len(vertex)
+        vertex.append(nid)
+        parent[nid] = pnid
+
+        for snid in succs(nid):
+            if snid not in dfnum:
+                todo.append((snid, nid))
+
+    semi = dict(dfnum)
+    label = {nid: nid for nid in vertex}
+    ancestor = {}
+    idom = {}
+    bucket = collections.defaultdict(list)
+
+    def _compress(nid):
+        stack = []
+        while ancestor.get(ancestor[nid]) is not None:
+            stack.append(nid)
+            nid = ancestor[nid]
+
+        while stack:
+            nid = stack.pop()
+            anid = ancestor[nid]
+            if semi[label[anid]] < semi[label[nid]]:
+                label[nid] = label[anid]
+            ancestor[nid] = ancestor[anid]
+
+    def _eval(nid):
+        if ancestor.get(nid) is None:
+            return nid
+        _compress(nid)
+        return label[nid]
+
+    for nid in reversed(vertex[1:]):
+
+        for pnid in preds(nid):
+            if pnid not in dfnum:
+                continue # unreachable from the root(s)
+
+            u = _eval(pnid)
+            if semi[u] < semi[nid]:
+                semi[nid] = semi[u]
+
+        bucket[vertex[semi[nid]]].append(nid)
+
+        pnid = parent[nid]
+        ancestor[nid] = pnid
+
+        for v in bucket.pop(pnid, ()):
+            u = _eval(v)
+            if semi[u] < semi[v]:
+                idom[v] = u
+            else:
+                idom[v] = pnid
+
+    for nid in vertex[1:]:
+        if idom[nid] != vertex[semi[nid]]:
+            idom[nid] = idom[idom[nid]]
+
+    idom[root] = None
+    if root is _virtnid:
+        idom.pop(_virtnid)
+        for nid, dnid in idom.items():
+            if dnid is _virtnid:
+                idom[nid] = None
+
+    return idom
+
+
 class Graph:
 
     '''
@@ -116,7 +230,42 @@ class Graph:
             node1 = graph.getNode(n1)
             node2 = graph.getNode(n2)
             self.addEdge(node1, node2, eid=eid, eprops=eprops)
-        
+
+    def copyGraph(self):
+        '''
+        Return a new graph (of the same class) containing copies of our
+        nodes, edges and metadata.  The node/edge property dictionaries
+        are duplicated (so props may be set without effecting the
+        original) but the property *values* are shared.
+
+        NOTE: the subclass constructor (which may take arguments or build
+              the graph) is not called.  Instead, the attributes a subclass
+              set up are copied (with dicts, lists and sets duplicated).
+              Subclasses whose attributes reference nodes or edges must
+              extend copyGraph() to point them at the copies.
+
+        Example:
+            g2 = g.copyGraph()
+            g2.setNodeProp(node, 'position', (0, 0))
+        '''
+        g = self.__class__.__new__(self.__class__)
+        Graph.__init__(g)
+        g.metadata.update(self.metadata)
+
+        for name, value in self.__dict__.items():
+            if name in g.__dict__:
+                continue
+            if isinstance(value, (dict, list, set)):
+                value = value.copy()
+            g.__dict__[name] = value
+
+        for nid, nprops in self.nodes.values():
+            g.addNode(nid=nid, nprops=nprops)
+
+        for eid, n1, n2, eprops in self.edges.values():
+            g.addEdgeByNids(n1, n2, eid=eid, eprops=dict(eprops))
+
+        return g
 
     def wipeGraph(self):
         '''
@@ -632,6 +781,224 @@ class Graph:
         pathSearchFromTo for docs on edgecb...
         '''
 
+    def _getEntryNids(self):
+        '''
+        Return the list of nids considered "entry" nodes for dominator
+        calculations ( nodes without incoming edges by default ).
+        '''
+        return [nid for nid in self.nodes if not self.edge_by_to.get(nid)]
+
+    def _getSuccNids(self, nid):
+        return [e[2] for e in self.edge_by_from.get(nid, ())]
+
+    def _getPredNids(self, nid):
+        return [e[1] for e in self.edge_by_to.get(nid, ())]
+
+    def getDominators(self, root=None):
+        '''
+        Calculate the dominator tree for the graph (in roughly linear time)
+        and return a dict of { nid: idom } where idom is the nid of the
+        immediate dominator (or None for the root).  If root is not
+        specified, all entry nodes are considered roots.
+
+        Nodes which are not reachable from the root are not present.
+
+        Example:
+            idoms = g.getDominators('a')
+            if idoms.get(nid) == 'a':
+                print('a immediately dominates %r' % (nid,))
+        '''
+        roots = [root]
+        if root is None:
+            roots = self._getEntryNids()
+
+        if not roots:
+            return {}
+
+        return _getDominators(roots, self._getSuccNids, self._getPredNids)
+
+    def getPostDominators(self):
+        '''
+        Calculate the post-dominator tree for the graph, using every
+        leaf node as an exit.  Returns a dict of { nid: ipdom } in the
+        same format as getDominators() ( leaves have ipdom None ).
+
+        NOTE: nodes which may not reach a leaf (infinite loops) are
+              not present.
+        '''
+        leaves = [nid for nid in self.nodes if not self.edge_by_from.get(nid)]
+        if not leaves:
+            return {}
+
+        return _getDominators(leaves, self._getPredNids, self._getSuccNids)
+
+    def getDominatedNids(self, nid, idoms):
+        '''
+        Return the set of nids dominated by the given nid (including
+        itself) using a dominator dict from getDominators() or
+        getPostDominators().
+        '''
+        kids = ldict()
+        for knid, dnid in idoms.items():
+            if dnid is not None:
+                kids[dnid].append(knid)
+
+        ret = set()
+        todo = [nid]
+        while todo:
+            dnid = todo.pop()
+            ret.add(dnid)
+            todo.extend(kids.get(dnid, ()))
+        return ret
+
+    def getStronglyConnected(self):
+        '''
+        Return a list of the strongly connected components of the graph
+        (each a list of nids) using Tarjan's algorithm.  Components are
+        returned in reverse topological order.
+
+        Example:
+            for scc in g.getStronglyConnected():
+                if len(scc) > 1:
+                    print('loop: %r' % (scc,))
+        '''
+        index = {}
+        lowlink = {}
+        onstack = set()
+        stack = []
+        ret = []
+
+        for start in self.nodes:
+            if start in index:
+                continue
+
+            index[start] = lowlink[start] = len(index)
+            stack.append(start)
+            onstack.add(start)
+            work = [(start, iter(self._getSuccNids(start)))]
+
+            while work:
+                nid, kids = work[-1]
+
+                for knid in kids:
+                    if knid not in index:
+                        index[knid] = lowlink[knid] = len(index)
+                        stack.append(knid)
+                        onstack.add(knid)
+                        work.append((knid, iter(self._getSuccNids(knid))))
+                        break
+
+                    if knid in onstack and index[knid] < lowlink[nid]:
+                        lowlink[nid] = index[knid]
+
+                else:
+                    work.pop()
+                    if work:
+                        pnid = work[-1][0]
+                        if lowlink[nid] < lowlink[pnid]:
+                            lowlink[pnid] = lowlink[nid]
+
+                    if lowlink[nid] == index[nid]:
+                        scc = []
+                        while True:
+                            snid = stack.pop()
+                            onstack.discard(snid)
+                            scc.append(snid)
+                            if snid == nid:
+                                break
+                        ret.append(scc)
+
+        return ret
+
+    def getLoopNids(self):
+        '''
+        Return the set of nids which participate in a cycle.  A node which
+        is not in this set may never appear more than once in a path.
+        '''
+        ret = set()
+        for scc in self.getStronglyConnected():
+            if len(scc) > 1:
+                ret.update(scc)
+                continue
+
+            nid = scc[0]
+            if nid in self._getSuccNids(nid):
+                ret.add(nid)
+
+        return ret
+
+    def getReachingNids(self, nids):
+        '''
+        Return the set of nids from which any of the given nids may be
+        reached (including the given nids).
+        '''
+        ret = set(nids)
+        todo = list(ret)
+        while todo:
+            nid = todo.pop()
+            for pnid in self._getPredNids(nid):
+                if pnid not in ret:
+                    ret.add(pnid)
+                    todo.append(pnid)
+        return ret
+
+    def getNaturalLoops(self, root=None, idoms=None):
+        '''
+        Find the natural loops in the graph.  A natural loop is defined by
+        a "back edge" to a header node which dominates the edge source.
+        Returns a dict of { headernid: set(bodynids) } ( loops which share
+        a header are merged ).
+        '''
+        if idoms is None:
+            idoms = self.getDominators(root=root)
+
+        def dominates(dnid, nid):
+            while nid is not None:
+                if nid == dnid:
+                    return True
+                nid = idoms.get(nid)
+            return False
+
+        loops = {}
+        for eid, n1, n2, eprops in self.edges.values():
+            if n1 not in idoms or not dominates(n2, n1):
+                continue
+
+            body = loops.get(n2)
+            if body is None:
+                body = set([n2])
+                loops[n2] = body
+
+            todo = [n1]
+            while todo:
+                nid = todo.pop()
+                if nid in body:
+                    continue
+                body.add(nid)
+                todo.extend(self._getPredNids(nid))
+
+        return loops
+
+    def getLoopNesting(self, root=None, loops=None):
+        '''
+        Return a dict of { headernid: parentheadernid } describing how the
+        natural loops (see getNaturalLoops()) nest.  Outermost loops have
+        a parent of None.
+        '''
+        if loops is None:
+            loops = self.getNaturalLoops(root=root)
+
+        ret = {}
+        for hnid, body in loops.items():
+            parent = None
+            for phnid, pbody in loops.items():
+                if phnid == hnid or hnid not in pbody:
+                    continue
+                if parent is None or len(pbody) < len(loops[parent]):
+                    parent = phnid
+            ret[hnid] = parent
+        return ret
+
 class HierGraph(Graph):
     '''
     An extension to the directed Graph class which facilitates the
@@ -662,6 +1029,10 @@ class HierGraph(Graph):
         '''
         return self.getNodesByProp('rootnode')
 
+    def _getEntryNids(self):
+        # root nodes may have incoming (loop) edges...
+        return [node[0] for node in self.getHierRootNodes()]
+
     def getHierNodeWeights(self):
         '''
         Calculate the node weights for the given nodes in the hierarchical
@@ -760,6 +1131,10 @@ class HierGraph(Graph):
                     checkstuff(node,edge)
         '''
         cnt = 0
+        # only nodes which are part of a cycle may repeat in a path, so
+        # those are the only ones we need to track...
+        loopnids = self.getLoopNids()
+
         todo = [(node,[],[node[0],])] # [ node, path, nids ]
 
         while todo:
@@ -790,18 +1165,20 @@ class HierGraph(Graph):
                 newpath.append((pnode,edge))
 
                 etoid = edge[2]
-                if nids.count(etoid) > loopcnt:
+                newnids = nids
+                if etoid in loopnids:
+                    if nids.count(etoid) > loopcnt:
 
-                    yield newpath
+                        yield newpath
 
-                    cnt += 1
-                    if maxpath is not None and cnt >= maxpath:
-                        return
+                        cnt += 1
+                        if maxpath is not None and cnt >= maxpath:
+                            return
 
-                    continue
+                        continue
 
-                newnids = list(nids)
-                newnids.append(etoid)
+                    newnids = list(nids)
+                    newnids.append(etoid)
 
                 nnode = self.getNode(etoid)
                 todo.append((nnode,newpath,newnids))
@@ -827,6 +1204,7 @@ class HierGraph(Graph):
         (See getHierPathsFrom for details )
         '''
         cnt = 0
+        loopnids = self.getLoopNids()
         todo = [(node,[(node,None)],[node[0],])] # [ node, path, nids ]
 
         while todo:
@@ -858,10 +1236,12 @@ class HierGraph(Graph):
                 newpath = list(path)
                 newpath.append((nnode,edge))
 
-                if etoid in nids:
-                    continue
+                newnids = nids
+                if etoid in loopnids:
+                    if etoid in nids:
+                        continue
 
-                newnids = list(nids)
-                newnids.append(etoid)
+                    newnids = list(nids)
+                    newnids.append(etoid)
 
                 todo.append((nnode,newpath,newnids))
@@ -2,6 +2,9 @@
 A dynadag-ish graph layout calculator...
 '''
 
+import time
+import bisect
+
 import visgraph.layouts as vg_layout
 import visgraph.drawing.bezier as vg_bezier
 
@@ -13,15 +16,50 @@ def revenumerate(l):
 SCOOCH_LEFT     = 0
 SCOOCH_RIGHT    = 1
 
+def countCrossings(pairs, size):
+    '''
+    Count the edge crossings between two adjacent layers in O(E log V)
+    using the Barth-Junger-Mutzel accumulator (fenwick) tree.
+
+    pairs is a list of (upperpos, lowerpos) for each edge between the
+    layers and size is the number of nodes in the lower layer.
+
+    Example:
+        # edges 0->1 and 1->0 cross once
+        countCrossings([(0, 1), (1, 0)], 2)
+    '''
+    tree = [0] * (size + 1)
+    cross = 0
+    for count, (upos, lpos) in enumerate(sorted(pairs)):
+        # every edge already added with a greater lower position crosses us
+        i = lpos + 1
+        while i > 0:
+            count -= tree[i]
+            i -= i & -i
+        cross += count
+
+        i = lpos + 1
+        while i <= size:
+            tree[i] += 1
+            i += i & -i
+
+    return cross
+
+def _pairCross(upos, vpos):
+    # crossings between the edges of u and v if u is left of v
+    # (both lists of neighbor positions must be sorted)
+    return sum(bisect.bisect_left(vpos, p) for p in upos)
+
 class DynadagLayout(vg_layout.GraphLayout):
 
-    def __init__(self, graph, barry=10):
+    def __init__(self, graph, barry=10, budget=2.0):
 
         vg_layout.GraphLayout.__init__(self, graph)
 
         self._addGhostNodes()
 
-        self._barry_count = barry
+        self._barry_count = barry       # ordering sweeps without improvement
+        self._order_budget = budget     # seconds allowed for ordering
         self.width_pad = 20
         self.height_pad = 40
 
@@ -46,123 +84,161 @@ class DynadagLayout(vg_layout.GraphLayout):
 
         return width, height
 
-    def _baryCenter(self, nid, ninfo):
-        tot = 0
-        cnt = 0
-        for eid, n1, n2, einfo in self.graph.getRefsFromByNid(nid):
-            node2 = self.graph.getNode(n2)
-            tot += node2[1].get('layerpos')
-            cnt += 1
-
-        for eid, n1, n2, einfo in self.graph.getRefsToByNid(nid):
-            node1 = self.graph.getNode(n1)
-            tot += node1[1].get('layerpos')
-            cnt += 1
-        barry = 0
-        if cnt:
-            barry = tot / float(cnt)
-        ninfo['barycenter'] = barry
-
-    # Try out "barycenter" averaging and re-ordering.
-    def _orderNodesByBary(self):
-        # Go through the layers and do barycenter calcs first.
-        # FIXME how do we tell when we're done?
-        for i in range(self._barry_count):
-            for layer in self.layers:
-                for nid, ninfo in layer:
-                    self._baryCenter(nid, ninfo)
-
-            for layer in self.layers:
-                layer.sort(key=lambda k: k[1].get('barycenter'))
-                for i, (nid, ninfo) in enumerate(layer):
-                    ninfo['layerpos'] = i
-
-    def _getNodeRelPos(self, nid, ninfo):
+    def _getLayerEdges(self):
+        '''
+        Build the per-layer adjacency used by the crossing minimization.
 
-        weight = ninfo['weight']
+        Returns (ups, downs, ledges) where ups/downs map each nid to its
+        neighbors in the layer above/below and ledges[i] is the list of
+        (upper nid, lower nid) edges between layer i and layer i+1.
+        '''
+        ups = {}
+        downs = {}
+        for layer in self.layers:
+            for nid, ninfo in layer:
+                ups[nid] = []
+                downs[nid] = []
 
-        abovepos = []
-        for eid, n1, n2, einfo in self.graph.getRefsToByNid(nid):
-            fprops = self.graph.getNodeProps(n1)
-            if fprops['weight'] != weight-1:
+        ledges = [[] for i in range(len(self.layers))]
+        for eid, n1, n2, einfo in self.graph.getEdges():
+            if n1 not in ups or n2 not in ups:
                 continue
-            abovepos.append(fprops['layerpos'])
-        abovepos.sort()
 
-        belowpos = []
-        for eid, n1, n2, einfo in self.graph.getRefsFromByNid(nid):
-            tprops = self.graph.getNodeProps(n2)
-            if tprops['weight'] != weight+1:
+            w1 = self.graph.getNodeProps(n1).get('weight', 0)
+            w2 = self.graph.getNodeProps(n2).get('weight', 0)
+            if w1 == w2 - 1:
+                upper, lower = n1, n2
+            elif w2 == w1 - 1:
+                upper, lower = n2, n1
+            else:
                 continue
-            belowpos.append(tprops['layerpos'])
-        belowpos.sort()
-
-        return abovepos, belowpos
 
-    def _getLayerCross(self, layernum):
-        ccount = 0
+            downs[upper].append(lower)
+            ups[lower].append(upper)
+            ledges[min(w1, w2)].append((upper, lower))
 
-        layer = self.layers[layernum]
-        for i in range(1, len(layer)):
+        return ups, downs, ledges
 
-            myabove, mybelow = self._getNodeRelPos(*layer[i])
-            hisabove, hisbelow = self._getNodeRelPos(*layer[i-1])
-
-            # If I have any nodes above with position lower
-            # than any of his, those are cross overs...
-            for mya in myabove:
-                for hisa in hisabove:
-                    if mya < hisa:
-                        ccount += 1
+    def _getCrossCount(self, ledges, poss):
+        '''
+        Return the total number of edge crossings for the current layer
+        ordering (poss maps nid to its position within its layer).
+        '''
+        cross = 0
+        for i, edges in enumerate(ledges):
+            if len(edges) < 2:
+                continue
+            pairs = [(poss[n1], poss[n2]) for n1, n2 in edges]
+            cross += countCrossings(pairs, len(self.layers[i + 1]))
+        return cross
 
-            # If I have any nodes below with position lower
-            # than any of his, those acre cross overs...
-            for myb in mybelow:
-                for hisb in hisbelow:
-                    if myb < hisb:
-                        ccount += 1
+    def _medianSortLayer(self, layer, nbrs, poss):
+        '''
+        Re-order a layer by the median (with barycenter as a tie breaker)
+        of each node's neighbor positions in the adjacent fixed layer.
+        Nodes with no neighbors there keep their current position.
+        '''
+        keys = {}
+        for nid, ninfo in layer:
+            npos = sorted(poss[n] for n in nbrs[nid])
+            if not npos:
+                keys[nid] = (poss[nid], poss[nid], poss[nid])
+                continue
 
-        return ccount
+            mid = len(npos) // 2
+            if len(npos) % 2:
+                median = npos[mid]
+            else:
+                median = (npos[mid - 1] + npos[mid]) / 2.0
 
-    def _bubSortNodes(self):
+            keys[nid] = (median, sum(npos) / float(len(npos)), poss[nid])
 
-        # Go through nodes and see if we can re-order children to
-        # reduce crossovers...
+        layer.sort(key=lambda n: keys[n[0]])
+        for i, (nid, ninfo) in enumerate(layer):
+            poss[nid] = i
 
-        for i in range(len(self.layers)):
+    def _transposeLayer(self, layer, ups, downs, poss):
+        '''
+        Swap adjacent nodes in the layer while doing so removes crossings
+        with the layers above and below.  Returns True if anything moved.
+        '''
+        moved = False
+        for j in range(len(layer) - 1):
+            unid = layer[j][0]
+            vnid = layer[j + 1][0]
+
+            ucross = 0
+            vcross = 0
+            for nbrs in (ups, downs):
+                upos = sorted(poss[n] for n in nbrs[unid])
+                vpos = sorted(poss[n] for n in nbrs[vnid])
+                ucross += _pairCross(upos, vpos)
+                vcross += _pairCross(vpos, upos)
+
+            if vcross < ucross:
+                layer[j], layer[j + 1] = layer[j + 1], layer[j]
+                poss[unid] = j + 1
+                poss[vnid] = j
+                moved = True
+
+        return moved
+
+    def _orderLayers(self):
+        '''
+        Minimize edge crossings by sweeping down and up the layers with
+        the median heuristic (keeping the best ordering seen) followed
+        by adjacent transposition.  Stops after _barry_count sweeps
+        without improvement or once _order_budget seconds have passed.
+        '''
+        ups, downs, ledges = self._getLayerEdges()
+        poss = {}
+        for layer in self.layers:
+            for i, (nid, ninfo) in enumerate(layer):
+                poss[nid] = i
 
-            layer = self.layers[i]
+        maxtime = time.time() + self._order_budget
 
-            reduced = True
-            while reduced:
+        best = self._getCrossCount(ledges, poss)
+        bestlayers = [list(layer) for layer in self.layers]
 
-                reduced = False
+        stale = 0
+        sweep = 0
+        while best and stale < self._barry_count and time.time() < maxtime:
 
-                # Get the current crossover count for this layer
-                score = self._getLayerCross(i)
+            if sweep % 2 == 0:
+                for layer in self.layers[1:]:
+                    self._medianSortLayer(layer, ups, poss)
+            else:
+                for layer in self.layers[-2::-1]:
+                    self._medianSortLayer(layer, downs, poss)
+            sweep += 1
+
+            cross = self._getCrossCount(ledges, poss)
+            if cross < best:
+                best = cross
+                bestlayers = [list(layer) for layer in self.layers]
+                stale = 0
+            else:
+                stale += 1
 
-                # TODO should we do this multipliciative rather than
-                # neighbors only?
-                for j in range(len(layer)-1):
+        self.layers[:] = bestlayers
+        for layer in self.layers:
+            for i, (nid, ninfo) in enumerate(layer):
+                poss[nid] = i
 
-                    n1 = layer[j]
-                    n2 = layer[j+1]
+        moved = best > 0
+        while moved and time.time() < maxtime:
+            moved = False
+            for layer in self.layers:
+                if self._transposeLayer(layer, ups, downs, poss):
+                    moved = True
 
-                    layer[j] = n2
-                    layer[j+1] = n1
+        for layer in self.layers:
+            for i, node in enumerate(layer):
+                self.graph.setNodeProp(node, 'layerpos', i)
 
-                    newscore = self._getLayerCross(i)
-                    # If this was optimal, keep it and continue
-                    if newscore < score:
-                        reduced = True
-                        n1[1]['layerpos'] = j+1
-                        n2[1]['layerpos'] = j
-                        break
+        return self._getCrossCount(ledges, poss)
 
-                    # Nope, put it back...
-                    layer[j] = n1
-                    layer[j+1] = n2
-                    
     def _addGhostNodes(self):
         '''
         Translate the hierarchical graph we are given into dynadag
@@ -256,9 +332,8 @@ class DynadagLayout(vg_layout.GraphLayout):
         for rootnode in self.graph.getHierRootNodes():
             doit(rootnode)
 
-        # Now lets use positional averaging to order nodes in the layer
-        self._orderNodesByBary()
-        self._bubSortNodes()
+        # Now lets use median ordering to reduce edge crossings
+        self._orderLayers()
 
         self.maxwidth = 0
 
@@ -1,11 +1,20 @@
+import sys
 import math
+import time
 import random
 import logging
+import argparse
 import itertools
+import collections
 import traceback
 
 import visgraph.layouts as vg_layouts
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 logger = logging.getLogger(__name__)
 
 # coulomb's constant approximation
@@ -83,7 +92,7 @@ class ForceLayout(vg_layouts.GraphLayout):
                 rpos = ( self._f_randint( 1, randmax ), self._f_randint( 1, randmax ) )
 
             rands[rpos] = True
-            nprops['position'] = rpos
+            graph.setNodeProp((nid, nprops), 'position', rpos)
 
 
     def layoutGraph(self):
@@ -116,7 +125,7 @@ class ForceLayout(vg_layouts.GraphLayout):
                 logger.error(traceback.format_exc())
 
         # Now, in order from largest to smallest, shift them back toward 0,0
-        cgraphs.sort( cmp=lambda x,y: cmp(y.getNodeCount(), x.getNodeCount()) )
+        cgraphs.sort(key=lambda g: g.getNodeCount(), reverse=True)
 
         offset = 0
         for graph in cgraphs:
@@ -143,7 +152,7 @@ class ForceLayout(vg_layouts.GraphLayout):
         nodes = graph.getNodes()
         for nid,nprops in nodes:
 
-            w,h = nprops.get('size')
+            w,h = nprops.get('size', (0, 0))
             x,y = nprops.get('position')
 
             xmin = min( xmin, x - ( w / 2 ) )
@@ -182,7 +191,7 @@ class ForceLayout(vg_layouts.GraphLayout):
                 logger.error(traceback.format_exc())
 
         # Now, in order from largest to smallest, shift them back toward 0,0
-        cgraphs.sort( cmp=lambda x,y: cmp(y.getNodeCount(), x.getNodeCount()) )
+        cgraphs.sort(key=lambda g: g.getNodeCount(), reverse=True)
 
         offset = 0
         for graph in cgraphs:
@@ -271,3 +280,490 @@ class ForceLayout(vg_layouts.GraphLayout):
         force = distance * self._f_springrate
         return force,angle
 
+
+
+def _buildQuadTree(xs, ys, idxs, maxdepth=24):
+    '''
+    Build a Barnes-Hut quadtree over the bodies in idxs.  The tree is
+    returned as flat lists of (cmx, cmy, mass, width, kids) where kids[c]
+    is None for a leaf cell or a list of 4 child cell indexes (-1 if empty).
+    Cell 0 is the root.
+    '''
+    cmx = []
+    cmy = []
+    mass = []
+    width = []
+    kids = []
+
+    x0 = min(xs[i] for i in idxs)
+    y0 = min(ys[i] for i in idxs)
+    size = max(max(xs[i] for i in idxs) - x0, max(ys[i] for i in idxs) - y0)
+    if size <= 0:
+        size = 1.0
+
+    todo = [(idxs, x0, y0, size, 0, -1, 0)]
+    while todo:
+        bods, bx, by, bsize, depth, parent, quad = todo.pop()
+
+        cid = len(mass)
+        if parent >= 0:
+            kids[parent][quad] = cid
+
+        n = len(bods)
+        cmx.append(sum(xs[i] for i in bods) / n)
+        cmy.append(sum(ys[i] for i in bods) / n)
+        mass.append(n)
+        width.append(bsize)
+
+        if n == 1 or depth >= maxdepth:
+            kids.append(None)
+            continue
+
+        kids.append([-1, -1, -1, -1])
+
+        half = bsize / 2.0
+        midx = bx + half
+        midy = by + half
+        quads = ([], [], [], [])
+        for i in bods:
+            quads[(xs[i] >= midx) | ((ys[i] >= midy) << 1)].append(i)
+
+        for q, qbods in enumerate(quads):
+            if qbods:
+                todo.append((qbods, bx + half * (q & 1), by + half * (q >> 1), half, depth + 1, cid, q))
+
+    return cmx, cmy, mass, width, kids
+
+
+def _buildQuadTreeNumpy(px, py, maxdepth=16):
+    '''
+    Build the same quadtree as _buildQuadTree() one level at a time using
+    numpy.  Bodies are quantized onto a 2**maxdepth grid and bucketed by
+    their cell key at each depth.  Returns arrays (cmx, cmy, mass, width,
+    kids) where kids is an (ncells, 4) array of child cells (-1 if empty).
+    '''
+    count = len(px)
+    x0 = px.min()
+    y0 = py.min()
+    size = max(px.max() - x0, py.max() - y0)
+    if size <= 0:
+        size = 1.0
+
+    grid = (1 << maxdepth) - 1
+    qx = ((px - x0) * (grid / size)).astype(numpy.int64)
+    qy = ((py - y0) * (grid / size)).astype(numpy.int64)
+
+    cmx = [numpy.array([px.mean()])]
+    cmy = [numpy.array([py.mean()])]
+    mass = [numpy.array([count], dtype=numpy.float64)]
+    width = [numpy.array([float(size)])]
+    kidrows = [numpy.full((1, 4), -1, dtype=numpy.int64)]
+
+    ncells = 1
+    active = numpy.arange(count)
+    bodycell = numpy.zeros(count, dtype=numpy.int64)
+    if count == 1:
+        active = active[:0]
+
+    for depth in range(1, maxdepth + 1):
+        if not len(active):
+            break
+
+        shift = maxdepth - depth
+        ax = qx[active] >> shift
+        ay = qy[active] >> shift
+        keys = (ax << depth) | ay
+
+        ukeys, first, inv, counts = numpy.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+        inv = inv.ravel()
+        cells = ncells + numpy.arange(len(ukeys))
+
+        cmx.append(numpy.bincount(inv, weights=px[active]) / counts)
+        cmy.append(numpy.bincount(inv, weights=py[active]) / counts)
+        mass.append(counts.astype(numpy.float64))
+        width.append(numpy.full(len(ukeys), size / float(1 << depth)))
+
+        # link each new cell into its parent's quadrant slot
+        parents = bodycell[active[first]]
+        quads = (ax[first] & 1) | ((ay[first] & 1) << 1)
+        kidrows.append(numpy.full((len(ukeys), 4), -1, dtype=numpy.int64))
+        kids = numpy.concatenate(kidrows)
+        kids[parents, quads] = cells
+        kidrows = [kids]
+
+        bodycell[active] = cells[inv]
+        ncells += len(ukeys)
+
+        # bodies alone in their cell are done (and so are leaves at maxdepth)
+        active = active[counts[inv] > 1]
+
+    kids = numpy.concatenate(kidrows)
+    return (numpy.concatenate(cmx), numpy.concatenate(cmy),
+            numpy.concatenate(mass), numpy.concatenate(width), kids)
+
+
+class BarnesHutLayout(ForceLayout):
+    '''
+    A ForceLayout which approximates the coulomb repulsion between nodes
+    using a Barnes-Hut quadtree, making each tick O(n log n) rather than
+    O(n^2).  Node positions and velocities are kept in flat arrays (numpy
+    arrays when numpy is available) for the duration of the layout and are
+    written back to the usual "position" node property once it settles.
+
+    theta controls the approximation: a quadtree cell is treated as a
+    single body once width / distance < theta (0 is exact).
+
+    Example:
+        layout = BarnesHutLayout(graph)
+        layout.layoutGraph()
+    '''
+
+    def __init__(self, graph, theta=0.8, usenumpy=True):
+        ForceLayout.__init__(self, graph)
+        self._f_imax = 300
+        self._f_theta = theta
+        self._f_numpy = usenumpy and numpy is not None
+        self._f_ticks = 0
+
+    def setTheta(self, theta):
+        '''
+        Set the Barnes-Hut opening angle (0 disables the approximation).
+        '''
+        self._f_theta = theta
+
+    def setMaxTicks(self, imax):
+        '''
+        Set the maximum number of physics ticks for one layoutGraph() call
+        ( None runs until the layout settles ).
+        '''
+        self._f_imax = imax
+
+    def getTickCount(self):
+        '''
+        Return the number of physics ticks run by the last layoutGraph().
+        '''
+        return self._f_ticks
+
+    def _getGraphArrays(self, graph):
+        nodes = graph.getNodes()
+        nidx = {}
+        xs = []
+        ys = []
+        drags = []
+        for i, (nid, nprops) in enumerate(nodes):
+            nidx[nid] = i
+            x, y = nprops['position']
+            xs.append(float(x))
+            ys.append(float(y))
+            drag = nprops.get('drag')
+            if drag is None:
+                drag = self._f_drag
+            drags.append(drag)
+
+        edges = [(nidx[n1], nidx[n2]) for eid, n1, n2, einfo in graph.getEdges() if n1 != n2]
+        return nodes, xs, ys, drags, edges
+
+    def _getComponents(self, count, edges):
+        '''
+        Split the node indexes into connected components (with their edges)
+        so each cluster is laid out on its own like ForceLayout does.
+        '''
+        roots = list(range(count))
+
+        def find(i):
+            while roots[i] != i:
+                roots[i] = roots[roots[i]]
+                i = roots[i]
+            return i
+
+        for a, b in edges:
+            ra = find(a)
+            rb = find(b)
+            if ra != rb:
+                roots[ra] = rb
+
+        comps = collections.OrderedDict()
+        for i in range(count):
+            comps.setdefault(find(i), ([], []))[0].append(i)
+
+        for a, b in edges:
+            comps[find(a)][1].append((a, b))
+
+        return list(comps.values())
+
+    def layoutGraph(self):
+
+        self.setRandomLayout(self.graph)
+        nodes, xs, ys, drags, edges = self._getGraphArrays(self.graph)
+
+        self._f_ticks = 0
+        comps = self._getComponents(len(nodes), edges)
+        for idxs, cedges in comps:
+            if len(idxs) < 2:
+                continue
+            try:
+                self._runPhysics(xs, ys, drags, idxs, cedges, self._f_imax)
+            except Exception:
+                logger.error(traceback.format_exc())
+
+        # Now, in order from largest to smallest, shift them back toward 0,0
+        comps.sort(key=lambda c: len(c[0]), reverse=True)
+
+        offset = 0
+        for idxs, cedges in comps:
+            xmin = ymin = float('inf')
+            xmax = ymax = float('-inf')
+            for i in idxs:
+                w, h = nodes[i][1].get('size', (0, 0))
+                xmin = min(xmin, xs[i] - (w / 2))
+                ymin = min(ymin, ys[i] - (h / 2))
+                xmax = max(xmax, xs[i] + (w / 2))
+                ymax = max(ymax, ys[i] + (h / 2))
+
+            dy = offset - ymin
+            for i in idxs:
+                xs[i] -= xmin
+                ys[i] += dy
+            offset += (ymax - ymin)
+
+        for i, node in enumerate(nodes):
+            self.graph.setNodeProp(node, 'position', (xs[i], ys[i]))
+
+        self._setEdgePoints()
+
+    def _tickPhysicsEngine(self, graph):
+        # A single (velocity-less) tick for incLayoutGraph()
+        nodes, xs, ys, drags, edges = self._getGraphArrays(graph)
+        if len(nodes) < 2:
+            return 0
+
+        totforce = self._runPhysics(xs, ys, drags, list(range(len(nodes))), edges, 1)
+        for i, node in enumerate(nodes):
+            graph.setNodeProp(node, 'position', (xs[i], ys[i]))
+
+        return totforce
+
+    def _runPhysics(self, xs, ys, drags, idxs, edges, maxticks):
+        '''
+        Run the physics engine over the bodies in idxs (updating xs/ys in
+        place) until the average movement per tick drops below minavgforce
+        or maxticks is reached.  Returns the total movement of the last tick.
+        '''
+        if self._f_numpy:
+            return self._runPhysicsNumpy(xs, ys, drags, idxs, edges, maxticks)
+
+        count = len(idxs)
+        loc = {i: j for j, i in enumerate(idxs)}
+        px = [xs[i] for i in idxs]
+        py = [ys[i] for i in idxs]
+        drag = [drags[i] for i in idxs]
+        ledges = [(loc[a], loc[b]) for a, b in edges]
+        vx = [0.0] * count
+        vy = [0.0] * count
+        lidxs = list(range(count))
+
+        kq = ke * self._f_charge * self._f_charge
+        theta2 = self._f_theta * self._f_theta
+        spring = self._f_springrate
+        mmax = self._f_mmax
+        sqrt = math.sqrt
+
+        totforce = 0
+        for tick in itertools.count():
+
+            if maxticks is not None and tick >= maxticks:
+                break
+
+            cmx, cmy, mass, width, kids = _buildQuadTree(px, py, lidxs)
+
+            fx = [0.0] * count
+            fy = [0.0] * count
+            for i in lidxs:
+                x = px[i]
+                y = py[i]
+                ax = 0.0
+                ay = 0.0
+                stack = [0]
+                while stack:
+                    c = stack.pop()
+                    dx = x - cmx[c]
+                    dy = y - cmy[c]
+                    d2 = dx * dx + dy * dy
+                    kc = kids[c]
+                    if kc is None or width[c] * width[c] < theta2 * d2:
+                        if d2 > 0:
+                            f = kq * mass[c] / (d2 * sqrt(d2))
+                            ax += dx * f
+                            ay += dy * f
+                        continue
+                    stack.extend([k for k in kc if k >= 0])
+                fx[i] = ax
+                fy[i] = ay
+
+            for a, b in ledges:
+                dx = (px[b] - px[a]) * spring
+                dy = (py[b] - py[a]) * spring
+                fx[a] += dx
+                fy[a] += dy
+                fx[b] -= dx
+                fy[b] -= dy
+
+            totforce = 0
+            for i in lidxs:
+                dx = max(-mmax, min(mmax, (vx[i] + fx[i]) * drag[i]))
+                dy = max(-mmax, min(mmax, (vy[i] + fy[i]) * drag[i]))
+                vx[i] = dx
+                vy[i] = dy
+                px[i] += dx
+                py[i] += dy
+                totforce += math.hypot(dx, dy)
+
+            self._f_ticks += 1
+            if totforce / count < self._f_minavgforce:
+                break
+
+        for j, i in enumerate(idxs):
+            xs[i] = px[j]
+            ys[i] = py[j]
+
+        return totforce
+
+    def _runPhysicsNumpy(self, xs, ys, drags, idxs, edges, maxticks):
+        count = len(idxs)
+        loc = {i: j for j, i in enumerate(idxs)}
+        px = numpy.array([xs[i] for i in idxs], dtype=numpy.float64)
+        py = numpy.array([ys[i] for i in idxs], dtype=numpy.float64)
+        drag = numpy.array([drags[i] for i in idxs], dtype=numpy.float64)
+        ea = numpy.array([loc[a] for a, b in edges], dtype=numpy.int64)
+        eb = numpy.array([loc[b] for a, b in edges], dtype=numpy.int64)
+        vx = numpy.zeros(count)
+        vy = numpy.zeros(count)
+        bodies = numpy.arange(count)
+
+        kq = ke * self._f_charge * self._f_charge
+        theta2 = self._f_theta * self._f_theta
+        spring = self._f_springrate
+        mmax = self._f_mmax
+
+        totforce = 0
+        for tick in itertools.count():
+
+            if maxticks is not None and tick >= maxticks:
+                break
+
+            cmx, cmy, mass, width, kids = _buildQuadTreeNumpy(px, py)
+            leaf = (kids < 0).all(axis=1)
+            width2 = width * width
+
+            # Walk the tree for every body at once, keeping a frontier
+            # of (body, cell) pairs which still need to be visited.
+            fx = numpy.zeros(count)
+            fy = numpy.zeros(count)
+            bi = bodies
+            ci = numpy.zeros(count, dtype=numpy.int64)
+            while len(bi):
+                dx = px[bi] - cmx[ci]
+                dy = py[bi] - cmy[ci]
+                d2 = dx * dx + dy * dy
+                done = leaf[ci] | (width2[ci] < theta2 * d2)
+
+                hit = done & (d2 > 0)
+                if hit.any():
+                    hd2 = d2[hit]
+                    f = kq * mass[ci[hit]] / (hd2 * numpy.sqrt(hd2))
+                    fx += numpy.bincount(bi[hit], weights=dx[hit] * f, minlength=count)
+                    fy += numpy.bincount(bi[hit], weights=dy[hit] * f, minlength=count)
+
+                opened = ~done
+                bi = numpy.repeat(bi[opened], 4)
+                ci = kids[ci[opened]].ravel()
+                keep = ci >= 0
+                bi = bi[keep]
+                ci = ci[keep]
+
+            if len(ea):
+                dx = (px[eb] - px[ea]) * spring
+                dy = (py[eb] - py[ea]) * spring
+                fx += numpy.bincount(ea, weights=dx, minlength=count)
+                fx -= numpy.bincount(eb, weights=dx, minlength=count)
+                fy += numpy.bincount(ea, weights=dy, minlength=count)
+                fy -= numpy.bincount(eb, weights=dy, minlength=count)
+
+            vx = numpy.clip((vx + fx) * drag, -mmax, mmax)
+            vy = numpy.clip((vy + fy) * drag, -mmax, mmax)
+            px += vx
+            py += vy
+
+            totforce = float(numpy.hypot(vx, vy).sum())
+
+            self._f_ticks += 1
+            if totforce / count < self._f_minavgforce:
+                break
+
+        for j, i in enumerate(idxs):
+            xs[i] = float(px[j])
+            ys[i] = float(py[j])
+
+        return totforce
+
+
+def _genBenchGraph(count, rnd, extra=0.5):
+    '''
+    Generate a connected random graph (a random tree plus extra * count
+    cross edges) for layout benchmarking.
+    '''
+    import visgraph.graphcore as vg_graphcore
+
+    graph = vg_graphcore.Graph()
+    for i in range(count):
+        graph.addNode(nid=i, size=(10, 10))
+    for i in range(1, count):
+        graph.addEdgeByNids(rnd.randrange(i), i)
+    for i in range(int(count * extra)):
+        graph.addEdgeByNids(rnd.randrange(count), rnd.randrange(count))
+    return graph
+
+
+def setup():
+    ap = argparse.ArgumentParser('Benchmark the force directed graph layouts')
+    ap.add_argument('--nodes', type=int, nargs='+', default=[1000, 10000], help='Graph sizes to generate')
+    ap.add_argument('--ticks', type=int, default=50, help='Physics ticks to run per layout')
+    ap.add_argument('--theta', type=float, default=0.8, help='Barnes-Hut opening angle')
+    ap.add_argument('--no-numpy', dest='usenumpy', action='store_false', help='Use the pure python engine')
+    ap.add_argument('--compare', type=int, default=0, help='Also time ForceLayout on graphs up to this size')
+    ap.add_argument('--seed', type=int, default=0)
+    return ap
+
+
+def main(argv):
+    opts = setup().parse_args(argv)
+
+    engine = 'numpy' if opts.usenumpy and numpy is not None else 'python'
+    print('engine: %s  ticks: %d  theta: %.2f' % (engine, opts.ticks, opts.theta))
+
+    for count in opts.nodes:
+        graph = _genBenchGraph(count, random.Random(opts.seed))
+        layout = BarnesHutLayout(graph, theta=opts.theta, usenumpy=opts.usenumpy)
+        layout.setMaxTicks(opts.ticks)
+
+        start = time.time()
+        layout.layoutGraph()
+        delta = time.time() - start
+        ticks = layout.getTickCount()
+        print('BarnesHutLayout %6d nodes %6d edges: %8.3fs (%d ticks, %.4fs/tick)' %
+              (count, len(graph.getEdges()), delta, ticks, delta / max(ticks, 1)))
+
+        if count > opts.compare:
+            continue
+
+        graph = _genBenchGraph(count, random.Random(opts.seed))
+        layout = ForceLayout(graph)
+        layout._f_imax = opts.ticks
+        start = time.time()
+        layout.layoutGraph()
+        delta = time.time() - start
+        print('ForceLayout     %6d nodes %6d edges: %8.3fs' % (count, len(graph.getEdges()), delta))
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
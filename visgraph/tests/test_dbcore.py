@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+
+import visgraph.dbcore as v_dbcore
+import visgraph.graphcore as v_graphcore
+
+
+class SqliteGraphStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dbpath = os.path.join(self.tmpdir.name, 'graph.db')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_sqlite_nodes_edges(self):
+        g = v_dbcore.SqliteGraphStore(self.dbpath)
+
+        n1 = g.addNode(name='foo', size=20)
+        n2 = g.addNode(ninfo={'name': 'bar'})
+        n3 = g.addNode()
+
+        self.assertEqual(g.getNodeProps(n1), {'name': 'foo', 'size': 20})
+        self.assertEqual(g.getNodeProp(n2, 'name'), 'bar')
+        self.assertEqual(g.getNodeProp(n3, 'name', 'woot'), 'woot')
+
+        g.setNodeProp(n1, 'size', 30)
+        g.setNodeProp(n1, 'isfunc', True)
+        self.assertEqual(g.getNodeProps(n1), {'name': 'foo', 'size': 30, 'isfunc': 1})
+        g.delNodeProp(n1, 'isfunc')
+        self.assertIsNone(g.getNodeProp(n1, 'isfunc'))
+
+        e1 = g.addEdge(n1, n2, einfo={'call': 1})
+        e2 = g.addEdge(n1, n3)
+        self.assertEqual(g.getEdge(e1), (e1, n1, n2, {'call': 1}))
+        self.assertEqual(g.getEdgeProp(e1, 'call'), 1)
+
+        # edges without properties are returned too
+        refs = sorted(g.getRefsFrom(n1))
+        self.assertEqual(refs, [(e1, n1, n2, {'call': 1}), (e2, n1, n3, {})])
+        self.assertEqual(list(g.getRefsTo(n3)), [(e2, n1, n3, {})])
+
+        self.assertEqual(list(g.searchNodes('name', 'bar')), [(n2,)])
+        self.assertEqual(list(g.searchNodes('size', 30)), [(n1,)])
+        self.assertEqual(sorted(g.searchNodes('name')), [(n1,), (n2,)])
+
+        g.delNode(n3)
+        self.assertEqual(list(g.getRefsFrom(n1)), [(e1, n1, n2, {'call': 1})])
+
+        # everything is persisted
+        g = v_dbcore.SqliteGraphStore(self.dbpath)
+        self.assertEqual(g.getNodeProps(n2), {'name': 'bar'})
+        self.assertEqual(g.getEdgeProps(e1), {'call': 1})
+
+    def test_sqlite_bulk(self):
+        cg = v_graphcore.HierGraph()
+        for i in range(2000):
+            cg.addNode(nid=0x1000 + i, repr='sub_%.8x' % (0x1000 + i), color=[1, 2])
+        for i in range(1999):
+            cg.addEdgeByNids(0x1000 + i, 0x1001 + i, calls=i)
+
+        g = v_dbcore.SqliteGraphStore(self.dbpath)
+        g.addNode(name='first')
+        nidmap = g.importGraph(cg, nidprop='va')
+        self.assertEqual(len(nidmap), 2000)
+        self.assertEqual(len(set(nidmap.values())), 2000)
+
+        nid = nidmap[0x1010]
+        self.assertEqual(list(g.searchNodes('va', 0x1010)), [(nid,)])
+        # un-storable props are skipped
+        self.assertEqual(g.getNodeProps(nid), {'va': 0x1010, 'repr': 'sub_00001010'})
+
+        nids = list(nidmap.values())
+        props = dict(g.getNodesProps(nids))
+        self.assertEqual(len(props), 2000)
+        self.assertEqual(props[nid]['repr'], 'sub_00001010')
+
+        refs = g.getRefsFromBulk(nids)
+        self.assertEqual(len(refs), 1999)
+        self.assertEqual(len(g.getRefsToBulk(nids[:10])), 9)
+        for eid, n1, n2, einfo in refs:
+            self.assertIn('calls', einfo)
+
+    def test_sqlite_subgraph(self):
+        g = v_dbcore.SqliteGraphStore()
+        a = g.addNode(name='a')
+        b = g.addNode(name='b')
+        c = g.addNode(name='c')
+        g.addEdge(a, b, einfo={'kind': 'call'})
+        g.addEdge(b, c, einfo={'kind': 'call'})
+        g.addEdge(a, c, einfo={'kind': 'jmp'})
+
+        sg = g.buildSubGraph()
+        sg.useEdges(kind='call')
+        self.assertEqual(len(sg.getEdges()), 2)
+        self.assertEqual(sg.pathSearchOne(a, c) is not None, True)
+
+        sg = g.buildSubGraph()
+        sg.expandNode(a, maxdepth=1)
+        self.assertEqual(sorted(sg.nodes.keys()), [a, b, c])
+
+        d = sg.addNode(name='d')
+        sg.addEdge(c, d)
+        self.assertTrue(sg.hasNode(d))
+        self.assertEqual(g.getNodeProp(d, 'name'), 'd')
+        self.assertEqual(len(list(g.getRefsFrom(c))), 1)
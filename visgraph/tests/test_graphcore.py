@@ -234,6 +234,90 @@ class GraphCoreTest(unittest.TestCase):
         self.assertFalse( e in g.getEdgesByProp('foo','bar') )
         self.assertIsNone(e[3].get('foo'))
 
+    def test_visgraph_copygraph(self):
+        g = self.getSampleGraph1()
+        e = g.getRefsFromByNid('a')[0]
+        g.setEdgeProp(e, 'foo', 'bar')
+
+        g2 = g.copyGraph()
+        self.assertIsInstance(g2, v_graphcore.HierGraph)
+        self.assertEqual(g.getNodes(), g2.getNodes())
+        self.assertEqual(g.getEdges(), g2.getEdges())
+        self.assertEqual(g2.getHierPathCount(), 3)
+
+        # changes to the copy must not bleed into the original
+        g2.setNodeProp(g2.getNode('b'), 'position', (1, 1))
+        g2.setEdgeProp(g2.getEdge(e[0]), 'foo', 'baz')
+        self.assertIsNone(g.getNodeProps('b').get('position'))
+        self.assertEqual(g.getEdgeProps(e[0]).get('foo'), 'bar')
+
+    def test_visgraph_copygraph_subclass(self):
+        class TagGraph(v_graphcore.HierGraph):
+            def __init__(self, owner):
+                v_graphcore.HierGraph.__init__(self)
+                self.owner = owner
+                self.tags = {}
+
+        g = TagGraph('owner')
+        g.addHierRootNode('a')
+        g.tags['a'] = 'root'
+
+        g2 = g.copyGraph()
+        self.assertIsInstance(g2, TagGraph)
+        self.assertEqual(g2.owner, 'owner')
+        self.assertEqual(g2.tags, {'a': 'root'})
+
+        g2.tags['b'] = 'leaf'
+        self.assertEqual(g.tags, {'a': 'root'})
+
+    def getLoopGraph(self):
+        # a -> b -> c -> d -> b   (outer loop b..d)
+        #           c -> c        (inner self loop)
+        #      b -> e -> f
+        #      a -> f
+        g = v_graphcore.HierGraph()
+        g.addHierRootNode('a')
+        for c in ('b','c','d','e','f'):
+            g.addNode(c)
+
+        for n1, n2 in (('a','b'),('b','c'),('c','d'),('d','b'),('c','c'),('b','e'),('e','f'),('a','f')):
+            g.addEdgeByNids(n1, n2)
+
+        return g
+
+    def test_visgraph_dominators(self):
+        g = self.getLoopGraph()
+        idoms = g.getDominators()
+        self.assertEqual(idoms, {'a':None, 'b':'a', 'c':'b', 'd':'c', 'e':'b', 'f':'a'})
+        self.assertEqual(g.getDominatedNids('b', idoms), set(['b','c','d','e']))
+
+        pdoms = g.getPostDominators()
+        self.assertEqual(pdoms, {'f':None, 'a':'f', 'b':'e', 'c':'d', 'd':'b', 'e':'f'})
+
+        # sample graph 1 has a diamond remerging at f
+        g = self.getSampleGraph1()
+        idoms = g.getDominators()
+        self.assertEqual(idoms['f'], 'a')
+        self.assertEqual(idoms['d'], 'b')
+
+    def test_visgraph_loops(self):
+        g = self.getLoopGraph()
+        sccs = [ set(scc) for scc in g.getStronglyConnected() ]
+        self.assertIn(set(['b','c','d']), sccs)
+        self.assertEqual(len(sccs), 4)
+        self.assertEqual(g.getLoopNids(), set(['b','c','d']))
+        self.assertEqual(g.getReachingNids(['e']), set(['a','b','c','d','e']))
+
+        loops = g.getNaturalLoops()
+        self.assertEqual(loops, {'b': set(['b','c','d']), 'c': set(['c'])})
+        self.assertEqual(g.getLoopNesting(loops=loops), {'b': None, 'c': 'b'})
+
+        self.assertEqual(self.getSampleGraph1().getNaturalLoops(), {})
+
+        g = self.getSampleGraph3()
+        self.assertEqual(g.getNaturalLoops(), {'b': set(['b','c'])})
+        self.assertPathsFrom(g, [('a','b','c'), ('a','b','c','d')])
+
     def test_visgraph_subcluster(self):
 
         g = v_graphcore.Graph()
@@ -1,6 +1,9 @@
+import math
+import random
 import unittest
 
 import visgraph.graphcore as v_graphcore
+import visgraph.layouts.force as v_force
 import visgraph.layouts.dynadag as v_dynadag
 
 class GraphLayoutTest(unittest.TestCase):
@@ -77,9 +80,100 @@ class GraphLayoutTest(unittest.TestCase):
         lyt = v_dynadag.DynadagLayout(g2)
         lyt.layoutGraph()
 
+        # the a->c and a->d ghost chains no longer cross
         self.assertEqual(g2.getNode('a')[1].get('position'),(20,0))
         self.assertEqual(g2.getNode('b')[1].get('position'),(20,40))
-        self.assertEqual(g2.getNode('c')[1].get('position'),(40,120))
-        self.assertEqual(g2.getNode('d')[1].get('position'),(20,80))
-        self.assertEqual(g2.getNode('e')[1].get('position'),(20,120))
-
+        self.assertEqual(g2.getNode('c')[1].get('position'),(20,120))
+        self.assertEqual(g2.getNode('d')[1].get('position'),(40,80))
+        self.assertEqual(g2.getNode('e')[1].get('position'),(40,120))
+
+    def test_visgraph_dynadag_crossings(self):
+        rnd = random.Random(3)
+        for i in range(200):
+            pairs = [(rnd.randrange(6), rnd.randrange(6)) for j in range(rnd.randrange(12))]
+            brute = sum(1 for (u1, l1) in pairs for (u2, l2) in pairs if u1 < u2 and l1 > l2)
+            self.assertEqual(v_dynadag.countCrossings(pairs, 6), brute)
+
+        # a wide layered graph should come out with fewer crossings
+        g = v_graphcore.HierGraph()
+        g.addNode(0, rootnode=True)
+        layers = [[0]]
+        for w in range(1, 6):
+            layers.append(['%d_%d' % (w, j) for j in range(12)])
+            for nid in layers[w]:
+                g.addNode(nid)
+                g.addEdgeByNids(rnd.choice(layers[w - 1]), nid)
+            for j in range(12):
+                g.addEdgeByNids(rnd.choice(layers[w - 1]), rnd.choice(layers[w]))
+
+        lyt = v_dynadag.DynadagLayout(g)
+        lyt.layoutGraph()
+        ups, downs, ledges = lyt._getLayerEdges()
+        poss = dict((nid, nprops['layerpos']) for nid, nprops in g.getNodes())
+        shuffled = dict(poss)
+        for layer in lyt.layers:
+            order = list(range(len(layer)))
+            rnd.shuffle(order)
+            for (nid, nprops), pos in zip(layer, order):
+                shuffled[nid] = pos
+        self.assertLess(lyt._getCrossCount(ledges, poss), lyt._getCrossCount(ledges, shuffled))
+        for layer in lyt.layers:
+            self.assertEqual([nprops['layerpos'] for nid, nprops in layer], list(range(len(layer))))
+
+
+    def test_visgraph_barneshut(self):
+        rnd = random.Random(1)
+        for usenumpy in (False, True):
+            # two clusters plus an orphan node
+            g = v_force._genBenchGraph(50, rnd)
+            g.addNode(nid='orphan', size=(10, 10))
+            g.addNode(nid='x', size=(10, 10))
+            g.addNode(nid='y', size=(10, 10))
+            g.addEdgeByNids('x', 'y')
+
+            lyt = v_force.BarnesHutLayout(g, usenumpy=usenumpy)
+            lyt.setMaxTicks(40)
+            lyt.layoutGraph()
+            self.assertTrue(0 < lyt.getTickCount() <= 80)
+
+            positions = set()
+            for nid, nprops in g.getNodes():
+                x, y = nprops.get('position')
+                self.assertTrue(math.isfinite(x) and math.isfinite(y))
+                self.assertGreaterEqual(x, -5)
+                self.assertGreaterEqual(y, -5)
+                positions.add((x, y))
+            self.assertEqual(len(positions), 53)
+
+            for eid, n1, n2, einfo in g.getEdges():
+                self.assertEqual(einfo['edge_points'], [g.getNodeProps(n1)['position'], g.getNodeProps(n2)['position']])
+
+            # the quadtree with theta=0 must match exact n^2 repulsion
+            g = v_force._genBenchGraph(30, rnd)
+            lyt = v_force.BarnesHutLayout(g, theta=0.0, usenumpy=usenumpy)
+            lyt.setRandomLayout(g)
+            before = {nid: nprops['position'] for nid, nprops in g.getNodes()}
+            lyt._tickPhysicsEngine(g)
+
+            kq = v_force.ke * lyt._f_charge ** 2
+            for nid, (x, y) in before.items():
+                fx = fy = 0.0
+                for nid2, (x2, y2) in before.items():
+                    if nid2 != nid:
+                        d3 = math.hypot(x - x2, y - y2) ** 3
+                        fx += kq * (x - x2) / d3
+                        fy += kq * (y - y2) / d3
+                for eid, n1, n2, einfo in g.getRefsFromByNid(nid):
+                    fx += (before[n2][0] - x) * lyt._f_springrate
+                    fy += (before[n2][1] - y) * lyt._f_springrate
+                for eid, n1, n2, einfo in g.getRefsToByNid(nid):
+                    fx += (before[n1][0] - x) * lyt._f_springrate
+                    fy += (before[n1][1] - y) * lyt._f_springrate
+                mx = max(-lyt._f_mmax, min(lyt._f_mmax, fx * lyt._f_drag))
+                my = max(-lyt._f_mmax, min(lyt._f_mmax, fy * lyt._f_drag))
+                nx, ny = g.getNodeProps(nid)['position']
+                self.assertAlmostEqual(nx, x + mx, places=6)
+                self.assertAlmostEqual(ny, y + my, places=6)
+
+            if v_force.numpy is None:
+                break
@@ -29,12 +29,14 @@ import envi.symstore.resolver as e_resolv
 import envi.symstore.symcache as e_symcache
 
 import vstruct
-import vstruct.cparse as vs_cparse
 import vstruct.primitives as vs_prims
 
 import vivisect.base as viv_base
 import vivisect.parsers as viv_parsers
 import vivisect.codegraph as viv_codegraph
+import vivisect.storage.compact as viv_compact
+import vivisect.storage.eventlog as viv_eventlog
+import vivisect.storage.snapshot as viv_snapshot
 import vivisect.impemu.lookup as viv_imp_lookup
 
 from vivisect.exc import *
@@ -99,6 +101,9 @@ class VivWorkspace(e_mem.MemoryObject, viv_base.VivWorkspaceCore):
         cfgpath = os.path.join(self.vivhome, 'viv.json')
         self.config = e_config.EnviConfig(filename=cfgpath, defaults=defconfig, docs=docconfig, autosave=autosave)
 
+        if self.config.viv.CompactEventLog:
+            self._event_list = viv_eventlog.EventLog(spill=self.config.viv.EventLogSpill)
+
         # Ideally, *none* of these are modified except by _handleFOO funcs...
         self.segments = []
         self.exports = []
@@ -266,7 +271,12 @@ class VivWorkspace(e_mem.MemoryObject, viv_base.VivWorkspaceCore):
     def loadWorkspace(self, wsname):
         mname = self.getMeta("StorageModule")
         mod = self.loadModule(mname)
-        mod.loadWorkspace(self, wsname)
+
+        elen = len(self._event_list)
+        if not viv_snapshot.loadWorkspace(self, mod, wsname):
+            mod.loadWorkspace(self, wsname)
+        self._event_filecount = len(self._event_list) - elen
+
         self.setMeta("StorageName", wsname)
         # The event list thusfar came *only* from the load...
         self._createSaveMark()
@@ -301,9 +311,7 @@ class VivWorkspace(e_mem.MemoryObject, viv_base.VivWorkspaceCore):
         plat = self.getMeta('Platform')
         arch = self.getMeta('Architecture')
 
-        eclass = viv_imp_lookup.workspace_emus.get((plat, arch))
-        if eclass is None:
-            eclass = viv_imp_lookup.workspace_emus.get(arch)
+        eclass = viv_imp_lookup.getWorkspaceEmulator(arch, plat=plat)
 
         if eclass is None:
             raise Exception("WorkspaceEmulation not supported on %s yet!" % arch)
@@ -597,10 +605,12 @@ class VivWorkspace(e_mem.MemoryObject, viv_base.VivWorkspaceCore):
         if self.server is not None:
             local = True
 
-        # Process the events from the import data...
+        # Process the events from the import data (applying the memory
+        # writes of relocations in bulk)...
         fe = self._fireEvent
-        for event, einfo in wsevents:
-            fe(event, einfo, local=local)
+        with self.deferRelocations():
+            for event, einfo in wsevents:
+                fe(event, einfo, local=local)
         return
 
     def exportWorkspace(self):
@@ -1114,6 +1124,11 @@ class VivWorkspace(e_mem.MemoryObject, viv_base.VivWorkspaceCore):
         if va in self.iscode and not rerun:
             return self.iscode[va]
 
+        # straight line code into undecodable bytes can't be a function
+        if v_emucode.isBadStraightLine(self, va):
+            self.iscode[va] = False
+            return False
+
         self.iscode[va] = True
         # because we're doing partial emulation, demote some of the logging
         # messages to low priority.
@@ -1163,6 +1178,42 @@ class VivWorkspace(e_mem.MemoryObject, viv_base.VivWorkspaceCore):
             return valu
         return self.imem_archs[(arch & envi.ARCH_MASK) >> 16].archParseOpcode(b, off, va)
 
+    def parseOpcodes(self, va, arch=envi.ARCH_DEFAULT, maxcount=None, maxva=None, records=False):
+        '''
+        Linearly parse a run of opcodes starting at va in one call.  Decoding
+        stops at the end of the memory map, after maxcount opcodes, at maxva
+        or at the first invalid instruction.  Set records=True for
+        lightweight envi.OpRecord tuples.
+
+        Opcodes are shared with the opcode cache used by parseOpcode():
+        cached opcodes are returned in place of the new decodes, and the
+        rest are added to the cache.
+
+        Example: ops = vw.parseOpcodes(fva, maxva=fva + 0x40)
+        '''
+        if arch == envi.ARCH_DEFAULT:
+            loctup = self.getLocation(va)
+            if loctup is not None and loctup[L_TINFO] and loctup[L_LTYPE] == LOC_OP:
+                arch = loctup[L_TINFO]
+
+        off, b = self.getByteDef(va)
+        archmod = self.imem_archs[(arch & envi.ARCH_MASK) >> 16]
+        ops = archmod.archParseOpcodes(b, off, va, maxcount=maxcount, maxva=maxva, records=records)
+        if records:
+            return ops
+
+        # same keys as parseOpcode(), the run never leaves the memory map
+        bkey = b[:16]
+        ret = []
+        for op in ops:
+            key = (op.va, arch, bkey)
+            valu = self._op_cache.get(key)
+            if valu is None:
+                valu = op
+                self._op_cache[key] = valu
+            ret.append(valu)
+        return ret
+
     def clearOpcache(self):
         '''
         Remove all elements from the opcode cache
@@ -1747,13 +1798,33 @@ class VivWorkspace(e_mem.MemoryObject, viv_base.VivWorkspaceCore):
         '''
         return self._call_graph
 
-    def getFunctionGraph(self, fva):
+    def getFunctionGraph(self, fva, copy=True):
         '''
         Retrieve a code-block graph for the specified virtual address.
         Procedural branches (ie, calls) will not be followed during graph
         construction.
+
+        NOTE: the graph is cached until the function changes.  Unless
+              copy=False, the caller receives a private copy which may be
+              modified freely.  With copy=False the shared cached graph
+              is returned and *must not* be modified.
+        '''
+        g = self._fgraph_cache.getFuncData(fva, 'blockgraph', viv_codegraph.FuncBlockGraph)
+        if copy:
+            g = g.copyGraph()
+        return g
+
+    def getFuncGraphCache(self):
+        '''
+        Retrieve the FuncGraphCache which holds function graphs (and data
+        derived from them) for this workspace.  Entries are invalidated
+        automatically as codeblocks/xrefs for the function change.
+
+        Example:
+            cache = vw.getFuncGraphCache()
+            paths = cache.getFuncData(fva, 'mypaths', buildMyPaths)
         '''
-        return viv_codegraph.FuncBlockGraph(self,fva)
+        return self._fgraph_cache
 
     def getImportCallers(self, name):
         """
@@ -2217,10 +2288,10 @@ class VivWorkspace(e_mem.MemoryObject, viv_base.VivWorkspaceCore):
         Example: vw.addStructureModule('ntdll', 'vstruct.defs.windows.win_5_1_i386.ntdll')
 
         This allows subsequent struct lookups by names like
+        'ntdll.PEB'.  The module is not imported until the namespace
+        is first used.
         '''
-
-        mod = self.loadModule(modname)
-        self.vsbuilder.addVStructNamespace(namespace, mod)
+        self.vsbuilder.addVStructNamespaceModule(namespace, modname)
 
     def getStructure(self, va, vstructname):
         """
@@ -2291,6 +2362,9 @@ class VivWorkspace(e_mem.MemoryObject, viv_base.VivWorkspaceCore):
             src = "struct woot { int x; int y; };"
             vw.setUserStructSource( src )
         '''
+        # cparse (and pycparser) are only imported once we need them
+        import vstruct.cparse as vs_cparse
+
         # First, we make sure it compiles...
         ctor = vs_cparse.ctorFromCSource( ssrc )
         # Then, build one to get the name from it...
@@ -2621,7 +2695,24 @@ class VivWorkspace(e_mem.MemoryObject, viv_base.VivWorkspaceCore):
         self._fireEvent(VWE_SETNAME, (va,name))
         return name
 
-    def saveWorkspace(self, fullsave=True):
+    def saveWorkspace(self, fullsave=True, compact=False, snapshot=None):
+        '''
+        Save the workspace using the StorageModule/StorageName meta.  A
+        full save with compact=True writes the event log compacted to the
+        (usually much shorter) list of events which reproduce the current
+        workspace state (see vivisect.storage.compact).  The in memory
+        event log is left alone.
+
+        With snapshot=True (default: the viv.SaveSnapshot config option) a
+        snapshot of the workspace state is saved next to the event log so
+        loading it can skip replaying the events (see
+        vivisect.storage.snapshot).
+
+        Example:
+            vw.saveWorkspace(compact=True)
+        '''
+        if snapshot is None:
+            snapshot = self.config.viv.SaveSnapshot
 
         if self.server is not None:
             return
@@ -2638,13 +2729,24 @@ class VivWorkspace(e_mem.MemoryObject, viv_base.VivWorkspaceCore):
 
         # If they specified a full save, *or* this event list
         # has never been saved before, do a full save.
-        if fullsave:
+        if fullsave and compact:
+            if not hasattr(mod, 'vivEventsToFile'):
+                raise Exception('Storage module %s can not save compacted workspaces' % modname)
+            events = viv_compact.compactEvents(self.exportWorkspace())
+            mod.vivEventsToFile(filename, events)
+            self._event_filecount = len(events)
+        elif fullsave:
             mod.saveWorkspace(self, filename)
+            self._event_filecount = len(self._event_list)
         else:
             mod.saveWorkspaceChanges(self, filename)
+            self._event_filecount += len(self._event_list) - self._event_saved
 
         self._createSaveMark()
 
+        if snapshot:
+            viv_snapshot.saveSnapshot(self, filename, self._event_filecount)
+
     def loadFromFd(self, fd, fmtname=None, baseaddr=None):
         """
         Read the first bytes of the file descriptor and see if we can identify the type.
@@ -2883,28 +2985,13 @@ class VivWorkspace(e_mem.MemoryObject, viv_base.VivWorkspaceCore):
         return segtup[SEG_FNAME]
 
     def getLocationDistribution(self):
+        '''
+        Return a dict of ltype: (typename, count, size, percent) for the
+        locations in the workspace (see vivisect.tools.locations).
+        '''
         # NOTE: if this changes, don't forget the report module!
-        totsize = 0
-        for mapva, mapsize, mperm, mname in self.getMemoryMaps():
-            totsize += mapsize
-        loctot = 0
-        ret = {}
-        for i in range(LOC_MAX):
-            cnt = 0
-            size = 0
-            for lva,lsize,ltype,tinfo in self.getLocations(i):
-                cnt += 1
-                size += lsize
-            loctot += size
-
-            tname = loc_type_names.get(i, 'Unknown')
-            ret[i] = (tname, cnt, size, int((size/float(totsize))*100))
-
-        # Update the undefined based on totals...
-        undeftot = totsize-loctot
-        ret[LOC_UNDEF] = ('Undefined', 0, undeftot, int((undeftot/float(totsize)) * 100))
-
-        return ret
+        import vivisect.tools.locations as v_t_locs
+        return v_t_locs.getLocationDistribution(self)
 
 #################################################################
 #
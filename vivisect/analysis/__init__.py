@@ -85,6 +85,8 @@ def addAnalysisModules(vw):
         vw.addAnalysisModule("vivisect.analysis.generic.thunks")
 
         vw.addAnalysisModule('vivisect.analysis.generic.strconst')
+        # catch callers of no return functions analyzed before they were known
+        vw.addAnalysisModule("vivisect.analysis.generic.noret")
 
     elif fmt == 'elf':  # ELF ########################################################
 
@@ -140,6 +142,7 @@ def addAnalysisModules(vw):
         vw.addAnalysisModule("vivisect.analysis.elf.elfplt_late")
         vw.addAnalysisModule("vivisect.analysis.generic.thunks")
         vw.addAnalysisModule("vivisect.analysis.generic.pointers")
+        vw.addAnalysisModule("vivisect.analysis.generic.noret")
 
     elif fmt == 'macho': # MACH-O ###################################################
 
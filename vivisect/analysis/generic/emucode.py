@@ -7,7 +7,6 @@ if they are code by emulation behaviorial analysis.
 import envi
 import vivisect
 import vivisect.exc as v_exc
-from envi.archs.i386.opconst import *
 import vivisect.impemu.monitor as viv_imp_monitor
 
 import logging
@@ -16,6 +15,53 @@ from vivisect.const import *
 
 logger = logging.getLogger(__name__)
 
+# Architectures with a length-and-flow decoder and a single instruction mode
+STRAIGHT_ARCHS = ('i386', 'amd64')
+# How far to follow straight line code before giving up on a quick answer
+STRAIGHT_MAX = 64
+STRAIGHT_FLOW = envi.IF_BRANCH | envi.IF_CALL | envi.IF_RET | envi.IF_NOFALL
+
+
+def isBadStraightLine(vw, va, maxcount=STRAIGHT_MAX):
+    '''
+    Use the length-and-flow decoder to check whether the straight line
+    code starting at va runs into bytes which do not decode before any
+    control flow.  Emulating such code can never reach a return, so the
+    (much more expensive) emulation pass may be skipped.
+
+    Returns False whenever the answer is not certain.
+
+    Example:
+        if not isBadStraightLine(vw, va):
+            emu.runFunction(va, maxhit=1)
+    '''
+    if vw.getMeta('Architecture') not in STRAIGHT_ARCHS:
+        return False
+
+    try:
+        recs = vw.parseOpcodes(va, maxcount=maxcount, records=True)
+    except Exception:
+        return False
+
+    if len(recs) >= maxcount:
+        return False
+
+    for rec in recs:
+        if rec.iflags & STRAIGHT_FLOW:
+            return False
+        if vw.getLocation(rec.va) is not None or vw.isNoReturnVa(rec.va):
+            return False
+
+    # Make sure the run ended on bad bytes, rather than the end of the map
+    mmap = vw.getMemoryMap(va)
+    if mmap is None:
+        return False
+
+    endva = va
+    if recs:
+        endva = recs[-1].va + recs[-1].size
+    return endva + 16 <= mmap[0] + mmap[1]
+
 
 class watcher(viv_imp_monitor.EmulationMonitor):
 
@@ -141,20 +187,22 @@ def analyze(vw):
                 elif vw.isProbablyString(va):
                     vw.makeString(va)
             else:
-                emu = vw.getEmulator(va=va)
-                wat = watcher(vw, va)
-                emu.setEmulationMonitor(wat)
-
-                try:
-                    emu.runFunction(va, maxhit=1)
-                except Exception:
-                    continue
-
-                if wat.looksgood():
+                wat = None
+                if not isBadStraightLine(vw, va):
+                    emu = vw.getEmulator(va=va)
+                    wat = watcher(vw, va)
+                    emu.setEmulationMonitor(wat)
+
+                    try:
+                        emu.runFunction(va, maxhit=1)
+                    except Exception:
+                        continue
+
+                if wat is not None and wat.looksgood():
                     docode.append(va)
                 # flag to tell us to be greedy w/ finding code
                 # XXX - visi is going to hate this..
-                elif wat.iscode() and vw.greedycode:
+                elif wat is not None and wat.iscode() and vw.greedycode:
                     bcode.append(va)
                 else:
                     if vw.isProbablyUnicode(va):
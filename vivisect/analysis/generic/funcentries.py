@@ -13,6 +13,7 @@ import envi
 import envi.memory as e_mem
 import envi.const as e_const
 import vivisect
+import vivisect.analysis.generic.emucode as v_emucode
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +47,9 @@ def analyze(vw):
             try:
 
                 if vw.isFunctionSignature(va):
+                    if v_emucode.isBadStraightLine(vw, va):
+                        logger.debug('skipping signature match into invalid code: 0x%x', va)
+                        continue
                     logger.debug('discovered new function (by signature): 0x%x', va)
                     vw.makeFunction(va)
 
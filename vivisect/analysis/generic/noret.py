@@ -9,8 +9,19 @@ Generally, idea is to search through the terminal nodes of a function, and if th
 noreturn call, or just straight up don't have a return
 * And if all the terminal nodes end in that, then there's no way the function returns, and we should
 bail
+
+A function found to not return may make its callers not return as well (any of
+their paths through a call to it no longer return), so each one found puts the
+functions which call it on a worklist to be checked again, until no more are
+found.  Callers which were analyzed before the function was known to not return
+are caught this way without another pass over every function.  The per block
+terminal info this needs is kept in the workspace function graph cache, so
+checking a function again does not rebuild its graph.
+
+As a workspace module, every function is checked (with the same worklist).
 '''
 import logging
+import collections
 
 import envi
 import vivisect.const as v_const
@@ -20,37 +31,173 @@ import vivisect.tools.graphutil as v_t_graph
 logger = logging.getLogger(__name__)
 
 
-def analyzeFunction(vw, fva):
-    if vw.isFunctionThunk(fva):
-        # Don't bother with import thunks
-        for ref in vw.getXrefsFrom(fva, rtype=v_const.REF_CODE):
-            loc = vw.getLocation(ref[v_const.XR_TO])
-            if loc and loc[v_const.L_LTYPE] == v_const.LOC_IMPORT:
-                return
-
-    g = v_t_graph.buildFunctionGraph(vw, fva)
-    _, _, leaves = v_t_graph.getNodeWeightHisto(g)
-
-    hasret = False
-    for weight, nodes in leaves.items():
-        for node in nodes:
-            cbstart, cbsize, cbfunc = vw.getCodeBlock(node[0])
-            cbend = cbstart + cbsize - 1
-
-            lva, lsize, ltype, linfo = vw.getLocation(cbend)
-            if ltype != v_const.LOC_OP:
-                pass
-            if vw.isNoReturnVa(lva):
+def _buildBlockExits(vw, fva):
+    '''
+    Build the terminal info for each code block of the function.  Returns
+    a dict of cbva: (succs, calls, lva, linfo, ltargets) where calls is a
+    tuple of (callva, targets) for the calls in the block and lva/linfo are
+    the last instruction of the block (with ltargets its code xrefs).
+    '''
+    g = v_t_graph.getCachedFunctionGraph(vw, fva, copy=False)
+
+    blocks = {}
+    for nid, nprops in g.getNodes():
+        cbva = nprops.get('cbva')
+        cbend = cbva + nprops.get('cbsize')
+        succs = tuple(eto for eid, efrom, eto, einfo in g.getRefsFromByNid(nid))
+
+        calls = []
+        lva = linfo = None
+        va = cbva
+        while va < cbend:
+            loc = vw.getLocation(va)
+            if loc is None:
+                break
+
+            lva, lsize, ltype, linfo = loc
+            if ltype == v_const.LOC_OP and linfo & envi.IF_CALL:
+                targets = tuple(xr[v_const.XR_TO] for xr in vw.getXrefsFrom(lva, rtype=v_const.REF_CODE))
+                calls.append((lva, targets))
+            va = lva + lsize
+
+        ltargets = ()
+        if lva is not None:
+            ltargets = tuple(xr[v_const.XR_TO] for xr in vw.getXrefsFrom(lva, rtype=v_const.REF_CODE))
+        blocks[cbva] = (succs, tuple(calls), lva, linfo, ltargets)
+
+    return blocks
+
+
+def getBlockExits(vw, fva):
+    '''
+    Return the (cached) block terminal info for the function (see
+    _buildBlockExits).  It is rebuilt only when the function changes.
+
+    NOTE: the returned dict is shared, do not modify it.
+    '''
+    return vw.getFuncGraphCache().getFuncData(fva, 'noret_exits', _buildBlockExits)
+
+
+def _isNoReturnTarget(vw, va, targets):
+    if vw.isNoReturnVa(va):
+        return True
+    # dynamic branches may have several targets, all must not return
+    return bool(targets) and all(vw.isNoReturnVa(tva) for tva in targets)
+
+
+def functionReturns(vw, fva):
+    '''
+    Check if the function has a path from its entry to a clean return (or
+    a dynamic branch we couldn't resolve) which does not pass through a
+    call which does not return.
+
+    Example:
+        if not functionReturns(vw, fva):
+            vw.addNoReturnVa(fva)
+    '''
+    blocks = getBlockExits(vw, fva)
+
+    todo = [fva]
+    done = set(todo)
+    while todo:
+        cbva = todo.pop()
+        exits = blocks.get(cbva)
+        if exits is None:
+            continue
+
+        succs, calls, lva, linfo, ltargets = exits
+        if any(_isNoReturnTarget(vw, cva, targets) for cva, targets in calls):
+            continue
+
+        if not succs:
+            if lva is None or _isNoReturnTarget(vw, lva, ltargets):
                 continue
             if linfo & envi.IF_RET:
-                hasret = True
-                break
+                return True
             # be wary of dynamic branches we couldn't resolve
             if linfo & envi.IF_BRANCH:
-                hasret = True
-                break
+                return True
+            continue
+
+        for succ in succs:
+            if succ not in done:
+                done.add(succ)
+                todo.append(succ)
 
     # 0x14006ba90 out of omnetpp.exe at O2, 64bit is a good counter example (that shouldn't be no ret)
-    if not hasret:
-        logger.info('Marking 0x%.8x as no return' % fva)
+    return False
+
+
+def _isImportThunk(vw, fva):
+    if not vw.isFunctionThunk(fva):
+        return False
+
+    for ref in vw.getXrefsFrom(fva, rtype=v_const.REF_CODE):
+        loc = vw.getLocation(ref[v_const.XR_TO])
+        if loc and loc[v_const.L_LTYPE] == v_const.LOC_IMPORT:
+            return True
+
+    return False
+
+
+def getCallers(vw, fva):
+    '''
+    Return the set of functions with a code xref (call or tail jump) to
+    the given function.
+    '''
+    callers = set()
+    for xrfrom, xrto, xrtype, xrflags in vw.getXrefsTo(fva, rtype=v_const.REF_CODE):
+        cfva = vw.getFunction(xrfrom)
+        if cfva is not None:
+            callers.add(cfva)
+    return callers
+
+
+def findNoReturns(vw, fvas):
+    '''
+    Check the given functions, and the callers of each one found to not
+    return (and theirs...), marking those which do not return.  Returns
+    the list of newly marked functions.
+
+    Example:
+        for fva in findNoReturns(vw, vw.getFunctions()):
+            print('0x%.8x does not return' % fva)
+    '''
+    todo = collections.deque(fvas)
+    queued = set(todo)
+    found = []
+
+    while todo:
+        fva = todo.popleft()
+        queued.discard(fva)
+
+        if vw.isNoReturnVa(fva) or _isImportThunk(vw, fva):
+            continue
+
+        try:
+            if functionReturns(vw, fva):
+                continue
+        except Exception as e:
+            logger.warning('Failed checking 0x%.8x for a return: %s', fva, e)
+            continue
+
+        logger.info('Marking 0x%.8x as no return', fva)
         vw.addNoReturnVa(fva)
+        found.append(fva)
+
+        for cfva in getCallers(vw, fva):
+            if cfva not in queued:
+                queued.add(cfva)
+                todo.append(cfva)
+
+    return found
+
+
+def analyze(vw):
+    found = findNoReturns(vw, vw.getFunctions())
+    if found:
+        vw.vprint('Found %d no return functions' % len(found))
+
+
+def analyzeFunction(vw, fva):
+    findNoReturns(vw, [fva])
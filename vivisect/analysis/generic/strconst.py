@@ -1,5 +1,3 @@
-import envi.exc as e_exc
-
 from vivisect.const import *
 
 
@@ -17,12 +15,7 @@ def analyze(vw):
     '''
     for fva in vw.getFunctions():
         for va, size, funcva in vw.getFunctionBlocks(fva):
-            maxva = va + size
-            while va < maxva:
-                try:
-                    op = vw.parseOpcode(va)
-                except e_exc.InvalidInstruction:
-                    break
+            for op in vw.parseOpcodes(va, maxva=va + size):
                 for o in op.opers:
                     if o.isDeref():
                         continue
@@ -37,7 +30,7 @@ def analyze(vw):
 
                     # Candidates will be listed with the Xrefs thanks to
                     # logic in makeOpcode().
-                    if not (vw.getXrefsTo(ref) and vw.getXrefsFrom(va)):
+                    if not (vw.getXrefsTo(ref) and vw.getXrefsFrom(op.va)):
                         continue
 
                     # String constants must be in a defined memory segment.
@@ -53,5 +46,4 @@ def analyze(vw):
                         if sz > 0:
                             vw.makeString(ref, size=sz)
 
-                va += len(op)
     return
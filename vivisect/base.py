@@ -12,7 +12,6 @@ import envi.memory as e_mem
 import envi.pagelookup as e_page
 import envi.codeflow as e_codeflow
 
-import vstruct.cparse as vs_cparse
 import vstruct.builder as vs_builder
 import vstruct.constants as vs_const
 
@@ -181,6 +180,13 @@ class VivWorkspaceCore(viv_impapi.ImportApi):
 
         self._event_list = []
         self._event_saved = 0 # The index of the last "save" event...
+        self._event_filecount = 0 # The number of events in the saved log
+
+        # Cache of function graphs (and derived data) by function version
+        self._fgraph_cache = viv_codegraph.FuncGraphCache(self)
+
+        # Memory maps patched in place by deferred relocations (see deferRelocations)
+        self._reloc_maps = None
 
         # Give ourself a structure namespace!
         self.vsbuilder = vs_builder.VStructBuilder()
@@ -210,11 +216,86 @@ class VivWorkspaceCore(viv_impapi.ImportApi):
         yield
         self._supervisor = False
 
+    @contextlib.contextmanager
+    def deferRelocations(self):
+        '''
+        Apply the memory writes of rebased relocations in bulk.
+
+        Writing memory copies the bytes of the whole memory map, which makes
+        applying one relocation at a time quadratic in the size of the map.
+        Within this context, a map a relocation lands in is converted to a
+        bytearray once and patched in place, then swapped back in as bytes
+        when the context exits.  Reads within the context see the patched
+        memory.
+
+        Example:
+            with vw.deferRelocations():
+                for rva, rtype, data in relocs:
+                    vw.addRelocation(rva, rtype, data)
+        '''
+        if self._reloc_maps is not None:
+            yield
+            return
+
+        self._reloc_maps = {}
+        try:
+            yield
+        finally:
+            mapdefs = self._reloc_maps
+            self._reloc_maps = None
+            for mapdef in mapdefs.values():
+                mapdef[3] = bytes(mapdef[3])
+
+    def _getRelocMapDef(self, va):
+        '''
+        Return the (in place patchable) map definition containing va for a
+        deferred relocation, or None.
+        '''
+        for mapdef in self._map_defs:
+            mva, mmaxva, mmap, mbytes = mapdef
+            if mva <= va < mmaxva:
+                if mva not in self._reloc_maps:
+                    mapdef[3] = bytearray(mbytes)
+                    self._reloc_maps[mva] = mapdef
+                return mapdef
+        return None
+
+    def _writeRelocPtr(self, va, ptr):
+        mapdef = self._getRelocMapDef(va)
+        if mapdef is None or va + self.psize > mapdef[1]:
+            # unmapped or crossing maps, let the regular write sort it out
+            if ptr != self.readMemoryPtr(va):
+                with self.getAdminRights():
+                    self.writeMemoryPtr(va, ptr)
+            return
+
+        off = va - mapdef[0]
+        mapdef[3][off:off + self.psize] = e_bits.buildbytes(ptr, self.psize, self.bigend)
+
+    def _bumpFuncGraphsAt(self, va):
+        '''
+        A code block at va came or went.  Bump the graph version of any
+        function which may flow into it (by code xref or fall through).
+        '''
+        cache = self._fgraph_cache
+        if not len(cache):
+            return
+
+        cache.bumpFunctionAtVa(va)
+        cache.bumpFunctionAtVa(va - 1)
+        for xrfrom, xrto, xrtype, xrflags in self.xrefs_by_to.get(va, ()):
+            if xrtype == REF_CODE:
+                cache.bumpFunctionAtVa(xrfrom)
+
     def _handleADDLOCATION(self, loc):
         lva, lsize, ltype, linfo = loc
         self.locmap.setMapLookup(lva, lsize, loc)
         self.loclist.append(loc)
 
+        # opcode flags (NOFALL etc) shape the function graph
+        if ltype == LOC_OP:
+            self._fgraph_cache.bumpFunctionAtVa(lva)
+
         # A few special handling cases...
         if ltype == LOC_IMPORT:
             # Check if the import is registered in NoReturnApis
@@ -227,6 +308,9 @@ class VivWorkspaceCore(viv_impapi.ImportApi):
         self.locmap.setMapLookup(lva, lsize, None)
         self.loclist.remove(loc)
 
+        if ltype == LOC_OP:
+            self._fgraph_cache.bumpFunctionAtVa(lva)
+
     def _handleADDSEGMENT(self, einfo):
         self.segments.append(einfo)
 
@@ -247,8 +331,11 @@ class VivWorkspaceCore(viv_impapi.ImportApi):
             if ptr != (ptr & e_bits.u_maxes[self.psize]):
                 logger.warning('Relocations calculated a bad pointer: 0x%x (imgbase: 0x%x) (relocation: %d)', ptr, imgbase, rtype)
 
+            if self._reloc_maps is not None:
+                self._writeRelocPtr(rva, ptr)
+
             # writes are costly, especially on larger binaries
-            if ptr != self.readMemoryPtr(rva):
+            elif ptr != self.readMemoryPtr(rva):
                 with self.getAdminRights():
                     self.writeMemoryPtr(rva, ptr)
 
@@ -328,6 +415,7 @@ class VivWorkspaceCore(viv_impapi.ImportApi):
 
         self.funcmeta.pop(fva)
         self.func_args.pop(fva, None)
+        self._fgraph_cache.bumpFunction(fva)
         self.codeblocks_by_funcva.pop(fva)
         node = self._call_graph.getNode(fva)
         self._call_graph.delNode(node)
@@ -344,6 +432,8 @@ class VivWorkspaceCore(viv_impapi.ImportApi):
         m = self.funcmeta.get(funcva)
         if m is not None:
             m[name] = value
+        if name == 'BlockColors':
+            self._fgraph_cache.bumpFunction(funcva)
         mcbname = "_fmcb_%s" % name.split(':')[0]
         mcb = getattr(self, mcbname, None)
         if mcb is not None:
@@ -351,18 +441,25 @@ class VivWorkspaceCore(viv_impapi.ImportApi):
 
     def _handleADDCODEBLOCK(self, einfo):
         va,size,funcva = einfo
+        self._bumpFuncGraphsAt(va)
         self.blockmap.setMapLookup(va, size, einfo)
         self.codeblocks_by_funcva.get(funcva).append(einfo)
         self.codeblocks.append(einfo)
+        self._fgraph_cache.bumpFunction(funcva)
 
     def _handleDELCODEBLOCK(self, cb):
         va,size,funcva = cb
+        self._bumpFuncGraphsAt(va)
+        self._fgraph_cache.bumpFunction(funcva)
         self.codeblocks.remove(cb)
         self.codeblocks_by_funcva.get(cb[CB_FUNCVA]).remove(cb)
         self.blockmap.setMapLookup(va, size, None)
 
     def _handleADDXREF(self, einfo):
         fromva, tova, reftype, rflags = einfo
+        if reftype == REF_CODE:
+            self._fgraph_cache.bumpFunctionAtVa(fromva)
+
         xr_to = self.xrefs_by_to.get(tova, None)
         xr_from = self.xrefs_by_from.get(fromva, None)
         if xr_to is None:
@@ -380,6 +477,9 @@ class VivWorkspaceCore(viv_impapi.ImportApi):
 
     def _handleDELXREF(self, einfo):
         fromva, tova, reftype, refflags = einfo
+        if reftype == REF_CODE:
+            self._fgraph_cache.bumpFunctionAtVa(fromva)
+
         self.xrefs_by_to[tova].remove(einfo)
         self.xrefs_by_from[fromva].remove(einfo)
 
@@ -675,6 +775,7 @@ class VivWorkspaceCore(viv_impapi.ImportApi):
         # All meta values in the "ustruct" namespace are user defined
         # structure defintions in C.
         sname = name.split(':')[1]
+        import vstruct.cparse as vs_cparse
         ctor = vs_cparse.ctorFromCSource( ssrc )
         self.vsbuilder.addVStructCtor( sname, ctor )
 
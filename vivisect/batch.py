@@ -0,0 +1,405 @@
+'''
+Analyze many binaries in parallel.
+
+Each file is loaded, analyzed and saved (with the chosen storage module)
+in its own worker process so a job which hangs, runs out of memory or
+crashes the interpreter only costs that one file.  A JSON line describing
+every job (timings, stats from getStats() or the failure) is appended to
+the summary file as it finishes.
+
+Re-running the same command resumes the batch: files whose workspace
+was already written (or which already failed, see --retry) are skipped.
+Workspaces are written to a temporary name and renamed when complete, so
+a crash never leaves behind something which looks finished.
+
+Example:
+    python -m vivisect.batch -o /tmp/out -j 8 --timeout 600 --maxmem 4096 samples/
+    python -m vivisect.batch -o /tmp/out --manifest todo.txt -s vivisect.storage.mpfile
+'''
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import traceback
+import multiprocessing
+import multiprocessing.connection
+
+try:
+    import resource
+except ImportError:
+    # not available on windows (no memory caps there)
+    resource = None
+
+import envi.common as e_common
+
+import vivisect
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORAGE = 'vivisect.storage.basicfile'
+
+# job states which mean the job will not be run again (unless --retry)
+FINISHED = ('ok', 'error', 'timeout', 'crashed')
+
+
+def getStorageExt(storage):
+    '''
+    Return the workspace file extension for the given storage module.
+    '''
+    for ext, modname in vivisect.STORAGE_MAP.items():
+        if modname == storage:
+            return ext
+    return 'viv'
+
+
+def getJobs(paths=(), manifest=None, outdir='.', storage=DEFAULT_STORAGE):
+    '''
+    Return a list of job dicts ({'path':..., 'output':...}) for the given
+    files and directories (walked recursively) and/or the files listed in
+    a manifest (one path per line, # comments).
+
+    Files found in a directory keep their relative path under outdir,
+    other files are named by their basename.
+    '''
+    ext = getStorageExt(storage)
+
+    todo = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for fname in sorted(files):
+                    fpath = os.path.join(root, fname)
+                    todo.append((fpath, os.path.relpath(fpath, path)))
+        else:
+            todo.append((path, os.path.basename(path)))
+
+    if manifest is not None:
+        with open(manifest, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                todo.append((line, os.path.basename(line)))
+
+    jobs = []
+    seen = set()
+    for fpath, relname in todo:
+        output = os.path.join(outdir, '%s.%s' % (relname, ext))
+        if output in seen:
+            logger.warning('skipping %s (output %s is already used)', fpath, output)
+            continue
+        seen.add(output)
+        jobs.append({'path': fpath, 'output': output})
+
+    return jobs
+
+
+def loadSummary(filename):
+    '''
+    Return a dict of path: summary for the jobs recorded in a summary
+    file (the last record for each path wins).
+    '''
+    ret = {}
+    if not os.path.exists(filename):
+        return ret
+
+    with open(filename, 'r') as f:
+        for line in f:
+            try:
+                info = json.loads(line)
+            except ValueError:
+                # a line cut short by a crash
+                continue
+            ret[info.get('path')] = info
+
+    return ret
+
+
+def analyzeFile(filename, output, storage=DEFAULT_STORAGE, parsemod=None, options=(), doanalyze=True):
+    '''
+    Load (and analyze) filename into a new workspace and save it as
+    output.  Returns a summary dict of the timings and workspace stats.
+    '''
+    vw = vivisect.VivWorkspace()
+    for option in options:
+        vw.config.parseConfigOption(option)
+    vw.setMeta('StorageModule', storage)
+    vw.setMeta('StorageName', output)
+
+    start = time.time()
+    vw.loadFromFile(filename, fmtname=parsemod)
+    loaded = time.time()
+
+    if doanalyze:
+        vw.analyze()
+    analyzed = time.time()
+
+    # save to a temporary name, the rename marks the job complete
+    outdir = os.path.dirname(output)
+    if outdir:
+        os.makedirs(outdir, exist_ok=True)
+
+    partname = output + '.part'
+    vw.loadModule(storage).saveWorkspace(vw, partname)
+    os.replace(partname, output)
+    saved = time.time()
+
+    return {
+        'status': 'ok',
+        'format': vw.getMeta('Format'),
+        'arch': vw.getMeta('Architecture'),
+        'stats': vw.getStats(),
+        'load': loaded - start,
+        'analyze': analyzed - loaded,
+        'save': saved - analyzed,
+    }
+
+
+def _runJob(conn, job, config):
+    '''
+    The body of a worker process (see runBatch).
+    '''
+    try:
+        maxmem = config.get('maxmem')
+        if maxmem and resource is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (maxmem, maxmem))
+
+        info = analyzeFile(job['path'], job['output'],
+                           storage=config.get('storage', DEFAULT_STORAGE),
+                           parsemod=config.get('parsemod'),
+                           options=config.get('options', ()),
+                           doanalyze=config.get('doanalyze', True))
+
+    except BaseException as e:
+        info = {
+            'status': 'error',
+            'error': '%s: %s' % (e.__class__.__name__, e),
+            'traceback': traceback.format_exc(),
+        }
+
+    if resource is not None:
+        info['maxrss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    conn.send(info)
+    conn.close()
+
+
+class BatchStats:
+    '''
+    Aggregate counts and throughput for a batch run.
+    '''
+    def __init__(self):
+        self.start = time.time()
+        self.counts = {}
+        self.bytes = 0
+        self.funcs = 0
+
+    def addJob(self, info):
+        status = info.get('status')
+        self.counts[status] = self.counts.get(status, 0) + 1
+        if status == 'ok':
+            self.bytes += info.get('size', 0)
+            self.funcs += info.get('stats', {}).get('functions', 0)
+
+    def getReport(self):
+        secs = max(time.time() - self.start, 0.000001)
+        done = sum(count for status, count in self.counts.items() if status != 'skipped')
+        return {
+            'secs': secs,
+            'counts': dict(self.counts),
+            'files_per_sec': done / secs,
+            'bytes_per_sec': self.bytes / secs,
+            'funcs_per_sec': self.funcs / secs,
+        }
+
+
+def runBatch(jobs, summary, procs=None, timeout=None, maxmem=None, storage=DEFAULT_STORAGE,
+             parsemod=None, options=(), doanalyze=True, retry=False, callback=None):
+    '''
+    Run the given jobs (see getJobs()) across up to procs worker processes
+    and append a JSON line per job to the summary file.
+
+    timeout is in seconds per job and maxmem is the address space cap (in
+    bytes) of each worker.  callback (if given) is called with each job
+    summary dict.  Returns a BatchStats.
+    '''
+    if procs is None:
+        procs = multiprocessing.cpu_count()
+
+    config = {
+        'maxmem': maxmem,
+        'storage': storage,
+        'parsemod': parsemod,
+        'options': list(options),
+        'doanalyze': doanalyze,
+    }
+
+    stats = BatchStats()
+    previous = loadSummary(summary)
+
+    sumdir = os.path.dirname(summary)
+    if sumdir:
+        os.makedirs(sumdir, exist_ok=True)
+
+    sumfd = open(summary, 'a')
+
+    def finish(job, info):
+        info['path'] = job['path']
+        info['output'] = job['output']
+        stats.addJob(info)
+        if info['status'] != 'skipped':
+            sumfd.write(json.dumps(info) + '\n')
+            sumfd.flush()
+        if callback is not None:
+            callback(info)
+
+    pending = []
+    for job in jobs:
+        if os.path.exists(job['output']):
+            finish(job, {'status': 'skipped', 'reason': 'output exists'})
+            continue
+
+        prev = previous.get(job['path'])
+        if not retry and prev is not None and prev.get('status') in FINISHED:
+            finish(job, {'status': 'skipped', 'reason': prev.get('status')})
+            continue
+
+        pending.append(job)
+
+    pending.reverse()
+    running = {}    # sentinel: (proc, conn, job, starttime)
+
+    try:
+        while pending or running:
+
+            while pending and len(running) < procs:
+                job = pending.pop()
+                rconn, wconn = multiprocessing.Pipe(duplex=False)
+                proc = multiprocessing.Process(target=_runJob, args=(wconn, job, config))
+                proc.daemon = True
+                proc.start()
+                wconn.close()
+                running[proc.sentinel] = (proc, rconn, job, time.time())
+
+            waitfor = None
+            if timeout is not None:
+                oldest = min(start for (proc, conn, job, start) in running.values())
+                waitfor = max(oldest + timeout - time.time(), 0)
+
+            # a worker is done when its result arrives (or it dies)
+            waitlist = list(running.keys()) + [conn for (proc, conn, job, start) in running.values()]
+            multiprocessing.connection.wait(waitlist, timeout=waitfor)
+
+            now = time.time()
+            for sentinel, (proc, conn, job, start) in list(running.items()):
+                info = None
+                if conn.poll():
+                    try:
+                        info = conn.recv()
+                    except EOFError:
+                        info = None
+
+                    if info is None:
+                        info = {'status': 'crashed', 'error': 'worker exited (code %s)' % proc.exitcode}
+                    proc.join()
+
+                elif not proc.is_alive():
+                    proc.join()
+                    info = {'status': 'crashed', 'error': 'worker exited (code %s)' % proc.exitcode}
+
+                elif timeout is not None and now - start >= timeout:
+                    proc.kill()
+                    proc.join()
+                    info = {'status': 'timeout', 'error': 'killed after %d seconds' % timeout}
+
+                if info is None:
+                    continue
+
+                conn.close()
+                running.pop(sentinel)
+                info['secs'] = now - start
+                try:
+                    info['size'] = os.path.getsize(job['path'])
+                except OSError:
+                    pass
+                finish(job, info)
+
+    finally:
+        for proc, conn, job, start in running.values():
+            proc.kill()
+            proc.join()
+        sumfd.close()
+
+    return stats
+
+
+def setup():
+    ap = argparse.ArgumentParser('Analyze many binaries in parallel')
+    ap.add_argument('paths', nargs='*', help='Files or directories (walked recursively) to analyze')
+    ap.add_argument('-m', '--manifest', default=None, help='A file listing paths to analyze (one per line)')
+    ap.add_argument('-o', '--outdir', default='.', help='Directory for the saved workspaces')
+    ap.add_argument('-j', '--procs', type=int, default=None, help='Number of worker processes (default: cpu count)')
+    ap.add_argument('-t', '--timeout', type=float, default=None, help='Seconds before a job is killed')
+    ap.add_argument('--maxmem', type=int, default=None, help='Address space cap (MB) for each worker')
+    ap.add_argument('-s', '--storage', default=DEFAULT_STORAGE, help='Storage module for the saved workspaces')
+    ap.add_argument('-p', '--parser', dest='parsemod', default=None, help='Manually specify the parser module')
+    ap.add_argument('-O', '--option', dest='options', default=[], action='append',
+                    help='<secname>.<optname>=<optval> (optval must be json syntax)')
+    ap.add_argument('-A', '--skip-analysis', dest='doanalyze', default=True, action='store_false',
+                    help='Only load (and save) the files')
+    ap.add_argument('--summary', default=None, help='JSON lines summary file (default: <outdir>/batch.jsonl)')
+    ap.add_argument('--retry', default=False, action='store_true', help='Re-run jobs which failed previously')
+    ap.add_argument('-v', '--verbose', default=0, action='count', help='Enable verbose mode (multiples matter: -vvvv)')
+    return ap
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    opts = setup().parse_args(argv)
+    level = e_common.LOG_LEVELS[min(opts.verbose, len(e_common.LOG_LEVELS) - 1)]
+    e_common.initLogging(logger, level=level)
+
+    if not opts.paths and opts.manifest is None:
+        setup().print_usage()
+        return -1
+
+    summary = opts.summary
+    if summary is None:
+        summary = os.path.join(opts.outdir, 'batch.jsonl')
+
+    maxmem = None
+    if opts.maxmem:
+        maxmem = opts.maxmem * 1024 * 1024
+
+    jobs = getJobs(opts.paths, manifest=opts.manifest, outdir=opts.outdir, storage=opts.storage)
+
+    def report(info):
+        if info['status'] == 'skipped':
+            logger.debug('%s: skipped (%s)', info['path'], info['reason'])
+        elif info['status'] == 'ok':
+            logger.info('%s: ok %.2fs %r', info['path'], info['secs'], info['stats'])
+        else:
+            logger.warning('%s: %s %s', info['path'], info['status'], info.get('error'))
+
+    stats = runBatch(jobs, summary, procs=opts.procs, timeout=opts.timeout, maxmem=maxmem,
+                     storage=opts.storage, parsemod=opts.parsemod, options=opts.options,
+                     doanalyze=opts.doanalyze, retry=opts.retry, callback=report)
+
+    rep = stats.getReport()
+    counts = ', '.join('%s %d' % (status, count) for status, count in sorted(rep['counts'].items()))
+    print('%d jobs in %.1fs (%s)' % (len(jobs), rep['secs'], counts))
+    print('%.2f files/sec, %.1f KB/sec, %.1f functions/sec' %
+          (rep['files_per_sec'], rep['bytes_per_sec'] / 1024.0, rep['funcs_per_sec']))
+
+    if any(status not in ('ok', 'skipped') for status in rep['counts']):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,7 +11,6 @@ import traceback
 import collections
 from getopt import getopt
 
-import vtrace
 import vivisect
 import vivisect.vamp as viv_vamp
 import vivisect.vector as viv_vector
@@ -23,10 +22,7 @@ import vivisect.tools.graphutil as v_t_graph
 
 import visgraph.pathcore as vg_path
 
-import vtrace.envitools as vt_envitools
-
-import vdb
-
+import envi as e_envi
 import envi.cli as e_cli
 import envi.common as e_common
 import envi.memory as e_memory
@@ -109,9 +105,8 @@ class VivCli(e_cli.EnviCli, vivisect.VivWorkspace):
             self.vprint(str(e))
             return
 
-        g = v_t_graph.buildFunctionGraph(self, fva)
         pathcnt = 0
-        for path in v_t_graph.getCodePaths(g):
+        for path in v_t_graph.getCachedCodePaths(self, fva):
             self.vprint('Path through 0x%.8x: %s' % (fva, [hex(p[0]) for p in path]))
             pathcnt += 1
         self.vprint('Total Paths: %d' % pathcnt)
@@ -270,7 +265,7 @@ class VivCli(e_cli.EnviCli, vivisect.VivWorkspace):
             # setup valist from function data
             try:
                 fva = options.funcva
-                graph = viv_graph.buildFunctionGraph(self, fva)
+                graph = viv_graph.getCachedFunctionGraph(self, fva, copy=False)
             except Exception as e:
                 self.vprint(repr(e))
                 return
@@ -336,7 +331,7 @@ class VivCli(e_cli.EnviCli, vivisect.VivWorkspace):
                             except:
                                 pass
 
-                            if numpattrn in vars(oper).values():
+                            if numpattrn in e_envi.getObjVars(oper).values():
                                 addthis = True
 
                 # search full text
@@ -628,6 +623,9 @@ class VivCli(e_cli.EnviCli, vivisect.VivWorkspace):
         if not line:
             return self.do_help("emulate")
 
+        import vdb
+        import vtrace.envitools as vt_envitools
+
         addr = self.parseExpression(line)
         emu = self.getEmulator(va=addr)
 
@@ -772,6 +770,7 @@ class VivCli(e_cli.EnviCli, vivisect.VivWorkspace):
             except Exception:
                 self.vprint('Invalid Remote Host: %s' % line)
 
+            import vtrace
             vtrace.remote = line
 
         import vivisect.vdbext as viv_vdbext
@@ -1,6 +1,9 @@
 '''
 Various codeflow oriented graph constructs.
 '''
+import threading
+import collections
+
 import envi
 import visgraph.graphcore as v_graphcore
 
@@ -199,6 +202,11 @@ class CodeBlockGraph(v_graphcore.HierGraph):
     def getNodeByVa(self, va):
         return self.nodevas.get(va)
 
+    def copyGraph(self):
+        g = v_graphcore.HierGraph.copyGraph(self)
+        g.nodevas = dict((va, g.getNode(node[0])) for va, node in self.nodevas.items())
+        return g
+
 class FuncBlockGraph(CodeBlockGraph):
 
     def __init__(self, vw, fva):
@@ -209,3 +217,104 @@ class FuncBlockGraph(CodeBlockGraph):
     def _getCodeBranches(self, va):
         return [ x for x in CodeBlockGraph._getCodeBranches(self,va) if not x[1] & envi.BR_PROC ]
 
+
+class FuncGraphCache:
+    '''
+    A bounded (LRU) cache of per-function graphs and the data derived
+    from them (code paths, symbolik effects, etc).
+
+    Every function has a "version" which is bumped by the workspace
+    whenever an event changes the shape of that function's graph
+    (codeblocks, code xrefs, NOFALL locations...).  Cached entries are
+    tagged with the version they were built against and are discarded
+    once it no longer matches.
+
+    NOTE: cached values are shared.  Callers who intend to modify the
+          graph they get back must make a copy (see Graph.copyGraph()).
+    '''
+    def __init__(self, vw, depth=512):
+        self.vw = vw
+        self.depth = depth
+        self.versions = collections.defaultdict(int)
+        self.cache = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.cache)
+
+    def setCacheDepth(self, depth):
+        '''
+        Set the maximum number of entries kept in the cache.
+        '''
+        with self.lock:
+            self.depth = depth
+            self._trimCache()
+
+    def _trimCache(self):
+        while len(self.cache) > self.depth:
+            self.cache.popitem(last=False)
+
+    def clearCache(self):
+        '''
+        Drop every cached entry (versions are retained).
+        '''
+        with self.lock:
+            self.cache.clear()
+
+    def getFuncVersion(self, fva):
+        '''
+        Return the current graph version for the given function.
+        '''
+        return self.versions[fva]
+
+    def bumpFunction(self, fva):
+        '''
+        Mark the graph of the given function as changed, discarding
+        anything cached for it.
+        '''
+        if fva is None:
+            return
+
+        with self.lock:
+            self.versions[fva] += 1
+            for key in [k for k in self.cache if k[0] == fva]:
+                self.cache.pop(key)
+
+    def bumpFunctionAtVa(self, va):
+        '''
+        Bump the version of whichever function owns the code block
+        containing va (if any).
+        '''
+        # Nothing can go stale while the cache is empty (which is
+        # the common case during initial analysis)...
+        if not self.cache:
+            return
+        self.bumpFunction(self.vw.getFunction(va))
+
+    def getFuncData(self, fva, name, ctor):
+        '''
+        Retrieve the cached value of "name" for the function, calling
+        ctor(vw, fva) to (re)build it on a miss or a version change.
+
+        Example:
+            g = cache.getFuncData(fva, 'fgraph', buildFunctionGraph)
+        '''
+        key = (fva, name)
+        with self.lock:
+            vers = self.versions[fva]
+            ent = self.cache.get(key)
+            if ent is not None and ent[0] == vers:
+                self.cache.move_to_end(key)
+                return ent[1]
+
+        val = ctor(self.vw, fva)
+
+        with self.lock:
+            # if an event bumped the function while we were building
+            # don't cache what we built
+            if self.versions[fva] == vers:
+                self.cache[key] = (vers, val)
+                self.cache.move_to_end(key)
+                self._trimCache()
+
+        return val
@@ -1,9 +1,12 @@
-import vdb
+import envi.defconfig as e_defconfig
 
 defconfig = {
     'viv':{
 
         'SymbolCacheSave':True,
+        'SaveSnapshot':False,
+        'CompactEventLog':False,
+        'EventLogSpill':False,
 
         'parsers':{
             'pe':{
@@ -37,11 +40,11 @@ defconfig = {
             },
         },
     },
-    'cli':vdb.defconfig.get('cli'), # FIXME make our own...
-    'vdb':vdb.defconfig.get('vdb'),
+    'cli':e_defconfig.defconfig.get('cli'), # FIXME make our own...
+    'vdb':e_defconfig.defconfig.get('vdb'),
 }
 
-defconfig.get('cli').update(vdb.defconfig.get('cli'))
+defconfig.get('cli').update(e_defconfig.defconfig.get('cli'))
 
 # Config elements docs
 docconfig = {
@@ -49,6 +52,9 @@ docconfig = {
     'viv':{
 
         'SymbolCacheSave':'Save vivisect names to the vdb configured symbol cache?',
+        'SaveSnapshot':'Save a state snapshot next to the workspace so loading it can skip replaying events?',
+        'CompactEventLog':'Keep the workspace event log msgpack encoded in memory (smaller, decoded when exported)?',
+        'EventLogSpill':'With CompactEventLog, spill the older event log chunks to a temporary file?',
 
         'parsers':{
             'pe':{
@@ -83,5 +89,5 @@ docconfig = {
 
     },
 
-    'vdb':vdb.docconfig.get('vdb'),
+    'vdb':e_defconfig.docconfig.get('vdb'),
 }
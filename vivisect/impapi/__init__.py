@@ -2,6 +2,8 @@
 Calling convention and API definitions for various APIs/archs.
 '''
 import sys
+import threading
+import importlib.util
 
 
 class ImportApi:
@@ -9,11 +11,38 @@ class ImportApi:
     def __init__(self):
         self._api_lookup = {}
         self._apitype_lookup = {}
+        # impapi modules added by addImpApi() but not yet imported
+        self._api_pending = []
+        self._api_lock = threading.Lock()
+
+    def _loadImpApis(self):
+        '''
+        Import any pending impapi modules (in the order they were added)
+        and merge their definitions into the lookup dictionaries.
+        '''
+        with self._api_lock:
+            while self._api_pending:
+                modname = self._api_pending[0]
+                __import__(modname)
+                mod = sys.modules[modname]
+                self._api_lookup.update(mod.api)
+                self._apitype_lookup.update(mod.apitypes)
+                self._api_pending.pop(0)
+
+    def _getApiDef(self, funcname):
+        if self._api_pending:
+            self._loadImpApis()
+        return self._api_lookup.get(funcname.lower())
 
     def getImpApiType(self, tname):
+        if self._api_pending:
+            self._loadImpApis()
         return self._apitype_lookup.get(tname)
 
     def updateApiDef(self, apidict):
+        # keep the "last one added wins" ordering with pending modules
+        if self._api_pending:
+            self._loadImpApis()
         self._api_lookup.update(apidict)
 
     def getImpApi(self, funcname):
@@ -21,52 +50,61 @@ class ImportApi:
         An API definition consists of the following:
             ( rettype, retname, callconv, funcname, ( (argtype, argname), ...) )
         '''
-        return self._api_lookup.get(funcname.lower())
+        return self._getApiDef(funcname)
 
     def getImpApiCallConv(self, funcname):
-        ret = self._api_lookup.get(funcname.lower())
+        ret = self._getApiDef(funcname)
         if ret is None:
             return None
         return ret[2]
 
     def getImpApiArgs(self, funcname):
-        ret = self._api_lookup.get(funcname.lower())
+        ret = self._getApiDef(funcname)
         if ret is None:
             return None
         return ret[4]
 
     def getImpApiRetType(self, funcname):
-        ret = self._api_lookup.get(funcname.lower())
+        ret = self._getApiDef(funcname)
         if ret is None:
             return None
         return ret[0]
 
     def getImpApiRetName(self, funcname):
-        ret = self._api_lookup.get(funcname.lower())
+        ret = self._getApiDef(funcname)
         if ret is None:
             return None
         return ret[1]
 
     def getImpApiArgTypes(self, funcname):
-        ret = self._api_lookup.get(funcname.lower())
+        ret = self._getApiDef(funcname)
         if ret is None:
             return None
         return [argt for (argt, argn) in ret[4]]
 
     def getImpApiArgNames(self, funcname):
-        ret = self._api_lookup.get(funcname.lower())
+        ret = self._getApiDef(funcname)
         if ret is None:
             return None
         return [argn for (argt, argn) in ret[4]]
 
     def addImpApi(self, api, arch):
+        '''
+        Add the API definitions for the given api/arch (ie. 'windows', 'i386').
+
+        The definition module is not imported until the first API lookup,
+        so workspaces which never ask for an API don't pay for it.
+        '''
         api = api.lower()
         arch = arch.lower()
         modname = 'vivisect.impapi.%s.%s' % (api, arch)
-        __import__(modname)
-        mod = sys.modules[modname]
-        self._api_lookup.update(mod.api)
-        self._apitype_lookup.update(mod.apitypes)
+        if importlib.util.find_spec(modname) is None:
+            raise ModuleNotFoundError('No module named %r' % modname, name=modname)
+
+        with self._api_lock:
+            if modname in self._api_pending:
+                self._api_pending.remove(modname)
+            self._api_pending.append(modname)
 
 
 def getImportApi(api, arch):
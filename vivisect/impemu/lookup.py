@@ -1,20 +1,40 @@
 '''
 Home for the registered emulators of different types...
+
+The emulator modules (and the envi architectures they pull in) are
+imported by name the first time an emulator for that arch is needed.
 '''
-import vivisect.impemu.platarch.h8 as v_i_h8
-import vivisect.impemu.platarch.arm as v_i_arm
-import vivisect.impemu.platarch.i386 as v_i_i386
-import vivisect.impemu.platarch.amd64 as v_i_amd64
-import vivisect.impemu.platarch.msp430 as v_i_msp430
-import vivisect.impemu.platarch.windows as v_i_windows
+import importlib
 
 workspace_emus  = {
-    'h8' :v_i_h8.H8WorkspaceEmulator,
-    'arm' :v_i_arm.ArmWorkspaceEmulator,
-    'i386'  :v_i_i386.i386WorkspaceEmulator,
-    'amd64' :v_i_amd64.Amd64WorkspaceEmulator,
-    'msp430' :v_i_msp430.Msp430WorkspaceEmulator,
-    'thumb' :v_i_arm.ThumbWorkspaceEmulator,
-    'thumb16' :v_i_arm.Thumb16WorkspaceEmulator,
-    ('windows','i386'):v_i_windows.Windowsi386Emulator,
+    'h8' :'vivisect.impemu.platarch.h8.H8WorkspaceEmulator',
+    'arm' :'vivisect.impemu.platarch.arm.ArmWorkspaceEmulator',
+    'i386'  :'vivisect.impemu.platarch.i386.i386WorkspaceEmulator',
+    'amd64' :'vivisect.impemu.platarch.amd64.Amd64WorkspaceEmulator',
+    'msp430' :'vivisect.impemu.platarch.msp430.Msp430WorkspaceEmulator',
+    'thumb' :'vivisect.impemu.platarch.arm.ThumbWorkspaceEmulator',
+    'thumb16' :'vivisect.impemu.platarch.arm.Thumb16WorkspaceEmulator',
+    ('windows','i386'):'vivisect.impemu.platarch.windows.Windowsi386Emulator',
 }
+
+
+def getWorkspaceEmulator(arch, plat=None):
+    '''
+    Return the WorkspaceEmulator class for the given arch (preferring a
+    platform specific one if registered) or None.
+
+    Example:
+        eclass = getWorkspaceEmulator('i386', plat='windows')
+    '''
+    ename = workspace_emus.get((plat, arch))
+    if ename is None:
+        ename = workspace_emus.get(arch)
+
+    if ename is None:
+        return None
+
+    if not isinstance(ename, str):
+        return ename
+
+    modname, clsname = ename.rsplit('.', 1)
+    return getattr(importlib.import_module(modname), clsname)
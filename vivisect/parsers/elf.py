@@ -13,7 +13,6 @@ import vivisect.parsers as v_parsers
 
 from vivisect.const import *
 
-from io import BytesIO
 
 
 logger = logging.getLogger(__name__)
@@ -26,13 +25,11 @@ elog.setLevel(logger.getEffectiveLevel())
 
 
 def parseFile(vw, filename, baseaddr=None):
-    fd = open(filename, 'rb')
-    elf = Elf.Elf(fd)
+    elf = Elf.elfFromFileName(filename)
     return loadElfIntoWorkspace(vw, elf, filename=filename, baseaddr=baseaddr)
 
 def parseBytes(vw, bytes, baseaddr=None):
-    fd = BytesIO(bytes)
-    elf = Elf.Elf(fd)
+    elf = Elf.elfFromBytes(bytes)
     return loadElfIntoWorkspace(vw, elf, baseaddr=baseaddr)
 
 def parseFd(vw, fd, filename=None, baseaddr=None):
@@ -185,9 +182,10 @@ def loadElfIntoWorkspace(vw, elf, filename=None, baseaddr=None):
 
     if filename is None:
         # see if dynamics DT_SONAME holds a name for us
-        for dyn in elf.getDynamics():
-            if dyn.d_tag == Elf.DT_SONAME:
-                filename = dyn.getName()
+        dyns = elf.getDynamicTable()
+        for d_tag, name in zip(dyns.getColumn('d_tag'), dyns.names):
+            if d_tag == Elf.DT_SONAME:
+                filename = name
 
         # if all else fails, fallback
         if filename is None:
@@ -397,15 +395,15 @@ def loadElfIntoWorkspace(vw, elf, filename=None, baseaddr=None):
 
     # get "Dynamics" based items, like NEEDED libraries (dependencies)
     elfmeta = {}
-    for d in elf.getDynamics():
-        if d.d_tag == Elf.DT_NEEDED:
-            name = d.getName()
+    dyns = elf.getDynamicTable()
+    for d_tag, d_value, name in zip(dyns.getColumn('d_tag'), dyns.getColumn('d_value'), dyns.names):
+        if d_tag == Elf.DT_NEEDED:
             name = name.split('.')[0].lower()
             vw.addLibraryDependancy(name)
         else:
-            logger.debug("DYNAMIC:\t%r", d)
+            logger.debug("DYNAMIC:\t%r %r 0x%x", name, Elf.dt_names.get(d_tag), d_value)
 
-        elfmeta[Elf.dt_names.get(d.d_tag)] = d.d_value
+        elfmeta[Elf.dt_names.get(d_tag)] = d_value
 
     # TODO: create a VaSet instead? setMeta allows more free-form info,
     # but isn't currently accessible from the gui
@@ -415,12 +413,17 @@ def loadElfIntoWorkspace(vw, elf, filename=None, baseaddr=None):
     # applyRelocs is specifically prior to "process Dynamic Symbols" because Dynamics-only symbols
     # (ie. not using Section Headers) may not get all the symbols.  Some ELF's simply list too
     # small a space using SYMTAB and SYMTABSZ
-    postfix = applyRelocs(elf, vw, addbase, baseaddr)
+    with vw.deferRelocations():
+        postfix = applyRelocs(elf, vw, addbase, baseaddr)
+
+    # the relocations which need the symbol values are applied (in bulk) after them
+    symfix = []
 
     # process Dynamic Symbols - this must happen *after* relocations, which can expand the size of this
-    for s in elf.getDynSyms():
-        stype = s.getInfoType()
-        sva = s.st_value
+    dynsyms = elf.getDynSymTable()
+    rows = zip(dynsyms.getColumn('st_value'), dynsyms.getColumn('st_info'), dynsyms.getColumn('st_other'), dynsyms.names)
+    for sva, st_info, st_other, symname in rows:
+        stype = st_info & 0xf
 
         if sva == 0:
             continue
@@ -429,54 +432,58 @@ def loadElfIntoWorkspace(vw, elf, filename=None, baseaddr=None):
         if sva == 0:
             continue
 
-        dmglname = demangle(s.name)
+        dmglname = demangle(symname)
 
         if stype == Elf.STT_FUNC or \
                 (stype == Elf.STT_GNU_IFUNC and arch in ('i386', 'amd64')):   # HACK: linux is what we're really after.
             try:
                 new_functions.append(("DynSym: STT_FUNC", sva))
                 vw.addExport(sva, EXP_FUNCTION, dmglname, fname, makeuniq=True)
-                vw.setComment(sva, s.name)
+                vw.setComment(sva, symname)
             except Exception as e:
-                vw.vprint('addExport Failure: (%s) %s' % (s.name, e))
+                vw.vprint('addExport Failure: (%s) %s' % (symname, e))
 
         elif stype == Elf.STT_OBJECT:
             if vw.isValidPointer(sva):
                 try:
                     vw.addExport(sva, EXP_DATA, dmglname, fname, makeuniq=True)
-                    vw.setComment(sva, s.name)
+                    vw.setComment(sva, symname)
                 except Exception:
                     vw.vprint('STT_OBJECT Warning: %s' % traceback.format_exc())
 
         elif stype == Elf.STT_HIOS:
             # So aparently Elf64 binaries on amd64 use HIOS and then
             # s.st_other cause that's what all the kewl kids are doing...
-            sva = s.st_other
+            sva = st_other
             if addbase:
                 sva += baseaddr
             if vw.isValidPointer(sva):
                 try:
                     new_functions.append(("DynSym: STT_HIOS", sva))
                     vw.addExport(sva, EXP_FUNCTION, dmglname, fname, makeuniq=True)
-                    vw.setComment(sva, s.name)
+                    vw.setComment(sva, symname)
                 except Exception:
                     vw.vprint('STT_HIOS Warning:\n%s' % traceback.format_exc())
 
         elif stype == Elf.STT_MDPROC:    # there's only one that isn't HI or LO...
-            sva = s.st_other
+            sva = st_other
             if addbase:
                 sva += baseaddr
             if vw.isValidPointer(sva):
                 try:
                     vw.addExport(sva, EXP_DATA, dmglname, fname, makeuniq=True)
-                    vw.setComment(sva, s.name)
+                    vw.setComment(sva, symname)
                 except Exception:
                     vw.vprint('STT_MDPROC Warning:\n%s' % traceback.format_exc())
 
         else:
-            logger.debug("DYNSYM:\t%r\t%r\t%r\t%r", s, s.getInfoType(), 'other', hex(s.st_other))
+            logger.debug("DYNSYM:\t0x%.8x %s\t%r\t%r\t%r", sva, symname, stype, 'other', hex(st_other))
 
         if dmglname in postfix:
+            symfix.append((dmglname, sva))
+
+    with vw.deferRelocations():
+        for dmglname, sva in symfix:
             for rlva, addend in postfix[dmglname]:
                 if addbase:
                     vw.addRelocation(rlva, RTYPE_BASEPTR, sva + addend - baseaddr)
@@ -487,26 +494,27 @@ def loadElfIntoWorkspace(vw, elf, filename=None, baseaddr=None):
     vw.addVaSet("WeakSymbols", (("Name", VASET_STRING), ("va", VASET_ADDRESS)))
 
     # apply symbols to workspace (if any)
-    relocs = elf.getRelocs()
-    impvas = [va for va, x, y, z in vw.getImports()]
-    expvas = [va for va, x, y, z in vw.getExports()]
-    for s in elf.getSymbols():
-        sva = s.st_value
-        dmglname = demangle(s.name)
+    relocs = elf.getRelocTable()
+    relocsbyname = None
+    impvas = set([va for va, x, y, z in vw.getImports()])
+    expvas = set([va for va, x, y, z in vw.getExports()])
+    syms = elf.getSymbolTable()
+    rows = zip(syms.getColumn('st_value'), syms.getColumn('st_size'), syms.getColumn('st_info'), syms.getColumn('st_other'), syms.names)
+    for sva, st_size, st_info, st_other, symname in rows:
+        dmglname = demangle(symname)
 
         logger.debug('symbol val: 0x%x\ttype: %r\tbind: %r\t name: %r', sva,
-                                                                        Elf.st_info_type.get(s.st_info, s.st_info),
-                                                                        Elf.st_info_bind.get(s.st_other, s.st_other),
-                                                                        s.name)
+                                                                        Elf.st_info_type.get(st_info, st_info),
+                                                                        Elf.st_info_bind.get(st_other, st_other),
+                                                                        symname)
 
-        if s.getInfoType() == Elf.STT_FILE:
+        if (st_info & 0xf) == Elf.STT_FILE:
             vw.setVaSetRow('FileSymbols', (dmglname, sva))
             continue
 
-        elif s.getInfoType() == Elf.STT_NOTYPE:
+        elif (st_info & 0xf) == Elf.STT_NOTYPE:
             # mapping symbol
             if arch in ('arm', 'thumb', 'thumb16'):
-                symname = s.getName()
                 if addbase:
                     sva += baseaddr
                 if symname == '$a':
@@ -523,14 +531,13 @@ def loadElfIntoWorkspace(vw, elf, filename=None, baseaddr=None):
                     # Data Items (eg. literal pool)
                     logger.info('mapping (NOTYPE) data symbol: 0x%x: %r', sva, dmglname)
                     data_ptrs.append(sva)
-        elif s.getInfoType() == Elf.STT_OBJECT:
-            symname = s.getName()
+        elif (st_info & 0xf) == Elf.STT_OBJECT:
             if addbase:
                 sva += baseaddr
             if symname:
                 vw.makeName(sva, symname, filelocal=True, makeuniq=True)
                 valu = vw.readMemoryPtr(sva)
-                if not vw.isValidPointer(valu) and s.st_size == vw.psize:
+                if not vw.isValidPointer(valu) and st_size == vw.psize:
                     vw.makePointer(sva, follow=False)
                 else:
                     '''
@@ -545,27 +552,31 @@ def loadElfIntoWorkspace(vw, elf, filename=None, baseaddr=None):
                         if len(byts) == psize:
                             new_pointers.append((sva, valu, symname))
                     elif vw.isProbablyUnicode(sva):
-                        vw.makeUnicode(sva, size=s.st_size)
+                        vw.makeUnicode(sva, size=st_size)
                     elif vw.isProbablyString(sva):
-                        vw.makeString(sva, size=s.st_size)
-                    elif s.st_size % vw.getPointerSize() == 0 and s.st_size >= vw.getPointerSize():
+                        vw.makeString(sva, size=st_size)
+                    elif st_size % vw.getPointerSize() == 0 and st_size >= vw.getPointerSize():
                         # so it could be something silly like an array
-                        for addr in range(sva, sva+s.st_size, vw.psize):
+                        for addr in range(sva, sva+st_size, vw.psize):
                             valu = vw.readMemoryPtr(addr)
                             if vw.isValidPointer(valu):
                                 new_pointers.append((addr, valu, symname))
                     else:
-                        vw.makeNumber(sva, size=s.st_size)
+                        vw.makeNumber(sva, size=st_size)
 
         # if the symbol has a value of 0, it is likely a relocation point which gets updated
-        sname = demangle(s.name)
+        sname = demangle(symname)
         if sva == 0:
-            for reloc in relocs:
-                rname = demangle(reloc.name)
-                if rname == sname:
-                    sva = reloc.r_offset
-                    logger.info('sva==0, using relocation name: %x: %r', sva, rname)
-                    break
+            if relocsbyname is None:
+                # first reloc (offset) for each demangled name
+                relocsbyname = {}
+                for rname, r_offset in zip(relocs.names, relocs.getColumn('r_offset')):
+                    if rname is not None:
+                        relocsbyname.setdefault(demangle(rname), r_offset)
+
+            if sname in relocsbyname:
+                sva = relocsbyname[sname]
+                logger.info('sva==0, using relocation name: %x: %r', sva, sname)
 
         dmglname = demangle(sname)
 
@@ -575,7 +586,7 @@ def loadElfIntoWorkspace(vw, elf, filename=None, baseaddr=None):
             sva += baseaddr
         if vw.isValidPointer(sva) and len(dmglname):
             try:
-                if s.getInfoBind() == Elf.STB_WEAK:
+                if (st_info >> 4) == Elf.STB_WEAK:
                     logger.info('WEAK symbol: 0x%x: %r', sva, sname)
                     vw.setVaSetRow('WeakSymbols', (sname, sva))
                     dmglname = '__weak_' + dmglname
@@ -583,14 +594,14 @@ def loadElfIntoWorkspace(vw, elf, filename=None, baseaddr=None):
                 if sva in impvas or sva in expvas:
                     imps = [imp for imp in vw.getImports() if imp[0] == sva]
                     exps = [exp for exp in vw.getExports() if exp[0] == sva]
-                    logger.debug('skipping Symbol naming for existing Import/Export: 0x%x (%r) (%r) (%r)', sva, s.name, imps, exps)
+                    logger.debug('skipping Symbol naming for existing Import/Export: 0x%x (%r) (%r) (%r)', sva, symname, imps, exps)
                 else:
                     vw.makeName(sva, dmglname, filelocal=True, makeuniq=True)
 
             except Exception as e:
                 logger.warning("%s" % str(e))
 
-        if s.st_info == Elf.STT_FUNC:
+        if st_info == Elf.STT_FUNC:
             new_functions.append(("STT_FUNC", sva))
 
     if addbase:
@@ -625,17 +636,17 @@ def applyRelocs(elf, vw, addbase=False, baseaddr=0):
     '''
     postfix = collections.defaultdict(list)
     arch = arch_names.get(elf.e_machine)
-    relocs = elf.getRelocs()
+    relocs = elf.getRelocTable()
     logger.debug("reloc len: %d", len(relocs))
-    for r in relocs:
-        rtype = Elf.getRelocType(r.r_info)
-        rlva = r.r_offset
+    # walk the reloc columns, objects are only built for logging/ARM addends
+    rows = zip(relocs.getColumn('r_offset'), relocs.getColumn('r_info'), relocs.getColumn('r_addend'), relocs.names)
+    for idx, (rlva, r_info, r_addend, name) in enumerate(rows):
+        rtype = Elf.getRelocType(r_info)
         if addbase:
             rlva += baseaddr
         try:
             # If it has a name, it's an externally resolved "import" entry,
             # otherwise, just a regular reloc
-            name = r.getName()
             dmglname = demangle(name)
             logger.debug('relocs: 0x%x: %s (%s)', rlva, dmglname, name)
             if arch in ('i386', 'amd64'):
@@ -643,7 +654,7 @@ def applyRelocs(elf, vw, addbase=False, baseaddr=0):
                     #if dmglname == 
                     if rtype == Elf.R_X86_64_IRELATIVE:
                         # before making import, let's fix up the pointer as a BASEPTR Relocation
-                        ptr = r.r_addend
+                        ptr = r_addend
                         rloc = vw.addRelocation(rlva, RTYPE_BASEPTR, ptr)
                         if rloc:
                             logger.info('Reloc: R_X86_64_IRELATIVE 0x%x', rlva)
@@ -661,11 +672,11 @@ def applyRelocs(elf, vw, addbase=False, baseaddr=0):
                         # a direct punch in plus an addend
                         # but things like libstc++ use this type for vtables in the rel.dyn
                         # section without actually specifying an addend
-                        postfix[dmglname].append((rlva, getattr(r, 'r_addend', 0)))
+                        postfix[dmglname].append((rlva, r_addend or 0))
 
                     else:
                         logger.warning('unknown reloc type: %d %s (at %s)', rtype, name, hex(rlva))
-                        logger.info(r.tree())
+                        logger.info(relocs[idx].tree())
 
                 else:
                     if rtype == Elf.R_386_RELATIVE: # R_X86_64_RELATIVE is the same number
@@ -675,7 +686,7 @@ def applyRelocs(elf, vw, addbase=False, baseaddr=0):
 
                     elif rtype == Elf.R_X86_64_IRELATIVE:
                         # first make it a relocation that is based on the imagebase
-                        ptr = r.r_addend
+                        ptr = r_addend
                         logger.info('R_X86_64_IRELATIVE: adding Relocation 0x%x -> 0x%x (name: %r %r) ', rlva, ptr, name, dmglname)
                         rloc = vw.addRelocation(rlva, RTYPE_BASEPTR, ptr)
                         if rloc is not None:
@@ -696,16 +707,16 @@ def applyRelocs(elf, vw, addbase=False, baseaddr=0):
                         pass
                     else:
                         logger.warning('unknown reloc type: %d %s (at %s)', rtype, name, hex(rlva))
-                        logger.warning(r.tree())
+                        logger.warning(relocs[idx].tree())
 
 
             if arch in ('arm', 'thumb', 'thumb16'):
                 # ARM REL entries require an addend that could be stored as a 
                 # number or an instruction!
                 import envi.archs.arm.const as eaac
-                if r.vsHasField('addend'):
+                if relocs.hasField(idx, 'addend'):
                     # this is a RELA object, bringing its own addend field!
-                    addend = r.addend
+                    addend = relocs[idx].addend
                 else:
                     # otherwise, we have to check the stored value for number or instruction
                     # if it's an instruction, we have to use the immediate value and then 
@@ -740,7 +751,7 @@ def applyRelocs(elf, vw, addbase=False, baseaddr=0):
                 logger.debug('addend: 0x%x', addend)
 
                 if rtype == Elf.R_ARM_JUMP_SLOT:
-                    symidx = r.getSymTabIndex()
+                    symidx = relocs.getSymTabIndex(idx)
                     sym = elf.getDynSymbol(symidx)
                     ptr = sym.st_value
 
@@ -772,7 +783,7 @@ def applyRelocs(elf, vw, addbase=False, baseaddr=0):
                         vw.setComment(rlva, name)
 
                 elif rtype == Elf.R_ARM_GLOB_DAT:
-                    symidx = r.getSymTabIndex()
+                    symidx = relocs.getSymTabIndex(idx)
                     sym = elf.getDynSymbol(symidx)
                     ptr = sym.st_value
 
@@ -798,7 +809,7 @@ def applyRelocs(elf, vw, addbase=False, baseaddr=0):
                         vw.setComment(rlva, name)
 
                 elif rtype == Elf.R_ARM_ABS32:
-                    symidx = r.getSymTabIndex()
+                    symidx = relocs.getSymTabIndex(idx)
                     sym = elf.getDynSymbol(symidx)
                     ptr = sym.st_value
 
@@ -829,7 +840,7 @@ def applyRelocs(elf, vw, addbase=False, baseaddr=0):
 
                 else:
                     logger.warning('unknown reloc type: %d %s (at %s)', rtype, name, hex(rlva))
-                    logger.info(r.tree())
+                    logger.info(relocs[idx].tree())
 
         except vivisect.InvalidLocation as e:
             logger.warning("NOTE\t%r", e)
@@ -878,9 +889,10 @@ def getRelRo(elf):
             break
 
     if status:
-        for dyn in elf.getDynamics():
-            if dyn.d_tag == Elf.DT_FLAGS:
-                if dyn.d_value == Elf.DF_BIND_NOW:
+        dyns = elf.getDynamicTable()
+        for d_tag, d_value in zip(dyns.getColumn('d_tag'), dyns.getColumn('d_value')):
+            if d_tag == Elf.DT_FLAGS:
+                if d_value == Elf.DF_BIND_NOW:
                     status = 2
 
     return ('NONE', 'Partial', 'FULL')[status]
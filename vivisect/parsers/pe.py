@@ -1,5 +1,4 @@
 import logging
-from io import BytesIO
 
 import PE
 import PE.carve as pe_carve
@@ -33,14 +32,12 @@ for mod in (PE, vtrace):
 
 
 def parseFile(vw, filename, baseaddr=None):
-    pe = PE.PE(open(filename, "rb"))
+    pe = PE.peFromFileName(filename)
     return loadPeIntoWorkspace(vw, pe, filename=filename, baseaddr=baseaddr)
 
 
 def parseBytes(vw, bytes, baseaddr=None):
-    fd = BytesIO(bytes)
-    fd.seek(0)
-    pe = PE.PE(fd)
+    pe = PE.peFromBytes(bytes)
     return loadPeIntoWorkspace(vw, pe, baseaddr=baseaddr)
 
 
@@ -347,29 +344,31 @@ def loadPeIntoWorkspace(vw, pe, filename=None, baseaddr=None):
         reloc_va += baseaddr
     vw.setFileMeta(fname, "reloc_va", reloc_va)
 
-    for rva, rtype in pe.getRelocations():
+    # apply the relocations in bulk (each memory write copies the map)
+    with vw.deferRelocations():
+        for rva, rtype in zip(*pe.getRelocationColumns()):
 
-        # map PE reloc to VIV reloc ( or dont... )
-        vtype = relmap.get(rtype)
-        if vtype is None:
-            logger.info('Skipping PE Relocation type: %d at %d (no handler)', rtype, rva)
-            continue
+            # map PE reloc to VIV reloc ( or dont... )
+            vtype = relmap.get(rtype)
+            if vtype is None:
+                logger.info('Skipping PE Relocation type: %d at %d (no handler)', rtype, rva)
+                continue
 
-        try:
-            mapoffset = vw.readMemoryPtr(rva + baseaddr) - baseaddr
-        except:
-            # the target adderss of the relocation is not accessible.
-            # for example, it's not mapped, or split across sections, etc.
-            # technically, the PE is corrupt.
-            # by continuing on here, we are a bit more robust (but maybe incorrect)
-            # than the Windows loader.
-            #
-            # discussed in:
-            # https://github.com/vivisect/vivisect/issues/346
-            logger.warning('Skipping invalid PE relocation: %d', rva)
-            continue
-        else:
-            vw.addRelocation(rva + baseaddr, vtype, mapoffset)
+            try:
+                mapoffset = vw.readMemoryPtr(rva + baseaddr) - baseaddr
+            except:
+                # the target adderss of the relocation is not accessible.
+                # for example, it's not mapped, or split across sections, etc.
+                # technically, the PE is corrupt.
+                # by continuing on here, we are a bit more robust (but maybe incorrect)
+                # than the Windows loader.
+                #
+                # discussed in:
+                # https://github.com/vivisect/vivisect/issues/346
+                logger.warning('Skipping invalid PE relocation: %d', rva)
+                continue
+            else:
+                vw.addRelocation(rva + baseaddr, vtype, mapoffset)
 
     for rva, lname, iname in pe.getImports():
         if vw.probeMemory(rva + baseaddr, 4, e_const.MM_READ):
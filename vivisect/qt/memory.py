@@ -3,6 +3,7 @@ import logging
 from PyQt5 import Qt
 from PyQt5.QtWidgets import *
 
+import envi.memcanvas as e_memcanvas
 import envi.qt.memory as e_mem_qt
 import envi.qt.memcanvas as e_mem_canvas
 
@@ -23,6 +24,10 @@ logger = logging.getLogger(__name__)
 qt_horizontal   = 1
 qt_vertical     = 2
 
+# pixels per rendered line (to size the render window) and per wheel line
+canv_lineheight = 16
+canv_wheelstep = 40
+
 
 class VivCanvasBase(vq_hotkey.HotKeyMixin, e_mem_canvas.VQMemoryCanvas):
 
@@ -303,49 +308,32 @@ class VivCanvasBase(vq_hotkey.HotKeyMixin, e_mem_canvas.VQMemoryCanvas):
 
 class VQVivMemoryCanvas(VivCanvasBase):
 
-    def _wheelEventCallback(self, data):
-        '''
-        Ugh. Yes. I know this sucks.
-        But we have to do this because QtWebEngine does't natively let you get the max scroll size.
-        You *have* to go through javascript to get those elements, and the only way to be sure of
-        the function finishing (and being able to get a value outta js) is via this callback
-        mechanism they set up.
-        '''
-        if not data:
-            return
-        smin = data[0]
-        spos = data[1]
-        smax = data[2]
-        if not len(self._canv_rendvas):
-            pass
-
-        elif spos >= smax:
-            lastva, lastsize = self._canv_rendvas[-1]
-            mapva, mapsize, mperm, mfname = self.vw.getMemoryMap(lastva)
-            sizeremain = (mapva + mapsize) - (lastva + lastsize)
-            if sizeremain:
-                self.renderMemoryAppend(min(sizeremain, 128))
-
-        elif spos == smin:
-            firstva, firstsize = self._canv_rendvas[0]
-            mapva, mapsize, mperm, mfname = self.vw.getMemoryMap(firstva)
-            sizeremain = firstva - mapva
-            if sizeremain:
-                self.renderMemoryPrepend(min(sizeremain, 128))
+    def _getWindowRows(self):
+        return max(self.height() // canv_lineheight, 1)
+
+    def renderMemory(self, va, size, rend=None):
+        # only the lines around va which fit the view are rendered (the
+        # wheel moves the window) so size is ignored
+        def callScroll(data):
+            self._selectVa(va)
+        return self.renderMemoryWindow(va, self._getWindowRows(), rend=rend, cb=callScroll)
+
+    def renderMemoryWindow(self, va, rows, margin=e_memcanvas.rend_margin, rend=None, cb=None):
+        def scrollTop(data):
+            # keep the margin above the view
+            self._scrollToVa(self._canv_window[0])
+            if cb is not None:
+                cb(data)
+        return VivCanvasBase.renderMemoryWindow(self, va, rows, margin=margin, rend=rend, cb=scrollTop)
 
     def wheelEvent(self, event):
-        page = self.page()
-        page.runJavaScript('''
-        var pcur = window.innerHeight + window.pageYOffset
-        var scrollMaxY = Math.max(
-            document.body.scrollHeight, document.documentElement.scrollHeight,
-            document.body.offsetHeight, document.documentElement.offsetHeight,
-            document.body.clientHeight, document.documentElement.clientHeight,
-        );
-        [window.innerHeight, pcur, scrollMaxY];
-        ''', self._wheelEventCallback)
-
-        return e_mem_canvas.VQMemoryCanvas.wheelEvent(self, event)
+        if self._canv_window is None:
+            return e_mem_canvas.VQMemoryCanvas.wheelEvent(self, event)
+
+        lines = -event.angleDelta().y() // canv_wheelstep
+        if lines:
+            self.scrollMemoryWindow(lines)
+        event.accept()
 
     def _clearColorMap(self):
         page = self.page()
@@ -371,7 +359,7 @@ class VQVivMemoryCanvas(VivCanvasBase):
         return (nva, va-nva)
 
 
-class VQVivMemoryView(e_mem_qt.VQMemoryWindow, viv_base.VivEventCore):
+class VQVivMemoryView(e_mem_qt.VQMemoryWindow, viv_rend.WorkspaceCanvasEvents, viv_base.VivEventCore):
 
     def __init__(self, vw, vwqgui):
         self.vw = vw
@@ -386,6 +374,7 @@ class VQVivMemoryView(e_mem_qt.VQMemoryWindow, viv_base.VivEventCore):
 
         vwqgui.addEventCore(self)
         self.mem_canvas._canv_rend_middle = True
+        self.mem_canvas.setRenderCache()
 
         self.addHotKeyTarget('viv:xrefsto', self._viv_xrefsto)
         self.addHotKey('x', 'viv:xrefsto')
@@ -486,47 +475,12 @@ class VQVivMemoryView(e_mem_qt.VQMemoryWindow, viv_base.VivEventCore):
         self.mem_canvas.addRenderer('Viv', vivrend)
         self.mem_canvas.setRenderer('Viv')
 
-    def _updateFunction(self, fva):
-        for cbva, cbsize, cbfva in self.vw.getFunctionBlocks(fva):
-            self.mem_canvas.renderMemoryUpdate(cbva, cbsize)
-
     def VTE_IAMLEADER(self, vw, event, einfo):
         user, followname = einfo
 
-    def VWE_SYMHINT(self, vw, event, einfo):
-        va, idx, hint = einfo
-        self.mem_canvas.renderMemoryUpdate(va, 1)
-
-    def VWE_ADDLOCATION(self, vw, event, einfo):
-        va, size, ltype, tinfo = einfo
-        self.mem_canvas.renderMemoryUpdate(va, size)
-
-    def VWE_DELLOCATION(self, vw, event, einfo):
-        va, size, ltype, tinfo = einfo
-        self.mem_canvas.renderMemoryUpdate(va, size)
-
-    def VWE_ADDFUNCTION(self, vw, event, einfo):
-        va, meta = einfo
-        self.mem_canvas.renderMemoryUpdate(va, 1)
-
-    def VWE_SETFUNCMETA(self, vw, event, einfo):
-        fva, key, val = einfo
-        self._updateFunction(fva)
-
-    def VWE_SETFUNCARGS(self, vw, event, einfo):
-        fva, fargs = einfo
-        self._updateFunction(fva)
-
-    def VWE_COMMENT(self, vw, event, einfo):
-        va, cmnt = einfo
-        self.mem_canvas.renderMemoryUpdate(va, 1)
-
     @idlethread
     def VWE_SETNAME(self, vw, event, einfo):
-        va, name = einfo
-        self.mem_canvas.renderMemoryUpdate(va, 1)
-        for fromva, tova, rtype, rflag in self.vw.getXrefsTo(va):
-            self.mem_canvas.renderMemoryUpdate(fromva, 1)
+        viv_rend.WorkspaceCanvasEvents.VWE_SETNAME(self, vw, event, einfo)
 
     @idlethread
     def VTE_IAMLEADER(self, vw, event, einfo):
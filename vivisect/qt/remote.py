@@ -166,7 +166,7 @@ def saveToServer(vw, parent=None):
 @e_threads.firethread
 def sendServerWorkspace(vw, wsname, wsserver):
     try:
-        events = vw.exportWorkspace()
+        events = list(vw.exportWorkspace())
         server = viv_server.connectToServer(wsserver)
         server.addNewWorkspace(wsname, events)
     except Exception as e:
@@ -0,0 +1,128 @@
+'''
+Measure the cost of applying relocations while loading a file and while
+replaying (importWorkspace) its events.
+
+Rebased relocations write a pointer to memory each.  They are applied in
+bulk (see VivWorkspace.deferRelocations()), this compares that with the
+write per relocation way (and checks that both result in the same memory).
+Most relocations only write memory when the file is loaded at a base
+address other than its own, so large PIE/shared ELFs (libc, libstdc++) or
+PEs loaded with --baseaddr show the difference.
+
+Example:
+    python -m vivisect.relocbench /usr/lib/x86_64-linux-gnu/libc.so.6 --baseaddr 0x40000000
+    python -m vivisect.relocbench libstdc++.so.6 --runs 3 --no-compare
+'''
+import sys
+import time
+import argparse
+import contextlib
+
+import vivisect
+
+from vivisect.const import *
+
+
+@contextlib.contextmanager
+def nodefer():
+    yield
+
+
+def getWorkspace(defer=True):
+    vw = vivisect.VivWorkspace()
+    if not defer:
+        # apply each relocation with its own memory write
+        vw.deferRelocations = nodefer
+    return vw
+
+
+def timeParse(filename, defer=True, baseaddr=None):
+    '''
+    Load filename into a new workspace and return (msecs, vw).
+    '''
+    vw = getWorkspace(defer=defer)
+    start = time.time()
+    vw.loadFromFile(filename, baseaddr=baseaddr)
+    return (time.time() - start) * 1000.0, vw
+
+
+def timeReplay(events, defer=True):
+    '''
+    Replay the events into a new workspace and return (msecs, vw).
+    '''
+    vw = getWorkspace(defer=defer)
+    start = time.time()
+    vw.importWorkspace(events)
+    return (time.time() - start) * 1000.0, vw
+
+
+def getMemBytes(vw):
+    return [(mva, bytes(mbytes)) for mva, mmaxva, mmap, mbytes in vw._map_defs]
+
+
+def bestOf(runs, func, *args, **kwargs):
+    best = None
+    for i in range(runs):
+        msecs, vw = func(*args, **kwargs)
+        if best is None or msecs < best[0]:
+            best = (msecs, vw)
+    return best
+
+
+def runBench(filename, runs=1, compare=True, baseaddr=None):
+    '''
+    Return a dict of the parse and replay times (in ms) for filename, with
+    and (if compare) without bulk relocations.
+    '''
+    results = {}
+    msecs, vw = bestOf(runs, timeParse, filename, baseaddr=baseaddr)
+    results['relocs'] = len(vw.getRelocations())
+    results['parse'] = msecs
+
+    events = list(vw.exportWorkspace())
+    msecs, rvw = bestOf(runs, timeReplay, events)
+    results['replay'] = msecs
+
+    if compare:
+        msecs, ovw = bestOf(runs, timeParse, filename, defer=False, baseaddr=baseaddr)
+        results['parse_nodefer'] = msecs
+        if getMemBytes(ovw) != getMemBytes(vw):
+            raise Exception('%s: bulk relocations changed the parsed memory' % filename)
+
+        msecs, ovw = bestOf(runs, timeReplay, events, defer=False)
+        results['replay_nodefer'] = msecs
+        if getMemBytes(ovw) != getMemBytes(rvw):
+            raise Exception('%s: bulk relocations changed the replayed memory' % filename)
+
+    return results
+
+
+def setup():
+    ap = argparse.ArgumentParser('Measure the cost of applying relocations')
+    ap.add_argument('files', nargs='+', help='Files to load (and replay the events of)')
+    ap.add_argument('--runs', type=int, default=1, help='Report the best of this many runs')
+    ap.add_argument('--baseaddr', type=lambda x: int(x, 0), default=None,
+                    help='Load the files at this base address (rebases their relocations)')
+    ap.add_argument('--no-compare', dest='compare', action='store_false',
+                    help='Do not time (and check) writing each relocation on its own')
+    return ap
+
+
+def main(argv):
+    opts = setup().parse_args(argv)
+
+    for fname in opts.files:
+        res = runBench(fname, runs=opts.runs, compare=opts.compare, baseaddr=opts.baseaddr)
+        print('%s: %d relocations' % (fname, res['relocs']))
+        for name in ('parse', 'replay'):
+            line = '    %-8s %10.1fms' % (name, res[name])
+            other = res.get(name + '_nodefer')
+            if other is not None:
+                line += '  (%.1fms per write, %.1fx)' % (other, other / max(res[name], 0.001))
+            print(line)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,11 +1,15 @@
 import os
 import sys
+import time
+import zlib
 import cobra
 import queue
 import logging
 import argparse
 import threading
 
+import msgpack
+
 import cobra.dcode
 
 import envi.common as e_common
@@ -13,6 +17,8 @@ import envi.threads as e_threads
 
 import vivisect.cli as v_cli
 import vivisect.parsers as v_parsers
+import vivisect.storage.mpfile as viv_mpfile
+import vivisect.storage.compact as viv_compact
 import vivisect.storage.basicfile as viv_basicfile
 
 from vivisect.const import *
@@ -31,40 +37,212 @@ timeo_aban = 120   # 2 minute timeout for abandon
 # This should *only* rev when they're truly incompatible
 server_version = 20130820
 
+# compressed workspace snapshots are sent to clients in chunks this big
+snap_chunksize = 0x100000
+# refresh a snapshot every snap_refresh seconds once this many events
+# have been fired since it was taken
+snap_refresh = 300
+snap_refresh_events = 10000
+
+
+def getStorageModule(fpath):
+    '''
+    Return the storage module for the workspace file at fpath.
+    '''
+    if v_parsers.guessFormatFilename(fpath) == 'mpviv':
+        return viv_mpfile
+    return viv_basicfile
+
+
+def packEventChunks(events, chunksize=snap_chunksize):
+    '''
+    Serialize a list of events as a zlib compressed msgpack stream split
+    into a list of chunks of (at most) chunksize bytes.
+    '''
+    comp = zlib.compressobj()
+    packer = msgpack.Packer(use_bin_type=True)
+    parts = [comp.compress(packer.pack(evt)) for evt in events]
+    parts.append(comp.flush())
+
+    data = b''.join(parts)
+    return [data[i:i + chunksize] for i in range(0, len(data), chunksize)]
+
+
+def iterChunkEvents(chunks):
+    '''
+    Yield the events from an iterable of chunks made by packEventChunks()
+    (as they arrive).
+
+    Example:
+        chunks = (server.getSnapshotChunk(chan, i) for i in range(count))
+        vw.importWorkspace(iterChunkEvents(chunks))
+    '''
+    decomp = zlib.decompressobj()
+    unpacker = msgpack.Unpacker(**viv_mpfile.loadargs)
+    for chunk in chunks:
+        unpacker.feed(decomp.decompress(chunk))
+        for evt in unpacker:
+            yield evt
+
+    unpacker.feed(decomp.flush())
+    for evt in unpacker:
+        yield evt
+
+
+class WorkspaceCache:
+    '''
+    A snapshot (as compressed chunks) of a shared workspace's event log
+    and the events fired since it was taken.  Offsets are indexes into the
+    full event log of the workspace.
+
+    The snapshot is the event log as is.  Clients which ask for it get a
+    compacted (see vivisect.storage.compact) copy of the same snapshot,
+    which is built the first time one does.
+    '''
+    def __init__(self, events):
+        self.count = len(events)
+        self.tail = []
+        self.compchunks = None
+        self._setSnapshot(self.count, events)
+
+    def _setSnapshot(self, offset, events, compchunks=None):
+        self.snapoffset = offset
+        self.snaptime = time.time()
+        self.chunks = packEventChunks(events)
+        self.compchunks = compchunks
+
+    def getChunks(self, compact=False):
+        '''
+        Return the chunks of the snapshot (or of its compacted copy).
+        NOTE: call with the workspace lock held
+        '''
+        if not compact:
+            return self.chunks
+
+        if self.compchunks is None:
+            events = viv_compact.compactEvents(list(iterChunkEvents(self.chunks)))
+            self.compchunks = packEventChunks(events)
+        return self.compchunks
+
+    def addEvent(self, evtup):
+        self.tail.append(evtup)
+        self.count += 1
+
+    def getTail(self, offset):
+        '''
+        Return the events after offset (or None if offset is before the
+        snapshot).
+        '''
+        if offset > self.count:
+            raise Exception('Invalid event offset: %d (workspace has %d)' % (offset, self.count))
+
+        if offset < self.snapoffset:
+            return None
+
+        return self.tail[offset - self.snapoffset:]
+
+    def needsRefresh(self):
+        if len(self.tail) >= snap_refresh_events:
+            return True
+        return bool(self.tail) and time.time() > self.snaptime + snap_refresh
+
+    def refresh(self, lock):
+        '''
+        Fold the events fired since the snapshot into a new one.  (The
+        work is done without holding the workspace lock)
+        '''
+        with lock:
+            chunks = self.chunks
+            compact = self.compchunks is not None
+            tail = list(self.tail)
+            offset = self.count
+
+        events = list(iterChunkEvents(chunks))
+        events.extend(tail)
+
+        # only keep a compacted copy up to date if clients have asked for one
+        compchunks = None
+        if compact:
+            compchunks = packEventChunks(viv_compact.compactEvents(events))
+
+        with lock:
+            self._setSnapshot(offset, events, compchunks=compchunks)
+            del self.tail[:len(tail)]
+
 
 class VivServerClient:
     '''
     Implement "glue" methods for the vivisect workspace client to
     talk to the server...
     '''
-    def __init__(self, vw, server, wsname):
+    def __init__(self, vw, server, wsname, compact=False):
         self.vw = vw
         self.chan = None
         self.wsname = wsname
+        self.compact = compact
         self.server = server
-        self.eoffset = 0
+        self.eoffset = None
+        self.snapinfo = None
         self.q = queue.Queue()  # The actual local Q we deliver to
 
     @e_threads.firethread
     def _eatServerEvents(self):
+        if self.eoffset is None:
+            # an older server, no offsets to resume from
+            while True:
+                for event in self.server.getNextEvents(self.chan):
+                    self.q.put(event)
+
         while True:
-            for event in self.server.getNextEvents(self.chan):
+            try:
+                offset, events = self.server.getNextEventsAt(self.chan)
+            except Exception as e:
+                logger.warning('Lost event channel (%s), resuming from event %d', e, self.eoffset)
+                time.sleep(timeo_wait)
+                try:
+                    self.chan, snapinfo = self.server.createEventChannelAt(self.wsname, self.eoffset)
+                except Exception as e:
+                    logger.warning('Resume failed: %s', e)
+                continue
+
+            # NOTE: a resume delivers our own events since eoffset again
+            for event in events:
                 self.q.put(event)
+            self.eoffset = offset
 
     def vprint(self, msg):
         return self.server.vprint(msg)
 
     def _fireEvent(self, event, einfo, local=False, skip=None):
+        if skip is not None:
+            # the workspace skips its own channel, which may have been
+            # replaced by a resume since
+            skip = self.chan
         return self.server._fireEvent(self.wsname, event, einfo, local=local, skip=skip)
 
     def createEventChannel(self):
-        self.chan = self.server.createEventChannel(self.wsname)
+        try:
+            if self.compact:
+                self.chan, self.snapinfo = self.server.createEventChannelAt(self.wsname, None, True)
+            else:
+                self.chan, self.snapinfo = self.server.createEventChannelAt(self.wsname)
+            self.eoffset = self.snapinfo[0]
+        except Exception as e:
+            logger.info('Server has no snapshots (%s), loading all events', e)
+            self.chan = self.server.createEventChannel(self.wsname)
+
         self._eatServerEvents()
         return self.chan
 
     def exportWorkspace(self):
         # Retrieve the big initial list of viv events
-        return self.server.getNextEvents(self.chan)
+        if self.snapinfo is None:
+            return self.server.getNextEvents(self.chan)
+
+        # or the snapshot as it streams in
+        offset, count = self.snapinfo
+        chunks = (self.server.getSnapshotChunk(self.chan, i) for i in range(count))
+        return iterChunkEvents(chunks)
 
     def waitForEvent(self, chan, timeout=None):
         return self.q.get(timeout=timeout)
@@ -76,12 +254,14 @@ class VivServer:
         self.path = os.path.abspath(dirname)
 
         self.wsdict = {}
+        self.wscache = {}
         self.chandict = {}
         self.wslock = threading.Lock()
 
         self._loadWorkspaces()
         self._maintThread()
         self._saveWorkspaceThread()
+        self._snapshotThread()
 
     def vprint(self, msg):
         print(msg)
@@ -98,7 +278,7 @@ class VivServer:
             if chaninfo is None:
                 continue
 
-            wsinfo, queue = chaninfo
+            wsinfo, queue, cache, chunks = chaninfo
             if queue.abandoned(timeo_aban):
                 # Remove from our chandict
                 self.chandict.pop(chan, None)
@@ -112,10 +292,18 @@ class VivServer:
         for wsinfo in self.wsdict.values():
             lock, path, events, users = wsinfo
             if events:
+                # the file and pending events must always add up to
+                # the whole event log (see _getWorkspaceEvents)
                 with lock:
+                    getStorageModule(path).vivEventsAppendFile(path, events)
                     wsinfo[2] = []  # start a new events list...
 
-                viv_basicfile.vivEventsAppendFile(path, events)
+    @e_threads.maintthread(30)
+    def _snapshotThread(self):
+        for wsname, cache in list(self.wscache.items()):
+            wsinfo = self.wsdict.get(wsname)
+            if wsinfo is not None and cache.needsRefresh():
+                cache.refresh(wsinfo[0])
 
     def _req_wsinfo(self, wsname):
         wsinfo = self.wsdict.get(wsname)
@@ -153,6 +341,7 @@ class VivServer:
             wsinfo = self.wsdict.get(wsname)
             if not os.path.isfile(wsinfo[1]):
                 self.wsdict.pop(wsname, None)
+                self.wscache.pop(wsname, None)
 
         for dirname, dirnames, filenames in os.walk(self.path):
             for filename in filenames:
@@ -163,7 +352,7 @@ class VivServer:
                     continue
 
                 with open(wspath, 'rb') as f:
-                    ext = f.read(6)
+                    ext = f.read(8)
 
                 if not ext:
                     continue
@@ -179,11 +368,57 @@ class VivServer:
                     logger.debug('loaded: %s', wsname)
                     self.wsdict[wsname] = wsinfo
 
-    def getNextEvents(self, chan):
+    def _req_chaninfo(self, chan):
         chaninfo = self.chandict.get(chan)
         if chaninfo is None:
             raise Exception('Invalid Channel: %s' % chan)
-        return chaninfo[1].get(timeout=timeo_wait)
+        return chaninfo
+
+    def _getWorkspaceEvents(self, wsinfo):
+        # NOTE: call with the workspace lock held
+        lock, fpath, pevents, users = wsinfo
+        events = getStorageModule(fpath).vivEventsFromFile(fpath)
+        events.extend(pevents)
+        return events
+
+    def _getWorkspaceCache(self, wsname, wsinfo):
+        # NOTE: call with the workspace lock held
+        cache = self.wscache.get(wsname)
+        if cache is None:
+            cache = WorkspaceCache(self._getWorkspaceEvents(wsinfo))
+            self.wscache[wsname] = cache
+        return cache
+
+    def getNextEvents(self, chan):
+        return self._req_chaninfo(chan)[1].get(timeout=timeo_wait)
+
+    def getNextEventsAt(self, chan):
+        '''
+        Return (offset, events) for the next events on the channel, where
+        offset is the event log offset the client is at once it has them.
+        '''
+        wsinfo, queue, cache, chunks = self._req_chaninfo(chan)
+        events = queue.get(timeout=timeo_wait)
+        lock, fpath, pevents, users = wsinfo
+        with lock:
+            # an abandoned channel misses events, the client must resume
+            if users.get(chan) is not queue:
+                raise Exception('Invalid Channel: %s' % chan)
+
+            # nothing is fired while we hold the lock, so every event up
+            # to the offset is either in here or came from the client
+            events.extend(queue.get(timeout=0))
+            return cache.count, events
+
+    def getSnapshotChunk(self, chan, idx):
+        '''
+        Return a compressed chunk of the snapshot for a channel made by
+        createEventChannelAt() (see iterChunkEvents()).
+        '''
+        wsinfo, queue, cache, chunks = self._req_chaninfo(chan)
+        if chunks is None:
+            raise Exception('Channel %s has no snapshot' % chan)
+        return chunks[idx]
 
     # All APIs from here down are basically mirrors of the workspace APIs
     # used with remote workspaces, with a prepended wsname first argument
@@ -195,6 +430,9 @@ class VivServer:
             # Transient events do not get saved
             if not event & VTE_MASK:
                 pevents.append(evtup)
+                cache = self.wscache.get(wsname)
+                if cache is not None:
+                    cache.addEvent(evtup)
             # SPEED HACK
             [q.append(evtup) for (chan, q) in users.items() if chan != skip]
 
@@ -204,20 +442,60 @@ class VivServer:
 
         lock, fpath, pevents, users = wsinfo
         with lock:
-            events = []
-            events.extend(viv_basicfile.vivEventsFromFile(fpath))
-            events.extend(pevents)
+            cache = self._getWorkspaceCache(wsname, wsinfo)
+            events = list(iterChunkEvents(cache.getChunks()))
+            events.extend(cache.tail)
             # These must reference the same actual list object...
             queue = e_threads.ChunkQueue(items=events)
             users[chan] = queue
-            self.chandict[chan] = [wsinfo, queue]
+            self.chandict[chan] = [wsinfo, queue, cache, None]
 
         return chan
 
+    def createEventChannelAt(self, wsname, offset=None, compact=False):
+        '''
+        Create an event channel and return (chan, snapinfo).
+
+        With no offset, snapinfo is (offset, count) for the workspace
+        snapshot (count chunks from getSnapshotChunk()) and the channel
+        delivers the events after it.  With compact=True the snapshot
+        is a compacted copy of the event log.  To resume a client which
+        already has the events up to offset, the channel delivers the
+        events after offset and snapinfo is None.
+        '''
+        wsinfo = self._req_wsinfo(wsname)
+        chan = e_common.hexify(os.urandom(16))
+
+        lock, fpath, pevents, users = wsinfo
+        with lock:
+            cache = self._getWorkspaceCache(wsname, wsinfo)
+            chunks = None
+            snapinfo = None
+            if offset is None:
+                chunks = cache.getChunks(compact=compact)
+                snapinfo = (cache.snapoffset, len(chunks))
+                events = list(cache.tail)
+            else:
+                events = cache.getTail(offset)
+                if events is None:
+                    # from before the snapshot, back to the log for these
+                    events = self._getWorkspaceEvents(wsinfo)[offset:]
+
+            queue = e_threads.ChunkQueue(items=events)
+            users[chan] = queue
+            self.chandict[chan] = [wsinfo, queue, cache, chunks]
 
-def getServerWorkspace(server, wsname):
+        return chan, snapinfo
+
+
+def getServerWorkspace(server, wsname, compact=False):
+    '''
+    Return a workspace which shares the named workspace on the server.
+    With compact=True it is loaded from a compacted copy of the event log
+    (fewer events, the same state).
+    '''
     vw = v_cli.VivCli()
-    cliproxy = VivServerClient(vw, server, wsname)
+    cliproxy = VivServerClient(vw, server, wsname, compact=compact)
     vw.initWorkspaceClient(cliproxy)
     return vw
 
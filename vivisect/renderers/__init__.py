@@ -16,6 +16,70 @@ import envi.memcanvas as e_canvas
 logger = logging.getLogger(__name__)
 
 
+class WorkspaceCanvasEvents:
+    '''
+    A mixin for a VivEventCore which keeps the workspace renders on its
+    mem_canvas current (and the canvas render cache, see
+    MemoryCanvas.setRenderCache()) by updating what the events change.
+    '''
+    def _updateFunction(self, fva):
+        self.mem_canvas.renderMemoryUpdate(fva, 1)
+        for cbva, cbsize, cbfva in self.vw.getFunctionBlocks(fva):
+            self.mem_canvas.renderMemoryUpdate(cbva, cbsize)
+
+    def VWE_SYMHINT(self, vw, event, einfo):
+        va, idx, hint = einfo
+        self.mem_canvas.renderMemoryUpdate(va, 1)
+
+    def VWE_ADDLOCATION(self, vw, event, einfo):
+        va, size, ltype, tinfo = einfo
+        self.mem_canvas.renderMemoryUpdate(va, size)
+
+    def VWE_DELLOCATION(self, vw, event, einfo):
+        va, size, ltype, tinfo = einfo
+        self.mem_canvas.renderMemoryUpdate(va, size)
+
+    def VWE_ADDSEGMENT(self, vw, event, einfo):
+        va, size, name, fname = einfo
+        self.mem_canvas.renderMemoryUpdate(va, 1)
+
+    def VWE_ADDFUNCTION(self, vw, event, einfo):
+        va, meta = einfo
+        self.mem_canvas.renderMemoryUpdate(va, 1)
+
+    def VWE_DELFUNCTION(self, vw, event, fva):
+        self.mem_canvas.renderMemoryUpdate(fva, 1)
+
+    def VWE_SETFUNCMETA(self, vw, event, einfo):
+        fva, key, val = einfo
+        self._updateFunction(fva)
+
+    def VWE_SETFUNCARGS(self, vw, event, einfo):
+        fva, fargs = einfo
+        self._updateFunction(fva)
+
+    def VWE_ADDXREF(self, vw, event, einfo):
+        # the xref count at tova (and a pointer at fromva)
+        fromva, tova, rtype, rflags = einfo
+        self.mem_canvas.renderMemoryUpdate(fromva, 1)
+        self.mem_canvas.renderMemoryUpdate(tova, 1)
+
+    def VWE_DELXREF(self, vw, event, einfo):
+        fromva, tova, rtype, rflags = einfo
+        self.mem_canvas.renderMemoryUpdate(fromva, 1)
+        self.mem_canvas.renderMemoryUpdate(tova, 1)
+
+    def VWE_COMMENT(self, vw, event, einfo):
+        va, cmnt = einfo
+        self.mem_canvas.renderMemoryUpdate(va, 1)
+
+    def VWE_SETNAME(self, vw, event, einfo):
+        va, name = einfo
+        self.mem_canvas.renderMemoryUpdate(va, 1)
+        for fromva, tova, rtype, rflag in self.vw.getXrefsTo(va):
+            self.mem_canvas.renderMemoryUpdate(fromva, 1)
+
+
 class WorkspaceRenderer(e_canvas.MemoryRenderer):
     def __init__(self, vw):
         self.vw = vw
@@ -47,6 +111,19 @@ class WorkspaceRenderer(e_canvas.MemoryRenderer):
         self.renderLocation(mcanv, loc, name, func, cmnt, extra)
         return lsize
 
+    def getUnitVa(self, mcanv, va):
+        loc = self.vw.getLocation(va)
+        if loc is None:
+            return va
+        return loc[L_VA]
+
+    def getPrevUnitVa(self, mcanv, va):
+        # undefined bytes are rendered one at a time
+        loc = self.vw.getLocation(va - 1)
+        if loc is None:
+            return va - 1
+        return loc[L_VA]
+
     def renderLocation(self, mcanv, loc, name, isfunc, cmnt, extra):
         """
         Actually render a given VA to the given text buffer.
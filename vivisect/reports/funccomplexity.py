@@ -1,12 +1,39 @@
 # Mnemonic distribution
 # Reverse depth
+import logging
+
+import vivisect.tools.graphutil as v_t_graph
+
+logger = logging.getLogger(__name__)
 
 columns = (
     ("Code Blocks", int),
     ("Mnem Dist", int),
+    ("Loops", int),
+    ("Loop Depth", int),
 )
 
 
+def getLoopStats(vw, fva):
+    '''
+    Return a (loopcount, maxdepth) tuple for the natural loops in the
+    given function.
+    '''
+    fgraph = v_t_graph.getCachedFunctionGraph(vw, fva, copy=False)
+    loops = fgraph.getNaturalLoops()
+    nesting = fgraph.getLoopNesting(loops=loops)
+
+    maxdepth = 0
+    for hnid in nesting:
+        depth = 0
+        while hnid is not None:
+            depth += 1
+            hnid = nesting.get(hnid)
+        maxdepth = max(maxdepth, depth)
+
+    return len(loops), maxdepth
+
+
 def report(vw):
     ret = {}
     cbtot = {}
@@ -16,6 +43,12 @@ def report(vw):
 
     for f, c in cbtot.items():
         mndist = vw.getFunctionMeta(f, "MnemDist", -1)
-        ret[f] = (c, mndist)
+        try:
+            loops, depth = getLoopStats(vw, f)
+        except Exception as e:
+            # graph construction raises plain Exceptions for broken functions
+            logger.warning('failed to compute loop stats for function 0x%.8x: %s', f, e)
+            loops, depth = -1, -1
+        ret[f] = (c, mndist, loops, depth)
 
     return ret
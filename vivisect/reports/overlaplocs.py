@@ -1,5 +1,5 @@
 """Locate locations which overlap"""
-from vivisect.const import *
+import vivisect.tools.locations as v_t_locs
 
 
 columns = (
@@ -11,14 +11,6 @@ columns = (
 
 def report(vw):
     res = {}
-    for i in range(LOC_MAX):
-        for lva, size, ltype, tinfo in vw.getLocations(i):
-            va = lva + 1
-            maxva = lva + size
-            while va < maxva:
-                othr = vw.getLocation(va, range=True)
-                if othr is not None:
-                    if lva != othr[0]:
-                        res[lva] = (va-lva, vw.reprLocation((lva, size, ltype, tinfo)), vw.reprLocation(othr))
-                va += 1
+    for loc, othr, size in v_t_locs.getLocationOverlaps(vw):
+        res[loc[0]] = (size, vw.reprLocation(loc), vw.reprLocation(othr))
     return res
@@ -0,0 +1,289 @@
+'''
+Measure the startup cost of vivbin and vdbbin.
+
+Each measurement runs in a fresh python process (so nothing is already
+imported or cached).  For the entry point modules this reports the total
+import time and the import time per top level package (from python's
+-X importtime).  For any files given it also reports the time until the
+workspace fires its first event while loading the file, the time to
+finish loading and the wall time of a full "vivbin -B" run.
+
+Example:
+    python -m vivisect.startbench
+    python -m vivisect.startbench /bin/ls --runs 5 --save start.json
+    python -m vivisect.startbench /bin/ls --baseline start.json
+'''
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import collections
+
+# entry points whose import cost we track
+entry_modules = (
+    'vivisect.vivbin',
+    'vdb.vdbbin',
+)
+
+# module prefixes which must only be imported when something needs them
+lazy_modules = {
+    'vivisect.vivbin': (
+        'cobra',
+        'vtrace',
+        'vdb',
+        'pycparser',
+        'vstruct.cparse',
+        'envi.archs',
+        'vivisect.impemu.platarch',
+        'vivisect.symboliks',
+        'vivisect.qt',
+        'vqt',
+        'PyQt5',
+    ),
+    'vdb.vdbbin': (
+        'cobra',
+        'vivisect',
+        'vdb.qt',
+        'vqt',
+        'PyQt5',
+    ),
+}
+
+importtime_re = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+# run in the child process to time loading a file into a workspace
+load_script = '''
+import sys, json, time, threading
+import vivisect
+times = {'import': time.time()}
+vw = vivisect.VivWorkspace()
+chan = vw.createEventChannel()
+def waitFirst():
+    vw.waitForEvent(chan)
+    times['event'] = time.time()
+thr = threading.Thread(target=waitFirst, daemon=True)
+thr.start()
+vw.loadFromFile(sys.argv[1])
+times['load'] = time.time()
+thr.join(1)
+print(json.dumps(times))
+'''
+
+
+def getChildEnv():
+    '''
+    Return an environment for child pythons which imports this tree.
+    '''
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = env.get('PYTHONPATH')
+    env['PYTHONPATH'] = root if not path else os.pathsep.join((root, path))
+    return env
+
+
+def parseImportTime(text):
+    '''
+    Parse python -X importtime output into a list of
+    (selfusec, cumulativeusec, depth, modname) tuples.
+    '''
+    ret = []
+    for line in text.splitlines():
+        m = importtime_re.match(line)
+        if m is None:
+            continue
+        selfus, cumus, indent, modname = m.groups()
+        ret.append((int(selfus), int(cumus), (len(indent) - 1) // 2, modname))
+    return ret
+
+
+def getImportCost(modname):
+    '''
+    Import modname in a fresh python and return a dict with the total
+    import time (in ms) and the self import time per top level package.
+    '''
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import %s' % modname],
+                          env=getChildEnv(), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+    if proc.returncode != 0:
+        raise Exception('importing %s failed: %s' % (modname, proc.stderr.strip().splitlines()[-1:]))
+
+    total = 0
+    packages = collections.defaultdict(int)
+    for selfus, cumus, depth, name in parseImportTime(proc.stderr):
+        packages[name.split('.')[0]] += selfus
+        if name == modname:
+            total = cumus
+
+    return {
+        'total': total / 1000.0,
+        'packages': {name: usec / 1000.0 for name, usec in packages.items()},
+    }
+
+
+def getLoadedModules(modname):
+    '''
+    Import modname in a fresh python and return the list of module names
+    which were loaded.
+    '''
+    script = 'import sys, %s; print("\\n".join(sys.modules))' % modname
+    out = subprocess.check_output([sys.executable, '-c', script], env=getChildEnv(),
+                                  universal_newlines=True)
+    return out.split()
+
+
+def getEagerModules(modname, prefixes=None):
+    '''
+    Return the modules loaded by importing modname which should only
+    have been loaded on demand (see lazy_modules).
+    '''
+    if prefixes is None:
+        prefixes = lazy_modules.get(modname, ())
+
+    ret = []
+    for name in getLoadedModules(modname):
+        for prefix in prefixes:
+            if name == prefix or name.startswith(prefix + '.'):
+                ret.append(name)
+                break
+    return ret
+
+
+def timeLoad(filename):
+    '''
+    Load filename into a workspace in a fresh python and return the
+    time (in ms) until vivisect was imported, the first event was fired
+    and the file was loaded.
+    '''
+    start = time.time()
+    out = subprocess.check_output([sys.executable, '-c', load_script, filename],
+                                  env=getChildEnv(), universal_newlines=True)
+    times = json.loads(out.strip().splitlines()[-1])
+    return {name: (when - start) * 1000.0 for name, when in times.items()}
+
+
+def timeBulk(filename):
+    '''
+    Return the wall time (in ms) of "vivbin -B" on a copy of filename.
+    '''
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpname = os.path.join(tmpdir, os.path.basename(filename))
+        with open(filename, 'rb') as src, open(tmpname, 'wb') as dst:
+            dst.write(src.read())
+
+        start = time.time()
+        subprocess.check_call([sys.executable, '-m', 'vivisect.vivbin', '-B', tmpname],
+                              env=getChildEnv(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return (time.time() - start) * 1000.0
+
+
+def bestOf(runs, func, *args):
+    '''
+    Call func(*args) runs times and return the fastest result (results
+    which are dicts are compared by each key).
+    '''
+    best = None
+    for i in range(runs):
+        ret = func(*args)
+        if best is None:
+            best = ret
+        elif isinstance(ret, dict):
+            for key, val in ret.items():
+                if isinstance(val, float):
+                    best[key] = min(best.get(key, val), val)
+        else:
+            best = min(best, ret)
+    return best
+
+
+def runBench(files=(), modules=entry_modules, runs=3, bulk=False):
+    results = {'imports': {}, 'files': {}}
+    for modname in modules:
+        results['imports'][modname] = bestOf(runs, getImportCost, modname)
+
+    for fname in files:
+        info = bestOf(runs, timeLoad, fname)
+        if bulk:
+            info['bulk'] = bestOf(runs, timeBulk, fname)
+        results['files'][fname] = info
+
+    return results
+
+
+def getRegressions(results, baseline, tolerance):
+    '''
+    Return a list of messages for measurements which are more than
+    tolerance (a fraction) slower than in the baseline results.
+    '''
+    ret = []
+    for modname, info in results['imports'].items():
+        base = baseline.get('imports', {}).get(modname)
+        if base is not None and info['total'] > base['total'] * (1 + tolerance):
+            ret.append('import %s: %.1fms (was %.1fms)' % (modname, info['total'], base['total']))
+
+    for fname, info in results['files'].items():
+        base = baseline.get('files', {}).get(fname, {})
+        for key, val in info.items():
+            bval = base.get(key)
+            if bval is not None and val > bval * (1 + tolerance):
+                ret.append('%s %s: %.1fms (was %.1fms)' % (fname, key, val, bval))
+
+    return ret
+
+
+def setup():
+    ap = argparse.ArgumentParser('Measure vivbin/vdbbin startup time')
+    ap.add_argument('files', nargs='*', help='Files to time loading (and bulk analyzing)')
+    ap.add_argument('--runs', type=int, default=3, help='Report the best of this many runs')
+    ap.add_argument('--module', dest='modules', action='append', default=None,
+                    help='Measure importing this module (default: vivbin and vdbbin)')
+    ap.add_argument('--top', type=int, default=8, help='Show this many packages per module')
+    ap.add_argument('--bulk', action='store_true', help='Also time a full "vivbin -B" run')
+    ap.add_argument('--save', default=None, help='Save the results (json) to this file')
+    ap.add_argument('--baseline', default=None, help='Fail if slower than these saved results')
+    ap.add_argument('--tolerance', type=float, default=0.25, help='Allowed slow down (fraction) vs the baseline')
+    return ap
+
+
+def main(argv):
+    opts = setup().parse_args(argv)
+    modules = opts.modules or entry_modules
+
+    results = runBench(files=opts.files, modules=modules, runs=opts.runs, bulk=opts.bulk)
+
+    for modname, info in results['imports'].items():
+        print('import %s: %.1fms' % (modname, info['total']))
+        pkgs = sorted(info['packages'].items(), key=lambda x: x[1], reverse=True)
+        for name, msecs in pkgs[:opts.top]:
+            print('    %-24s %.1fms' % (name, msecs))
+
+        eager = getEagerModules(modname)
+        if eager:
+            print('    eagerly imported: %s' % ', '.join(sorted(eager)))
+
+    for fname, info in results['files'].items():
+        descr = ', '.join('%s %.1fms' % (key, info[key]) for key in ('import', 'event', 'load', 'bulk') if key in info)
+        print('%s: %s' % (fname, descr))
+
+    if opts.save:
+        with open(opts.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if opts.baseline:
+        with open(opts.baseline, 'r') as f:
+            baseline = json.load(f)
+
+        regs = getRegressions(results, baseline, opts.tolerance)
+        for msg in regs:
+            print('REGRESSION: %s' % msg)
+        if regs:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
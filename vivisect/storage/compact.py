@@ -0,0 +1,374 @@
+'''
+Workspace event log compaction.
+
+A workspace keeps every event ever fired, so a long lived (or many times
+re-analyzed) workspace carries superseded meta values, add/delete pairs
+for locations, xrefs and codeblocks, deleted functions and renames.
+compactEvents() rewrites such a log as a (much) shorter event sequence
+which reproduces the same workspace state when it is replayed.
+
+The rules are:
+
+* events which set a value for a key (COMMENT, SYMHINT, ADDFREF, ADDCOLOR,
+  SETFUNCMETA, SETFUNCARGS) keep only their final value, at the position
+  of the last write.  If the last write is a delete, every event for the
+  key is dropped.
+* SETMETA and SETFILEMETA are read by other event handlers and meta
+  callbacks, so they keep both their first and their last write.
+* every SETNAME is kept, a rename releases the old name (which another
+  va may have taken since) so the intermediate names matter.
+* location, xref and codeblock adds which are later deleted are dropped
+  along with the delete (as are re-adds of an xref which already exists).
+* functions which are later deleted are dropped along with all of the
+  events made for them.
+* vaset rows are folded into the ADDVASET (which is emptied if the vaset
+  is deleted later, the DELVASET is kept since a new workspace makes some
+  vasets of its own).
+* only the last AUTOANALFIN is kept and CHAT (and the legacy FOLLOWME)
+  events are dropped.
+
+Anything else (memory maps, relocations, files, exports...) and anything
+touching the locations/xrefs a BASEPTR relocation creates behind the scenes
+is kept as is.
+
+Example:
+    events = compactEvents(vw.exportWorkspace())
+    vivisect.storage.basicfile.vivEventsToFile('compact.viv', events)
+'''
+import logging
+import collections
+
+from vivisect.const import *
+
+logger = logging.getLogger(__name__)
+
+# simple key/value events and the einfo indexes of their key
+keyevents = {
+    VWE_SETMETA: (0,),
+    VWE_SETFILEMETA: (0, 1),
+    VWE_COMMENT: (0,),
+    VWE_SYMHINT: (0, 1),
+    VWE_ADDFREF: (0, 1),
+    VWE_DELFREF: (0, 1),
+}
+
+# key events which delete their key when given a value of None
+nonedels = (VWE_COMMENT, VWE_SYMHINT)
+
+# key events whose first value must survive for the handlers in between
+keepfirst = (VWE_SETMETA, VWE_SETFILEMETA)
+
+# add/delete pairs of events which are keyed by the whole einfo
+pairevents = {
+    VWE_ADDLOCATION: VWE_DELLOCATION,
+    VWE_ADDXREF: VWE_DELXREF,
+}
+delevents = dict((dele, adde) for adde, dele in pairevents.items())
+
+
+def _hashkey(key):
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class EventCompactor:
+    '''
+    Build a compacted copy of an event list, one event at a time.
+
+    Example:
+        comp = EventCompactor()
+        for event, einfo in events:
+            comp.addEvent(event, einfo)
+        events = comp.getEvents()
+    '''
+    def __init__(self):
+        # the compacted events (None for the ones dropped since)
+        self.events = []
+
+        # key -> indexes in self.events of the surviving writes
+        self.keyslots = {}
+        # (event, einfo) -> indexes of the live location/xref adds
+        self.pairslots = collections.defaultdict(list)
+
+        # fva -> indexes of the events made for the current function
+        self.funcslots = {}
+        self.funcgen = collections.defaultdict(int)
+        # fva -> {cb: [indexes]} for the function's live codeblocks
+        self.cbslots = {}
+
+        # vaset name -> (index, defs, {rowkey: row})
+        self.vasets = {}
+
+        # file imagebases and the vas of BASEPTR relocations
+        self.imagebases = {}
+        self.relocvas = set()
+
+        self.autoanal = None
+
+        self.chand = {
+            VWE_ADDRELOC: self._compADDRELOC,
+            VWE_ADDFILE: self._compADDFILE,
+            VWE_ADDFUNCTION: self._compADDFUNCTION,
+            VWE_DELFUNCTION: self._compDELFUNCTION,
+            VWE_SETFUNCARGS: self._compSETFUNCARGS,
+            VWE_SETFUNCMETA: self._compSETFUNCMETA,
+            VWE_ADDCODEBLOCK: self._compADDCODEBLOCK,
+            VWE_DELCODEBLOCK: self._compDELCODEBLOCK,
+            VWE_ADDCOLOR: self._compADDCOLOR,
+            VWE_DELCOLOR: self._compDELCOLOR,
+            VWE_ADDVASET: self._compADDVASET,
+            VWE_DELVASET: self._compDELVASET,
+            VWE_SETVASETROW: self._compSETVASETROW,
+            VWE_DELVASETROW: self._compDELVASETROW,
+            VWE_AUTOANALFIN: self._compAUTOANALFIN,
+            VWE_CHAT: self._compDROP,
+            VWE_FOLLOWME: self._compDROP,
+        }
+
+    def _append(self, event, einfo):
+        self.events.append((event, einfo))
+        return len(self.events) - 1
+
+    def _drop(self, idxs):
+        for idx in idxs:
+            self.events[idx] = None
+
+    def _setKey(self, key, event, einfo, delete=False, first=False):
+        '''
+        Record a write (or delete) of key and return the index of the
+        surviving event (None for a delete).
+        '''
+        slots = self.keyslots.get(key)
+        if delete:
+            if slots is not None:
+                self._drop(slots)
+                self.keyslots.pop(key)
+            return
+
+        if slots is None:
+            slots = self.keyslots[key] = []
+
+        keep = slots[:1] if first else []
+        self._drop(slots[len(keep):])
+
+        idx = self._append(event, einfo)
+        slots[:] = keep + [idx]
+        return idx
+
+    def addEvent(self, event, einfo):
+        '''
+        Add the next event from the log being compacted.
+        '''
+        keyidx = keyevents.get(event)
+        if keyidx is not None:
+            return self._addKeyEvent(event, einfo, keyidx)
+
+        if event in pairevents:
+            return self._addPairEvent(event, einfo)
+
+        if event in delevents:
+            return self._delPairEvent(event, einfo)
+
+        chand = self.chand.get(event)
+        if chand is not None:
+            return chand(event, einfo)
+
+        self._append(event, einfo)
+
+    def _addKeyEvent(self, event, einfo, keyidx):
+        if event == VWE_DELFREF:
+            key = (VWE_ADDFREF,) + tuple(einfo[i] for i in keyidx)
+        else:
+            key = (event,) + tuple(einfo[i] for i in keyidx)
+
+        if _hashkey(key) is None:
+            self._append(event, einfo)
+            return
+
+        first = event in keepfirst
+        delete = event == VWE_DELFREF or (event in nonedels and einfo[-1] is None)
+        self._setKey(key, event, einfo, delete=delete, first=first)
+
+        if event == VWE_SETFILEMETA and einfo[1] == 'imagebase':
+            self.imagebases[einfo[0]] = einfo[2]
+
+    def _isRelocVa(self, einfo):
+        # BASEPTR relocations add a pointer location/xref without an event
+        return einfo[0] in self.relocvas
+
+    def _addPairEvent(self, event, einfo):
+        key = _hashkey((event, einfo))
+        if key is None or self._isRelocVa(einfo):
+            self._append(event, einfo)
+            return
+
+        slots = self.pairslots[key]
+        if event == VWE_ADDXREF and slots:
+            # adding an existing xref does nothing
+            return
+
+        slots.append(self._append(event, einfo))
+
+    def _delPairEvent(self, event, einfo):
+        key = _hashkey((delevents[event], einfo))
+        if key is None or self._isRelocVa(einfo):
+            self._append(event, einfo)
+            return
+
+        slots = self.pairslots.get(key)
+        if not slots:
+            self._append(event, einfo)
+            return
+
+        self.events[slots.pop()] = None
+
+    def _compDROP(self, event, einfo):
+        pass
+
+    def _compAUTOANALFIN(self, event, einfo):
+        if self.autoanal is not None:
+            self.events[self.autoanal] = None
+        self.autoanal = self._append(event, einfo)
+
+    def _compADDRELOC(self, event, einfo):
+        fname, ptroff, rtype, data = einfo
+        imgbase = self.imagebases.get(fname)
+        if rtype == RTYPE_BASEPTR and imgbase is not None:
+            self.relocvas.add(imgbase + ptroff)
+        self._append(event, einfo)
+
+    def _compADDFILE(self, event, einfo):
+        normname, imagebase, md5sum = einfo
+        self.imagebases[normname] = imagebase
+        self._append(event, einfo)
+
+    def _compADDFUNCTION(self, event, einfo):
+        fva, meta = einfo
+        # re-adding a function replaces its meta wholesale
+        self.funcgen[fva] += 1
+        self.cbslots.setdefault(fva, {})
+        self.funcslots.setdefault(fva, []).append(self._append(event, einfo))
+
+    def _compDELFUNCTION(self, event, fva):
+        if fva not in self.cbslots:
+            self._append(event, fva)
+            return
+
+        # the delete takes the function's meta, args and codeblocks with it
+        self._drop(self.funcslots.pop(fva))
+        self.cbslots.pop(fva)
+        self.funcgen[fva] += 1
+
+    def _compSETFUNCARGS(self, event, einfo):
+        fva, args = einfo
+        idx = self._setKey((event, fva, self.funcgen[fva]), event, einfo)
+        self.funcslots.setdefault(fva, []).append(idx)
+
+    def _compSETFUNCMETA(self, event, einfo):
+        fva, name, value = einfo
+        if fva not in self.cbslots or _hashkey(name) is None:
+            # not a function (yet), only the meta callback runs
+            self._append(event, einfo)
+            return
+
+        idx = self._setKey((event, fva, self.funcgen[fva], name), event, einfo)
+        self.funcslots[fva].append(idx)
+
+    def _compADDCODEBLOCK(self, event, einfo):
+        va, size, fva = einfo
+        idx = self._append(event, einfo)
+
+        cbs = self.cbslots.get(fva)
+        if cbs is not None and _hashkey(einfo) is not None:
+            cbs.setdefault(einfo, []).append(idx)
+            self.funcslots[fva].append(idx)
+
+    def _compDELCODEBLOCK(self, event, einfo):
+        va, size, fva = einfo
+        slots = None
+        cbs = self.cbslots.get(fva)
+        if cbs is not None and _hashkey(einfo) is not None:
+            slots = cbs.get(einfo)
+
+        if not slots:
+            self._append(event, einfo)
+            return
+
+        self.events[slots.pop()] = None
+
+    def _compADDCOLOR(self, event, einfo):
+        mapname, colmap = einfo
+        self._setKey((event, mapname), event, einfo)
+
+    def _compDELCOLOR(self, event, mapname):
+        self._setKey((VWE_ADDCOLOR, mapname), event, mapname, delete=True)
+
+    def _compADDVASET(self, event, einfo):
+        name, defs, rows = einfo
+        old = self.vasets.get(name)
+        if old is not None:
+            self.events[old[0]] = None
+
+        vals = {}
+        for row in rows:
+            vals[row[0]] = row
+
+        self.vasets[name] = (self._append(event, einfo), defs, vals)
+
+    def _compDELVASET(self, event, name):
+        old = self.vasets.pop(name, None)
+        if old is not None:
+            # keep the (empty) add, a new workspace makes some vasets itself
+            idx, defs, vals = old
+            self.events[idx] = (VWE_ADDVASET, (name, defs, ()))
+
+        self._append(event, name)
+
+    def _compSETVASETROW(self, event, einfo):
+        name, row = einfo
+        vaset = self.vasets.get(name)
+        if vaset is None:
+            self._append(event, einfo)
+            return
+
+        vaset[2][row[0]] = row
+
+    def _compDELVASETROW(self, event, einfo):
+        name, va = einfo
+        vaset = self.vasets.get(name)
+        if vaset is None:
+            self._append(event, einfo)
+            return
+
+        vaset[2].pop(va, None)
+
+    def getEvents(self):
+        '''
+        Return the compacted event list.
+        '''
+        events = list(self.events)
+        for name, (idx, defs, vals) in self.vasets.items():
+            events[idx] = (VWE_ADDVASET, (name, defs, tuple(vals.values())))
+
+        return [evt for evt in events if evt is not None]
+
+
+def compactEvents(events):
+    '''
+    Return a new (usually much shorter) list of events which reproduces
+    the workspace state of replaying the given events.  The given list is
+    not modified.
+
+    Example:
+        events = compactEvents(vw.exportWorkspace())
+    '''
+    comp = EventCompactor()
+    for event, einfo in events:
+        comp.addEvent(event, einfo)
+
+    ret = comp.getEvents()
+    logger.info('compacted %d events to %d', len(events), len(ret))
+    return ret
@@ -0,0 +1,236 @@
+'''
+Compact in-memory workspace event log.
+
+A workspace keeps every event it has applied (to save and share it) as a
+list of (event, einfo) tuples, which for a large binary is often bigger
+than the workspace state built from them.  EventLog is a drop in for that
+list which stores the events msgpack encoded in chunked bytearrays (and
+optionally spills the filled chunks to a temporary file).  The events are
+decoded as they are iterated.
+
+Like the mpviv storage format, decoded events have tuples where lists were
+given and dicts are kept as dicts.
+
+Example:
+    vw._event_list = EventLog(spill=True)
+    ...
+    for event, einfo in vw.exportWorkspace():
+        ...
+'''
+import bisect
+import tempfile
+import threading
+
+import msgpack
+
+# encoded bytes per chunk (a chunk is decoded as a unit)
+chunksize = 0x40000
+
+loadargs = {'use_list': False, 'raw': False, 'strict_map_key': False}
+
+
+def unpackEvents(buf):
+    unpacker = msgpack.Unpacker(**loadargs)
+    unpacker.feed(buf)
+    return unpacker
+
+
+class EventLogSlice:
+    '''
+    A lazy view of a range of events in an EventLog (as returned by
+    slicing one).  The range is fixed when the slice is made.
+    '''
+    def __init__(self, elog, start, stop):
+        self.elog = elog
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __iter__(self):
+        return self.elog.iterEvents(self.start, self.stop)
+
+    def __reduce__(self):
+        # pickle (storage and cobra) as the list of events
+        return (list, (list(self),))
+
+
+class EventLog:
+    '''
+    A list like (append/extend/pop/len/iter/index/slice) log of workspace
+    events which keeps them encoded.  With spill=True the filled chunks are
+    written to a temporary file and only the chunk being filled is kept in
+    memory.
+
+    Example:
+        elog = EventLog()
+        elog.append((VWE_SETMETA, ('Architecture', 'i386')))
+        changes = elog[saved:]
+    '''
+    def __init__(self, events=(), spill=False, chunksize=chunksize):
+        self.spill = spill
+        self.chunksize = chunksize
+
+        self.lock = threading.Lock()
+        self.packer = msgpack.Packer(use_bin_type=True)
+
+        # the filled chunks (bytes, or (offset, size) in the spill file)
+        # and the index of the first event in each one
+        self.chunks = []
+        self.starts = []
+        self.spillfd = None
+
+        self.cur = bytearray()
+        self.curstart = 0
+        self.count = 0
+
+        self.extend(events)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return self.iterEvents()
+
+    def __reduce__(self):
+        # pickle (storage and cobra) as the list of events
+        return (list, (list(self),))
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(self.count)
+            if step != 1:
+                raise Exception('EventLog slices must have a step of 1')
+            return EventLogSlice(self, start, max(start, stop))
+
+        if idx < 0:
+            idx += self.count
+        if idx < 0 or idx >= self.count:
+            raise IndexError('EventLog index out of range')
+
+        for evt in self.iterEvents(idx, idx + 1):
+            return evt
+
+    def __delitem__(self, idx):
+        # only the end of the log may be removed (see truncate())
+        if not isinstance(idx, slice):
+            idx = slice(idx, idx + 1 if idx != -1 else None)
+
+        start, stop, step = idx.indices(self.count)
+        if stop < self.count or step != 1:
+            raise Exception('EventLog can only delete events from the end')
+        self.truncate(start)
+
+    def append(self, evt):
+        with self.lock:
+            self.cur.extend(self.packer.pack(evt))
+            self.count += 1
+            if len(self.cur) >= self.chunksize:
+                self._sealChunk()
+
+    def extend(self, events):
+        for evt in events:
+            self.append(evt)
+
+    def pop(self):
+        if not self.count:
+            raise IndexError('pop from empty EventLog')
+        evt = self[-1]
+        self.truncate(self.count - 1)
+        return evt
+
+    def truncate(self, count):
+        '''
+        Remove the events after the first count events.
+        '''
+        with self.lock:
+            if count >= self.count:
+                return
+
+            # re-encode the kept events of the chunk count lands in
+            if count < self.curstart:
+                cidx = bisect.bisect_right(self.starts, count) - 1
+                chunk = self.chunks[cidx]
+                buf = self._getChunk(chunk)
+                if not isinstance(chunk, bytes):
+                    self.spillfd.truncate(chunk[0])
+                curstart = self.starts[cidx]
+                del self.chunks[cidx:]
+                del self.starts[cidx:]
+            else:
+                buf = bytes(self.cur)
+                curstart = self.curstart
+
+            self.cur = bytearray()
+            self.curstart = curstart
+            for i, evt in enumerate(unpackEvents(buf)):
+                if curstart + i >= count:
+                    break
+                self.cur.extend(self.packer.pack(evt))
+
+            self.count = count
+            if self.spill and not self.chunks:
+                self._closeSpill()
+
+    def iterEvents(self, start=0, stop=None):
+        '''
+        Yield the events from start up to (not including) stop, decoding
+        them a chunk at a time.
+        '''
+        with self.lock:
+            if stop is None or stop > self.count:
+                stop = self.count
+            chunks = list(self.chunks)
+            starts = list(self.starts)
+            chunks.append(bytes(self.cur))
+            starts.append(self.curstart)
+
+        idx = max(0, bisect.bisect_right(starts, start) - 1)
+        for chunk, cstart in zip(chunks[idx:], starts[idx:]):
+            if cstart >= stop:
+                return
+
+            with self.lock:
+                buf = self._getChunk(chunk)
+
+            for i, evt in enumerate(unpackEvents(buf), start=cstart):
+                if i >= stop:
+                    return
+                if i >= start:
+                    yield evt
+
+    def getMemSize(self):
+        '''
+        Return the number of encoded bytes held in memory.
+        '''
+        return len(self.cur) + sum(len(chunk) for chunk in self.chunks if isinstance(chunk, bytes))
+
+    def _getChunk(self, chunk):
+        # NOTE: call with the lock held
+        if isinstance(chunk, bytes):
+            return chunk
+
+        off, size = chunk
+        self.spillfd.seek(off)
+        return self.spillfd.read(size)
+
+    def _sealChunk(self):
+        # NOTE: call with the lock held
+        chunk = bytes(self.cur)
+        if self.spill:
+            if self.spillfd is None:
+                self.spillfd = tempfile.TemporaryFile(prefix='vivlog')
+            self.spillfd.seek(0, 2)
+            chunk = (self.spillfd.tell(), len(chunk))
+            self.spillfd.write(self.cur)
+
+        self.chunks.append(chunk)
+        self.starts.append(self.curstart)
+        self.cur = bytearray()
+        self.curstart = self.count
+
+    def _closeSpill(self):
+        if self.spillfd is not None:
+            self.spillfd.close()
+            self.spillfd = None
@@ -0,0 +1,219 @@
+'''
+Workspace state snapshots.
+
+Loading a workspace replays every event in its log through the event
+handlers, which for a large analyzed workspace is most of the load time.
+A snapshot is a direct serialization of the state those handlers build
+(locations, xrefs, codeblocks, function meta, names, vasets, memory maps
+etc) saved next to the event log (as <workspace>.vsnap).  When a valid
+snapshot is found, loading restores the state from it and only replays
+the events which were saved to the log after the snapshot was taken.
+
+The snapshot remembers how many events, and which bytes, of the log it
+covers so a log which was rewritten since is detected and loaded the
+slow way.
+
+Example:
+    vw.saveWorkspace(snapshot=True)
+    ...
+    vw = vivisect.VivWorkspace()
+    vw.loadWorkspace(filename)    # uses filename + '.vsnap' if it is valid
+'''
+import os
+import pickle
+import hashlib
+import logging
+
+import envi.pagelookup as e_page
+
+from vivisect.const import *
+
+logger = logging.getLogger(__name__)
+
+snap_ext = '.vsnap'
+snap_magic = b'VIVSNAP1'
+
+# bytes from each end of the event log which identify it
+digest_size = 0x10000
+
+# the workspace attributes which are built by the event handlers
+stateattrs = (
+    'metadata',
+    'filemeta',
+    'bigend',
+    '_map_defs',
+    'segments',
+    'loclist',
+    'xrefs',
+    'xrefs_by_to',
+    'xrefs_by_from',
+    'codeblocks',
+    'codeblocks_by_funcva',
+    'funcmeta',
+    'func_args',
+    'localsyms',
+    'frefs',
+    'name_by_va',
+    'va_by_name',
+    'comments',
+    'symhints',
+    'exports',
+    'exports_by_va',
+    'relocations',
+    'reloc_by_va',
+    'colormaps',
+    'vasetdefs',
+    'vasets',
+    '_dead_data',
+)
+
+
+def getSnapName(filename):
+    return filename + snap_ext
+
+
+def getLogDigest(filename, size):
+    '''
+    Return a digest of the first size bytes of an event log file (the
+    size and the bytes at both ends of it).
+    '''
+    md5 = hashlib.md5(str(size).encode('utf-8'))
+    with open(filename, 'rb') as f:
+        md5.update(f.read(min(size, digest_size)))
+        if size > digest_size:
+            f.seek(max(digest_size, size - digest_size))
+            md5.update(f.read(size - f.tell()))
+    return md5.hexdigest()
+
+
+def getStateSnapshot(vw):
+    '''
+    Return a dict of the workspace state built by its event handlers.
+    (The values are the live workspace objects, pickle it right away)
+    '''
+    return dict((name, getattr(vw, name)) for name in stateattrs)
+
+
+def setStateSnapshot(vw, state):
+    '''
+    Restore the state from getStateSnapshot() into a new workspace and
+    rebuild the things derived from it (arch, lookups, call graph...).
+    '''
+    # the meta callbacks set up the arch, endian, structures etc.  a few
+    # of them set more meta (whose results the snapshot already has)
+    elen = len(vw._event_list)
+    for name, value in state['metadata'].items():
+        mcb = getattr(vw, '_mcb_%s' % name.split(':')[0], None)
+        if mcb is not None:
+            mcb(name, value)
+    del vw._event_list[elen:]
+
+    for name in stateattrs:
+        setattr(vw, name, state[name])
+
+    vw.locmap = e_page.MapLookup()
+    vw.blockmap = e_page.MapLookup()
+    for mva, mmaxva, mmap, mbytes in vw._map_defs:
+        vw.locmap.initMapLookup(mva, mmaxva - mva)
+        vw.blockmap.initMapLookup(mva, mmaxva - mva)
+
+    for loc in vw.loclist:
+        vw.locmap.setMapLookup(loc[L_VA], loc[L_SIZE], loc)
+
+    for cb in vw.codeblocks:
+        vw.blockmap.setMapLookup(cb[CB_VA], cb[CB_SIZE], cb)
+
+    noret = vw.metadata.get('NoReturnApis', {})
+    for lva, lsize, ltype, linfo in vw.loclist:
+        if ltype == LOC_IMPORT and noret.get(linfo.lower()):
+            vw.cfctx.addNoReturnAddr(lva)
+
+    # every function node must exist before the CallsFrom edges are made
+    for fva, fmeta in vw.funcmeta.items():
+        node = vw._call_graph.getFunctionNode(fva)
+        name = vw.getName(fva)
+        if name is not None:
+            vw._call_graph.setNodeProp(node, 'repr', name)
+        vw.cfctx.addFunctionDef(fva, fmeta.get('CallsFrom'))
+
+    for fva, fmeta in vw.funcmeta.items():
+        for name, value in fmeta.items():
+            fmcb = getattr(vw, '_fmcb_%s' % name.split(':')[0], None)
+            if fmcb is not None:
+                fmcb(fva, name, value)
+
+
+def saveSnapshot(vw, filename, evtcount):
+    '''
+    Save a snapshot of the workspace state next to the event log in
+    filename, which holds evtcount events (all of them applied to vw).
+    '''
+    logsize = os.path.getsize(filename)
+    header = {
+        'events': evtcount,
+        'logsize': logsize,
+        'logdigest': getLogDigest(filename, logsize),
+    }
+
+    snapname = getSnapName(filename)
+    tmpname = snapname + '.tmp'
+    with open(tmpname, 'wb') as f:
+        f.write(snap_magic)
+        pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(getStateSnapshot(vw), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpname, snapname)
+
+
+def loadSnapshot(filename):
+    '''
+    Return the (header, state) of the snapshot next to the event log in
+    filename, or None if there is no snapshot or it does not match the log.
+    '''
+    snapname = getSnapName(filename)
+    if not os.path.exists(snapname):
+        return None
+
+    with open(snapname, 'rb') as f:
+        if f.read(len(snap_magic)) != snap_magic:
+            logger.warning('Invalid snapshot file: %s', snapname)
+            return None
+
+        header = pickle.load(f)
+        logsize = header.get('logsize')
+        if os.path.getsize(filename) < logsize or getLogDigest(filename, logsize) != header.get('logdigest'):
+            logger.warning('Ignoring out of date snapshot: %s', snapname)
+            return None
+
+        return header, pickle.load(f)
+
+
+def loadWorkspace(vw, mod, filename):
+    '''
+    Load the workspace from the event log in filename (using the storage
+    module mod) and its snapshot.  Returns False (having loaded nothing)
+    if there is no usable snapshot.
+    '''
+    # only a new workspace may have its state replaced
+    if vw.server is not None or vw.loclist or vw.getMemoryMaps():
+        return False
+
+    if not hasattr(mod, 'vivEventsFromFile'):
+        return False
+
+    snap = loadSnapshot(filename)
+    if snap is None:
+        return False
+
+    header, state = snap
+    events = mod.vivEventsFromFile(filename)
+    evtcount = header.get('events')
+    if events is None or len(events) < evtcount:
+        logger.warning('Ignoring snapshot of %d events (log has %s)', evtcount, None if events is None else len(events))
+        return False
+
+    setStateSnapshot(vw, state)
+    vw._event_list.extend(events[:evtcount])
+    vw.importWorkspace(events[evtcount:])
+
+    logger.info('loaded %d events from snapshot and replayed %d', evtcount, len(events) - evtcount)
+    return True
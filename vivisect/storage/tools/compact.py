@@ -0,0 +1,110 @@
+'''
+Compact the event log of a workspace file.
+
+The events are rewritten as the minimal sequence which reproduces the
+workspace state (see vivisect.storage.compact) and both workspaces are
+loaded to report how much smaller and faster to load the new one is.
+
+Example:
+    python -m vivisect.storage.tools.compact old.viv --name new.viv
+    python -m vivisect.storage.tools.compact old.viv --inplace
+'''
+import os
+import sys
+import time
+import argparse
+import importlib
+
+import vivisect
+import vivisect.parsers as v_parsers
+import vivisect.storage.compact as v_compact
+
+from vivisect.storage.tools.convert import storemap
+
+
+def setup():
+    ap = argparse.ArgumentParser('Compact the event log of a workspace')
+
+    ap.add_argument('old', help='Path to the workspace to compact')
+    ap.add_argument('--name', '-n', help='Name for the compacted workspace (default: <old>.compact)')
+    ap.add_argument('--inplace', action='store_true', help='Replace the old workspace with the compacted one')
+    ap.add_argument('--runs', type=int, default=1, help='Report the best load time of this many loads')
+
+    return ap
+
+
+def timeLoad(filename, storname, runs=1):
+    '''
+    Load the workspace runs times and return the best load time in seconds.
+    '''
+    best = None
+    for i in range(runs):
+        vw = vivisect.VivWorkspace()
+        vw.setMeta('StorageModule', storname)
+
+        start = time.time()
+        vw.loadWorkspace(filename)
+        secs = time.time() - start
+
+        best = secs if best is None else min(best, secs)
+    return best
+
+
+def compact(old, newname=None, inplace=False, runs=1):
+    '''
+    Write the compacted workspace and return a dict describing the change
+    in event count, file size and load time.
+    '''
+    fmt = v_parsers.guessFormatFilename(old)
+    if fmt not in storemap:
+        raise Exception('Refusing to handle format %s, this is for workspace files only!' % fmt)
+
+    storname = storemap[fmt]
+    stor = importlib.import_module(storname)
+
+    if inplace:
+        newname = old
+    elif not newname:
+        newname = '%s.compact' % old
+
+    events = stor.vivEventsFromFile(old)
+    newevents = v_compact.compactEvents(events)
+
+    ret = {
+        'name': newname,
+        'events': len(events),
+        'newevents': len(newevents),
+        'size': os.path.getsize(old),
+        'load': timeLoad(old, storname, runs=runs),
+    }
+
+    # write next to the target and move it over (old may be the target)
+    tmpname = '%s.tmp' % newname
+    stor.vivEventsToFile(tmpname, newevents)
+    os.replace(tmpname, newname)
+
+    ret['newsize'] = os.path.getsize(newname)
+    ret['newload'] = timeLoad(newname, storname, runs=runs)
+    return ret
+
+
+def main(argv):
+    opts = setup().parse_args(argv)
+
+    old = os.path.abspath(opts.old)
+    ret = compact(old, newname=opts.name, inplace=opts.inplace, runs=opts.runs)
+
+    def pct(new, orig):
+        if not orig:
+            return 0.0
+        return 100.0 * (orig - new) / orig
+
+    print('wrote %s' % ret['name'])
+    print('events: %d -> %d (%.1f%% smaller)' % (ret['events'], ret['newevents'], pct(ret['newevents'], ret['events'])))
+    print('bytes:  %d -> %d (%.1f%% smaller)' % (ret['size'], ret['newsize'], pct(ret['newsize'], ret['size'])))
+    print('load:   %.3fs -> %.3fs (%.2fx faster)' % (ret['load'], ret['newload'], ret['load'] / max(ret['newload'], 1e-6)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -370,11 +370,29 @@ class SymbolikAnalysisContext:
         hierarchical graph) and translate all the opcodes in each block
         to un-applied symbolik effects.  The list of effects for each node
         is stored in 'symbolik_effects' list in the node properties.
-        '''
-        xlate = self.getTranslator()
 
+        NOTE: unless fgraph is specified, the translated graph is cached
+              in the workspace function graph cache and a copy returned
+              (including copies of the opcode, effect and constraint lists).
+        '''
         if fgraph is None:
-            fgraph = viv_graph.buildFunctionGraph(self.vw, fva)
+            cache = self.vw.getFuncGraphCache()
+            name = ('symbolik', self.__xlator__.__name__)
+            symgraph = cache.getFuncData(fva, name, self._buildSymbolikGraph)
+
+            graph = symgraph.copyGraph()
+            for nid, ninfo in graph.getNodes():
+                for prop in ('opcodes', 'symbolik_effects'):
+                    if ninfo.get(prop) is not None:
+                        ninfo[prop] = list(ninfo[prop])
+
+            for eid, fromid, toid, einfo in graph.getEdges():
+                if einfo.get('symbolik_constraints') is not None:
+                    einfo['symbolik_constraints'] = list(einfo['symbolik_constraints'])
+
+            return graph
+
+        xlate = self.getTranslator()
 
         for nodeva, ninfo in fgraph.getNodes():
 
@@ -420,6 +438,10 @@ class SymbolikAnalysisContext:
 
         return fgraph
 
+    def _buildSymbolikGraph(self, vw, fva):
+        fgraph = viv_graph.getCachedFunctionGraph(vw, fva)
+        return self.getSymbolikGraph(fva, fgraph=fgraph)
+
     def _oposet_cons(self, c1, c2):
 
         c1v1 = c1._v1.solve()
@@ -0,0 +1,77 @@
+import os
+import json
+import tempfile
+import unittest
+
+import vivisect
+import vivisect.batch as v_batch
+
+# push ebp; mov ebp, esp; xor eax, eax; pop ebp; ret
+i386_code = b'\x55\x89\xe5\x31\xc0\x5d\xc3'
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.indir = os.path.join(self.tmpdir.name, 'in')
+        self.outdir = os.path.join(self.tmpdir.name, 'out')
+        os.makedirs(os.path.join(self.indir, 'sub'))
+        for name in ('one.bin', os.path.join('sub', 'two.bin')):
+            with open(os.path.join(self.indir, name), 'wb') as f:
+                f.write(i386_code)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_getjobs(self):
+        manifest = os.path.join(self.tmpdir.name, 'manifest.txt')
+        with open(manifest, 'w') as f:
+            f.write('# comment\n\n/tmp/foo.exe\n')
+
+        jobs = v_batch.getJobs([self.indir], manifest=manifest, outdir=self.outdir)
+        self.assertEqual([job['output'] for job in jobs], [
+            os.path.join(self.outdir, 'one.bin.viv'),
+            os.path.join(self.outdir, 'sub', 'two.bin.viv'),
+            os.path.join(self.outdir, 'foo.exe.viv'),
+        ])
+
+        jobs = v_batch.getJobs([self.indir], outdir=self.outdir, storage='vivisect.storage.mpfile')
+        self.assertTrue(jobs[0]['output'].endswith('one.bin.mpviv'))
+
+    def test_batch(self):
+        summary = os.path.join(self.outdir, 'batch.jsonl')
+        jobs = v_batch.getJobs([self.indir], outdir=self.outdir)
+        opts = ['viv.parsers.blob.arch="i386"']
+        stats = v_batch.runBatch(jobs, summary, procs=2, timeout=120, parsemod='blob', options=opts)
+        self.assertEqual(stats.counts, {'ok': 2})
+
+        with open(summary, 'r') as f:
+            infos = [json.loads(line) for line in f]
+        self.assertEqual(set(info['status'] for info in infos), set(['ok']))
+        self.assertEqual(infos[0]['arch'], 'i386')
+
+        vw = vivisect.VivWorkspace()
+        vw.loadWorkspace(jobs[0]['output'])
+        self.assertEqual(vw.getMeta('Architecture'), 'i386')
+
+        # resuming skips the completed jobs
+        stats = v_batch.runBatch(jobs, summary, procs=2, parsemod='blob', options=opts)
+        self.assertEqual(stats.counts, {'skipped': 2})
+
+    def test_batch_errors(self):
+        summary = os.path.join(self.outdir, 'batch.jsonl')
+        jobs = v_batch.getJobs([self.indir], outdir=self.outdir)[:1]
+        stats = v_batch.runBatch(jobs, summary, procs=1, parsemod='elf')
+        self.assertEqual(stats.counts, {'error': 1})
+        self.assertFalse(os.path.exists(jobs[0]['output']))
+
+        info = v_batch.loadSummary(summary)[jobs[0]['path']]
+        self.assertEqual(info['status'], 'error')
+        self.assertTrue(info['error'])
+
+        # failed jobs are only run again when asked to
+        stats = v_batch.runBatch(jobs, summary, procs=1, parsemod='elf')
+        self.assertEqual(stats.counts, {'skipped': 1})
+        stats = v_batch.runBatch(jobs, summary, procs=1, parsemod='elf', retry=True)
+        self.assertEqual(stats.counts, {'error': 1})
@@ -0,0 +1,126 @@
+import unittest
+
+import envi
+import vivisect
+import vivisect.tools.graphutil as v_t_graph
+
+from vivisect.const import *
+
+# push ebp; mov ebp, esp; cmp eax, 1; jz +2; inc eax; inc eax; inc eax; pop ebp; ret
+fcode = bytes.fromhex('5589e583f801740240404040' '5dc3')
+
+
+def getGraphWorkspace():
+    vw = vivisect.VivWorkspace()
+    vw.setMeta('Architecture', 'i386')
+    vw.setMeta('Platform', 'windows')
+    vw.setMeta('Format', 'blob')
+    vw.addMemoryMap(0x1000, envi.memory.MM_RWX, 'blob', fcode)
+    vw.addSegment(0x1000, len(fcode), '.text', 'blob')
+    vw._snapInAnalysisModules()
+    vw.makeFunction(0x1000)
+    return vw
+
+
+class FuncGraphCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.vw = getGraphWorkspace()
+        self.fva = 0x1000
+
+    def test_graphcache_hit(self):
+        vw = self.vw
+        g1 = v_t_graph.getCachedFunctionGraph(vw, self.fva, copy=False)
+        g2 = v_t_graph.getCachedFunctionGraph(vw, self.fva, copy=False)
+        self.assertIs(g1, g2)
+
+        # copies are private, but equivalent
+        g3 = v_t_graph.getCachedFunctionGraph(vw, self.fva)
+        self.assertIsNot(g1, g3)
+        self.assertEqual(sorted(g1.getNodes()), sorted(g3.getNodes()))
+
+        fresh = v_t_graph.buildFunctionGraph(vw, self.fva)
+        self.assertEqual(sorted(n[0] for n in fresh.getNodes()), sorted(n[0] for n in g1.getNodes()))
+
+        paths = v_t_graph.getCachedCodePaths(vw, self.fva)
+        self.assertEqual(len(paths), 2)
+        self.assertIs(paths, v_t_graph.getCachedCodePaths(vw, self.fva))
+
+        self.assertIs(vw.getFunctionGraph(self.fva, copy=False), vw.getFunctionGraph(self.fva, copy=False))
+
+    def test_graphcache_funcgraph_copy(self):
+        vw = self.vw
+        shared = vw.getFunctionGraph(self.fva, copy=False)
+        g = vw.getFunctionGraph(self.fva)
+        self.assertIsNot(g, shared)
+        self.assertIs(g.vw, vw)
+
+        # node lookups by va must land on the copy's nodes
+        node = g.getNodeByVa(0x1009)
+        self.assertIs(node, g.getNode(0x1008))
+        g.setNodeProp(node, 'color', 'red')
+        self.assertIsNone(shared.getNodeProps(0x1008).get('color'))
+
+    def test_graphcache_symbolik_copy(self):
+        import vivisect.symboliks.analysis as vs_anal
+        vw = self.vw
+        sctx = vs_anal.getSymbolikAnalysisContext(vw)
+        g1 = sctx.getSymbolikGraph(self.fva)
+        g2 = sctx.getSymbolikGraph(self.fva)
+
+        effs1 = g1.getNodeProps(self.fva).get('symbolik_effects')
+        effs2 = g2.getNodeProps(self.fva).get('symbolik_effects')
+        self.assertEqual(effs1, effs2)
+        self.assertIsNot(effs1, effs2)
+
+        effs1.pop()
+        self.assertEqual(len(effs2), len(sctx.getSymbolikGraph(self.fva).getNodeProps(self.fva).get('symbolik_effects')))
+
+    def test_graphcache_invalidate(self):
+        vw = self.vw
+        cache = vw.getFuncGraphCache()
+        g1 = v_t_graph.getCachedFunctionGraph(vw, self.fva, copy=False)
+        vers = cache.getFuncVersion(self.fva)
+
+        # a new code xref out of the function changes the graph
+        vw.addXref(0x1009, 0x100d, REF_CODE)
+        self.assertGreater(cache.getFuncVersion(self.fva), vers)
+        g2 = v_t_graph.getCachedFunctionGraph(vw, self.fva, copy=False)
+        self.assertIsNot(g1, g2)
+
+        # as does a code block coming or going
+        cb = vw.getCodeBlock(0x100a)
+        vw.delCodeBlock(cb[CB_VA])
+        g3 = v_t_graph.getCachedFunctionGraph(vw, self.fva, copy=False)
+        self.assertIsNot(g2, g3)
+
+        # non-code xrefs don't
+        vers = cache.getFuncVersion(self.fva)
+        vw.addXref(0x1000, 0x1000, REF_DATA)
+        self.assertEqual(cache.getFuncVersion(self.fva), vers)
+        self.assertIs(g3, v_t_graph.getCachedFunctionGraph(vw, self.fva, copy=False))
+
+    def test_graphcache_lru(self):
+        vw = self.vw
+        cache = vw.getFuncGraphCache()
+        cache.setCacheDepth(2)
+
+        g1 = v_t_graph.getCachedFunctionGraph(vw, self.fva, copy=False)
+        v_t_graph.getCachedFunctionGraph(vw, self.fva, revloop=True, copy=False)
+        self.assertEqual(len(cache), 2)
+
+        vw.getFunctionGraph(self.fva)
+        self.assertEqual(len(cache), 2)
+
+        # the oldest entry was pushed out
+        self.assertIsNot(g1, v_t_graph.getCachedFunctionGraph(vw, self.fva, copy=False))
+
+    def test_graphcache_remerge(self):
+        vw = self.vw
+        g = v_t_graph.getCachedFunctionGraph(vw, self.fva)
+        self.assertEqual(v_t_graph.findRemergeDown(g, 0x1009), set([0x1008]))
+        self.assertEqual([n[0] for n in g.getNodesByProp('hit')], [0x1008])
+        self.assertEqual(v_t_graph.findRemergeDown(g, self.fva), set([0x1000, 0x1008, 0x100a]))
+
+        self.assertEqual(g.getNaturalLoops(), {})
+        self.assertEqual(list(v_t_graph.getLoopPaths(g)), [])
@@ -27,3 +27,18 @@ class ImpApiTest(unittest.TestCase):
         imp = viv_impapi.getImportApi('winkern','arm')
         self.assertEqual( imp.getImpApiCallConv('ntoskrnl.ObReferenceObjectByHandle'), 'armcall')
 
+
+    def test_impapi_lazy(self):
+        imp = viv_impapi.ImportApi()
+        imp.addImpApi('posix', 'amd64')
+        imp.addImpApi('windows', 'amd64')
+        self.assertEqual(imp._api_pending, ['vivisect.impapi.posix.amd64', 'vivisect.impapi.windows.amd64'])
+
+        # the last one added wins, just like when they were imported eagerly
+        self.assertEqual(imp.getImpApiCallConv('ntdll.RtlAllocateHeap'), 'msx64call')
+        self.assertEqual(imp._api_pending, [])
+
+        imp.updateApiDef({'foo.bar': ('int', None, 'cdecl', 'foo.bar', ())})
+        self.assertEqual(imp.getImpApiArgs('foo.bar'), ())
+
+        self.assertRaises(ImportError, imp.addImpApi, 'posix', 'nope')
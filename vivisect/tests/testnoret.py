@@ -0,0 +1,100 @@
+import unittest
+
+import envi
+import vivisect
+import vivisect.tools.graphutil as v_t_graph
+import vivisect.analysis.generic.noret as v_noret
+
+# 0x1000: call 0x1010; xor eax, eax; ret
+# 0x1010: push ebp; call 0x1020; pop ebp; ret
+# 0x1020: push 0; call [0x2000]; ret
+# 0x1030: test eax, eax; jz 0x103c; call [0x2000]; xor eax, eax; ret
+# 0x1040: call 0x1030; ret
+fcode = bytes.fromhex(
+    'e80b00000031c0c3' 'cccccccccccccccc'
+    '55e80a0000005dc3' 'cccccccccccccccc'
+    '6a00ff1500200000' 'c3cccccccccccccc'
+    '85c07408ff15002000' '0031c0c3cccccc'
+    'e8ebffffffc3'
+)
+
+
+def getNoRetWorkspace():
+    vw = vivisect.VivWorkspace()
+    vw.setMeta('Architecture', 'i386')
+    vw.setMeta('Platform', 'windows')
+    vw.setMeta('Format', 'blob')
+    vw.addMemoryMap(0x1000, envi.memory.MM_RWX, 'blob', fcode)
+    vw.addSegment(0x1000, len(fcode), '.text', 'blob')
+    vw.addMemoryMap(0x2000, envi.memory.MM_READ, 'imports', b'\x00' * 4)
+    vw.addSegment(0x2000, 4, '.idata', 'blob')
+    vw.makeImport(0x2000, 'kernel32', 'ExitProcess')
+    vw._snapInAnalysisModules()
+    for fva in (0x1000, 0x1030, 0x1040):
+        vw.makeFunction(fva)
+    return vw
+
+
+class NoReturnTest(unittest.TestCase):
+
+    def setUp(self):
+        self.vw = getNoRetWorkspace()
+
+    def test_function_returns(self):
+        vw = self.vw
+        self.assertEqual(sorted(vw.getFunctions()), [0x1000, 0x1010, 0x1020, 0x1030, 0x1040])
+        for fva in vw.getFunctions():
+            self.assertTrue(v_noret.functionReturns(vw, fva))
+        self.assertEqual(v_noret.getCallers(vw, 0x1020), {0x1010})
+        self.assertEqual(v_noret.findNoReturns(vw, vw.getFunctions()), [])
+
+    def test_propagate(self):
+        vw = self.vw
+        # the functions were analyzed before ExitProcess was known to not return
+        vw.addNoReturnApi('kernel32.ExitProcess')
+        self.assertTrue(vw.isNoReturnVa(0x2000))
+
+        v_noret.analyzeFunction(vw, 0x1020)
+        for fva in (0x1000, 0x1010, 0x1020):
+            self.assertTrue(vw.isNoReturnVa(fva))
+
+        # the path around the call still returns
+        self.assertFalse(vw.isNoReturnVa(0x1030))
+        self.assertFalse(vw.isNoReturnVa(0x1040))
+
+    def test_propagate_workspace(self):
+        vw = self.vw
+        v_noret.analyze(vw)
+        self.assertEqual(vw.getMeta('NoReturnApisVa', {}), {})
+
+        vw.addNoReturnApi('kernel32.ExitProcess')
+        found = v_noret.findNoReturns(vw, vw.getFunctions())
+        self.assertEqual(sorted(found), [0x1000, 0x1010, 0x1020])
+
+    def test_cached_exits(self):
+        vw = self.vw
+        built = []
+        buildFunctionGraph = v_t_graph.buildFunctionGraph
+
+        def _build(vw, fva, *args, **kwargs):
+            built.append(fva)
+            return buildFunctionGraph(vw, fva, *args, **kwargs)
+
+        v_t_graph.buildFunctionGraph = _build
+        try:
+            v_noret.analyze(vw)
+            self.assertEqual(sorted(built), sorted(vw.getFunctions()))
+
+            # checking the callers again reuses the block exits
+            built = []
+            vw.addNoReturnApi('kernel32.ExitProcess')
+            v_noret.analyze(vw)
+            self.assertEqual(built, [])
+            self.assertTrue(vw.isNoReturnVa(0x1000))
+
+            # until the function changes
+            vw.addXref(0x103a, 0x1040, vivisect.REF_CODE)
+            self.assertIsNotNone(v_noret.getBlockExits(vw, 0x1030))
+            self.assertEqual(built, [0x1030])
+        finally:
+            v_t_graph.buildFunctionGraph = buildFunctionGraph
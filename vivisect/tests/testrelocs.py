@@ -0,0 +1,57 @@
+import unittest
+
+import envi
+import vivisect
+
+from vivisect.const import *
+
+
+def getRelocWorkspace():
+    vw = vivisect.VivWorkspace()
+    vw.setMeta('Architecture', 'i386')
+    vw.setMeta('Platform', 'windows')
+    fname = vw.addFile('relocs', 0x40000, 'deadbeef')
+    vw.addMemoryMap(0x40000, envi.memory.MM_READ, fname, b'\x00' * 0x1000)
+    vw.addMemoryMap(0x41000, envi.memory.MM_READ, fname, b'\x00' * 0x1000)
+    return vw
+
+
+class RelocationTest(unittest.TestCase):
+
+    def test_defer_relocs(self):
+        vw = getRelocWorkspace()
+        with vw.deferRelocations():
+            for off in range(0x10, 0x100, 4):
+                vw.addRelocation(0x40000 + off, RTYPE_BASEPTR, 0x1000 + off)
+            vw.addRelocation(0x41800, RTYPE_BASEOFF, 0x20)
+
+            # reads see the relocations right away
+            self.assertEqual(vw.readMemoryPtr(0x40010), 0x41010)
+            with vw.deferRelocations():
+                vw.addRelocation(0x41804, RTYPE_BASEOFF, 0x24)
+            self.assertEqual(vw.readMemoryPtr(0x41804), 0x40024)
+
+            # crossing the end of a map is written the regular way
+            vw.addRelocation(0x40ffe, RTYPE_BASEOFF, 0x30)
+
+        for mva, mmaxva, mmap, mbytes in vw._map_defs:
+            self.assertIsInstance(mbytes, bytes)
+
+        self.assertEqual(vw.readMemoryPtr(0x400fc), 0x410fc)
+        self.assertEqual(vw.readMemoryPtr(0x41800), 0x40020)
+        self.assertEqual(vw.readMemoryPtr(0x40ffe), 0x40030)
+        self.assertEqual(vw.getLocation(0x40010), (0x40010, 4, LOC_POINTER, 0x41010))
+        self.assertEqual(vw.getXrefsFrom(0x40010), [(0x40010, 0x41010, REF_PTR, 0)])
+
+    def test_replay_relocs(self):
+        vw = getRelocWorkspace()
+        for off in range(0x10, 0x100, 4):
+            vw.addRelocation(0x40000 + off, RTYPE_BASEPTR, 0x1000 + off)
+        vw.addRelocation(0x40ffe, RTYPE_BASEOFF, 0x30)
+
+        vw2 = vivisect.VivWorkspace()
+        vw2.importWorkspace(vw.exportWorkspace())
+        self.assertEqual(vw2.getMemorySnap(), vw.getMemorySnap())
+        self.assertEqual(vw2.getRelocations(), vw.getRelocations())
+        for mva, mmaxva, mmap, mbytes in vw2._map_defs:
+            self.assertIsInstance(mbytes, bytes)
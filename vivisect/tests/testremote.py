@@ -5,6 +5,8 @@ import unittest
 import threading
 import multiprocessing as mp
 
+import cobra
+
 import vivisect
 import vivisect.const as v_const
 import vivisect.tests.helpers as helpers
@@ -97,3 +99,161 @@ class VivisectRemoteTests(unittest.TestCase):
             finally:
                 tmpf.close()
                 os.unlink(tmpf.name)
+
+
+class VivServerSnapshotTests(unittest.TestCase):
+
+    def getWorkspace(self):
+        vw = vivisect.VivWorkspace()
+        vw.setMeta('Architecture', 'i386')
+        vw.setMeta('Platform', 'windows')
+        vw.setMeta('Format', 'blob')
+        vw.addMemoryMap(0x1000, 7, 'test', b'\x90' * 0x1000)
+        for i in range(100):
+            va = 0x1000 + (i * 0x10)
+            vw.addLocation(va, 4, v_const.LOC_NUMBER)
+            vw.makeName(va, 'num_%d' % i)
+            vw.setComment(va, 'first %d' % i)
+            vw.setComment(va, 'second %d' % i)
+            if i:
+                vw.addXref(va, va - 0x10, v_const.REF_PTR)
+
+        # names which move between addresses
+        vw.makeName(0x1000, 'A')
+        vw.makeName(0x1000, 'B')
+        vw.makeName(0x1010, 'A')
+        vw.makeName(0x1000, 'C')
+        vw.delXref((0x1020, 0x1010, v_const.REF_PTR, 0))
+        return vw
+
+    def getState(self, vw):
+        return (set(vw.getLocations()),
+                set(vw.getNames()),
+                dict(vw.va_by_name),
+                # (deleted xrefs stay in getXrefs(), compare the lookups)
+                set(xref for xrefs in vw.xrefs_by_from.values() for xref in xrefs),
+                set(vw.getComments()),
+                vw.getMemoryMaps())
+
+    def waitFor(self, cond):
+        for i in range(50):
+            if cond():
+                return True
+            time.sleep(0.1)
+        return False
+
+    def test_event_chunks(self):
+        events = self.getWorkspace().exportWorkspace()
+        chunks = v_r_server.packEventChunks(events, chunksize=64)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) <= 64 for chunk in chunks))
+        self.assertEqual(list(v_r_server.iterChunkEvents(chunks)), events)
+
+    def test_snapshot_server(self):
+        vw = self.getWorkspace()
+        with tempfile.TemporaryDirectory() as tmpd:
+            vw.setMeta('StorageName', os.path.join(tmpd, 'test.viv'))
+            vw.saveWorkspace()
+            events = vw.exportWorkspace()
+
+            server = v_r_server.VivServer(tmpd)
+            self.assertEqual(server.listWorkspaces(), ['test.viv'])
+
+            # the snapshot is the event log as is
+            chan, snapinfo = server.createEventChannelAt('test.viv')
+            offset, count = snapinfo
+            self.assertEqual(offset, len(events))
+            chunks = [server.getSnapshotChunk(chan, i) for i in range(count)]
+            self.assertEqual(list(v_r_server.iterChunkEvents(chunks)), list(events))
+            self.assertIsNone(server.wscache['test.viv'].compchunks)
+
+            othr = vivisect.VivWorkspace()
+            othr.importWorkspace(v_r_server.iterChunkEvents(chunks))
+            self.assertEqual(self.getState(othr), self.getState(vw))
+            self.assertEqual(othr.vaByName('A'), 0x1010)
+
+            # unless the client asks for a compacted one (with the same state)
+            cchan, cinfo = server.createEventChannelAt('test.viv', None, True)
+            self.assertEqual(cinfo[0], offset)
+            chunks = [server.getSnapshotChunk(cchan, i) for i in range(cinfo[1])]
+            snapevts = list(v_r_server.iterChunkEvents(chunks))
+            self.assertLess(len(snapevts), len(events))
+
+            cvw = vivisect.VivWorkspace()
+            cvw.importWorkspace(snapevts)
+            self.assertEqual(self.getState(cvw), self.getState(othr))
+
+            # events fired after the snapshot come with their offsets
+            server._fireEvent('test.viv', v_const.VWE_COMMENT, (0x1000, 'third'))
+            noff, nevts = server.getNextEventsAt(chan)
+            self.assertEqual(noff, offset + 1)
+            self.assertEqual(nevts, [(v_const.VWE_COMMENT, (0x1000, 'third'))])
+
+            # a refresh folds them into a new snapshot
+            cache = server.wscache['test.viv']
+            cache.refresh(server.wsdict['test.viv'][0])
+            self.assertEqual(cache.snapoffset, offset + 1)
+            self.assertEqual(cache.tail, [])
+            self.assertEqual(list(v_r_server.iterChunkEvents(cache.getChunks()))[-1],
+                             (v_const.VWE_COMMENT, (0x1000, 'third')))
+            self.assertIsNotNone(cache.compchunks)
+
+            # resume from before (and after) the new snapshot
+            server._fireEvent('test.viv', v_const.VWE_COMMENT, (0x1000, 'fourth'))
+            rchan, rinfo = server.createEventChannelAt('test.viv', offset)
+            self.assertIsNone(rinfo)
+            self.assertEqual(server.getNextEventsAt(rchan),
+                             (offset + 2, [(v_const.VWE_COMMENT, (0x1000, 'third')),
+                                           (v_const.VWE_COMMENT, (0x1000, 'fourth'))]))
+
+            rchan, rinfo = server.createEventChannelAt('test.viv', offset + 1)
+            self.assertEqual(server.getNextEventsAt(rchan),
+                             (offset + 2, [(v_const.VWE_COMMENT, (0x1000, 'fourth'))]))
+
+            self.assertRaises(Exception, server.createEventChannelAt, 'test.viv', offset + 3)
+
+            # old clients get the snapshot and the events since in one go
+            ochan = server.createEventChannel('test.viv')
+            othr = vivisect.VivWorkspace()
+            othr.importWorkspace(server.getNextEvents(ochan))
+            self.assertEqual(othr.getComment(0x1000), 'fourth')
+
+    def test_snapshot_client(self):
+        vw = self.getWorkspace()
+        with tempfile.TemporaryDirectory() as tmpd:
+            vw.setMeta('StorageName', os.path.join(tmpd, 'test.viv'))
+            vw.saveWorkspace()
+
+            timeo_wait = v_r_server.timeo_wait
+            v_r_server.timeo_wait = 0.2
+            server = v_r_server.VivServer(tmpd)
+            daemon = cobra.CobraDaemon(host='127.0.0.1', port=0, msgpack=True)
+            daemon.shareObject(server, 'VivServer')
+            daemon.fireThread()
+            try:
+                proxy = v_r_server.connectToServer('127.0.0.1', daemon.port)
+                othr = v_r_server.getServerWorkspace(proxy, 'test.viv')
+                self.assertEqual(self.getState(othr), self.getState(vw))
+
+                cvw = v_r_server.getServerWorkspace(proxy, 'test.viv', compact=True)
+                self.assertEqual(self.getState(cvw), self.getState(vw))
+                self.assertLess(len(cvw.exportWorkspace()), len(othr.exportWorkspace()))
+
+                # a second client sees the changes made by the first
+                thrd = v_r_server.getServerWorkspace(proxy, 'test.viv')
+                othr.setComment(0x1000, 'from othr')
+                self.assertTrue(self.waitFor(lambda: thrd.getComment(0x1000) == 'from othr'))
+
+                server._fireEvent('test.viv', v_const.VWE_COMMENT, (0x1010, 'from server'))
+                self.assertTrue(self.waitFor(lambda: othr.getComment(0x1010) == 'from server'))
+                self.assertTrue(self.waitFor(lambda: thrd.getComment(0x1010) == 'from server'))
+
+                # drop othr's channel, it resumes from the last event it got
+                wsinfo, queue, cache, chunks = server.chandict.pop(othr.server.chan)
+                wsinfo[3].pop(othr.server.chan)
+                server._fireEvent('test.viv', v_const.VWE_COMMENT, (0x1020, 'resumed'))
+                self.assertTrue(self.waitFor(lambda: othr.getComment(0x1020) == 'resumed'))
+                self.assertIn(othr.server.chan, server.chandict)
+            finally:
+                v_r_server.timeo_wait = timeo_wait
+                daemon.stopServer()
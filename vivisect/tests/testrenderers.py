@@ -0,0 +1,106 @@
+import unittest
+
+import envi.memcanvas as e_mcanvas
+
+import vivisect
+import vivisect.base as viv_base
+import vivisect.renderers as viv_rend
+
+from vivisect.const import *
+
+
+class CanvasUpdater(viv_rend.WorkspaceCanvasEvents, viv_base.VivEventCore):
+
+    def __init__(self, vw, canvas):
+        viv_base.VivEventCore.__init__(self, vw)
+        self.vw = vw
+        self.mem_canvas = canvas
+
+
+class CountingRenderer(viv_rend.WorkspaceRenderer):
+
+    def __init__(self, vw):
+        viv_rend.WorkspaceRenderer.__init__(self, vw)
+        self.rendered = []
+
+    def render(self, mcanv, va):
+        self.rendered.append(va)
+        return viv_rend.WorkspaceRenderer.render(self, mcanv, va)
+
+
+class WorkspaceRendererTest(unittest.TestCase):
+
+    def setUp(self):
+        vw = vivisect.VivWorkspace()
+        vw.setMeta('Architecture', 'i386')
+        vw.setMeta('Platform', 'windows')
+        # push ebp; mov ebp,esp; nop * 16; pop ebp; ret
+        code = b'\x55\x89\xe5' + (b'\x90' * 16) + b'\x5d\xc3'
+        vw.addMemoryMap(0x1000, 7, 'test', code + (b'\x00' * 0x100))
+        vw.addSegment(0x1000, len(code) + 0x100, 'test', 'test')
+        vw.makeFunction(0x1000)
+        vw.makeString(0x1020, 8)
+        self.vw = vw
+
+        self.rend = CountingRenderer(vw)
+        self.canv = e_mcanvas.StringMemoryCanvas(vw)
+        self.canv.addRenderer('viv', self.rend)
+        self.canv.setRenderCache()
+
+    def test_window_units(self):
+        vw = self.vw
+        self.assertEqual(self.rend.getUnitVa(self.canv, 0x1002), 0x1001)
+        self.assertEqual(self.rend.getUnitVa(self.canv, 0x1030), 0x1030)
+        self.assertEqual(self.rend.getPrevUnitVa(self.canv, 0x1003), 0x1001)
+        self.assertEqual(self.rend.getPrevUnitVa(self.canv, 0x1028), 0x1020)
+        self.assertEqual(self.rend.getPrevUnitVa(self.canv, 0x1031), 0x1030)
+
+        # a va inside an instruction starts the window at the instruction
+        va = self.canv.renderMemoryWindow(0x1002, 8, margin=2)
+        self.assertEqual(va, 0x1001)
+        self.assertEqual(self.canv._canv_rendvas[0], (0x1000, 1))
+        self.assertIn('mov ebp,esp', str(self.canv))
+
+        # the function header is several lines of one unit
+        self.canv.renderMemoryWindow(0x1003, 4, margin=1)
+        self.assertEqual(self.canv._canv_rendvas[0][0], 0x1001)
+        self.assertNotIn('FUNC:', str(self.canv))
+        self.canv.scrollMemoryWindow(-1)
+        self.assertIn('FUNC:', str(self.canv))
+
+        # the string is a single unit
+        self.canv.renderMemoryWindow(0x101c, 8, margin=0)
+        self.assertIn((0x1020, 8), self.canv._canv_rendvas)
+        self.assertIn((0x1028, 1), self.canv._canv_rendvas)
+
+    def test_window_events(self):
+        vw = self.vw
+        updater = CanvasUpdater(vw, self.canv)
+
+        self.canv.renderMemoryWindow(0x1000, 12, margin=0)
+        self.assertEqual(self.rend.rendered[0], 0x1000)
+        self.rend.rendered = []
+
+        # rendering the window again is all replay
+        self.canv.scrollMemoryWindow(0)
+        self.assertEqual(self.rend.rendered, [])
+
+        vw.setComment(0x1003, 'hello there')
+        updater._ve_fireEvent(VWE_COMMENT, (0x1003, 'hello there'))
+        self.assertEqual(self.rend.rendered, [0x1003])
+        self.assertIn(';hello there', str(self.canv))
+
+        # a name is rendered at its location and at the xrefs to it
+        self.rend.rendered = []
+        vw.addXref(0x1005, 0x1020, REF_DATA)
+        vw.makeName(0x1020, 'hellostr')
+        updater._ve_fireEvent(VWE_SETNAME, (0x1020, 'hellostr'))
+        self.assertEqual(sorted(self.rend.rendered), [0x1005])
+
+        self.canv.renderMemoryWindow(0x101c, 8, margin=0)
+        self.assertIn('hellostr', str(self.canv))
+
+        # renders the events did not touch stay cached
+        self.rend.rendered = []
+        self.canv.renderMemoryWindow(0x1000, 12, margin=0)
+        self.assertEqual(self.rend.rendered, [])
@@ -1,8 +1,13 @@
 import unittest
 
+import envi
+import vivisect
 import vivisect.reports as v_reports
+import vivisect.tools.locations as v_t_locs
 import vivisect.tests.helpers as helpers
 
+from vivisect.const import *
+
 
 class ReportsTest(unittest.TestCase):
     '''
@@ -49,11 +54,86 @@ class ReportsTest(unittest.TestCase):
     def test_funcomp(self):
         cols, retn = v_reports.runReportModule(self.vw, 'vivisect.reports.funccomplexity')
         self.assertEqual(cols, (("Code Blocks", int),
-                                ("Mnem Dist", int)))
+                                ("Mnem Dist", int),
+                                ("Loops", int),
+                                ("Loop Depth", int)))
         vw = self.vw
 
         self.assertGreater(len(retn), 0)
         for fva, comp in retn.items():
-            blks, mdist = comp
+            blks, mdist, loops, depth = comp
             self.assertEqual(blks, len(vw.getFunctionBlocks(fva)))
             self.assertEqual(mdist, vw.getFunctionMeta(fva, 'MnemDist', -1))
+            self.assertGreaterEqual(loops, depth)
+            self.assertGreaterEqual(depth, 0)
+
+
+class FuncComplexityTest(unittest.TestCase):
+
+    def test_funcomp_loops(self):
+        # xor ecx, ecx
+        # outer: xor edx, edx
+        # inner: inc edx; cmp edx, 4; jnz inner
+        #        inc ecx; cmp ecx, 4; jnz outer
+        #        ret
+        fcode = bytes.fromhex('31c9' '31d2' '4283fa0475fa' '4183f90475f2' 'c3')
+        vw = vivisect.VivWorkspace()
+        vw.setMeta('Architecture', 'i386')
+        vw.setMeta('Platform', 'windows')
+        vw.setMeta('Format', 'blob')
+        vw.addMemoryMap(0x1000, envi.memory.MM_RWX, 'blob', fcode)
+        vw.addSegment(0x1000, len(fcode), '.text', 'blob')
+        vw._snapInAnalysisModules()
+        vw.makeFunction(0x1000)
+
+        cols, retn = v_reports.runReportModule(vw, 'vivisect.reports.funccomplexity')
+        blks, mdist, loops, depth = retn[0x1000]
+        self.assertEqual(blks, 5)
+        self.assertEqual(loops, 2)
+        self.assertEqual(depth, 2)
+
+
+class LocationToolsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.vw = vivisect.VivWorkspace()
+        self.vw.setMeta('Architecture', 'i386')
+        self.vw.addMemoryMap(0x1000, 7, 'test', b'\x00' * 0x100)
+        self.vw.addLocation(0x1000, 4, LOC_NUMBER)
+        self.vw.addLocation(0x1004, 8, LOC_STRUCT, 'foo')
+        self.vw.addLocation(0x1008, 4, LOC_NUMBER)      # inside the struct
+        self.vw.addLocation(0x1010, 16, LOC_STRING)
+        self.vw.addLocation(0x101e, 4, LOC_NUMBER)      # hangs off the string
+        self.vw.addLocation(0x1030, 2, LOC_PAD)
+
+    def _checkBoth(self, func):
+        # the numpy and pure python paths must agree
+        ret = func(self.vw)
+        numpy = v_t_locs.numpy
+        v_t_locs.numpy = None
+        try:
+            self.assertEqual(func(self.vw), ret)
+        finally:
+            v_t_locs.numpy = numpy
+        return ret
+
+    def test_overlaps(self):
+        ret = self._checkBoth(v_t_locs.getLocationOverlaps)
+        self.assertEqual([(loc[0], othr[0], size) for loc, othr, size in ret], [
+            (0x1004, 0x1008, 4),
+            (0x1008, 0x1004, 4),
+            (0x1010, 0x101e, 2),
+            (0x101e, 0x1010, 2),
+        ])
+
+        cols, retn = v_reports.runReportModule(self.vw, 'vivisect.reports.overlaplocs')
+        self.assertEqual(sorted(retn.keys()), [0x1004, 0x1008, 0x1010, 0x101e])
+        self.assertEqual(retn[0x1008][0], 4)
+
+    def test_locationdist(self):
+        ret = self._checkBoth(v_t_locs.getLocationDistribution)
+        self.assertEqual(ret[LOC_NUMBER], ('Num/Int', 3, 12, 4))
+        self.assertEqual(ret[LOC_STRING][1:3], (1, 16))
+        self.assertEqual(ret[LOC_OP][1:3], (0, 0))
+        self.assertEqual(ret[LOC_UNDEF], ('Undefined', 0, 0x100 - 38, 85))
+        self.assertEqual(self.vw.getLocationDistribution(), ret)
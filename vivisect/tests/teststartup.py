@@ -0,0 +1,47 @@
+import unittest
+
+import envi
+import vivisect
+import vivisect.startbench as v_startbench
+import vivisect.impemu.lookup as viv_imp_lookup
+
+
+class StartupTest(unittest.TestCase):
+
+    def test_lazy_imports(self):
+        # the heavy subsystems must only be imported when they are needed
+        for modname in v_startbench.entry_modules:
+            self.assertEqual(v_startbench.getEagerModules(modname), [], msg=modname)
+
+    def test_parse_importtime(self):
+        text = '\n'.join([
+            'import time: self [us] | cumulative | imported package',
+            'import time:       120 |        120 |     envi.exc',
+            'import time:      1000 |       1120 |   envi',
+        ])
+        self.assertEqual(v_startbench.parseImportTime(text), [
+            (120, 120, 2, 'envi.exc'),
+            (1000, 1120, 1, 'envi'),
+        ])
+
+    def test_lazy_archs(self):
+        archs = envi.getArchModules(default=envi.ARCH_AMD64)
+        self.assertEqual(list.__getitem__(archs, envi.ARCH_I386 >> 16), None)
+        self.assertEqual(archs[envi.ARCH_DEFAULT].getArchId(), envi.ARCH_AMD64)
+        self.assertIs(archs[0], archs[envi.ARCH_AMD64 >> 16])
+
+        archs.setEndian(envi.ENDIAN_MSB)
+        self.assertEqual(archs[envi.ARCH_ARMV7 >> 16].getEndian(), envi.ENDIAN_MSB)
+        self.assertEqual(len([a for a in archs if a is not None]), len(archs))
+
+    def test_lazy_emulators(self):
+        eclass = viv_imp_lookup.getWorkspaceEmulator('i386', plat='windows')
+        self.assertEqual(eclass.__name__, 'Windowsi386Emulator')
+        eclass = viv_imp_lookup.getWorkspaceEmulator('amd64', plat='linux')
+        self.assertEqual(eclass.__name__, 'Amd64WorkspaceEmulator')
+        self.assertIsNone(viv_imp_lookup.getWorkspaceEmulator('nope'))
+
+        vw = vivisect.VivWorkspace()
+        vw.setMeta('Architecture', 'amd64')
+        vw.setMeta('Platform', 'linux')
+        self.assertIsInstance(vw.getEmulator(), eclass)
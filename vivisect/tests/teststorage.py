@@ -1,9 +1,16 @@
 import os
+import json
+import pickle
 import hashlib
+import importlib
 import tempfile
 import unittest
 
 import vivisect
+import vivisect.storage.compact as v_compact
+import vivisect.storage.eventlog as v_eventlog
+import vivisect.storage.snapshot as v_snapshot
+import vivisect.storage.tools.compact as v_t_compact
 from vivisect.const import *
 
 
@@ -32,6 +39,61 @@ def add_events(vw):
     vw.addExport(0x7000, EXP_FUNCTION, 'kernel32.YoThisExportFake', 'testfile')
 
 
+def add_churn(vw):
+    # Things a long lived workspace collects which the state no longer needs
+    add_events(vw)
+    for i in range(5):
+        vw.setMeta('foo', 'bar%d' % i)
+        vw.setComment(0x2000, 'comment %d' % i)
+        vw.addLocation(0x8000, 4, LOC_NUMBER)
+        vw.delLocation(0x8000)
+        vw.addXref(0x6000, 0x2000, REF_PTR)
+
+    vw.makeName(0x3000, 'first')
+    vw.makeName(0x3000, 'second')
+    vw.setComment(0x4000, 'gone')
+    vw.setComment(0x4000, None)
+    vw.setSymHint(0x5000, 0, 'hint')
+
+    vw.addVaSet('SomeSet', (('va', VASET_ADDRESS), ('name', VASET_STRING)), rows=((0x1000, 'one'),))
+    vw.setVaSetRow('SomeSet', (0x2000, 'two'))
+    vw.setVaSetRow('SomeSet', (0x1000, 'uno'))
+    vw.delVaSetRow('SomeSet', 0x2000)
+    vw.addVaSet('GoneSet', (('va', VASET_ADDRESS),))
+    vw.setVaSetRow('GoneSet', (0x1000,))
+    vw.delVaSet('GoneSet')
+
+    vw.addLocation(0x9000, 1, LOC_OP)
+    vw.addLocation(0x9100, 1, LOC_OP)
+    for fva in (0x9000, 0x9100):
+        vw.makeName(fva, 'sub_%x' % fva)
+        vw._fireEvent(VWE_ADDFUNCTION, (fva, {'Size': 1}))
+        vw.addCodeBlock(fva, 1, fva)
+        vw.setFunctionMeta(fva, 'Thing', 1)
+        vw.setFunctionMeta(fva, 'Thing', 2)
+    vw.delFunction(0x9100)
+
+    vw.chat('hello')
+
+
+def get_state(vw):
+    xrefs = dict((va, sorted(xrs)) for va, xrs in vw.xrefs_by_to.items() if xrs)
+    return {
+        'meta': vw.metadata,
+        'filemeta': vw.filemeta,
+        'locs': sorted(vw.loclist),
+        'xrefs': xrefs,
+        'names': vw.name_by_va,
+        'vanames': vw.va_by_name,
+        'comments': vw.comments,
+        'symhints': vw.symhints,
+        'funcs': vw.funcmeta,
+        'blocks': sorted(vw.codeblocks),
+        'vasets': vw.vasets,
+        'exports': vw.exports,
+    }
+
+
 class StorageTests(unittest.TestCase):
 
     def setUp(self):
@@ -124,3 +186,176 @@ class StorageTests(unittest.TestCase):
         self.assertIn("IndexError: list index out of range", ''.join(logcap.output))
         self.assertEqual(1, len(files))
         self.assertEqual('VivisectFile', files[0])
+
+    def test_compact_events(self):
+        vw = vivisect.VivWorkspace()
+        add_churn(vw)
+        events = list(vw.exportWorkspace())
+        compacted = v_compact.compactEvents(events)
+        self.assertEqual(events, vw.exportWorkspace())
+        self.assertLess(len(compacted), len(events) - 30)
+
+        # nothing which is gone from the state survives
+        self.assertNotIn(VWE_CHAT, [evt for evt, einfo in compacted])
+        self.assertNotIn(VWE_DELLOCATION, [evt for evt, einfo in compacted])
+        self.assertNotIn(0x9100, [einfo[0] for evt, einfo in compacted if evt == VWE_ADDFUNCTION])
+        self.assertIn((VWE_ADDVASET, ('SomeSet', (('va', VASET_ADDRESS), ('name', VASET_STRING)), ((0x1000, 'uno'),))),
+                      compacted)
+
+        cvw = vivisect.VivWorkspace()
+        cvw._event_list = []
+        cvw.importWorkspace(compacted)
+        self.assertEqual(get_state(vw), get_state(cvw))
+        self.assertEqual(vw.getName(0x3000), 'second')
+        self.assertEqual(cvw.getVaSetRows('SomeSet'), [(0x1000, 'uno')])
+
+    def test_compact_renames(self):
+        vw = vivisect.VivWorkspace()
+        vw.addMemoryMap(0x1000, 7, 'testfile', b'\x00' * 0x100)
+        vw.makeName(0x1000, 'A')
+        vw.makeName(0x1000, 'B')
+        vw.makeName(0x1010, 'A')
+        vw.makeName(0x1000, 'C')
+        self.assertEqual(vw.vaByName('A'), 0x1010)
+
+        cvw = vivisect.VivWorkspace()
+        cvw._event_list = []
+        cvw.importWorkspace(v_compact.compactEvents(vw.exportWorkspace()))
+        self.assertEqual(get_state(vw), get_state(cvw))
+        self.assertEqual(cvw.vaByName('A'), 0x1010)
+        self.assertEqual(cvw.vaByName('C'), 0x1000)
+        self.assertIsNone(cvw.vaByName('B'))
+
+    def test_compact_save(self):
+        vw = vivisect.VivWorkspace()
+        vw.setMeta('StorageName', self.tmpf.name)
+        vw.setMeta('StorageModule', 'vivisect.storage.mpfile')
+        add_churn(vw)
+        vw.saveWorkspace(compact=True)
+        size = os.path.getsize(self.tmpf.name)
+
+        # changes are still appended to a compacted workspace
+        vw.setComment(0x6000, 'later')
+        vw.saveWorkspace(fullsave=False)
+        self.assertGreater(os.path.getsize(self.tmpf.name), size)
+
+        ovw = vivisect.VivWorkspace()
+        ovw.setMeta('StorageModule', 'vivisect.storage.mpfile')
+        ovw.loadWorkspace(self.tmpf.name)
+        self.assertEqual(get_state(vw), get_state(ovw))
+
+        vw.saveWorkspace()
+        self.assertGreater(os.path.getsize(self.tmpf.name), size)
+
+    def test_compact_tool(self):
+        vw = vivisect.VivWorkspace()
+        vw.setMeta('StorageName', self.tmpf.name)
+        vw.setMeta('StorageModule', 'vivisect.storage.basicfile')
+        add_churn(vw)
+        vw.saveWorkspace()
+
+        ret = v_t_compact.compact(self.tmpf.name, inplace=True)
+        self.assertLess(ret['newevents'], ret['events'])
+        self.assertLess(ret['newsize'], ret['size'])
+        self.assertGreater(ret['load'], 0)
+
+        ovw = vivisect.VivWorkspace()
+        ovw.loadWorkspace(self.tmpf.name)
+        self.assertEqual(get_state(vw), get_state(ovw))
+
+    def test_snapshot_load(self):
+        snapname = v_snapshot.getSnapName(self.tmpf.name)
+        self.addCleanup(lambda: os.path.exists(snapname) and os.unlink(snapname))
+
+        vw = vivisect.VivWorkspace()
+        vw.setMeta('StorageName', self.tmpf.name)
+        vw.setMeta('StorageModule', 'vivisect.storage.mpfile')
+        add_churn(vw)
+        vw.saveWorkspace(snapshot=True)
+        self.assertTrue(os.path.exists(snapname))
+
+        # events saved after the snapshot are replayed on top of it
+        vw.setComment(0x6000, 'later')
+        vw.makeName(0x9000, 'func_9000')
+        vw.saveWorkspace(fullsave=False)
+
+        svw = vivisect.VivWorkspace()
+        svw.setMeta('StorageModule', 'vivisect.storage.mpfile')
+        with self.assertLogs('vivisect.storage.snapshot', level='INFO') as logcap:
+            svw.loadWorkspace(self.tmpf.name)
+        self.assertIn('replayed 2', ''.join(logcap.output))
+
+        ovw = vivisect.VivWorkspace()
+        ovw.setMeta('StorageModule', 'vivisect.storage.mpfile')
+        os.rename(snapname, snapname + '.bak')
+        try:
+            ovw.loadWorkspace(self.tmpf.name)
+        finally:
+            os.rename(snapname + '.bak', snapname)
+
+        self.assertEqual(get_state(svw), get_state(ovw))
+        self.assertEqual(svw.exportWorkspace(), ovw.exportWorkspace())
+        self.assertEqual(svw.getMemorySnap(), ovw.getMemorySnap())
+        self.assertEqual(svw.getLocation(0x3004), ovw.getLocation(0x3004))
+        self.assertEqual(svw.getCodeBlock(0x9000), (0x9000, 1, 0x9000))
+        self.assertEqual(svw.arch.getArchName(), 'i386')
+        self.assertEqual(svw._call_graph.getNode(0x9000)[1].get('repr'), 'func_9000')
+        self.assertEqual(svw.getFunctionMeta(0x9000, 'Thing'), 2)
+
+        # a log which was rewritten since is loaded the slow way
+        vw.saveWorkspace(compact=True, snapshot=False)
+        self.assertIsNone(v_snapshot.loadSnapshot(self.tmpf.name))
+
+    def test_eventlog(self):
+        vw = vivisect.VivWorkspace()
+        add_churn(vw)
+        events = list(vw.exportWorkspace())
+
+        for spill in (False, True):
+            elog = v_eventlog.EventLog(events, spill=spill, chunksize=256)
+            self.assertGreater(len(elog.chunks), 1)
+            self.assertEqual(len(elog), len(events))
+            self.assertEqual(list(elog), events)
+            self.assertEqual(list(elog[5:]), events[5:])
+            self.assertEqual(list(elog[17:40]), events[17:40])
+            self.assertEqual(len(elog[len(events):]), 0)
+            self.assertEqual(elog[-1], events[-1])
+            self.assertEqual(elog[30], events[30])
+            self.assertEqual(pickle.loads(pickle.dumps(elog)), events)
+            self.assertEqual(pickle.loads(pickle.dumps(elog[10:])), events[10:])
+            if spill:
+                self.assertLess(elog.getMemSize(), 256)
+
+            # only the end of the log may be removed
+            self.assertEqual(elog.pop(), events[-1])
+            del elog[20:]
+            self.assertEqual(list(elog), events[:20])
+            self.assertRaises(Exception, elog.__delitem__, slice(5, 10))
+            elog.extend(events[20:])
+            self.assertEqual(list(elog), events)
+
+    def test_eventlog_workspace(self):
+        with tempfile.TemporaryDirectory() as confdir:
+            with open(os.path.join(confdir, 'viv.json'), 'w') as f:
+                json.dump({'viv': {'CompactEventLog': True, 'EventLogSpill': True}}, f)
+
+            for storname in ('vivisect.storage.basicfile', 'vivisect.storage.mpfile'):
+                vw = vivisect.VivWorkspace(confdir=confdir)
+                self.assertIsInstance(vw._event_list, v_eventlog.EventLog)
+                vw.setMeta('StorageName', self.tmpf.name)
+                vw.setMeta('StorageModule', storname)
+                add_churn(vw)
+                vw.saveWorkspace()
+
+                # incremental saves only write the changes
+                vw.setComment(0x6000, 'later')
+                self.assertEqual(list(vw.exportWorkspaceChanges()), [(VWE_COMMENT, (0x6000, 'later'))])
+                vw.saveWorkspace(fullsave=False)
+
+                ovw = vivisect.VivWorkspace()
+                ovw.setMeta('StorageModule', storname)
+                ovw.loadWorkspace(self.tmpf.name)
+                self.assertEqual(get_state(vw), get_state(ovw))
+
+                stor = importlib.import_module(storname)
+                self.assertEqual(list(vw.exportWorkspace()), stor.vivEventsFromFile(self.tmpf.name))
@@ -202,7 +202,7 @@ def getCodePathsTo(fgraph, tocbva, loopcnt=0, maxpath=None):
                 ...etc...
     '''
     pathcnt = 0
-    looptrack = []
+    loopnids = fgraph.getLoopNids()
     pnode = vg_pathcore.newPathNode(nid=tocbva, eid=None)
 
     node = fgraph.getNode(tocbva)
@@ -227,8 +227,8 @@ def getCodePathsTo(fgraph, tocbva, loopcnt=0, maxpath=None):
 
         for eid, n1, n2, einfo in refsto:
             # Skip loops if they are "deeper" than we are allowed
-            loops = vg_pathcore.getPathLoopCount(cpath, 'nid', n1)
-            if loops > loopcnt:
+            # ( only nodes in a cycle may repeat in a path )
+            if n1 in loopnids and vg_pathcore.getPathLoopCount(cpath, 'nid', n1) > loopcnt:
                 continue
 
             vg_pathcore.setNodeProp(cpath, 'eid', eid)
@@ -248,6 +248,7 @@ def getCodePathsFrom(fgraph, fromcbva, loopcnt=0, maxpath=None):
                 ...etc...
     '''
     pathcnt = 0
+    loopnids = fgraph.getLoopNids()
     proot = vg_pathcore.newPathNode(nid=fromcbva, eid=None)
 
     cbnid,cbnode = fgraph.getNode(fromcbva)
@@ -271,8 +272,7 @@ def getCodePathsFrom(fgraph, fromcbva, loopcnt=0, maxpath=None):
 
         for eid, fromid, n2, einfo in refsfrom:
             # Skip loops if they are "deeper" than we are allowed
-            loops = vg_pathcore.getPathLoopCount(cpath, 'nid', n2)
-            if loops > loopcnt:
+            if n2 in loopnids and vg_pathcore.getPathLoopCount(cpath, 'nid', n2) > loopcnt:
                 continue
 
             npath = vg_pathcore.newPathNode(parent=cpath, nid=n2, eid=eid)
@@ -290,6 +290,7 @@ def getCodePaths(fgraph, loopcnt=0, maxpath=None):
                 ...etc...
     '''
     pathcnt = 0
+    loopnids = fgraph.getLoopNids()
     for root in fgraph.getHierRootNodes():
         proot = vg_pathcore.newPathNode(nid=root[0], eid=None)
         todo = [(root,proot), ]
@@ -312,7 +313,7 @@ def getCodePaths(fgraph, loopcnt=0, maxpath=None):
 
             for eid, fromid, toid, einfo in refsfrom:
                 # Skip loops if they are "deeper" than we are allowed
-                if vg_pathcore.getPathLoopCount(cpath, 'nid', toid) > loopcnt:
+                if toid in loopnids and vg_pathcore.getPathLoopCount(cpath, 'nid', toid) > loopcnt:
                     continue
 
                 npath = vg_pathcore.newPathNode(parent=cpath, nid=toid, eid=eid)
@@ -330,6 +331,7 @@ def walkCodePaths(fgraph, callback, loopcnt=0, maxpath=None):
     For root nodes, the current path and edge will be None types.  
     '''
     pathcnt = 0
+    loopnids = fgraph.getLoopNids()
     routed = fgraph.getMeta('Routed', False)
     for root in fgraph.getHierRootNodes():
         proot = vg_pathcore.newPathNode(nid=root[0], eid=None)
@@ -364,7 +366,7 @@ def walkCodePaths(fgraph, callback, loopcnt=0, maxpath=None):
                 if routed and not einfo.get('follow', False):
                     continue
                 # Skip loops if they are "deeper" than we are allowed
-                if vg_pathcore.getPathLoopCount(cpath, 'nid', toid) > loopcnt:
+                if toid in loopnids and vg_pathcore.getPathLoopCount(cpath, 'nid', toid) > loopcnt:
                     continue
 
                 edge = (eid,fromid,toid,einfo)
@@ -383,7 +385,14 @@ def getLoopPaths(fgraph):
     which loop.  The last element in the (node,edge) list will be the first
     "looped" block.
     '''
+    # Only walk into nodes which may still reach a loop...
+    loopnids = fgraph.getLoopNids()
+    canloop = fgraph.getReachingNids(loopnids)
+
     for root in fgraph.getHierRootNodes():
+        if root[0] not in canloop:
+            continue
+
         proot = vg_pathcore.newPathNode(nid=root[0], eid=None)
         todo = [ (root[0],proot,0), ]
 
@@ -391,17 +400,20 @@ def getLoopPaths(fgraph):
             node,cpath,loopcnt = todo.pop()
 
             count = 0
-            free = []
             if loopcnt == 1:
-                yield [ _nodeedge(n) for n in vg_pathcore.getPathToNode(npath) ]
+                yield [ _nodeedge(n) for n in vg_pathcore.getPathToNode(cpath) ]
 
             else:
                 for eid, fromid, toid, einfo in fgraph.getRefsFromByNid(node):
-
-                    loopcnt = vg_pathcore.getPathLoopCount(cpath, 'nid', toid)
-                    if loopcnt > 1:
+                    if toid not in canloop:
                         continue
 
+                    loopcnt = 0
+                    if toid in loopnids:
+                        loopcnt = vg_pathcore.getPathLoopCount(cpath, 'nid', toid)
+                        if loopcnt > 1:
+                            continue
+
                     count += 1
                     npath = vg_pathcore.newPathNode(parent=cpath, nid=toid, eid=eid)
                     todo.append((toid,npath,loopcnt))
@@ -533,6 +545,43 @@ def buildFunctionGraph(vw, fva, revloop=False, g=None):
 
     return g
 
+def _buildRevLoopGraph(vw, fva):
+    return buildFunctionGraph(vw, fva, revloop=True)
+
+def getCachedFunctionGraph(vw, fva, revloop=False, copy=True):
+    '''
+    Retrieve the function graph (see buildFunctionGraph) from the workspace
+    function graph cache, building it only if the function has changed
+    since it was last built.
+
+    Unless copy=False, the caller receives a private copy which may be
+    modified (routing, layout, etc) freely.  With copy=False the shared
+    cached graph is returned and *must not* be modified.
+    '''
+    ctor = buildFunctionGraph
+    name = 'fgraph'
+    if revloop:
+        ctor = _buildRevLoopGraph
+        name = 'fgraph_revloop'
+
+    g = vw.getFuncGraphCache().getFuncData(fva, name, ctor)
+    if copy:
+        g = g.copyGraph()
+    return g
+
+def getCachedCodePaths(vw, fva, loopcnt=0, maxpath=None):
+    '''
+    Return a list of the code paths for the function ( see getCodePaths )
+    from the workspace function graph cache.
+
+    NOTE: the returned list is shared, do not modify it.
+    '''
+    def _ctor(vw, fva):
+        fgraph = getCachedFunctionGraph(vw, fva, copy=False)
+        return list(getCodePaths(fgraph, loopcnt=loopcnt, maxpath=maxpath))
+
+    return vw.getFuncGraphCache().getFuncData(fva, ('codepaths', loopcnt, maxpath), _ctor)
+
 def getGraphNodeByVa(fgraph, va):
     '''
     Returns graph node a given VA falls within.
@@ -556,30 +605,21 @@ def getGraphNodeByVa(fgraph, va):
 def findRemergeDown(graph, va):
     '''
     starting at a given va, figure out the nodes connecting va to the next place something remerges
+
+    The nodes (which are all dominated by the node containing va) are marked
+    with the 'hit' property and their node ids are returned.
     '''
     startnid = getGraphNodeByVa(graph, va)
+    if startnid is None:
+        raise Exception("va not in graph 0x%x" % va)
 
-    # paint down graph, 
-    preRouteGraphDown(graph, startnid, mark='hit', loop=False)
+    # anything reachable only by way of startnid has not yet remerged
+    idoms = graph.getDominators()
+    hits = graph.getDominatedNids(startnid, idoms)
+    for nid in hits:
+        graph.setNodeProp(graph.getNode(nid), 'hit', True)
 
-    histo, nodewts, leaves = getNodeWeightHisto(graph)
-    startnode = graph.getNode(startnid)
-    startweight = nodewts.get(startnid)
-
-    for node in graph.getNodesByProp('hit'):
-        # skip the starting node
-        if node[0] == startnid: 
-            continue
-
-        if node[1].get('hit') is None: 
-            continue
-
-        for eid, frva, tova, einfo in graph.getRefsTo(node):
-            frnode = graph.getNode(frva)
-            if frnode[1].get('hit') is None:
-                # clear from here down
-                clearMarkDown(graph, tova, mark='hit')
-                break
+    return hits
 
 # path routing through a graph.  reduces aimless wandering when we know where we want to be
 def preRouteGraph(graph, fromva, tova, clearFirst=True):
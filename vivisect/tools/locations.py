@@ -0,0 +1,167 @@
+'''
+Whole workspace location queries (overlaps, distribution) computed from
+a va sorted interval view of the locations rather than per-byte lookups.
+
+numpy is used (if available) to find the runs of overlapping locations
+and to sum the location sizes, only those runs are swept in python.
+'''
+import heapq
+import operator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from vivisect.const import *
+
+
+def _getClustersPy(locs):
+    locs = sorted(locs, key=operator.itemgetter(L_VA))
+
+    ret = []
+    cur = []
+    maxend = None
+    for loc in locs:
+        lva, lsize = loc[L_VA], loc[L_SIZE]
+        if maxend is None or lva >= maxend:
+            if len(cur) > 1:
+                ret.append(cur)
+            cur = []
+            maxend = lva + lsize
+
+        cur.append(loc)
+        maxend = max(maxend, lva + lsize)
+
+    if len(cur) > 1:
+        ret.append(cur)
+    return ret
+
+
+def _getClustersNumpy(locs):
+    count = len(locs)
+    starts = numpy.fromiter(map(operator.itemgetter(L_VA), locs), dtype=numpy.uint64, count=count)
+    sizes = numpy.fromiter(map(operator.itemgetter(L_SIZE), locs), dtype=numpy.uint64, count=count)
+
+    order = numpy.argsort(starts, kind='stable')
+    starts = starts[order]
+    maxends = numpy.maximum.accumulate(starts + sizes[order])
+
+    # a location which starts at/after every previous end starts a new run
+    newrun = numpy.ones(count, dtype=bool)
+    newrun[1:] = starts[1:] >= maxends[:-1]
+    runids = numpy.cumsum(newrun)
+    multi = numpy.bincount(runids)[runids] > 1
+
+    ret = []
+    cur = []
+    lastid = None
+    for idx, runid in zip(order[multi].tolist(), runids[multi].tolist()):
+        if runid != lastid:
+            if cur:
+                ret.append(cur)
+            cur = []
+            lastid = runid
+        cur.append(locs[idx])
+
+    if cur:
+        ret.append(cur)
+    return ret
+
+
+def getOverlapClusters(vw):
+    '''
+    Return a list of runs (lists of location tuples sorted by va) where
+    each location in the run overlaps the span of the ones before it.
+    Locations which overlap nothing are not returned.
+    '''
+    locs = vw.loclist
+    if numpy is not None and locs:
+        return _getClustersNumpy(locs)
+    return _getClustersPy(locs)
+
+
+def getLocationOverlaps(vw):
+    '''
+    Return a list of (loc, other, size) tuples, one for each location
+    which shares bytes with another location.  other is the location it
+    shares the most bytes with and size is the number of shared bytes.
+
+    Example:
+        for loc, other, size in getLocationOverlaps(vw):
+            print('%s overlaps %s by %d' % (vw.reprLocation(loc), vw.reprLocation(other), size))
+    '''
+    ret = []
+    for run in getOverlapClusters(vw):
+        # sweep the run keeping a heap of the locations still "open"
+        best = {}
+        active = []
+        for idx, loc in enumerate(run):
+            lva = loc[L_VA]
+            lend = lva + loc[L_SIZE]
+            while active and active[0][0] <= lva:
+                heapq.heappop(active)
+
+            for aend, aidx in active:
+                size = min(aend, lend) - lva
+                if size <= 0:
+                    continue
+                if size > best.get(aidx, (0, None))[0]:
+                    best[aidx] = (size, idx)
+                if size > best.get(idx, (0, None))[0]:
+                    best[idx] = (size, aidx)
+
+            heapq.heappush(active, (lend, idx))
+
+        for idx in sorted(best):
+            size, oidx = best[idx]
+            ret.append((run[idx], run[oidx], size))
+
+    return ret
+
+
+def getLocationDistribution(vw):
+    '''
+    Return a dict of ltype: (typename, count, size, percent) describing
+    how much of the workspace memory maps each location type covers (with
+    LOC_UNDEF for the bytes which are not in any location).
+    '''
+    totsize = 0
+    for mapva, mapsize, mperm, mname in vw.getMemoryMaps():
+        totsize += mapsize
+
+    locs = vw.loclist
+    if numpy is not None and locs:
+        count = len(locs)
+        ltypes = numpy.fromiter(map(operator.itemgetter(L_LTYPE), locs), dtype=numpy.int64, count=count)
+        lsizes = numpy.fromiter(map(operator.itemgetter(L_SIZE), locs), dtype=numpy.float64, count=count)
+        counts = numpy.bincount(ltypes, minlength=LOC_MAX).tolist()
+        sizes = numpy.bincount(ltypes, weights=lsizes, minlength=LOC_MAX).tolist()
+
+    else:
+        counts = [0] * LOC_MAX
+        sizes = [0] * LOC_MAX
+        for loc in locs:
+            ltype = loc[L_LTYPE]
+            if ltype < LOC_MAX:
+                counts[ltype] += 1
+                sizes[ltype] += loc[L_SIZE]
+
+    def percent(size):
+        if not totsize:
+            return 0
+        return int((size / float(totsize)) * 100)
+
+    ret = {}
+    loctot = 0
+    for i in range(LOC_MAX):
+        size = int(sizes[i])
+        loctot += size
+        tname = loc_type_names.get(i, 'Unknown')
+        ret[i] = (tname, counts[i], size, percent(size))
+
+    # Update the undefined based on totals...
+    undeftot = totsize - loctot
+    ret[LOC_UNDEF] = ('Undefined', 0, undeftot, percent(undeftot))
+
+    return ret
@@ -37,7 +37,7 @@ def getEmuAtVa(vw, va, maxhit=None):
         return None
 
     cbva,cbsize,cbfva = vw.getCodeBlock(va)
-    fgraph = v_graphutil.buildFunctionGraph(vw, fva)
+    fgraph = v_graphutil.getCachedFunctionGraph(vw, fva, copy=False)
 
     # Just take the first one off the iterator...
     for path in v_graphutil.getCodePathsTo(fgraph, cbva):
@@ -1,3 +1,7 @@
+import io
+import os
+import mmap
+import stat
 import struct
 
 from copy import deepcopy
@@ -29,6 +33,109 @@ class MemObjFile:
         self.memobj.writeMemory(self.offset, bytes)
         self.offset += len(bytes)
 
+class BufferFile:
+    """
+    A read-only file like object over a buffer (bytes, bytearray, mmap...).
+
+    Besides seek()/read() it hands out bounds checked slices of a memoryview
+    of the buffer so parsers may read without a seek()/read() (and copy) per
+    structure.  Reads past the end are short (like a file) and negative
+    offsets or sizes raise an Exception.
+
+    Example:
+        fd = vstruct.BufferFile(bytez)
+        hdr = fd.readAt(0, 64)
+        view = fd.getView(0x1000, 0x200)
+    """
+
+    def __init__(self, buf, fd=None):
+        self.buf = buf
+        # an underlying (mapped) file to close along with us
+        self.fd = fd
+        self.view = memoryview(buf)
+        self.size = len(self.view)
+        self.offset = 0
+
+    def __len__(self):
+        return self.size
+
+    def getView(self, offset, size):
+        """
+        Return a memoryview (no copy) of up to size bytes at offset.
+        """
+        if offset < 0 or size < 0:
+            raise Exception('BufferFile: invalid read of %d bytes at offset %d' % (size, offset))
+        return self.view[offset:offset + size]
+
+    def readAt(self, offset, size):
+        """
+        Return up to size bytes at offset (without moving the file offset).
+        """
+        return bytes(self.getView(offset, size))
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.offset
+        elif whence == os.SEEK_END:
+            offset += self.size
+
+        if offset < 0:
+            raise Exception('BufferFile: invalid seek offset %d' % offset)
+
+        self.offset = offset
+        return offset
+
+    def tell(self):
+        return self.offset
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = max(self.size - self.offset, 0)
+        ret = self.readAt(self.offset, size)
+        self.offset += len(ret)
+        return ret
+
+    def flush(self):
+        pass
+
+    def fileno(self):
+        if self.fd is None:
+            raise io.UnsupportedOperation('fileno')
+        return self.fd.fileno()
+
+    def close(self):
+        try:
+            self.view.release()
+            if isinstance(self.buf, mmap.mmap):
+                self.buf.close()
+        except BufferError:
+            # someone still holds a view, let the GC clean up
+            pass
+
+        if self.fd is not None:
+            self.fd.close()
+
+def mapFile(fd):
+    """
+    Return a BufferFile over a read-only mmap of the (binary mode) file fd,
+    or fd itself if it can not be mapped (not a regular file, empty...).
+
+    NOTE: the mapping is of the file on disk, so the file must not be
+          truncated while it is being parsed.
+
+    Example:
+        pe = PE.PE(vstruct.mapFile(open(fname, 'rb')))
+    """
+    try:
+        fileno = fd.fileno()
+        if not stat.S_ISREG(os.fstat(fileno).st_mode):
+            return fd
+        fmap = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        return fd
+
+    return BufferFile(fmap, fd=fd)
+
 def isVstructType(x):
     return isinstance(x, vs_prims.v_base)
 
@@ -7,6 +7,8 @@ VStruct builder!  Used to serialize structure definitions etc...
 import copy
 import types
 import inspect
+import importlib
+import importlib.util
 import vstruct
 import vstruct.primitives as vs_prim
 
@@ -46,7 +48,7 @@ class VStructBuilder:
             self.addVStructEnumeration(enum)
 
     def __getattr__(self, name):
-        ns = self._vs_namespaces.get(name)
+        ns = self._getNamespace(name)
         if ns is not None:
             return ns
 
@@ -76,8 +78,30 @@ class VStructBuilder:
     def addVStructNamespace(self, name, builder):
         self._vs_namespaces[name] = builder
 
+    def addVStructNamespaceModule(self, name, modname):
+        '''
+        Add the named python module of VStruct classes as a namespace
+        without importing it.  The module is imported the first time
+        the namespace is used.
+
+        Example:
+            bldr.addVStructNamespaceModule('ntdll', 'vstruct.defs.windows.win_6_1_amd64.ntdll')
+            peb = bldr.buildVStruct('ntdll.PEB')
+        '''
+        if importlib.util.find_spec(modname) is None:
+            raise Exception('VStruct namespace module %s not found' % modname)
+        self._vs_namespaces[name] = modname
+
+    def _getNamespace(self, name):
+        ns = self._vs_namespaces.get(name)
+        if isinstance(ns, str):
+            # a lazily added module namespace (see addVStructNamespaceModule)
+            ns = importlib.import_module(ns)
+            self._vs_namespaces[name] = ns
+        return ns
+
     def getVStructNamespaces(self):
-        return list(self._vs_namespaces.items())
+        return [(name, self._getNamespace(name)) for name in list(self._vs_namespaces.keys())]
 
     def getVStructNamespaceNames(self):
         return list(self._vs_namespaces.keys())
@@ -89,7 +113,7 @@ class VStructBuilder:
         if namespace is None:
             return list(self._vs_defs.keys()) + list(self._vs_ctors.keys())
 
-        nsmod = self._vs_namespaces.get(namespace)
+        nsmod = self._getNamespace(namespace)
         if isinstance(nsmod, VStructBuilder):
             return nsmod.getVStructNames()
 
@@ -131,7 +155,7 @@ class VStructBuilder:
         # Check for a namespace
         parts = vsname.split('.', 1)
         if len(parts) == 2:
-            ns = self._vs_namespaces.get(parts[0])
+            ns = self._getNamespace(parts[0])
             if ns is None:
                 raise Exception('Namespace %s is not present! (need symbols?)' % parts[0])
 
@@ -152,7 +176,8 @@ class VStructBuilder:
 
         # If we still dont have a def, lets ask our namespaces
         if vsdef is None:
-            for ns in self._vs_namespaces.values():
+            for nsname in list(self._vs_namespaces.keys()):
+                ns = self._getNamespace(nsname)
 
                 if isinstance(ns, types.ModuleType):
                     cls = getattr(ns, vsname, None)
@@ -0,0 +1,404 @@
+'''
+Compiled codecs for fixed layout VStruct definitions.
+
+A VsCodec flattens a VStruct definition into a single struct.Struct and
+parses bytes into lightweight record views rather than building a python
+object for every primitive field.  Records hold a memoryview of the input
+(no copies) and only unpack the fields the first time one is accessed.
+Field access by attribute matches what vsParse() would give you:
+
+    import vstruct.codec as vs_codec
+    import vstruct.defs.elf as vs_elf
+
+    codec = vs_codec.getCodec(vs_elf.Elf64Symbol)
+    for sym in codec.parseArray(bytez, offset, count):
+        print(sym.st_name, sym.st_value)
+
+Definitions which may change shape while parsing (parse callbacks, custom
+vsParse() methods, unions, bitfields, NULL terminated strings) are not
+fixed layout and raise an Exception when compiled.
+
+The module may also be run to benchmark the codec against the object per
+field parser:
+
+    python -m vstruct.codec --count 20000 elf.Elf64Symbol
+'''
+import sys
+import time
+import struct
+import argparse
+
+from copy import deepcopy
+
+import vstruct
+import vstruct.primitives as vs_prims
+
+# Primitive classes with a fixed size (and struct format) we can compile
+fixed_prims = (
+    vs_prims.v_number,
+    vs_prims.v_float,
+    vs_prims.v_bytes,
+    vs_prims.v_str,
+    vs_prims.GUID,
+)
+
+# Compiled codecs by (class, args, kwargs)
+codec_cache = {}
+
+
+def _strValue(raw):
+    return raw.split(b'\x00')[0].decode('utf-8')
+
+
+class _PrimValue:
+    '''
+    Convert raw bytes to the vsGetValue() result of the given primitive
+    for the types whose values are more than a struct format.
+    '''
+    def __init__(self, prim):
+        self.prim = deepcopy(prim)
+
+    def __call__(self, raw):
+        self.prim.vsParse(raw)
+        return self.prim.vsGetValue()
+
+
+class VsRecord:
+    '''
+    A lazily decoded view of a VStruct within a buffer (see VsCodec).
+    '''
+    __slots__ = ('_vs_codec', '_vs_buf', '_vs_offset', '_vs_vals')
+
+    def __init__(self, codec, buf, offset):
+        self._vs_codec = codec
+        self._vs_buf = buf
+        self._vs_offset = offset
+        self._vs_vals = None
+
+    def _vsGetValues(self):
+        vals = self._vs_vals
+        if vals is None:
+            vals = self._vs_codec.struct.unpack_from(self._vs_buf, self._vs_offset)
+            self._vs_vals = vals
+        return vals
+
+    def __getattr__(self, name):
+        try:
+            return self._vs_codec._getField(self, name)
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, name):
+        return self._vs_codec._getField(self, str(name))
+
+    def __len__(self):
+        return self._vs_codec.size
+
+    def __iter__(self):
+        return self.vsGetFields()
+
+    def __repr__(self):
+        return self._vs_codec.name
+
+    def vsGetTypeName(self):
+        return self._vs_codec.name
+
+    def vsGetOffset(self):
+        '''
+        Return the offset of this record within the parsed buffer.
+        '''
+        return self._vs_offset
+
+    def vsGetFields(self):
+        '''
+        Yield (fieldname, value) tuples for the fields of the record where
+        nested structures are returned as records.
+
+        Example:
+            for fname, value in rec.vsGetFields():
+                print('%s: %r' % (fname, value))
+        '''
+        codec = self._vs_codec
+        for fname in codec.fields:
+            yield fname, codec._getField(self, fname)
+
+    def vsEmit(self):
+        '''
+        Return the bytes for the record.
+        '''
+        return bytes(self._vs_buf[self._vs_offset:self._vs_offset + self._vs_codec.size])
+
+    def vsToStruct(self):
+        '''
+        Parse the record bytes into a (full object per field) instance of
+        the VStruct definition the codec was compiled from.
+        '''
+        vs = deepcopy(self._vs_codec.proto)
+        vs.vsParse(self.vsEmit())
+        return vs
+
+
+class VsCodec:
+    '''
+    Compile a fixed layout VStruct definition (an instance) into a single
+    struct.Struct for parsing into VsRecord views.
+
+    Example:
+        codec = VsCodec(vs_pe.IMAGE_SECTION_HEADER())
+        sec = codec.parse(bytez, offset)
+        print(sec.Name, sec.VirtualAddress)
+    '''
+    def __init__(self, vs):
+        if not isinstance(vs, vstruct.VStruct):
+            raise Exception('VsCodec requires a VStruct instance, not %r' % (vs,))
+
+        self.proto = vs
+        self.name = vs.vsGetTypeName()
+        self.fields = []
+        # fieldname -> (index, conv) for primitives or (offset, codec) for nested structs
+        self.prims = {}
+        self.kids = {}
+
+        self._checkFixed(vs)
+
+        endian = None
+        fmts = []
+        offset = 0
+        # the index into unpacked tuples ('%dx' pads unpack to nothing)
+        vidx = 0
+        for fname, field in vs.vsGetFields():
+            size = len(field)
+            self.fields.append(fname)
+            if field.vsIsPrim():
+                fmt, conv, bigend = self._getPrimFormat(fname, field)
+                if bigend is not None:
+                    if endian is not None and endian != bigend:
+                        raise Exception('%s: mixed endian fields are not supported' % self.name)
+                    endian = bigend
+                self.prims[fname] = (vidx, conv)
+                fmts.append(fmt)
+                vidx += 1
+
+            else:
+                kid = VsCodec(field)
+                if kid.endian is not None:
+                    if endian is not None and endian != kid.endian:
+                        raise Exception('%s: mixed endian fields are not supported' % self.name)
+                    endian = kid.endian
+                self.kids[fname] = (offset, kid)
+                if size:
+                    fmts.append('%dx' % size)
+
+            offset += size
+
+        self.endian = endian
+        self.fmt = ('>' if endian else '<') + ''.join(fmts)
+        self.struct = struct.Struct(self.fmt)
+        self.size = self.struct.size
+
+        if self.size != offset:
+            raise Exception('%s: compiled size %d != %d' % (self.name, self.size, offset))
+
+        # A record class per definition with a property per field
+        props = {'__slots__': ()}
+        for fname in self.fields:
+            if fname.isidentifier() and not hasattr(VsRecord, fname):
+                props[fname] = self._getFieldProperty(fname)
+        self.rclass = type('%sRecord' % self.name, (VsRecord,), props)
+
+    def _getFieldProperty(self, fname):
+        prim = self.prims.get(fname)
+        if prim is None:
+            offset, kid = self.kids[fname]
+            return property(lambda rec: kid.rclass(kid, rec._vs_buf, rec._vs_offset + offset))
+
+        idx, conv = prim
+        if conv is None:
+            return property(lambda rec: rec._vsGetValues()[idx])
+        return property(lambda rec: conv(rec._vsGetValues()[idx]))
+
+    def _checkFixed(self, vs):
+        if isinstance(vs, vstruct.VUnion):
+            raise Exception('%s: unions are not fixed layout' % self.name)
+
+        if type(vs).vsParse is not vstruct.VStruct.vsParse:
+            raise Exception('%s: custom vsParse() is not fixed layout' % self.name)
+
+        if vs._vs_pcallbacks or any(n.startswith('pcb_') for n in dir(type(vs))):
+            raise Exception('%s: parse callbacks are not fixed layout' % self.name)
+
+    def _getPrimFormat(self, fname, field):
+        '''
+        Return (fmt, conv, bigend) for a primitive field where conv is
+        a callable to convert the unpacked value (or None).
+        '''
+        if not isinstance(field, fixed_prims):
+            raise Exception('%s.%s: %s is not a fixed layout primitive' % (self.name, fname, field.vsGetTypeName()))
+
+        size = len(field)
+        if isinstance(field, (vs_prims.v_number, vs_prims.v_float)):
+            fmt = field._vs_fmt
+            if fmt is None:
+                # odd sized (24 bit) numbers are parsed by the primitive
+                return '%ds' % size, _PrimValue(field), None
+            if size == 1:
+                # single bytes have no endianness
+                return fmt[1:], None, None
+            return fmt[1:], None, fmt[0] == '>'
+
+        if type(field) is vs_prims.v_bytes:
+            return '%ds' % size, None, None
+
+        if type(field) is vs_prims.v_str:
+            return '%ds' % size, _strValue, None
+
+        return '%ds' % size, _PrimValue(field), None
+
+    def _getField(self, rec, fname):
+        prim = self.prims.get(fname)
+        if prim is not None:
+            idx, conv = prim
+            val = rec._vsGetValues()[idx]
+            if conv is not None:
+                return conv(val)
+            return val
+
+        offset, kid = self.kids[fname]
+        return kid.rclass(kid, rec._vs_buf, rec._vs_offset + offset)
+
+    def parse(self, buf, offset=0):
+        '''
+        Return a VsRecord view of the structure at offset in buf (bytes,
+        bytearray, mmap or memoryview).
+        '''
+        if offset < 0 or offset + self.size > len(buf):
+            raise Exception('%s: not enough data at offset %d' % (self.name, offset))
+        if not isinstance(buf, memoryview):
+            buf = memoryview(buf)
+        return self.rclass(self, buf, offset)
+
+    def parseArray(self, buf, offset=0, count=None):
+        '''
+        Return a list of VsRecord views for consecutive structures in buf
+        (as many as fit if count is None).
+        '''
+        if not isinstance(buf, memoryview):
+            buf = memoryview(buf)
+
+        size = self.size
+        maxcount = (len(buf) - offset) // size
+        if count is None:
+            count = maxcount
+        elif count > maxcount:
+            raise Exception('%s: not enough data for %d records' % (self.name, count))
+
+        rclass = self.rclass
+        return [rclass(self, buf, off) for off in range(offset, offset + (count * size), size)]
+
+    def unpackArray(self, buf, offset=0, count=None):
+        '''
+        Return the raw (unconverted) primitive value tuples for consecutive
+        structures in buf.  This is the fastest way to bulk parse tables of
+        numeric fields; use getFieldIndex() to pick fields from the tuples.
+        '''
+        size = self.size
+        if count is None:
+            count = (len(buf) - offset) // size
+
+        end = offset + (count * size)
+        if end > len(buf):
+            raise Exception('%s: not enough data for %d records' % (self.name, count))
+
+        return list(self.struct.iter_unpack(memoryview(buf)[offset:end]))
+
+    def getFieldIndex(self, fname):
+        '''
+        Return the index of the named primitive field in unpacked tuples.
+        '''
+        return self.prims[fname][0]
+
+
+def getCodec(vsdef, *args, **kwargs):
+    '''
+    Return the (cached) VsCodec for a VStruct class constructed with the
+    given arguments (or for the given VStruct instance, uncached).
+
+    Example:
+        codec = getCodec(vs_elf.Elf32Symbol, bigend=True)
+    '''
+    if isinstance(vsdef, vstruct.VStruct):
+        return VsCodec(vsdef)
+
+    key = (vsdef, args, tuple(sorted(kwargs.items())))
+    codec = codec_cache.get(key)
+    if codec is None:
+        codec = VsCodec(vsdef(*args, **kwargs))
+        codec_cache[key] = codec
+    return codec
+
+
+def _benchParse(sname, count, rounds=3):
+    vs = vstruct.getStructure(sname)
+    if vs is None:
+        raise Exception('Unknown structure: %s' % sname)
+
+    codec = VsCodec(vs)
+    size = len(vs)
+    buf = bytes((i * 7) & 0x7f for i in range(size * count))
+    names = codec.fields
+
+    def objparse(fast):
+        ret = []
+        for i in range(count):
+            x = vstruct.getStructure(sname)
+            x.vsParse(buf, offset=i * size, fast=fast)
+            ret.append(x)
+        return ret
+
+    def recparse():
+        return codec.parseArray(buf, 0, count)
+
+    def touch(recs):
+        for r in recs:
+            for n in names:
+                getattr(r, n)
+
+    results = []
+    for desc, func in (('vsParse', lambda: objparse(False)),
+                       ('vsParse(fast=True)', lambda: objparse(True)),
+                       ('VsCodec.parseArray', recparse)):
+        best = None
+        for i in range(rounds):
+            start = time.time()
+            recs = func()
+            parsed = time.time() - start
+            touch(recs)
+            total = time.time() - start
+            if best is None or total < best[1]:
+                best = (parsed, total)
+        results.append((desc, best[0], best[1]))
+
+    return size, results
+
+
+def setup():
+    ap = argparse.ArgumentParser('Benchmark compiled vstruct codecs against vsParse()')
+    ap.add_argument('structs', nargs='*', default=['elf.Elf64Symbol', 'pe.IMAGE_SECTION_HEADER'],
+                    help='vstruct.defs structure paths (ie. elf.Elf64Symbol)')
+    ap.add_argument('--count', type=int, default=20000, help='Number of records to parse')
+    ap.add_argument('--rounds', type=int, default=3, help='Best of how many runs')
+    return ap
+
+
+def main(argv):
+    opts = setup().parse_args(argv)
+    for sname in opts.structs:
+        size, results = _benchParse(sname, opts.count, rounds=opts.rounds)
+        print('%s (%d bytes) x %d' % (sname, size, opts.count))
+        basetime = results[0][2]
+        for desc, parsed, total in results:
+            print('    %-20s parse: %.3fs  parse+access: %.3fs  (%.1fx)' % (desc, parsed, total, basetime / total))
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -71,7 +71,7 @@ class Elf32Reloc(vstruct.VStruct):
 
 class Elf32Reloca(Elf32Reloc):
     def __init__(self, bigend=False):
-        Elf32Reloc.__init__(self)
+        Elf32Reloc.__init__(self, bigend=bigend)
         self.r_addend = v_uint32(bigend=bigend)
 
     def __eq__(self, other):
@@ -0,0 +1,62 @@
+import io
+import os
+import mmap
+import tempfile
+import unittest
+
+import vstruct
+
+
+class BufferFileTest(unittest.TestCase):
+
+    def test_bufferfile_read(self):
+        fd = vstruct.BufferFile(b'ABCDEFGH')
+        self.assertEqual(len(fd), 8)
+        self.assertEqual(fd.read(3), b'ABC')
+        self.assertEqual(fd.tell(), 3)
+        self.assertEqual(fd.read(), b'DEFGH')
+        self.assertEqual(fd.read(4), b'')
+
+        fd.seek(-2, os.SEEK_END)
+        self.assertEqual(fd.read(10), b'GH')
+        fd.seek(2)
+        fd.seek(1, os.SEEK_CUR)
+        self.assertEqual(fd.read(1), b'D')
+
+        # readAt does not move the offset and short reads past the end
+        self.assertEqual(fd.readAt(6, 10), b'GH')
+        self.assertEqual(fd.readAt(100, 10), b'')
+        self.assertEqual(fd.tell(), 4)
+
+        view = fd.getView(2, 3)
+        self.assertIsInstance(view, memoryview)
+        self.assertEqual(bytes(view), b'CDE')
+
+        self.assertRaises(Exception, fd.getView, -1, 4)
+        self.assertRaises(Exception, fd.readAt, 0, -1)
+        self.assertRaises(Exception, fd.seek, -1)
+        self.assertRaises(io.UnsupportedOperation, fd.fileno)
+
+    def test_mapfile(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'mapped.bin')
+            with open(fname, 'wb') as f:
+                f.write(b'\x7fELF' + b'\x00' * 60)
+
+            fd = vstruct.mapFile(open(fname, 'rb'))
+            self.assertIsInstance(fd, vstruct.BufferFile)
+            self.assertIsInstance(fd.buf, mmap.mmap)
+            self.assertEqual(fd.readAt(0, 4), b'\x7fELF')
+            self.assertEqual(len(fd), 64)
+            fd.close()
+            self.assertTrue(fd.buf.closed)
+            self.assertTrue(fd.fd.closed)
+
+            # empty files can't be mapped and are handed back as is
+            ename = os.path.join(tmpdir, 'empty.bin')
+            open(ename, 'wb').close()
+            with open(ename, 'rb') as efd:
+                self.assertIs(vstruct.mapFile(efd), efd)
+
+        bfd = io.BytesIO(b'abcd')
+        self.assertIs(vstruct.mapFile(bfd), bfd)
@@ -1,4 +1,5 @@
 import os
+import sys
 import binascii
 import unittest
 
@@ -59,6 +60,22 @@ class VstructBuilderTest(unittest.TestCase):
         bldr.addVStructCtor('foo', nested)
         self.assertEqual(bldr.getVStructCtorNames(), ['foo'])
 
+    def test_lazy_namespaces(self):
+        modname = 'vstruct.defs.windows.win_6_1_amd64.ntdll'
+        bldr = vs_builder.VStructBuilder()
+        bldr.addVStructNamespaceModule('ntdll', modname)
+        self.assertTrue(bldr.hasVStructNamespace('ntdll'))
+        self.assertEqual(bldr.getVStructNamespaceNames(), ['ntdll'])
+
+        peb = bldr.buildVStruct('ntdll.PEB')
+        self.assertEqual(peb.vsGetTypeName(), 'PEB')
+        self.assertIs(bldr._vs_namespaces['ntdll'], sys.modules[modname])
+        self.assertIn('PEB', bldr.getVStructNames(namespace='ntdll'))
+        # un-namespaced names are searched for in the namespaces too
+        self.assertEqual(bldr.buildVStruct('TEB').vsGetTypeName(), 'TEB')
+
+        self.assertRaises(Exception, bldr.addVStructNamespaceModule, 'nope', 'vstruct.defs.nope')
+
     def test_get_pycode(self):
         # TODO: Windows CI
         pass
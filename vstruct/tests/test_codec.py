@@ -0,0 +1,117 @@
+import struct
+import unittest
+
+import vstruct
+import vstruct.codec as vs_codec
+import vstruct.primitives as p
+import vstruct.defs.pe as vs_pe
+import vstruct.defs.elf as vs_elf
+
+
+class CallbackStruct(vstruct.VStruct):
+    def __init__(self):
+        vstruct.VStruct.__init__(self)
+        self.size = p.v_uint32()
+        self.data = p.v_bytes()
+
+    def pcb_size(self):
+        self['data'].vsSetLength(self.size)
+
+
+class ZstrStruct(vstruct.VStruct):
+    def __init__(self):
+        vstruct.VStruct.__init__(self)
+        self.name = p.v_zstr()
+
+
+def getBytes(size):
+    return bytes(((i * 13) + 1) & 0x7f for i in range(size))
+
+
+class VsCodecTests(unittest.TestCase):
+
+    def checkRecord(self, rec, vs):
+        self.assertEqual(len(rec), len(vs))
+        self.assertEqual([n for n, v in rec.vsGetFields()], vs._vs_fields)
+        for fname, fobj in vs.vsGetFields():
+            if fobj.vsIsPrim():
+                self.assertEqual(getattr(rec, fname), getattr(vs, fname), msg=fname)
+                self.assertEqual(rec[fname], getattr(vs, fname), msg=fname)
+            else:
+                self.checkRecord(getattr(rec, fname), fobj)
+
+    def test_codec_matches_vsparse(self):
+        for cls in (vs_elf.Elf64Symbol, vs_elf.Elf32, vs_pe.IMAGE_SECTION_HEADER, vs_pe.IMAGE_NT_HEADERS):
+            vs = cls()
+            buf = getBytes(len(vs) + 10)
+            vs.vsParse(buf, offset=10)
+            rec = vs_codec.getCodec(cls).parse(buf, 10)
+            self.checkRecord(rec, vs)
+            self.assertEqual(rec.vsEmit(), vs.vsEmit())
+            self.assertEqual(rec.vsToStruct().vsEmit(), vs.vsEmit())
+
+        # data directories are a VArray (indexed records)
+        rec = vs_codec.getCodec(vs_pe.IMAGE_NT_HEADERS).parse(buf, 10)
+        ddir = rec.OptionalHeader.DataDirectory
+        self.assertEqual(ddir[1].Size, vs.OptionalHeader.DataDirectory[1].Size)
+        self.assertIsInstance(rec.Signature, bytes)
+        self.assertIsInstance(vs_codec.getCodec(vs_pe.IMAGE_SECTION_HEADER).parse(buf).Name, str)
+
+    def test_codec_nested_fields(self):
+        # e_oemid and e_lfanew follow the nested e_res array
+        vs = vs_pe.IMAGE_DOS_HEADER()
+        buf = bytes(range(len(vs)))
+        vs.vsParse(buf)
+        rec = vs_codec.getCodec(vs_pe.IMAGE_DOS_HEADER).parse(buf)
+        self.checkRecord(rec, vs)
+        self.assertEqual(rec.e_oemid, 0x2524)
+        self.assertEqual(rec.e_lfanew, vs.e_lfanew)
+        self.assertEqual(rec.vsEmit(), buf)
+
+        codec = vs_codec.getCodec(vs_pe.IMAGE_DOS_HEADER)
+        vals = codec.unpackArray(buf)[0]
+        self.assertEqual(len(vals), len(codec.prims))
+        self.assertEqual(vals[codec.getFieldIndex('e_lfanew')], vs.e_lfanew)
+
+    def test_codec_bigend(self):
+        codec = vs_codec.getCodec(vs_elf.Elf32Symbol, bigend=True)
+        self.assertIs(codec, vs_codec.getCodec(vs_elf.Elf32Symbol, bigend=True))
+        self.assertIsNot(codec, vs_codec.getCodec(vs_elf.Elf32Symbol))
+        self.assertEqual(codec.fmt[0], '>')
+
+        buf = struct.pack('>IIIBBH', 1, 0x41414141, 20, 0x12, 0, 7)
+        sym = codec.parse(buf)
+        self.assertEqual((sym.st_name, sym.st_value, sym.st_size, sym.st_info, sym.st_shndx),
+                         (1, 0x41414141, 20, 0x12, 7))
+
+    def test_codec_arrays(self):
+        codec = vs_codec.getCodec(vs_elf.Elf64Symbol)
+        buf = bytearray(getBytes(codec.size * 5 + 3))
+        recs = codec.parseArray(buf, 3)
+        self.assertEqual(len(recs), 5)
+        self.assertEqual(len(codec.parseArray(buf, 3, 2)), 2)
+        self.assertRaises(Exception, codec.parseArray, buf, 3, 6)
+        self.assertRaises(Exception, codec.parse, buf, len(buf) - 4)
+
+        vals = codec.unpackArray(buf, 3)
+        idx = codec.getFieldIndex('st_value')
+        for rec, val in zip(recs, vals):
+            vs = vs_elf.Elf64Symbol()
+            vs.vsParse(buf, offset=rec.vsGetOffset())
+            self.assertEqual(rec.st_value, vs.st_value)
+            self.assertEqual(val[idx], vs.st_value)
+
+        # records are views, values are unpacked on first access
+        rec = codec.parse(buf, 3)
+        buf[3:7] = b'\x00' * 4
+        self.assertEqual(rec.st_name, 0)
+
+    def test_codec_not_fixed(self):
+        self.assertRaises(Exception, vs_codec.VsCodec, CallbackStruct())
+        self.assertRaises(Exception, vs_codec.VsCodec, ZstrStruct())
+        self.assertRaises(Exception, vs_codec.VsCodec, vstruct.VUnion())
+
+    def test_codec_bench(self):
+        size, results = vs_codec._benchParse('elf.Elf32Symbol', 20, rounds=1)
+        self.assertEqual(size, 16)
+        self.assertEqual([r[0] for r in results], ['vsParse', 'vsParse(fast=True)', 'VsCodec.parseArray'])
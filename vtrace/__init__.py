@@ -77,7 +77,6 @@ VSYM_SIZE = 2
 VSYM_TYPE = 3
 VSYM_FILE = 4
 
-from vtrace.rmi import *
 from vtrace.notifiers import *
 from vtrace.breakpoints import *
 from vtrace.watchpoints import *
@@ -1435,7 +1434,8 @@ def getTrace(target=None, **kwargs):
         return vt_vmware.VMWare32WindowsTrace( host=host, port=port )
 
     if remote: #We have a remote server!
-        return getRemoteTrace()
+        import vtrace.rmi as v_rmi
+        return v_rmi.getRemoteTrace()
 
     # From here down, we're trying to build a trace for *this* platform!
 
@@ -1560,3 +1560,24 @@ def getEmu(trace, arch=envi.ARCH_DEFAULT):
     arch_mod = envi.getArchModule(arch_name)
     emu = arch_mod.getEmulator()
     return emu
+
+# The cobra based remote debugging helpers (vtrace.rmi) used to be star
+# imported here.  cobra is slow to import and most traces are local, so
+# they are now imported the first time one is asked for.
+_rmi_names = (
+    'getTracerFactory',
+    'TraceProxyFactory',
+    'RemoteTrace',
+    'getCallbackProxy',
+    'getCallbackPort',
+    'startCobraDaemon',
+    'getRemoteTrace',
+    'releaseRemoteTrace',
+    'startVtraceServer',
+)
+
+def __getattr__(name):
+    if name in _rmi_names:
+        import vtrace.rmi as v_rmi
+        return getattr(v_rmi, name)
+    raise AttributeError("module 'vtrace' has no attribute '%s'" % name)
@@ -607,8 +607,8 @@ class GdbStubMixin_old(e_registers.RegisterContext):
 
         else:
             pe = PE.peFromMemoryObject(self, baseaddr)
-            for rva, ord, name in pe.getExports():
-                self.addSymbol(e_resolv.Symbol(name, baseaddr+rva, 0, normname))
+            syms = [e_resolv.Symbol(name, baseaddr+rva, 0, normname) for rva, ord, name in pe.getExports()]
+            self.addSymbols(syms)
 
     def platformPs(self):
         return [ (1, 'SystemProcess'), ]
@@ -150,23 +150,26 @@ class ElfMixin:
         if not elf.isPreLinked() and elf.isSharedObject():
             addbase = baseaddr
 
+        syms = []
         for sec in elf.sections:
             sym = e_resolv.SectionSymbol(sec.name, sec.sh_addr+addbase, sec.sh_size, normname)
-            self.addSymbol(sym)
+            syms.append(sym)
 
         for sym in elf.symbols:
             symclass = typemap.get((sym.st_info & 0xf), e_resolv.Symbol)
             sym = symclass(sym.name, sym.st_value+addbase, sym.st_size, normname)
-            self.addSymbol(sym)
+            syms.append(sym)
 
         for sym in elf.dynamic_symbols:
             symclass = typemap.get((sym.st_info & 0xf), e_resolv.Symbol)
             sym = symclass(sym.name, sym.st_value+addbase, sym.st_size, normname)
-            self.addSymbol(sym)
+            syms.append(sym)
 
         if elf.isExecutable():
             sym = e_resolv.Symbol('__entry', elf.e_entry, 0, normname)
-            self.addSymbol(sym)
+            syms.append(sym)
+
+        self.addSymbols(syms)
 
 # As much as I would *love* if all the ptrace defines were the same all the time,
 # there seem to be small platform differences...
@@ -2,7 +2,6 @@
 
 import vtrace
 import vtrace.notifiers as v_notifiers
-import vtrace.rmi as v_rmi
 
 
 class TraceManager:
@@ -25,6 +24,7 @@ class TraceManager:
         """
         self.trace = trace
         if vtrace.remote:
+            import vtrace.rmi as v_rmi
             trace.registerNotifier(vtrace.NOTIFY_ALL, v_rmi.getCallbackProxy(trace, self.dnotif))
         else:
             trace.registerNotifier(vtrace.NOTIFY_ALL, self.dnotif)
@@ -40,6 +40,7 @@ class TraceManager:
         Untie this trace manager from the trace.
         """
         if vtrace.remote:
+            import vtrace.rmi as v_rmi
             trace.deregisterNotifier(vtrace.NOTIFY_ALL, v_rmi.getCallbackProxy(trace, self.dnotif))
         else:
             trace.deregisterNotifier(vtrace.NOTIFY_ALL, self.dnotif)